@@ -0,0 +1,150 @@
+# AI Agentic Platform - Async Database Benchmark
+"""
+Shows what a slow query does to every other request in the worker, with the synchronous session the
+routes used to use and with the async session they use now.
+
+Fast primary-key lookups arrive at a steady rate while a few slow queries run alongside them.
+A slow query calls a ``sleep(ms)`` SQL function, SQLite's stand-in for ``pg_sleep``: like a query
+waiting on a busy database server or a lock, it takes time without using the worker's CPU. With a
+synchronous session the slow query holds the event loop, so every lookup that arrives meanwhile
+waits for it; with the async session the lookups keep being served while the slow queries wait on
+their own connections.
+
+Run from the repository root:
+    python -m backend.benchmarks.bench_async_db --lookups 500 --slow-queries 5
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import SQLModel
+
+from ..models import Agent, async_database_url
+
+SLOW_QUERY = text("SELECT sleep(:ms)")
+
+def add_sleep_function(dbapi_connection, connection_record) -> None:
+    """Register ``sleep(ms)`` on each new connection."""
+    dbapi_connection.create_function("sleep", 1, lambda ms: time.sleep(ms / 1000))
+
+def populate(engine, count: int) -> list:
+    """Insert agents and return their IDs."""
+    now = datetime.utcnow()
+    owner_id = uuid.uuid4()
+    rows = [
+        {"id": uuid.uuid4(), "name": f"agent-{i}", "status": "active", "config": {},
+         "owner_id": owner_id, "created_at": now, "updated_at": now}
+        for i in range(count)
+    ]
+    with engine.begin() as conn:
+        conn.execute(Agent.__table__.insert(), rows)
+    return [row["id"] for row in rows]
+
+async def sync_lookup(session_factory, agent_id) -> None:
+    """Fetch an agent the way the routes used to, blocking the event loop."""
+    db = session_factory()
+    try:
+        db.get(Agent, agent_id)
+    finally:
+        db.close()
+
+async def sync_slow(session_factory, ms: int) -> None:
+    """Run the slow query on a synchronous session."""
+    db = session_factory()
+    try:
+        db.execute(SLOW_QUERY, {"ms": ms}).scalar()
+    finally:
+        db.close()
+
+async def async_lookup(session_factory, agent_id) -> None:
+    """Fetch an agent on an async session."""
+    async with session_factory() as db:
+        await db.get(Agent, agent_id)
+
+async def async_slow(session_factory, ms: int) -> None:
+    """Run the slow query on an async session."""
+    async with session_factory() as db:
+        (await db.execute(SLOW_QUERY, {"ms": ms})).scalar()
+
+async def run_mix(lookup, slow, session_factory, ids, lookups: int, interval: float,
+                  slow_queries: int, slow_ms: int):
+    """Fire lookups every ``interval`` seconds alongside the slow queries.
+    
+    Returns each lookup's latency, counted from when it was due rather than when the event loop
+    got round to starting it, and the total wall time.
+    """
+    latencies = []
+    
+    async def timed_lookup(agent_id, due: float) -> None:
+        await lookup(session_factory, agent_id)
+        latencies.append(time.perf_counter() - due)
+    
+    start = time.perf_counter()
+    tasks = [asyncio.ensure_future(slow(session_factory, slow_ms)) for _ in range(slow_queries)]
+    for i in range(lookups):
+        due = start + i * interval
+        await asyncio.sleep(max(0.0, due - time.perf_counter()))
+        tasks.append(asyncio.ensure_future(timed_lookup(ids[i % len(ids)], due)))
+    await asyncio.gather(*tasks)
+    return latencies, time.perf_counter() - start
+
+def report(label: str, latencies, elapsed: float) -> None:
+    """Print latency percentiles for a run."""
+    latencies = sorted(latencies)
+    p50 = statistics.median(latencies) * 1000
+    p95 = latencies[int(len(latencies) * 0.95)] * 1000
+    print(f"{label:<8} {p50:>9.1f} {p95:>9.1f} {latencies[-1] * 1000:>9.1f} {elapsed:>9.2f}")
+
+def run(agents: int, lookups: int, interval_ms: float, slow_queries: int, slow_ms: int) -> None:
+    """Benchmark the same request mix on both kinds of session."""
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        engine = create_engine(url, connect_args={"check_same_thread": False})
+        SQLModel.metadata.create_all(engine)
+        ids = populate(engine, agents)
+        event.listen(engine, "connect", add_sleep_function)
+        async_engine = create_async_engine(async_database_url(url))
+        event.listen(async_engine.sync_engine, "connect", add_sleep_function)
+        print(f"{lookups} lookups every {interval_ms:g} ms alongside {slow_queries} "
+              f"slow queries of {slow_ms} ms\n")
+        
+        print(f"{'session':<8} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9} {'total s':>9}")
+        latencies, elapsed = asyncio.run(run_mix(
+            sync_lookup, sync_slow, sessionmaker(bind=engine), ids,
+            lookups, interval_ms / 1000, slow_queries, slow_ms
+        ))
+        report("sync", latencies, elapsed)
+        
+        async def run_async():
+            try:
+                return await run_mix(
+                    async_lookup, async_slow, sessionmaker(async_engine, class_=AsyncSession), ids,
+                    lookups, interval_ms / 1000, slow_queries, slow_ms
+                )
+            finally:
+                await async_engine.dispose()
+        latencies, elapsed = asyncio.run(run_async())
+        report("async", latencies, elapsed)
+        engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--agents", type=int, default=10000)
+    parser.add_argument("--lookups", type=int, default=500)
+    parser.add_argument("--interval-ms", type=float, default=2.0)
+    parser.add_argument("--slow-queries", type=int, default=5)
+    parser.add_argument("--slow-ms", type=int, default=200)
+    args = parser.parse_args()
+    
+    logging.getLogger("ai_agentic_platform").setLevel(logging.WARNING)
+    run(args.agents, args.lookups, args.interval_ms, args.slow_queries, args.slow_ms)
@@ -0,0 +1,111 @@
+# AI Agentic Platform - Conditional GET Benchmark
+"""
+Compares what a poll of an agent, and of a page of the agent listing, costs when it fetches the
+full response against when it revalidates a cached copy with ``If-None-Match`` and gets a 304.
+
+Calls the route handlers on an async session, so the numbers cover the queries, projection and
+encoding a poll costs the worker, without the HTTP layer. Agents carry configuration and metrics
+blobs of realistic size.
+
+Run from the repository root:
+    python -m backend.benchmarks.bench_conditional --agents 5000 --page-size 100
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import SQLModel
+from starlette.requests import Request
+
+from ..models import Agent, async_database_url
+from ..routes.agents import get_agent, get_agents
+from ..schemas import AgentRead, parse_fields
+from ..utils.pagination import PageRequest
+
+def populate(engine, count: int) -> list:
+    """Insert agents with configuration blobs and return their IDs."""
+    owner_id = uuid.uuid4()
+    start = datetime(2024, 1, 1)
+    rows = [
+        {
+            "id": uuid.uuid4(), "name": f"agent-{i}", "description": "Answers support tickets", "status": "active",
+            "config": {
+                "model": "llama2", "temperature": 0.7, "system_prompt": "You are a helpful support agent. " * 8,
+                "tools": [{"name": f"tool-{t}", "timeout": 30, "retries": 2} for t in range(5)]
+            },
+            "performance_metrics": {"runs": i, "success_rate": 0.98, "latency_ms": 850.5},
+            "mcp_tools": ["search", "calendar"], "owner_id": owner_id,
+            "created_at": start + timedelta(seconds=i), "updated_at": start + timedelta(seconds=i)
+        }
+        for i in range(count)
+    ]
+    with engine.begin() as conn:
+        conn.execute(Agent.__table__.insert(), rows)
+    return [row["id"] for row in rows]
+
+def make_request(etag: str = None) -> Request:
+    """Build a GET request, revalidating ``etag`` if given."""
+    headers = [(b"if-none-match", etag.encode())] if etag else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+async def time_polls(poll, repeats: int):
+    """Get the mean milliseconds per poll, and the status and body size of the last one."""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        response = await poll()
+    return (time.perf_counter() - start) / repeats * 1000, response.status_code, len(response.body)
+
+async def run_polls(url: str, agent_ids: list, page_size: int, repeats: int) -> None:
+    """Benchmark full and conditional polls of an agent and of a listing page."""
+    engine = create_async_engine(url)
+    db = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)()
+    fields = parse_fields(None, AgentRead)
+    page = PageRequest(after=None, limit=page_size)
+    agent_id = str(agent_ids[len(agent_ids) // 2])
+    
+    def detail(etag=None):
+        return lambda: get_agent(agent_id, make_request(etag), fields=fields, db=db)
+    
+    def listing(etag=None):
+        return lambda: get_agents(make_request(etag), owner_id=None, agent_status=None, page=page, fields=fields, db=db)
+    
+    print(f"{'poll':<10} {'full ms':>8} {'304 ms':>8} {'speedup':>8} {'full KB':>8} {'304 KB':>7}")
+    for name, poll in (("agent", detail), (f"page/{page_size}", listing)):
+        etag = (await poll()()).headers["etag"]
+        full, _, full_bytes = await time_polls(poll(), repeats)
+        cached, status_code, cached_bytes = await time_polls(poll(etag), repeats)
+        assert status_code == 304
+        print(f"{name:<10} {full:>8.2f} {cached:>8.2f} {full / cached:>7.1f}x "
+              f"{full_bytes / 1024:>8.1f} {cached_bytes / 1024:>7.1f}")
+    
+    await db.close()
+    await engine.dispose()
+
+def run(agents: int, page_size: int, repeats: int) -> None:
+    """Populate a database and benchmark polling it."""
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        engine = create_engine(url)
+        SQLModel.metadata.create_all(engine)
+        agent_ids = populate(engine, agents)
+        engine.dispose()
+        asyncio.run(run_polls(async_database_url(url), agent_ids, page_size, repeats))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--agents", type=int, default=5000)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+    
+    logging.getLogger("ai_agentic_platform").setLevel(logging.WARNING)
+    run(args.agents, args.page_size, args.repeats)
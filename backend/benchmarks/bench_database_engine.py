@@ -0,0 +1,105 @@
+# AI Agentic Platform - Database Engine Benchmark
+"""
+Compares request-shaped database work under the engine settings ``models.py`` used to hard-code and
+under the ones it now builds from ``config.Settings``.
+
+Each operation opens a session the way a request does and either fetches an agent by ID or inserts
+one and commits. Settings are layered on one at a time: the old engine (no pool, SQLite defaults,
+every statement echoed), then echo off, then a connection pool, then the SQLite pragmas (WAL,
+``synchronous=NORMAL``, ``busy_timeout``, ``mmap_size``), then sampled statement logging. Echoed
+statements go to /dev/null so the terminal's speed doesn't count against echo.
+
+Run from the repository root:
+    python -m backend.benchmarks.bench_database_engine --reads 5000 --writes 1000
+"""
+
+import argparse
+import contextlib
+import logging
+import os
+import random
+import tempfile
+import time
+import uuid
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import SQLModel
+
+from ..config import Settings
+from ..models import Agent, create_database_engine
+from ..utils.logging import console_handler, logger
+
+def make_agent(owner_id: uuid.UUID) -> Agent:
+    """Build an agent row for inserting."""
+    return Agent(name=f"agent-{uuid.uuid4().hex[:8]}", status="inactive", config={}, owner_id=owner_id)
+
+def time_workload(engine, reads: int, writes: int, seed_rows: int):
+    """Get reads and writes per second, each in its own session as a request would."""
+    SQLModel.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+    owner_id = uuid.uuid4()
+    with session_factory() as db:
+        agents = [make_agent(owner_id) for _ in range(seed_rows)]
+        db.add_all(agents)
+        db.commit()
+        ids = [agent.id for agent in agents]
+    rng = random.Random(0)
+    
+    start = time.perf_counter()
+    for _ in range(reads):
+        with session_factory() as db:
+            db.get(Agent, rng.choice(ids))
+    read_rate = reads / (time.perf_counter() - start)
+    
+    start = time.perf_counter()
+    for _ in range(writes):
+        with session_factory() as db:
+            db.add(make_agent(owner_id))
+            db.commit()
+    write_rate = writes / (time.perf_counter() - start)
+    return read_rate, write_rate
+
+def run(reads: int, writes: int, seed_rows: int, sample_rate: float) -> None:
+    """Benchmark each step from the old engine settings to the new ones."""
+    with tempfile.TemporaryDirectory() as tmp, open(os.devnull, "w") as devnull:
+        def url(name: str) -> str:
+            # A database per configuration, since WAL mode sticks to the file
+            return f"sqlite:///{os.path.join(tmp, name + '.db')}"
+        
+        # Settings that leave SQLite's own defaults in place
+        sqlite_defaults = {"sqlite_journal_mode": "DELETE", "sqlite_synchronous": "FULL",
+                           "sqlite_busy_timeout_ms": 0, "sqlite_mmap_size": 0}
+        configurations = [
+            ("old: no pool, echo", lambda: create_engine(url("old"), echo=True)),
+            ("no pool", lambda: create_engine(url("no_pool"))),
+            ("pool", lambda: create_database_engine(Settings(database_url=url("pool"), **sqlite_defaults))),
+            ("pool + pragmas", lambda: create_database_engine(Settings(database_url=url("pragmas")))),
+            (f"+ {sample_rate:.0%} sampled log", lambda: create_database_engine(
+                Settings(database_url=url("sampled"), database_echo_sample_rate=sample_rate)
+            )),
+        ]
+        
+        # Really format and write the sampled statements, just not to the terminal
+        logger.setLevel(logging.INFO)
+        console_handler.setStream(devnull)
+        
+        print(f"{'engine':<22} {'reads/s':>9} {'writes/s':>9}")
+        for label, make_engine in configurations:
+            # Echo writes to stdout through a handler created with the engine
+            with contextlib.redirect_stdout(devnull):
+                engine = make_engine()
+                read_rate, write_rate = time_workload(engine, reads, writes, seed_rows)
+            engine.dispose()
+            print(f"{label:<22} {read_rate:>9.0f} {write_rate:>9.0f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--reads", type=int, default=5000)
+    parser.add_argument("--writes", type=int, default=1000)
+    parser.add_argument("--seed-rows", type=int, default=1000)
+    parser.add_argument("--sample-rate", type=float, default=0.01)
+    args = parser.parse_args()
+    
+    logging.getLogger("ai_agentic_platform").setLevel(logging.WARNING)
+    run(args.reads, args.writes, args.seed_rows, args.sample_rate)
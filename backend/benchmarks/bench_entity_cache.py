@@ -0,0 +1,160 @@
+# AI Agentic Platform - Entity Cache Benchmark
+"""
+Compares the agent and team reads detail pages and workflow runs make, from the database and
+through the entity cache:
+
+- an agent's detail, from the database, the process's LRU and the shared SQLite tier
+- a team with its agents, as ``load_team_with_agents`` and ``cached_team_with_agents`` load them
+- a burst of concurrent requests for a team that is not cached, each querying the database against
+  waiting on one load
+
+Requests pick agents and teams with a skew, so a few are hot and most are read now and then, and
+each request opens a session of its own as a route would.
+
+Run from the repository root:
+    python -m backend.benchmarks.bench_entity_cache --teams 2000 --members 8 --requests 5000
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import SQLModel
+
+from ..models import Agent, Team, TeamMembership, async_database_url
+from ..routes.teams import cached_team_with_agents, load_team_with_agents
+from ..schemas import AgentRead, AgentSnapshot, project
+from ..services.entity_cache import EntityCache, SharedEntityStore, agent_cache, load_agents, team_cache
+
+def populate(engine, teams: int, members: int) -> tuple:
+    """Insert teams of agents, returning the agent and team IDs."""
+    owner_id = uuid.uuid4()
+    start = datetime(2024, 1, 1)
+    agent_ids = [uuid.uuid4() for _ in range(teams * members)]
+    team_ids = [uuid.uuid4() for _ in range(teams)]
+    with engine.begin() as conn:
+        conn.execute(Agent.__table__.insert(), [
+            {"id": agent_id, "name": f"agent-{i}", "status": "active", "config": {"model": "llama2"},
+             "performance_metrics": {}, "mcp_tools": [], "owner_id": owner_id, "row_version": 1,
+             "created_at": start + timedelta(seconds=i), "updated_at": start + timedelta(seconds=i)}
+            for i, agent_id in enumerate(agent_ids)
+        ])
+        conn.execute(Team.__table__.insert(), [
+            {"id": team_id, "name": f"team-{i}", "owner_id": owner_id, "orchestration_rules": {}, "row_version": 1,
+             "created_at": start + timedelta(seconds=i), "updated_at": start + timedelta(seconds=i)}
+            for i, team_id in enumerate(team_ids)
+        ])
+        conn.execute(TeamMembership.__table__.insert(), [
+            {"team_id": team_id, "agent_id": agent_ids[i * members + position], "position": position, "role": None}
+            for i, team_id in enumerate(team_ids) for position in range(members)
+        ])
+    return agent_ids, team_ids
+
+def skewed(ids: list, count: int) -> list:
+    """Pick ``count`` IDs, the first of them far more often than the rest."""
+    weights = [1 / (rank + 1) for rank in range(len(ids))]
+    return random.choices(ids, weights, k=count)
+
+async def time_requests(sessions, requests: list, read) -> float:
+    """Get the mean milliseconds per request of ``read``, each on a session of its own."""
+    start = time.perf_counter()
+    for key in requests:
+        async with sessions() as db:
+            await read(db, key)
+    return (time.perf_counter() - start) / len(requests) * 1000
+
+async def run_reads(url: str, agent_ids: list, team_ids: list, requests: int, burst: int, shared_path: str) -> None:
+    """Benchmark each read from the database and through the cache."""
+    engine = create_async_engine(url)
+    sessions = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    agent_requests, team_requests = skewed(agent_ids, requests), skewed(team_ids, requests)
+    
+    async def agent_from_database(db, agent_id):
+        agent = (await db.execute(select(Agent).filter(Agent.id == agent_id))).scalar_one()
+        return project(agent, AgentRead)
+    
+    async def agent_from_cache(db, agent_id):
+        return project(await agent_cache.get(db, agent_id), AgentRead)
+    
+    shared = SharedEntityStore(shared_path)
+    shared_cache = EntityCache("agents", AgentSnapshot, load_agents, shared=shared)
+    
+    async def agent_from_shared_tier(db, agent_id):
+        # Another process has loaded the agent, but this one has not
+        shared_cache.clear()
+        return project(await shared_cache.get(db, agent_id), AgentRead)
+    
+    async with sessions() as db:
+        assert await agent_from_database(db, agent_ids[0]) == await agent_from_cache(db, agent_ids[0])
+        assert await load_team_with_agents(db, team_ids[0]) is not None
+        assert await cached_team_with_agents(db, team_ids[0]) is not None
+    
+    print(f"{'read':<22} {'db ms':>8} {'cache ms':>9} {'speedup':>8} {'hit rate':>9}")
+    base_ms = await time_requests(sessions, agent_requests, agent_from_database)
+    for name, read, cache in (
+        ("agent detail", agent_from_cache, agent_cache),
+        ("agent, shared tier", agent_from_shared_tier, shared_cache)
+    ):
+        cache.clear()
+        await time_requests(sessions, agent_requests[:1], read)
+        cached_ms = await time_requests(sessions, agent_requests, read)
+        hit_rate = cache.stats()["hit_rate"]
+        print(f"{name:<22} {base_ms:>8.3f} {cached_ms:>9.3f} {base_ms / cached_ms:>7.1f}x {hit_rate:>9.1%}")
+    
+    agent_cache.clear()
+    team_cache.clear()
+    base_ms = await time_requests(sessions, team_requests, load_team_with_agents)
+    cached_ms = await time_requests(sessions, team_requests, cached_team_with_agents)
+    hit_rate = team_cache.stats()["hit_rate"]
+    print(f"{'team with agents':<22} {base_ms:>8.3f} {cached_ms:>9.3f} {base_ms / cached_ms:>7.1f}x {hit_rate:>9.1%}")
+    
+    async def one_request(read, team_id):
+        async with sessions() as db:
+            await read(db, team_id)
+    
+    for name, read in (("database", load_team_with_agents), ("cache", cached_team_with_agents)):
+        agent_cache.clear()
+        team_cache.clear()
+        misses = team_cache.stats()["misses"]
+        start = time.perf_counter()
+        await asyncio.gather(*(one_request(read, team_ids[0]) for _ in range(burst)))
+        elapsed = (time.perf_counter() - start) * 1000
+        queries = burst if read is load_team_with_agents else team_cache.stats()["misses"] - misses
+        print(f"Burst of {burst} for a cold team from the {name}: {elapsed:.1f} ms, {queries} team queries")
+    
+    shared.close()
+    await engine.dispose()
+
+def run(teams: int, members: int, requests: int, burst: int) -> None:
+    """Populate a database and benchmark agent and team reads from it and through the cache."""
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        engine = create_engine(url)
+        SQLModel.metadata.create_all(engine)
+        agent_ids, team_ids = populate(engine, teams, members)
+        engine.dispose()
+        
+        asyncio.run(run_reads(
+            async_database_url(url), agent_ids, team_ids, requests, burst, os.path.join(tmp, "entity_cache.db")
+        ))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--teams", type=int, default=2000)
+    parser.add_argument("--members", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--burst", type=int, default=100)
+    args = parser.parse_args()
+    
+    logging.getLogger("ai_agentic_platform").setLevel(logging.WARNING)
+    random.seed(0)
+    run(args.teams, args.members, args.requests, args.burst)
@@ -0,0 +1,89 @@
+# AI Agentic Platform - Sparse Fieldset Benchmark
+"""
+Compares a page of the agent listing with every field against sparse fieldsets, from the SELECT to
+the encoded response body: how long a page takes and how many bytes it is.
+
+Agents carry configuration and metrics blobs of realistic size, so a dashboard asking for
+``fields=id,name,status`` skips loading, decoding and encoding most of each row.
+
+Run from the repository root:
+    python -m backend.benchmarks.bench_fieldsets --agents 20000 --page-size 1000
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlmodel import SQLModel
+
+from ..models import Agent
+from ..schemas import CURSOR_FIELDS, AgentRead, columns, parse_fields, project_page
+from ..utils.pagination import PageRequest, paginate_async
+
+FIELDSETS = [None, "id,name,status,updated_at", "id,name,status"]
+
+def populate(engine, count: int) -> None:
+    """Insert agents with configuration blobs."""
+    owner_id = uuid.uuid4()
+    start = datetime(2024, 1, 1)
+    rows = [
+        {
+            "id": uuid.uuid4(), "name": f"agent-{i}", "description": "Answers support tickets",
+            "status": "active" if i % 3 else "inactive",
+            "config": {
+                "model": "llama2", "temperature": 0.7, "system_prompt": "You are a helpful support agent. " * 8,
+                "tools": [{"name": f"tool-{t}", "timeout": 30, "retries": 2} for t in range(5)]
+            },
+            "performance_metrics": {"runs": i, "success_rate": 0.98, "latency_ms": 850.5},
+            "mcp_tools": ["search", "calendar"], "owner_id": owner_id,
+            "created_at": start + timedelta(seconds=i), "updated_at": start + timedelta(seconds=i)
+        }
+        for i in range(count)
+    ]
+    with engine.begin() as conn:
+        conn.execute(Agent.__table__.insert(), rows)
+
+async def time_fieldsets(path: str, page_size: int, repeats: int) -> None:
+    """Time the first listing page with each fieldset, fetched on an async session as the route does."""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    page = PageRequest(after=None, limit=page_size)
+    async with AsyncSession(engine) as db:
+        print(f"{'fields':<28} {'ms/page':>8} {'KB/page':>8}")
+        for fieldset in FIELDSETS:
+            fields = parse_fields(fieldset, AgentRead)
+            statement = select(*columns(Agent, fields, extra=CURSOR_FIELDS))
+            start = time.perf_counter()
+            for _ in range(repeats):
+                rows, next_cursor = await paginate_async(db, statement, Agent, page)
+                body = ORJSONResponse(project_page(rows, AgentRead, next_cursor, fields)).body
+            elapsed = (time.perf_counter() - start) / repeats
+            print(f"{fieldset or 'all':<28} {elapsed * 1000:>8.2f} {len(body) / 1024:>8.1f}")
+    await engine.dispose()
+
+def run(agents: int, page_size: int, repeats: int) -> None:
+    """Benchmark one listing page with each fieldset."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        engine = create_engine(f"sqlite:///{path}")
+        SQLModel.metadata.create_all(engine)
+        populate(engine, agents)
+        engine.dispose()
+        asyncio.run(time_fieldsets(path, page_size, repeats))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--agents", type=int, default=20000)
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+    
+    logging.getLogger("ai_agentic_platform").setLevel(logging.WARNING)
+    run(args.agents, args.page_size, args.repeats)
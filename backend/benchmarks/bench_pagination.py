@@ -0,0 +1,104 @@
+# AI Agentic Platform - Pagination Benchmark
+"""
+Compares OFFSET and keyset (cursor) pagination of the agent listing at increasing page depths.
+
+OFFSET has the database walk and throw away every row before the page, so deep pages get slower
+the further in they are; a keyset page seeks straight to its cursor through the
+``(created_at, id)`` index and costs the same at any depth. Pages are fetched with
+``paginate_async`` on an async session, as the listing routes fetch them.
+
+Run from the repository root:
+    python -m backend.benchmarks.bench_pagination --rows 1000000 --depths 0 10000 100000 500000 990000
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlmodel import SQLModel
+
+from ..models import Agent
+from ..utils.pagination import PageRequest, encode_cursor, decode_cursor, paginate_async
+
+def populate(engine, rows: int, batch_size: int = 50000) -> None:
+    """Insert agents with a few rows per second of creation time and a handful of owners."""
+    owners = [uuid.uuid4() for _ in range(10)]
+    start = datetime(2024, 1, 1)
+    table = Agent.__table__
+    with engine.begin() as conn:
+        for offset in range(0, rows, batch_size):
+            conn.execute(table.insert(), [
+                {
+                    "id": uuid.uuid4(),
+                    "name": f"agent-{i}",
+                    "status": "active" if i % 3 else "inactive",
+                    "config": {},
+                    "owner_id": owners[i % len(owners)],
+                    "created_at": start + timedelta(seconds=i // 4),
+                    "updated_at": start + timedelta(seconds=i // 4),
+                }
+                for i in range(offset, min(offset + batch_size, rows))
+            ])
+
+async def time_page(fetch, repeats: int) -> float:
+    """Get the mean latency of a page fetch in milliseconds."""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        await fetch()
+    return (time.perf_counter() - start) / repeats * 1000
+
+async def time_depths(path: str, rows: int, depths, page_size: int, repeats: int) -> None:
+    """Time both pagination styles at each depth on an async session."""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    statement = select(*Agent.__table__.columns)
+    ordered = statement.order_by(Agent.created_at, Agent.id)
+    async with AsyncSession(engine) as db:
+        print(f"{'depth':>9} {'offset ms':>10} {'keyset ms':>10}")
+        for depth in depths:
+            if depth >= rows:
+                continue
+            # The cursor a client would hold after paging down to this depth
+            after = None
+            if depth:
+                last = (await db.execute(ordered.offset(depth - 1).limit(1))).one()
+                after = decode_cursor(encode_cursor(last.created_at, last.id))
+            page = PageRequest(after=after, limit=page_size)
+            
+            async def fetch_offset():
+                return (await db.execute(ordered.offset(depth).limit(page_size))).all()
+            
+            offset_ms = await time_page(fetch_offset, repeats)
+            keyset_ms = await time_page(lambda: paginate_async(db, statement, Agent, page), repeats)
+            print(f"{depth:>9} {offset_ms:>10.2f} {keyset_ms:>10.2f}")
+    await engine.dispose()
+
+def run(rows: int, depths, page_size: int, repeats: int) -> None:
+    """Benchmark both pagination styles at each depth."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        engine = create_engine(f"sqlite:///{path}")
+        SQLModel.metadata.create_all(engine)
+        start = time.perf_counter()
+        populate(engine, rows)
+        engine.dispose()
+        print(f"inserted {rows} agents in {time.perf_counter() - start:.1f}s\n")
+        
+        asyncio.run(time_depths(path, rows, depths, page_size, repeats))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--depths", type=int, nargs="+", default=[0, 10000, 100000, 500000, 990000])
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    
+    logging.getLogger("ai_agentic_platform").setLevel(logging.WARNING)
+    run(args.rows, args.depths, args.page_size, args.repeats)
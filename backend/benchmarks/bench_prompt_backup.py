@@ -0,0 +1,65 @@
+# AI Agentic Platform - Prompt Backup Benchmark
+"""
+Measures backup and restore time, archive size and peak Python memory for full and incremental backups.
+
+Run from the repository root:
+    python -m backend.benchmarks.bench_prompt_backup --prompts 20000
+"""
+
+import argparse
+import logging
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from ..services.prompt_store import PromptStoreService
+
+def measured(label: str, func, path: str = None) -> None:
+    """Run ``func`` once and print its duration, peak traced memory and output size."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    size = f"{os.path.getsize(path) / 1e6:>8.2f} MB" if path else ""
+    print(f"{label:<20} {elapsed:>8.3f}s  peak {peak / 1e6:>8.2f} MB  {size}")
+
+def run(prompts: int, changed: int) -> None:
+    """Benchmark full and incremental backups and their restores."""
+    words = [f"word{i}" for i in range(5000)]
+    with tempfile.TemporaryDirectory() as tmp:
+        store = PromptStoreService(db_path=os.path.join(tmp, "bench.db"))
+        ids = [store.create_prompt(body=" ".join(random.choices(words, k=200)))["id"] for _ in range(prompts)]
+        
+        full_path = os.path.join(tmp, "full.opra")
+        checkpoint = None
+        
+        def full_backup():
+            nonlocal checkpoint
+            checkpoint = store.backup_prompts(full_path)
+        
+        measured("full backup", full_backup, full_path)
+        
+        for prompt_id in random.sample(ids, changed):
+            store.update_prompt(prompt_id, body=" ".join(random.choices(words, k=200)), version="1.1")
+        incremental_path = os.path.join(tmp, "incremental.opra")
+        measured("incremental backup", lambda: store.backup_prompts(incremental_path, since=checkpoint), incremental_path)
+        store.close()
+        
+        restored = PromptStoreService(db_path=os.path.join(tmp, "restored.db"))
+        measured("full restore", lambda: restored.restore_prompts(full_path))
+        measured("incremental restore", lambda: restored.restore_prompts(incremental_path))
+        measured("single restore", lambda: restored.restore_prompt(full_path, ids[prompts // 2]))
+        restored.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--prompts", type=int, default=5000)
+    parser.add_argument("--changed", type=int, default=100)
+    args = parser.parse_args()
+    
+    logging.getLogger("ai_agentic_platform").setLevel(logging.WARNING)
+    run(args.prompts, args.changed)
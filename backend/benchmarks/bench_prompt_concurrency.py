@@ -0,0 +1,97 @@
+# AI Agentic Platform - Prompt Store Concurrency Benchmark
+"""
+Stress test for concurrent prompt store readers, with and without a writer running alongside them.
+
+Each reader thread loops over cached lookups, tag counts, full-text searches and version lookups for a
+fixed time. Total read throughput is reported per thread count together with the writer's throughput,
+which shows whether readers hold up writes or each other. Pure-Python work still takes turns on the
+GIL, so total throughput flattens out once it is CPU-bound; what should not happen is throughput
+dropping as threads are added or while the writer runs.
+
+Run from the repository root:
+    python -m backend.benchmarks.bench_prompt_concurrency --prompts 5000 --threads 1 2 4 8 16
+"""
+
+import argparse
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+
+from ..services.prompt_store import PromptStoreService
+
+def read_loop(store: PromptStoreService, ids, words, stop: threading.Event, counts: list, slot: int) -> None:
+    """Run a mix of reads until told to stop, counting operations in ``counts[slot]``."""
+    rng = random.Random(slot)
+    operations = 0
+    while not stop.is_set():
+        prompt_id = rng.choice(ids)
+        store.get_prompt(prompt_id)
+        store.count_prompts(tags=[f"tag{rng.randrange(20)}"])
+        store.search_prompts(query=rng.choice(words), limit=10, ranked=True)
+        store.find_prompt_version(prompt_id, version="1.x")
+        operations += 4
+    counts[slot] = operations
+
+def write_loop(store: PromptStoreService, ids, words, stop: threading.Event, counts: list) -> None:
+    """Update random prompts until told to stop, counting updates in ``counts[0]``."""
+    rng = random.Random(-1)
+    updates = 0
+    while not stop.is_set():
+        store.update_prompt(
+            rng.choice(ids),
+            body=" ".join(rng.choices(words, k=50)),
+            version=f"1.{updates}",
+            tags=[f"tag{rng.randrange(20)}"]
+        )
+        updates += 1
+    counts[0] = updates
+
+def measure(store: PromptStoreService, ids, words, threads: int, duration: float, with_writer: bool):
+    """Run ``threads`` readers, and optionally a writer, for ``duration`` seconds."""
+    stop = threading.Event()
+    read_counts = [0] * threads
+    write_counts = [0]
+    workers = [
+        threading.Thread(target=read_loop, args=(store, ids, words, stop, read_counts, slot))
+        for slot in range(threads)
+    ]
+    if with_writer:
+        workers.append(threading.Thread(target=write_loop, args=(store, ids, words, stop, write_counts)))
+    
+    for worker in workers:
+        worker.start()
+    time.sleep(duration)
+    stop.set()
+    for worker in workers:
+        worker.join()
+    return sum(read_counts) / duration, write_counts[0] / duration
+
+def run(prompts: int, thread_counts, duration: float) -> None:
+    """Benchmark read throughput as reader threads are added."""
+    words = [f"word{i}" for i in range(2000)]
+    with tempfile.TemporaryDirectory() as tmp:
+        store = PromptStoreService(db_path=os.path.join(tmp, "bench.db"))
+        ids = [
+            store.create_prompt(body=" ".join(random.choices(words, k=50)), tags=[f"tag{i % 20}"])["id"]
+            for i in range(prompts)
+        ]
+        
+        print(f"{'threads':>7} {'reads/s':>12} {'per thread':>12} {'reads/s +writer':>16} {'writes/s':>10}")
+        for threads in thread_counts:
+            reads, _ = measure(store, ids, words, threads, duration, with_writer=False)
+            contended_reads, writes = measure(store, ids, words, threads, duration, with_writer=True)
+            print(f"{threads:>7} {reads:>12.0f} {reads / threads:>12.0f} {contended_reads:>16.0f} {writes:>10.0f}")
+        store.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--prompts", type=int, default=5000)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--duration", type=float, default=2.0)
+    args = parser.parse_args()
+    
+    logging.getLogger("ai_agentic_platform").setLevel(logging.WARNING)
+    run(args.prompts, args.threads, args.duration)
@@ -0,0 +1,85 @@
+# AI Agentic Platform - Near-Duplicate Prompt Benchmark
+"""
+Compares finding a prompt's near-duplicates through the MinHash LSH index with comparing it against
+every prompt, and times clustering the whole library.
+
+The library is random prompts plus lightly edited copies of some of them (a few words replaced), so
+the recall column shows how many planted copies each lookup finds.
+
+Run from the repository root:
+    python -m backend.benchmarks.bench_prompt_duplicates --sizes 1000 10000 50000
+"""
+
+import argparse
+import random
+import time
+
+from ..services.prompt_index import MinHashIndex, cluster_signatures, minhash_similarity
+
+def make_library(size: int, copies: float, edits: int):
+    """Build prompt bodies where a ``copies`` fraction are edited copies of earlier ones.
+    
+    Returns the bodies and a map from each original's ordinal to its copies' ordinals.
+    """
+    rng = random.Random(0)
+    words = [f"word{i}" for i in range(5000)]
+    bodies = []
+    planted = {}
+    for ordinal in range(size):
+        if bodies and rng.random() < copies:
+            source = rng.randrange(len(bodies))
+            tokens = bodies[source].split()
+            for _ in range(edits):
+                tokens[rng.randrange(len(tokens))] = rng.choice(words)
+            planted.setdefault(source, []).append(ordinal)
+            bodies.append(" ".join(tokens))
+        else:
+            bodies.append(" ".join(rng.choices(words, k=80)))
+    return bodies, planted
+
+def run(sizes, lookups: int, threshold: float) -> None:
+    """Benchmark indexed lookups against a linear scan at each library size."""
+    print(f"{'prompts':>8} {'index build s':>14} {'lsh lookup ms':>14} {'scan lookup ms':>15} "
+          f"{'recall':>7} {'cluster s':>10} {'clusters':>9}")
+    for size in sizes:
+        bodies, planted = make_library(size, copies=0.1, edits=2)
+        index = MinHashIndex()
+        
+        start = time.perf_counter()
+        for ordinal, body in enumerate(bodies):
+            index.add(ordinal, body)
+        build = time.perf_counter() - start
+        
+        rng = random.Random(1)
+        sources = rng.sample(sorted(planted), min(lookups, len(planted)))
+        signatures = index.signatures()
+        
+        found = expected = 0
+        start = time.perf_counter()
+        for source in sources:
+            matches = {ordinal for ordinal, _ in index.query(signatures[source], threshold)}
+            found += len(matches & set(planted[source]))
+            expected += len(planted[source])
+        lsh = (time.perf_counter() - start) / len(sources)
+        
+        start = time.perf_counter()
+        for source in sources:
+            [ordinal for ordinal, signature in signatures.items()
+             if minhash_similarity(signatures[source], signature) >= threshold]
+        scan = (time.perf_counter() - start) / len(sources)
+        
+        start = time.perf_counter()
+        clusters = cluster_signatures(signatures, bands=index.bands, threshold=threshold)
+        cluster = time.perf_counter() - start
+        
+        print(f"{size:>8} {build:>14.2f} {lsh * 1000:>14.3f} {scan * 1000:>15.1f} "
+              f"{found / expected:>7.3f} {cluster:>10.2f} {len(clusters):>9}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--lookups", type=int, default=200)
+    parser.add_argument("--threshold", type=float, default=0.8)
+    args = parser.parse_args()
+    
+    run(args.sizes, args.lookups, args.threshold)
@@ -0,0 +1,148 @@
+# AI Agentic Platform - Prompt Bulk Import Benchmark
+"""
+Compares creating prompts one ``POST /prompts/`` call at a time, each with its own commit and
+refresh, with ``POST /prompts/bulk``, which inserts them in chunked transactions, and then times a
+full streaming ``GET /prompts/export``. The prompt store's ``import_prompts`` and ``export_chunks``,
+which parse and encode with the same ``utils.bulk`` code, are timed on the same rows.
+
+Calls the route handlers on an async session over an engine configured as the platform's is (WAL,
+pooled connections), so the numbers cover the statements and commits without the HTTP layer.
+
+Run from the repository root:
+    python -m backend.benchmarks.bench_prompt_import --prompts 20000 --chunk-sizes 100 500 2000
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+import uuid
+from types import SimpleNamespace
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import SQLModel
+
+from ..config import Settings
+from ..models import create_async_database_engine
+from ..routes import prompts
+from ..routes.prompts import _export_chunks, create_prompt, import_prompts
+from ..services.prompt_store import PromptStoreService
+from ..utils import bulk
+
+# Bytes per chunk of the request body fed to the bulk import
+STREAM_CHUNK_SIZE = 64 * 1024
+
+def make_rows(count: int):
+    """Yield bulk import rows with random bodies and tags."""
+    rng = random.Random(0)
+    words = [f"word{i}" for i in range(2000)]
+    for _ in range(count):
+        yield {"body": " ".join(rng.choices(words, k=50)), "tags": [f"tag{rng.randrange(20)}"]}
+
+class NdjsonRequest:
+    """Stands in for the request of a bulk import, streaming an NDJSON body in chunks."""
+    
+    def __init__(self, rows):
+        """Encode the rows as the body."""
+        self.headers = {"content-type": "application/x-ndjson"}
+        self.body = "".join(json.dumps(row) + "\n" for row in rows).encode("utf-8")
+    
+    async def stream(self):
+        """Yield the body a chunk at a time, as the server receives it."""
+        for start in range(0, len(self.body), STREAM_CHUNK_SIZE):
+            yield self.body[start:start + STREAM_CHUNK_SIZE]
+
+async def open_database(path: str):
+    """Create a fresh database, returning its engine and a session factory."""
+    engine = create_async_database_engine(Settings(database_url=f"sqlite:///{path}"))
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    return engine, sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+async def time_singles(path: str, count: int) -> float:
+    """Get the prompts per second created with one ``POST /prompts/`` call each."""
+    engine, sessions = await open_database(path)
+    user = SimpleNamespace(id=uuid.uuid4())
+    async with sessions() as db:
+        start = time.perf_counter()
+        for row in make_rows(count):
+            await create_prompt(body=row["body"], tags=row["tags"], db=db, current_user=user)
+        elapsed = time.perf_counter() - start
+    await engine.dispose()
+    return count / elapsed
+
+async def time_import(path: str, count: int, chunk_size: int) -> float:
+    """Get the prompts per second created by ``POST /prompts/bulk`` with ``chunk_size`` rows per transaction."""
+    engine, sessions = await open_database(path)
+    request = NdjsonRequest(make_rows(count))
+    prompts.BULK_CHUNK_SIZE = chunk_size
+    async with sessions() as db:
+        start = time.perf_counter()
+        result = await import_prompts(request=request, db=db, current_user=SimpleNamespace(id=uuid.uuid4()))
+        elapsed = time.perf_counter() - start
+    await engine.dispose()
+    assert result["imported"] == count
+    return count / elapsed
+
+async def time_export(path: str) -> float:
+    """Get the prompts per second streamed by ``GET /prompts/export``."""
+    engine = create_async_database_engine(Settings(database_url=f"sqlite:///{path}"))
+    sessions = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    start = time.perf_counter()
+    exported = 0
+    async for chunk in _export_chunks("ndjson", sessions):
+        exported += chunk.count(b"\n")
+    elapsed = time.perf_counter() - start
+    await engine.dispose()
+    return exported / elapsed
+
+def time_store(path: str, count: int, chunk_size: int):
+    """Get the prompts per second imported and exported by the prompt store, as NDJSON."""
+    prompt_store = PromptStoreService(db_path=path)
+    body = NdjsonRequest(make_rows(count)).body
+    chunks = (body[start:start + STREAM_CHUNK_SIZE] for start in range(0, len(body), STREAM_CHUNK_SIZE))
+    start = time.perf_counter()
+    result = prompt_store.import_prompts(bulk.iter_ndjson(chunks), chunk_size=chunk_size)
+    imported = time.perf_counter() - start
+    assert result["imported"] == count
+    
+    start = time.perf_counter()
+    exported = sum(chunk.count(b"\n") for chunk in prompt_store.export_chunks())
+    elapsed = time.perf_counter() - start
+    prompt_store.close()
+    return count / imported, exported / elapsed
+
+async def run_benchmarks(tmp: str, prompts_count: int, chunk_sizes) -> None:
+    """Benchmark single creates against bulk imports of the same rows, then export the last import."""
+    # Single creates are slow, so time a slice of the rows and report the rate
+    singles = await time_singles(os.path.join(tmp, "singles.db"), min(prompts_count, 2000))
+    print(f"{'POST /prompts/':<24} {singles:>10.0f} prompts/s")
+    
+    for chunk_size in chunk_sizes:
+        path = os.path.join(tmp, f"import-{chunk_size}.db")
+        rate = await time_import(path, prompts_count, chunk_size)
+        print(f"{f'POST /prompts/bulk ({chunk_size})':<24} {rate:>10.0f} prompts/s  {rate / singles:>6.1f}x")
+    print(f"{'GET /prompts/export':<24} {await time_export(path):>10.0f} prompts/s")
+    
+    imported, exported = time_store(os.path.join(tmp, "store.db"), prompts_count, chunk_sizes[-1])
+    print(f"{f'store import ({chunk_sizes[-1]})':<24} {imported:>10.0f} prompts/s")
+    print(f"{'store export':<24} {exported:>10.0f} prompts/s")
+
+def run(prompts_count: int, chunk_sizes) -> None:
+    """Run the benchmarks on fresh databases."""
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run_benchmarks(tmp, prompts_count, chunk_sizes))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--prompts", type=int, default=20000)
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[100, 500, 2000])
+    args = parser.parse_args()
+    
+    logging.getLogger("ai_agentic_platform").setLevel(logging.WARNING)
+    run(args.prompts, args.chunk_sizes)
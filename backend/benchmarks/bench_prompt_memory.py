@@ -0,0 +1,81 @@
+# AI Agentic Platform - Prompt Record Memory Benchmark
+"""
+Measures the memory the prompt cache spends per prompt, comparing the dicts the cache used to hold
+(ISO timestamp strings, tag lists and the full audit log) with ``PromptRecord``.
+
+Bodies are drawn from a shared pool in both cases, as the cache shares identical bodies either way,
+so the numbers are the per-record overhead on top of the text itself. The old layout also grows with
+every update through the audit log; ``--updates`` sets how many each prompt has had.
+
+Run from the repository root:
+    python -m backend.benchmarks.bench_prompt_memory --prompts 1000000
+"""
+
+import argparse
+import json
+import multiprocessing
+import random
+import resource
+from datetime import datetime, timedelta
+
+from ..services.prompt_store import PromptRecord
+
+def make_rows(count: int, updates: int):
+    """Yield prompt fields as they come out of the database, one prompt at a time."""
+    rng = random.Random(0)
+    bodies = [" ".join(f"word{rng.randrange(5000)}" for _ in range(40)) for _ in range(1000)]
+    tags = [f"tag{i}" for i in range(50)]
+    start = datetime(2024, 1, 1)
+    for i in range(count):
+        created = (start + timedelta(seconds=i, microseconds=rng.randrange(1000000))).isoformat()
+        updated = (start + timedelta(seconds=i + 3600, microseconds=rng.randrange(1000000))).isoformat()
+        audit = [{"action": "create", "timestamp": created, "version": "1.0"}] + [
+            {"action": "update", "timestamp": updated, "version": f"1.{n + 1}"} for n in range(updates)
+        ]
+        yield i + 1, f"prompt_{i + 1}", rng.choice(bodies), "1.1", json.dumps(rng.sample(tags, 3)), created, updated, json.dumps(audit)
+
+def as_dict(seq, prompt_id, body, version, tags, created, updated, audit):
+    """Build the dict the cache used to hold for a prompt."""
+    return {
+        "id": prompt_id,
+        "body": body,
+        "version": version,
+        "tags": json.loads(tags),
+        "created_at": created,
+        "updated_at": updated,
+        "audit_log": json.loads(audit)
+    }
+
+def as_record(seq, prompt_id, body, version, tags, created, updated, audit):
+    """Build the record the cache holds now."""
+    return PromptRecord(seq, prompt_id, body, version, json.loads(tags), created, updated, "update")
+
+def peak_rss() -> int:
+    """Get this process's peak resident memory in bytes (Linux reports kilobytes)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def measure(build, count: int, updates: int) -> int:
+    """Get the memory taken by ``count`` cached prompts built with ``build``."""
+    rows = make_rows(count, updates)
+    # Materialize the shared body pool before the baseline so it is not counted
+    first = next(rows)
+    baseline = peak_rss()
+    cache = {first[1]: build(*first)}
+    for row in rows:
+        cache[row[1]] = build(*row)
+    return peak_rss() - baseline
+
+def run(prompts: int, updates: int) -> None:
+    """Compare the two cache layouts, each in a fresh process so peaks do not overlap."""
+    for label, build in (("dict", as_dict), ("record", as_record)):
+        with multiprocessing.Pool(1) as pool:
+            size = pool.apply(measure, (build, prompts, updates))
+        print(f"{label:<8} {size / 1e6:>10.1f} MB  {size / prompts:>8.0f} bytes/prompt")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--prompts", type=int, default=1000000)
+    parser.add_argument("--updates", type=int, default=3)
+    args = parser.parse_args()
+    
+    run(args.prompts, args.updates)
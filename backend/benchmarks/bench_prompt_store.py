@@ -0,0 +1,70 @@
+# AI Agentic Platform - Prompt Store Benchmark
+"""
+Measures PromptStoreService operations per second against a file-backed store.
+
+Run from the repository root:
+    python -m backend.benchmarks.bench_prompt_store --prompts 5000
+"""
+
+import argparse
+import logging
+import os
+import random
+import tempfile
+import time
+
+from ..services.prompt_store import PromptStoreService
+
+def timed(label: str, count: int, func) -> None:
+    """Run ``func`` ``count`` times and print the resulting throughput."""
+    start = time.perf_counter()
+    for i in range(count):
+        func(i)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<12} {count:>8} ops  {count / elapsed:>12,.0f} ops/s")
+
+def run(prompts: int) -> None:
+    """Benchmark the main prompt store operations."""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = PromptStoreService(db_path=os.path.join(tmp, "bench.db"))
+        ids = []
+        tags = [f"tag{i}" for i in range(50)]
+        words = [f"word{i}" for i in range(2000)]
+        
+        timed("create", prompts, lambda i: ids.append(
+            store.create_prompt(body=" ".join(random.choices(words, k=40)), tags=random.sample(tags, 3))["id"]
+        ))
+        timed("get", prompts * 10, lambda i: store.get_prompt(ids[i % len(ids)]))
+        timed("update", prompts, lambda i: store.update_prompt(ids[i], body=f"Edited body {i}", version="1.1"))
+        timed("versions", prompts, lambda i: store.get_prompt_versions(ids[i]))
+        timed("rollback", prompts, lambda i: store.rollback_prompt(ids[i], "1.0"))
+        timed("find", prompts, lambda i: store.find_prompt_version(ids[i], "1.x"))
+        timed("search", 100, lambda i: store.search_prompts(tags=[tags[i % len(tags)]]))
+        timed("fulltext", 1000, lambda i: store.search_prompts(
+            query=f"{words[i % len(words)]} {words[(i * 7) % len(words)]}", limit=20, ranked=True
+        ))
+        timed("prefix", 1000, lambda i: store.search_prompts(query=f"word{i % 100}*", limit=20, ranked=True))
+        timed("substring", 100, lambda i: store.search_prompts(query=f"d{i % 100}", limit=20))
+        timed("count", 1000, lambda i: store.count_prompts(
+            all_tags=[tags[i % len(tags)]], exclude_tags=[tags[(i + 1) % len(tags)]]
+        ))
+        
+        # Copies of shared templates are stored once
+        templates = [" ".join(random.choices(words, k=200)) for _ in range(20)]
+        timed("copy", prompts, lambda i: store.create_prompt(body=templates[i % len(templates)]))
+        stats = store.get_storage_stats()
+        print(f"{'dedup':<12} {stats['saved_bytes'] / 1e6:>8.2f} MB saved  {stats['dedup_ratio']:>8.1f}x")
+        
+        # Reopening rebuilds the cache from disk, as a worker does at startup
+        store.close()
+        start = time.perf_counter()
+        PromptStoreService(db_path=os.path.join(tmp, "bench.db")).close()
+        print(f"{'reopen':<12} {prompts:>8} prompts loaded in {time.perf_counter() - start:.3f}s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--prompts", type=int, default=2000)
+    args = parser.parse_args()
+    
+    logging.getLogger("ai_agentic_platform").setLevel(logging.WARNING)
+    run(args.prompts)
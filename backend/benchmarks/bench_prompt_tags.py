@@ -0,0 +1,151 @@
+# AI Agentic Platform - Prompt Tag Benchmark
+"""
+Compares the tag queries the prompt listing makes, run as scans of each prompt's JSON tag array
+with ``json_each`` and through the PromptTag index:
+
+- the first page of prompts with one tag, with all of two tags and with either of two tags
+- counting the prompts with each tag
+
+The listing's filter picks how to use the index from how many prompts have each tag, so tags
+from the common and the rare end of the vocabulary are both measured.
+
+Tags are drawn from a skewed vocabulary, so some are on most prompts and most are rare. Prompts
+are written with their tags in the JSON column only and indexed with ``backfill_prompt_tags``, as
+an existing database would be at startup, so the backfill is timed too.
+
+Run from the repository root:
+    python -m backend.benchmarks.bench_prompt_tags --prompts 100000
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import SQLModel
+
+from ..models import Prompt, PromptTag, async_database_url, backfill_prompt_tags
+from ..routes.prompts import _prompt_filters
+
+PAGE_SIZE = 50
+
+def populate(engine, count: int, vocabulary: int, tags_per_prompt: int) -> list:
+    """Insert prompts with tags in their JSON column only, returning the tag vocabulary."""
+    tags = [f"tag-{i}" for i in range(vocabulary)]
+    weights = [1 / (rank + 1) for rank in range(vocabulary)]
+    owner_id = uuid.uuid4()
+    start = datetime(2024, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(Prompt.__table__.insert(), [
+            {"id": uuid.uuid4(), "body": f"prompt {i}", "version": "1.0",
+             "tags": list(dict.fromkeys(random.choices(tags, weights, k=tags_per_prompt))), "owner_id": owner_id,
+             "audit_log": {}, "created_at": start + timedelta(seconds=i), "updated_at": start + timedelta(seconds=i)}
+            for i in range(count)
+        ])
+    return tags
+
+def json_filters(tags: list, match_all: bool) -> list:
+    """Filter prompts on their tags by scanning each prompt's JSON array, as the listing used to."""
+    filters = [
+        text(f"EXISTS (SELECT 1 FROM json_each(prompt.tags) WHERE json_each.value = :tag_{i})").bindparams(
+            **{f"tag_{i}": tag}
+        )
+        for i, tag in enumerate(tags)
+    ]
+    if match_all:
+        return filters
+    return [text(" OR ".join(f"({clause.text})" for clause in filters)).bindparams(
+        **{f"tag_{i}": tag for i, tag in enumerate(tags)}
+    )]
+
+def page_query(filters: list):
+    """Get the first page of the listing, oldest first."""
+    return select(Prompt.id).filter(*filters).order_by(Prompt.created_at, Prompt.id).limit(PAGE_SIZE)
+
+JSON_COUNTS = text(
+    "SELECT json_each.value AS tag, count(*) AS count FROM prompt, json_each(prompt.tags)"
+    " GROUP BY json_each.value ORDER BY count DESC, tag LIMIT 100"
+)
+
+def index_counts():
+    """Count the prompts with each tag as ``GET /prompts/tags`` does."""
+    count = func.count().label("count")
+    return select(PromptTag.tag, count).group_by(PromptTag.tag).order_by(count.desc(), PromptTag.tag).limit(100)
+
+async def time_query(db: AsyncSession, query, repeats: int) -> float:
+    """Get the mean milliseconds per run of a query."""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        (await db.execute(query)).all()
+    return (time.perf_counter() - start) / repeats * 1000
+
+async def time_filtered_page(db: AsyncSession, tag_filter, repeats: int) -> float:
+    """Get the mean milliseconds per first page through the listing's filter, including its tag counts."""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        (await db.execute(page_query(await _prompt_filters(db, None, tag_filter)))).all()
+    return (time.perf_counter() - start) / repeats * 1000
+
+async def run_queries(url: str, tags: list, repeats: int) -> None:
+    """Benchmark each tag query both ways."""
+    engine = create_async_engine(url)
+    db = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)()
+    
+    common, mid, rare = tags[0], tags[len(tags) // 25], tags[-1]
+    cases = (
+        ("one common tag", [common], True),
+        ("one mid tag", [mid], True),
+        ("one rare tag", [rare], True),
+        ("all of two", [common, rare], True),
+        ("any of two", [rare, tags[-2]], False)
+    )
+    print(f"{'query':<16} {'json ms':>9} {'index ms':>9} {'speedup':>8}")
+    for name, case_tags, match_all in cases:
+        old = page_query(json_filters(case_tags, match_all))
+        new = page_query(await _prompt_filters(db, None, (case_tags, match_all)))
+        assert (await db.execute(old)).scalars().all() == (await db.execute(new)).scalars().all()
+        old_ms = await time_query(db, old, repeats)
+        new_ms = await time_filtered_page(db, (case_tags, match_all), repeats)
+        print(f"{name:<16} {old_ms:>9.2f} {new_ms:>9.2f} {old_ms / new_ms:>7.1f}x")
+    
+    assert (await db.execute(JSON_COUNTS)).all() == (await db.execute(index_counts())).all()
+    old_ms, new_ms = await time_query(db, JSON_COUNTS, repeats), await time_query(db, index_counts(), repeats)
+    print(f"{'tag counts':<16} {old_ms:>9.2f} {new_ms:>9.2f} {old_ms / new_ms:>7.1f}x")
+    
+    await db.close()
+    await engine.dispose()
+
+def run(prompts: int, vocabulary: int, tags_per_prompt: int, repeats: int) -> None:
+    """Populate a database, index its tags and benchmark the tag queries both ways."""
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        engine = create_engine(url)
+        SQLModel.metadata.create_all(engine)
+        tags = populate(engine, prompts, vocabulary, tags_per_prompt)
+        
+        start = time.perf_counter()
+        indexed = backfill_prompt_tags(engine)
+        print(f"Indexed {indexed} tags of {prompts} prompts in {(time.perf_counter() - start) * 1000:.0f} ms")
+        engine.dispose()
+        
+        asyncio.run(run_queries(async_database_url(url), tags, repeats))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--prompts", type=int, default=100000)
+    parser.add_argument("--vocabulary", type=int, default=500)
+    parser.add_argument("--tags-per-prompt", type=int, default=3)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    
+    logging.getLogger("ai_agentic_platform").setLevel(logging.WARNING)
+    random.seed(0)
+    run(args.prompts, args.vocabulary, args.tags_per_prompt, args.repeats)
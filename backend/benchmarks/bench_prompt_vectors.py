@@ -0,0 +1,93 @@
+# AI Agentic Platform - Prompt Vector Search Benchmark
+"""
+Compares exact (brute-force) and IVF vector search as the prompt library grows: query latency,
+recall of the IVF results against the exact top-k, and how much a latency budget truncates.
+
+Vectors are clustered random unit vectors of the hashing embedder's dimension rather than real
+embeddings, so the numbers measure the index, not the embedder; the embedder's own throughput is
+reported separately.
+
+Run from the repository root:
+    python -m backend.benchmarks.bench_prompt_vectors --sizes 10000 100000 1000000
+"""
+
+import argparse
+import random
+import time
+
+import numpy
+
+from ..services.prompt_vectors import HashingEmbedder, VectorIndex, normalize
+
+def make_vectors(count: int, dim: int, clusters: int = 1000) -> numpy.ndarray:
+    """Build unit vectors scattered around random topic centers."""
+    rng = numpy.random.default_rng(0)
+    centers = rng.normal(size=(clusters, dim)).astype(numpy.float32)
+    vectors = centers[rng.integers(clusters, size=count)]
+    vectors += rng.normal(scale=0.5, size=(count, dim)).astype(numpy.float32)
+    return normalize(vectors)
+
+def build(vectors: numpy.ndarray, ivf: bool) -> VectorIndex:
+    """Index vectors, with the IVF clusters trained or never trained."""
+    # Train once on the full set rather than on every doubling along the way
+    index = VectorIndex(ivf_threshold=len(vectors) + 1)
+    for ordinal, vector in enumerate(vectors):
+        index.add(ordinal, vector)
+    if ivf:
+        index.train()
+    return index
+
+def time_queries(index: VectorIndex, queries: numpy.ndarray, k: int, budget_ms=None):
+    """Run queries one at a time; get the mean latency, the results and the truncated fraction."""
+    results = []
+    truncated = 0
+    start = time.perf_counter()
+    for query in queries:
+        deadline = None if budget_ms is None else time.monotonic() + budget_ms / 1000
+        (matches,), cut = index.search(query, k=k, deadline=deadline)
+        results.append({ordinal for ordinal, _ in matches})
+        truncated += cut
+    return (time.perf_counter() - start) / len(queries), results, truncated / len(queries)
+
+def run(sizes, dim: int, queries: int, k: int, budget_ms: float) -> None:
+    """Benchmark exact and IVF search at each library size."""
+    embedder = HashingEmbedder(dim)
+    rng = random.Random(0)
+    words = [f"word{i}" for i in range(5000)]
+    texts = [" ".join(rng.choices(words, k=60)) for _ in range(2000)]
+    start = time.perf_counter()
+    embedder.embed(texts)
+    print(f"hashing embedder: {len(texts) / (time.perf_counter() - start):.0f} prompts/s\n")
+    
+    print(f"{'prompts':>9} {'exact ms':>9} {'batched ms':>11} {'ivf ms':>8} {'recall':>7} "
+          f"{f'exact @{budget_ms:g}ms cut':>18}")
+    for size in sizes:
+        vectors = make_vectors(size, dim)
+        sample = vectors[numpy.random.default_rng(1).choice(size, size=queries, replace=False)]
+        
+        exact = build(vectors, ivf=False)
+        exact_latency, expected, _ = time_queries(exact, sample, k)
+        start = time.perf_counter()
+        exact.search(sample, k=k)
+        batched_latency = (time.perf_counter() - start) / queries
+        _, _, cut = time_queries(exact, sample, k, budget_ms)
+        del exact
+        
+        ivf = build(vectors, ivf=True)
+        ivf_latency, found, _ = time_queries(ivf, sample, k)
+        recall = numpy.mean([len(a & b) / k for a, b in zip(found, expected)])
+        del ivf
+        
+        print(f"{size:>9} {exact_latency * 1000:>9.2f} {batched_latency * 1000:>11.2f} "
+              f"{ivf_latency * 1000:>8.2f} {recall:>7.3f} {cut:>18.0%}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=20.0)
+    args = parser.parse_args()
+    
+    run(args.sizes, args.dim, args.queries, args.k, args.budget_ms)
@@ -0,0 +1,149 @@
+# AI Agentic Platform - Team Membership Benchmark
+"""
+Compares the two lookups team pages and workflow runs make, with members in the JSON column teams
+used to have and with the TeamMembership table:
+
+- loading a team with its agents: the team, then one query per member, against one joined query
+- finding the teams an agent is in: a scan of every team's JSON array, against the agent-first index
+
+Teams are populated with the legacy JSON column and moved over with ``migrate_team_members``, as
+an existing database would be at startup, so the migration is timed too.
+
+Run from the repository root:
+    python -m backend.benchmarks.bench_team_members --teams 5000 --members 8
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import SQLModel
+
+from ..models import Agent, Team, TeamMembership, async_database_url, migrate_team_members
+from ..routes.teams import load_team_with_agents
+
+def populate(engine, teams: int, members: int) -> list:
+    """Insert agents and teams with members in the legacy JSON column, returning the team IDs."""
+    owner_id = uuid.uuid4()
+    start = datetime(2024, 1, 1)
+    agents = [
+        {"id": uuid.uuid4(), "name": f"agent-{i}", "status": "active", "config": {"model": "llama2"},
+         "owner_id": owner_id, "created_at": start + timedelta(seconds=i), "updated_at": start + timedelta(seconds=i)}
+        for i in range(teams * members // 2)
+    ]
+    team_rows = [
+        {"id": uuid.uuid4(), "name": f"team-{i}", "orchestration_rules": {}, "owner_id": owner_id,
+         "created_at": start + timedelta(seconds=i), "updated_at": start + timedelta(seconds=i)}
+        for i in range(teams)
+    ]
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE team ADD COLUMN members JSON"))
+        conn.execute(Agent.__table__.insert(), agents)
+        conn.execute(Team.__table__.insert(), team_rows)
+        conn.execute(
+            text("UPDATE team SET members = :members WHERE id = :id"),
+            [
+                {
+                    "id": row["id"].hex,
+                    "members": json.dumps([str(agent["id"]) for agent in random.sample(agents, members)])
+                }
+                for row in team_rows
+            ]
+        )
+    return [row["id"] for row in team_rows]
+
+async def json_team_with_agents(db: AsyncSession, team_id: uuid.UUID) -> list:
+    """Load a team's agents the way the JSON column allowed: one query per member."""
+    result = await db.execute(text("SELECT members FROM team WHERE id = :id"), {"id": team_id.hex})
+    members = json.loads(result.scalar_one())
+    return [(await db.execute(select(Agent).filter(Agent.id == uuid.UUID(member)))).scalar_one() for member in members]
+
+async def json_agent_teams(db: AsyncSession, agent_id: uuid.UUID) -> list:
+    """Find an agent's teams by scanning every team's JSON array."""
+    contains_agent = text("EXISTS (SELECT 1 FROM json_each(team.members) WHERE json_each.value = :agent)")
+    result = await db.execute(select(Team.id).filter(contains_agent.bindparams(agent=str(agent_id))))
+    return result.scalars().all()
+
+async def table_agent_teams(db: AsyncSession, agent_id: uuid.UUID) -> list:
+    """Find an agent's teams through the membership table, as the team listing's agent_id filter does."""
+    result = await db.execute(
+        select(Team.id).filter(Team.id.in_(select(TeamMembership.team_id).filter(TeamMembership.agent_id == agent_id)))
+    )
+    return result.scalars().all()
+
+async def time_lookups(lookup, keys) -> float:
+    """Get the mean milliseconds per lookup."""
+    start = time.perf_counter()
+    for key in keys:
+        await lookup(key)
+    return (time.perf_counter() - start) / len(keys) * 1000
+
+async def run_lookups(url: str, team_ids: list, agent_ids: list) -> None:
+    """Benchmark each lookup both ways."""
+    engine = create_async_engine(url)
+    db = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)()
+    
+    print(f"{'lookup':<18} {'json ms':>8} {'table ms':>9} {'speedup':>8}")
+    for name, old, new, keys in (
+        ("team with agents", json_team_with_agents, load_team_with_agents, team_ids),
+        ("teams of agent", json_agent_teams, table_agent_teams, agent_ids)
+    ):
+        old_ms = await time_lookups(lambda key: old(db, key), keys)
+        new_ms = await time_lookups(lambda key: new(db, key), keys)
+        print(f"{name:<18} {old_ms:>8.2f} {new_ms:>9.2f} {old_ms / new_ms:>7.1f}x")
+    
+    await db.close()
+    await engine.dispose()
+
+def run(teams: int, members: int, lookups: int) -> None:
+    """Populate a database with legacy teams, migrate it and benchmark lookups."""
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        engine = create_engine(url)
+        SQLModel.metadata.create_all(engine)
+        team_ids = populate(engine, teams, members)
+        
+        start = time.perf_counter()
+        moved = migrate_team_members(engine)
+        print(f"Migrated {moved} members of {teams} teams in {(time.perf_counter() - start) * 1000:.0f} ms")
+        
+        # The JSON lookups need the column's contents, which the migration cleared
+        with engine.begin() as conn:
+            memberships = conn.execute(
+                select(TeamMembership.team_id, TeamMembership.agent_id)
+                .order_by(TeamMembership.team_id, TeamMembership.position)
+            ).all()
+            members_by_team = {}
+            for team_id, agent_id in memberships:
+                members_by_team.setdefault(team_id, []).append(str(agent_id))
+            conn.execute(
+                text("UPDATE team SET members = :members WHERE id = :id"),
+                [{"id": team_id.hex, "members": json.dumps(agents)} for team_id, agents in members_by_team.items()]
+            )
+        agent_ids = list({agent_id for _, agent_id in memberships})
+        engine.dispose()
+        
+        asyncio.run(run_lookups(
+            async_database_url(url), random.sample(team_ids, lookups), random.sample(agent_ids, lookups)
+        ))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--teams", type=int, default=5000)
+    parser.add_argument("--members", type=int, default=8)
+    parser.add_argument("--lookups", type=int, default=200)
+    args = parser.parse_args()
+    
+    logging.getLogger("ai_agentic_platform").setLevel(logging.WARNING)
+    random.seed(0)
+    run(args.teams, args.members, args.lookups)
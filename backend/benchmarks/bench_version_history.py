@@ -0,0 +1,87 @@
+# AI Agentic Platform - Version History Benchmark
+"""
+Compares delta-encoded prompt history against keeping a full copy of every version.
+
+Run from the repository root:
+    python -m backend.benchmarks.bench_version_history --revisions 5000
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from ..services.prompt_store import PromptStoreService
+
+def make_revisions(revisions: int, body_words: int, seed: int = 1):
+    """Generate successive bodies, each a small edit of the one before."""
+    rng = random.Random(seed)
+    tokens = [f"word{rng.randrange(5000)}" for _ in range(body_words)]
+    for _ in range(revisions):
+        for _ in range(rng.randint(1, 3)):
+            tokens[rng.randrange(len(tokens))] = f"edit{rng.randrange(5000)}"
+        yield " ".join(tokens)
+
+def run(revisions: int, body_words: int) -> None:
+    """Measure memory, storage and backup size for one prompt with many revisions."""
+    bodies = list(make_revisions(revisions, body_words))
+    
+    # Previous layout: a full copy of the prompt per version, all held in memory
+    tracemalloc.start()
+    # join() makes each body its own string, as every edit did
+    full_copies = [{"id": "prompt_1", "body": "".join(body), "version": f"1.{i}", "tags": ["bench"]}
+                   for i, body in enumerate(bodies)]
+    full_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    full_backup = len(json.dumps({"version_history": {"prompt_1": full_copies}}, indent=2))
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        store = PromptStoreService(db_path=os.path.join(tmp, "bench.db"))
+        
+        start = time.perf_counter()
+        prompt_id = store.create_prompt(body=bodies[0], version="1.0", tags=["bench"])["id"]
+        for i, body in enumerate(bodies[1:], start=1):
+            store.update_prompt(prompt_id, body=body, version=f"1.{i}")
+        write_time = time.perf_counter() - start
+        
+        stored = store._conn.execute(
+            "SELECT COUNT(*), SUM(kind = 'snapshot'), SUM(LENGTH(payload)) FROM prompt_versions"
+        ).fetchone()
+        
+        tracemalloc.start()
+        store.get_prompt(prompt_id)
+        store_memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        
+        start = time.perf_counter()
+        for _ in range(200):
+            store._reconstruct(store._conn, prompt_id, random.randrange(revisions))
+        reconstruct_time = (time.perf_counter() - start) / 200
+        
+        backup_path = os.path.join(tmp, "backup.opra")
+        store.backup_prompts(backup_path)
+        delta_backup = os.path.getsize(backup_path)
+        store.close()
+    
+    body_bytes = sum(len(body) for body in bodies)
+    print(f"revisions:              {revisions} x ~{body_words} words ({body_bytes / 1e6:.1f} MB of bodies)")
+    print(f"full copies in memory:  {full_memory / 1e6:.1f} MB")
+    print(f"store memory per read:  {store_memory / 1e3:.1f} KB (history stays on disk)")
+    print(f"stored history:         {stored[2] / 1e6:.2f} MB in {stored[0]} rows ({stored[1]} snapshots)")
+    print(f"backup, full copies:    {full_backup / 1e6:.1f} MB")
+    print(f"backup, delta encoded:  {delta_backup / 1e6:.2f} MB")
+    print(f"update throughput:      {revisions / write_time:,.0f} revisions/s")
+    print(f"rebuild one version:    {reconstruct_time * 1e3:.2f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--revisions", type=int, default=2000)
+    parser.add_argument("--body-words", type=int, default=600)
+    args = parser.parse_args()
+    
+    logging.getLogger("ai_agentic_platform").setLevel(logging.WARNING)
+    run(args.revisions, args.body_words)
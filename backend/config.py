@@ -5,12 +5,24 @@ Configuration loading and validation for the AI Agentic Platform.
 
 import os
 from typing import Optional
-from pydantic import BaseSettings, validator
+from pydantic import BaseSettings, Field, validator
 from datetime import timedelta
 
 class Settings(BaseSettings):
     # Database configuration
-    database_url: str = "sqlite:///./ai_agentic_platform.db"
+    database_url: str = Field("sqlite:///./ai_agentic_platform.db", env="DATABASE_URL")
+    database_pool_size: int = 5  # Connections kept open per engine
+    database_max_overflow: int = 10  # Extra connections opened under load, closed once returned
+    database_pool_timeout: float = 30.0  # Seconds to wait for a free connection
+    database_pool_recycle: int = 1800  # Seconds before a connection is replaced, ahead of server-side idle timeouts
+    database_pool_pre_ping: bool = True  # Check connections on checkout so a dropped one is replaced, not failed
+    database_echo: bool = False  # Log every SQL statement; for debugging only
+    database_echo_sample_rate: float = 0.0  # Fraction of statements logged when echo is off
+    sqlite_journal_mode: str = "WAL"  # Readers don't block the writer and vice versa
+    sqlite_synchronous: str = "NORMAL"  # Safe with WAL; fsyncs at checkpoints instead of every commit
+    sqlite_busy_timeout_ms: int = 5000  # Wait for a lock this long before failing with "database is locked"
+    sqlite_mmap_size: int = 268435456  # Bytes of the database file read through mmap
+    sqlite_foreign_keys: bool = False  # Enforce the models' foreign keys, as PostgreSQL does; off is SQLite's default
     
     # JWT configuration
     secret_key: str = "your-secret-key-here-change-this-in-production"
@@ -34,6 +46,33 @@ class Settings(BaseSettings):
     # Logging
     log_level: str = "INFO"
     
+    # Prompt store
+    prompt_store_path: str = "./prompt_store.db"
+    prompt_cache_path: Optional[str] = None  # Shared memory-mapped cache for worker processes
+    prompt_cache_publish_interval: float = 1.0  # Most seconds a write waits to be published to the shared cache
+    prompt_duplicate_index: bool = False  # MinHash index for near-duplicate lookups (~1.6 KB per prompt)
+    prompt_embedder: Optional[str] = "hashing"  # hashing[:<dim>] or ollama:<model>; unset disables semantic search
+    
+    # Usage metering
+    usage_flush_interval_seconds: float = 5.0  # Upper bound on quota staleness
+    usage_reset_period_days: int = 30
+    
+    # Batch endpoints
+    batch_max_operations: int = 1000  # Creates, updates and deletes allowed in one batch request
+    idempotency_key_ttl_hours: int = 24  # How long a batch's response is replayed for a retry with its Idempotency-Key
+    
+    # Entity cache
+    entity_cache_max_entries: int = 10000  # Agents, and teams, each process keeps in memory
+    entity_cache_ttl_seconds: float = 10.0  # Upper bound on how stale a record is after a write by another process
+    entity_cache_shared_path: Optional[str] = None  # SQLite file the worker processes on a host share records through
+    entity_cache_shared_ttl_seconds: float = 300.0
+    
+    @validator("database_echo_sample_rate")
+    def validate_echo_sample_rate(cls, v):
+        if not 0.0 <= v <= 1.0:
+            raise ValueError("database_echo_sample_rate must be between 0 and 1")
+        return v
+    
     @validator("environment")
     def validate_environment(cls, v):
         if v not in ["development", "staging", "production"]:
@@ -52,4 +91,11 @@ DATABASE_URL = settings.database_url
 SECRET_KEY = settings.secret_key
 ALGORITHM = settings.algorithm
 ACCESS_TOKEN_EXPIRE_MINUTES = settings.access_token_expire_minutes
-OLLAMA_HOST = settings.ollama_host
\ No newline at end of file
+OLLAMA_HOST = settings.ollama_host
+PROMPT_STORE_PATH = settings.prompt_store_path
+PROMPT_CACHE_PATH = settings.prompt_cache_path
+PROMPT_CACHE_PUBLISH_INTERVAL = settings.prompt_cache_publish_interval
+PROMPT_DUPLICATE_INDEX = settings.prompt_duplicate_index
+PROMPT_EMBEDDER = settings.prompt_embedder
+USAGE_FLUSH_INTERVAL_SECONDS = settings.usage_flush_interval_seconds
+USAGE_RESET_PERIOD_DAYS = settings.usage_reset_period_days
\ No newline at end of file
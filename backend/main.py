@@ -4,21 +4,21 @@ Main FastAPI application with JWT middleware and role-based access controls.
 """
 
 from fastapi import FastAPI, Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
+import asyncio
 import os
 import uvicorn
 
 # Import authentication utilities
-from .routes.auth import get_current_user_from_token
+from .routes.auth import get_current_user_from_token, oauth2_scheme
 
-# Import database models
-from .models import Base, engine, get_db
+# Import database models; the schema is created and upgraded by ``python -m backend.migrate``
+from .models import async_engine, engine, get_async_db
 from .routes import auth, agents, teams, prompts, mcp
-
-# Create database tables
-Base.metadata.create_all(bind=engine)
+from .services.entity_cache import cache_stats, close_shared_entity_store, open_shared_entity_store
+from .services.prompt_store import close_prompt_store, get_prompt_store
+from .services.usage_meter import usage_meter
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -34,6 +34,39 @@ app.include_router(teams.router, prefix="/teams", tags=["Teams"])
 app.include_router(prompts.router, prefix="/prompts", tags=["Prompts"])
 app.include_router(mcp.router, prefix="/mcp", tags=["MCP"])
 
+# Background usage metering
+@app.on_event("startup")
+async def start_usage_meter():
+    usage_meter.start()
+
+@app.on_event("shutdown")
+async def stop_usage_meter():
+    await usage_meter.stop()
+
+# Open and load the prompt store before the first request rather than during it
+@app.on_event("startup")
+async def open_prompt_store():
+    await asyncio.get_event_loop().run_in_executor(None, get_prompt_store)
+
+@app.on_event("shutdown")
+async def shutdown_prompt_store():
+    close_prompt_store()
+
+# Open the entity caches' shared tier, if one is configured, and close it so its thread stops with the app
+@app.on_event("startup")
+async def open_entity_cache():
+    await asyncio.get_event_loop().run_in_executor(None, open_shared_entity_store)
+
+@app.on_event("shutdown")
+async def close_entity_cache():
+    await asyncio.get_event_loop().run_in_executor(None, close_shared_entity_store)
+
+# Close pooled connections, whose driver threads would otherwise keep the process alive
+@app.on_event("shutdown")
+async def close_database_pools():
+    await async_engine.dispose()
+    engine.dispose()
+
 # Health check endpoint
 @app.get("/")
 async def root():
@@ -43,12 +76,14 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
-# OAuth2 scheme for JWT token authentication
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
+# Hit rates and sizes of the agent and team caches
+@app.get("/health/cache")
+async def cache_health():
+    return cache_stats()
 
 # Dependency to get current user from JWT token
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    return get_current_user_from_token(token, db)
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    return await get_current_user_from_token(token, db)
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
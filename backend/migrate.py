@@ -0,0 +1,50 @@
+# AI Agentic Platform - Database Migrations
+"""
+Brings the database schema and data up to date. Run once per deploy, before starting the API:
+
+    python -m backend.migrate
+
+Creates missing tables, adds the columns and indexes introduced since a table was created, and runs
+the one-off data migrations. Nothing here runs when the application is imported, so API processes
+start without touching the schema.
+"""
+
+from sqlalchemy import DDL, inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateColumn
+from sqlmodel import SQLModel
+
+from .models import backfill_prompt_tags, engine, migrate_team_members
+from .utils.logging import logger
+
+def add_missing_columns(bind: Engine) -> None:
+    """Add the columns and indexes of existing tables that the models have and the tables lack.
+    
+    ``create_all`` skips tables that already exist. New columns must be nullable or have a server
+    default to be added to a table that has rows.
+    """
+    inspector = inspect(bind)
+    for table in SQLModel.metadata.sorted_tables:
+        existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing_columns:
+                column_ddl = CreateColumn(column).compile(dialect=bind.dialect)
+                with bind.begin() as conn:
+                    conn.execute(DDL(f"ALTER TABLE %(fullname)s ADD COLUMN {column_ddl}").against(table))
+                logger.info(f"Added column {table.name}.{column.name}")
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
+
+def migrate(bind: Engine = engine) -> None:
+    """Create and upgrade every table, then run the data migrations."""
+    SQLModel.metadata.create_all(bind=bind)
+    add_missing_columns(bind)
+    
+    # Teams kept their members in a JSON column before team memberships had their own table
+    migrate_team_members(bind)
+    # Prompts created before their tags were indexed in a table of their own
+    backfill_prompt_tags(bind)
+    logger.info("Database is up to date")
+
+if __name__ == "__main__":
+    migrate()
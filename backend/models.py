@@ -4,6 +4,7 @@ SQLModel database schemas for the AI Agentic Platform.
 """
 
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Column, Index, JSON
 from typing import Optional, List
 from datetime import datetime
 from uuid import UUID, uuid4
@@ -14,8 +15,13 @@ class BaseModel(SQLModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
+# Base class for models the API serves with ETags
+class VersionedModel(BaseModel):
+    # Incremented in SQL on every update; with updated_at it identifies a row's state
+    row_version: int = Field(default=1, nullable=False, sa_column_kwargs={"server_default": "1"})
+
 # User Model
-class User(BaseModel):
+class User(BaseModel, table=True):
     email: str = Field(unique=True, index=True)
     hashed_password: str
     full_name: str
@@ -28,9 +34,12 @@ class User(BaseModel):
     subscription_expiry: Optional[datetime] = None
     
     # Usage analytics tracking fields
-    usage_quota: Optional[int] = None
+    usage_quota: Optional[int] = None  # Token allowance per reset period (None means unlimited)
     usage_reset_date: Optional[datetime] = None
     last_accessed: Optional[datetime] = None
+    usage_tokens: int = 0  # Tokens consumed since the last reset, flushed by the usage meter
+    usage_calls: int = 0  # LLM/tool calls since the last reset
+    usage_requests: int = 0  # API requests since the last reset
     
     # Relationship to agents, teams, and prompts (one-to-many)
     agents: List["Agent"] = Relationship(back_populates="owner")
@@ -38,16 +47,23 @@ class User(BaseModel):
     prompts: List["Prompt"] = Relationship(back_populates="owner")
 
 # Agent Model
-class Agent(BaseModel):
+class Agent(VersionedModel, table=True):
+    # Listings page through (created_at, id), optionally narrowed by owner or status first
+    __table_args__ = (
+        Index("ix_agent_created_at_id", "created_at", "id"),
+        Index("ix_agent_owner_id_created_at_id", "owner_id", "created_at", "id"),
+        Index("ix_agent_status_created_at_id", "status", "created_at", "id"),
+    )
+    
     name: str
     description: Optional[str] = None
-    config: dict  # JSON configuration for the agent
+    config: dict = Field(default={}, sa_column=Column(JSON))  # JSON configuration for the agent
     status: str  # Tracks the agent's current status (active, inactive, error, etc.)
     last_executed: Optional[datetime] = None  # Tracks when the agent was last executed
-    performance_metrics: dict = Field(default={}, sa_column_kwargs={"type_": "json"})  # Stores key performance metrics for the agent
+    performance_metrics: dict = Field(default={}, sa_column=Column(JSON))  # Stores key performance metrics for the agent
     
     # MCP tool configuration
-    mcp_tools: List[str] = Field(default=[], sa_column_kwargs={"type_": "json"})  # JSON array of MCP tool names
+    mcp_tools: List[str] = Field(default=[], sa_column=Column(JSON))  # JSON array of MCP tool names
     
     # Foreign key to User (owner)
     owner_id: UUID = Field(foreign_key="user.id")
@@ -56,11 +72,16 @@ class Agent(BaseModel):
     owner: User = Relationship(back_populates="agents")
 
 # Team Model
-class Team(BaseModel):
+class Team(VersionedModel, table=True):
+    __table_args__ = (
+        Index("ix_team_created_at_id", "created_at", "id"),
+        Index("ix_team_owner_id_created_at_id", "owner_id", "created_at", "id"),
+        Index("ix_team_workflow_status_created_at_id", "workflow_status", "created_at", "id"),
+    )
+    
     name: str
     description: Optional[str] = None
-    members: List[UUID] = Field(default=[], sa_column_kwargs={"type_": "json"})  # JSON array of agent IDs
-    orchestration_rules: dict = Field(default={}, sa_column_kwargs={"type_": "json"})  # JSON rules for agent coordination
+    orchestration_rules: dict = Field(default={}, sa_column=Column(JSON))  # JSON rules for agent coordination
     last_workflow_execution: Optional[datetime] = None  # Tracks when the team's workflow was last executed
     workflow_status: Optional[str] = None  # Tracks the current status of the team's workflow execution
     
@@ -70,34 +91,231 @@ class Team(BaseModel):
     # Relationship to user
     owner: User = Relationship(back_populates="teams")
 
+# Team Membership Model
+class TeamMembership(SQLModel, table=True):
+    # The primary key finds a team's agents; the second index finds an agent's teams
+    __table_args__ = (
+        Index("ix_teammembership_agent_id_team_id", "agent_id", "team_id"),
+    )
+    
+    team_id: UUID = Field(foreign_key="team.id", primary_key=True)
+    agent_id: UUID = Field(foreign_key="agent.id", primary_key=True)
+    position: int = 0  # Order of the agent within the team, from 0
+    role: Optional[str] = None  # What the agent does in the team, e.g. planner, reviewer
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
 # Prompt Model
-class Prompt(BaseModel):
+class Prompt(VersionedModel, table=True):
+    __table_args__ = (
+        Index("ix_prompt_created_at_id", "created_at", "id"),
+        Index("ix_prompt_owner_id_created_at_id", "owner_id", "created_at", "id"),
+    )
+    
     body: str
     version: str
-    tags: List[str] = Field(default=[], sa_column_kwargs={"type_": "json"})  # JSON array of tags
+    tags: List[str] = Field(default=[], sa_column=Column(JSON))  # JSON array of tags
     
     # Foreign key to User (owner)
     owner_id: UUID = Field(foreign_key="user.id")
     
     # Audit log for tracking changes
-    audit_log: dict = Field(default={}, sa_column_kwargs={"type_": "json"})
+    audit_log: dict = Field(default={}, sa_column=Column(JSON))
     
     # Relationship to user
     owner: User = Relationship(back_populates="prompts")
 
+# Prompt Tag Model
+class PromptTag(SQLModel, table=True):
+    # Prompt.tags keeps each prompt's tags, in order, for responses; these rows index them for filtering and counts
+    __table_args__ = (
+        Index("ix_prompttag_tag_prompt_id", "tag", "prompt_id"),
+    )
+    
+    prompt_id: UUID = Field(foreign_key="prompt.id", primary_key=True)
+    tag: str = Field(primary_key=True)
+
+# Idempotency Key Model
+class IdempotencyKey(SQLModel, table=True):
+    # Keys are chosen by clients, so they are scoped to the owner and the endpoint they were sent to
+    owner_id: UUID = Field(foreign_key="user.id", primary_key=True)
+    scope: str = Field(primary_key=True)
+    key: str = Field(primary_key=True)
+    request_hash: str  # Fingerprint of the request body, so a key reused for a different request is refused
+    status_code: int
+    response: dict = Field(default={}, sa_column=Column(JSON))  # The response body replayed to retries
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+# Applied Migration Model
+class AppliedMigration(SQLModel, table=True):
+    # One row per one-off data migration that has completed, so it is never run again
+    name: str = Field(primary_key=True)
+    applied_at: datetime = Field(default_factory=datetime.utcnow)
+
 # Database setup
-from sqlalchemy import create_engine
+import random
+from sqlalchemy import column, create_engine, event, inspect, select, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from .config import Settings, settings
+from .utils.logging import logger
+
+# Database URL from the settings (DATABASE_URL), SQLite for development by default
+DATABASE_URL = settings.database_url
+
+# asyncio drivers for the databases the platform runs on
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
 
-# Get database URL from environment variable or use SQLite for development
-DATABASE_URL = "sqlite:///./ai_agentic_platform.db"
+def async_database_url(url: str):
+    """Get the same database URL with its driver swapped for the asyncio one."""
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.drivername, url.drivername))
 
-engine = create_engine(DATABASE_URL, echo=True)
+def engine_options(url, config: Settings, pool_class) -> dict:
+    """Get the keyword arguments for creating an engine on ``url`` from the settings."""
+    url = make_url(url)
+    options = {"echo": config.database_echo, "pool_pre_ping": config.database_pool_pre_ping}
+    if url.get_backend_name() == "sqlite":
+        if url.database in (None, "", ":memory:"):
+            # An in-memory database only lives as long as its one connection, so keep the default pool
+            return options
+        if url.get_driver_name() == "pysqlite":
+            # Pooled connections are handed from thread to thread, which pysqlite refuses by default
+            options["connect_args"] = {"check_same_thread": False}
+    options.update(
+        poolclass=pool_class,
+        pool_size=config.database_pool_size,
+        max_overflow=config.database_max_overflow,
+        pool_timeout=config.database_pool_timeout,
+        pool_recycle=config.database_pool_recycle
+    )
+    return options
+
+def configure_engine(engine: Engine, config: Settings) -> None:
+    """Set SQLite's pragmas on each new connection and log a sample of statements."""
+    if engine.dialect.name == "sqlite":
+        pragmas = {
+            "journal_mode": config.sqlite_journal_mode,
+            "synchronous": config.sqlite_synchronous,
+            "busy_timeout": config.sqlite_busy_timeout_ms,
+            "mmap_size": config.sqlite_mmap_size,
+            "foreign_keys": "ON" if config.sqlite_foreign_keys else "OFF"
+        }
+        
+        @event.listens_for(engine, "connect")
+        def set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+            cursor.close()
+    
+    # Echo logs everything; sampling keeps a trickle of statements in the logs at a fraction of the cost
+    if config.database_echo_sample_rate and not config.database_echo:
+        sample_rate = config.database_echo_sample_rate
+        
+        @event.listens_for(engine, "before_cursor_execute")
+        def log_sampled_statement(conn, cursor, statement, parameters, context, executemany):
+            if random.random() < sample_rate:
+                logger.info(f"SQL: {statement} {parameters!r}")
+
+def create_database_engine(config: Settings = settings) -> Engine:
+    """Create the synchronous engine the settings describe."""
+    engine = create_engine(config.database_url, **engine_options(config.database_url, config, QueuePool))
+    configure_engine(engine, config)
+    return engine
+
+def create_async_database_engine(config: Settings = settings) -> AsyncEngine:
+    """Create the asyncio engine the settings describe."""
+    url = async_database_url(config.database_url)
+    engine = create_async_engine(url, **engine_options(url, config, AsyncAdaptedQueuePool))
+    configure_engine(engine.sync_engine, config)
+    return engine
+
+def migrate_team_members(engine: Engine) -> int:
+    """Move team members from the JSON column teams used to keep them in to TeamMembership rows.
+    
+    Members keep their order; IDs of agents that no longer exist are dropped. The column is cleared
+    as its members are moved, so running this again moves nothing. Returns the number moved.
+    """
+    if "members" not in {column["name"] for column in inspect(engine).get_columns(Team.__tablename__)}:
+        return 0
+    
+    with engine.begin() as conn:
+        teams = conn.execute(
+            text("SELECT id, members FROM team WHERE members IS NOT NULL").columns(
+                column("id", Team.__table__.c.id.type), column("members", JSON)
+            )
+        ).all()
+        agent_ids = set(conn.execute(select(Agent.id)).scalars())
+        now = datetime.utcnow()
+        memberships = []
+        for team_id, members in teams:
+            moved = []
+            for member in members or []:
+                try:
+                    agent_id = UUID(str(member))
+                except ValueError:
+                    continue
+                if agent_id in agent_ids and agent_id not in moved:
+                    moved.append(agent_id)
+            memberships.extend(
+                {"team_id": team_id, "agent_id": agent_id, "position": position, "role": None, "created_at": now}
+                for position, agent_id in enumerate(moved)
+            )
+        if memberships:
+            conn.execute(TeamMembership.__table__.insert(), memberships)
+        conn.execute(text("UPDATE team SET members = NULL WHERE members IS NOT NULL"))
+    
+    if teams:
+        logger.info(f"Moved {len(memberships)} members of {len(teams)} teams to team memberships")
+    return len(memberships)
+
+def backfill_prompt_tags(engine: Engine, batch_size: int = 1000) -> int:
+    """Index the tags of prompts created before PromptTag existed.
+    
+    Runs once: completion is recorded as an AppliedMigration row in the same transaction, so later
+    runs cost one query even if no prompt had tags to index. A tag table that already has rows was
+    filled before the marker existed and is only marked. Returns the number of tags indexed.
+    """
+    indexed = 0
+    with engine.begin() as conn:
+        if conn.execute(select(AppliedMigration.name).where(AppliedMigration.name == "backfill_prompt_tags")).first():
+            return 0
+        if conn.execute(select(PromptTag.prompt_id).limit(1)).first() is None:
+            result = conn.execution_options(yield_per=batch_size).execute(select(Prompt.id, Prompt.tags))
+            for prompts in result.partitions():
+                rows = [
+                    {"prompt_id": prompt_id, "tag": tag}
+                    for prompt_id, tags in prompts for tag in dict.fromkeys(tags or [])
+                ]
+                if rows:
+                    conn.execute(PromptTag.__table__.insert(), rows)
+                    indexed += len(rows)
+        conn.execute(
+            AppliedMigration.__table__.insert(), {"name": "backfill_prompt_tags", "applied_at": datetime.utcnow()}
+        )
+    
+    if indexed:
+        logger.info(f"Indexed {indexed} prompt tags")
+    return indexed
+
+engine = create_database_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Routes use the asyncio engine so a slow query waits without blocking the event loop.
+# Objects stay loaded after commit, since lazily refreshing them would need IO outside an await.
+async_engine = create_async_database_engine()
+AsyncSessionLocal = sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
\ No newline at end of file
@@ -3,48 +3,69 @@
 CRUD endpoints for managing AI agents.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Tuple
 import uuid
+from datetime import datetime
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-import uuid
-
-from ..models import Agent, User, get_db, engine
+from ..models import Agent, User, get_async_db, engine
+from ..schemas import (
+    CURSOR_FIELDS, AgentCreate, AgentRead, AgentSnapshot, AgentUpdate, BatchRequest, BatchResult, FieldSelector, Page,
+    columns, project, project_page
+)
+from ..services.entity_cache import agent_cache
+from ..utils.batch import run_batch
+from ..utils.conditional import (
+    VALIDATOR_FIELDS, collection_etag, entity_etag, is_conditional, is_not_modified, not_modified, set_validators
+)
+from ..utils.idempotency import IDEMPOTENCY_HEADER
 from ..utils.logging import logger
-from ..routes.auth import get_current_user_from_token, get_current_active_user
+from ..utils.pagination import PageRequest, get_page_request, paginate_async
+from ..routes.auth import get_current_active_user
+from ..routes.teams import remove_agent_memberships
 
 router = APIRouter()
 
+# Columns a new agent starts with that AgentCreate doesn't take, as in create_agent
+AGENT_DEFAULTS = {"status": "inactive", "last_executed": None, "performance_metrics": {}}
+
 
-@router.get("/", response_model=List[dict])
+@router.get("/", response_model=Page[AgentRead])
 async def get_agents(
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db)
-) -> List[dict]:
-    """Get all agents with pagination."""
+    request: Request,
+    owner_id: Optional[uuid.UUID] = None,
+    agent_status: Optional[str] = Query(None, alias="status"),
+    page: PageRequest = Depends(get_page_request),
+    fields: Tuple[str, ...] = Depends(FieldSelector(AgentRead)),
+    db: AsyncSession = Depends(get_async_db)
+) -> Response:
+    """Get a page of agents, oldest first, optionally filtered by owner and status.
+    
+    Pass the returned ``next_cursor`` as ``cursor`` to get the following page, and ``fields`` to get
+    only some of each agent's fields. Send the page's ``ETag`` back as ``If-None-Match`` to get a 304
+    while none of its agents have changed.
+    """
     try:
-        agents = db.query(Agent).offset(skip).limit(limit).all()
-        return [
-            {
-                "id": agent.id,
-                "name": agent.name,
-                "description": agent.description,
-                "config": agent.config,
-                "status": agent.status,
-                "last_executed": agent.last_executed,
-                "performance_metrics": agent.performance_metrics,
-                "mcp_tools": agent.mcp_tools,
-                "owner_id": agent.owner_id,
-                "created_at": agent.created_at,
-                "updated_at": agent.updated_at
-            }
-            for agent in agents
-        ]
+        filters = []
+        if owner_id is not None:
+            filters.append(Agent.owner_id == owner_id)
+        if agent_status is not None:
+            filters.append(Agent.status == agent_status)
+        
+        if is_conditional(request):
+            key_query = select(*columns(Agent, VALIDATOR_FIELDS, extra=CURSOR_FIELDS)).filter(*filters)
+            keys, next_cursor = await paginate_async(db, key_query, Agent, page)
+            etag = collection_etag(keys, next_cursor, fields)
+            if is_not_modified(request, etag):
+                return not_modified(etag)
+        
+        query = select(*columns(Agent, fields, extra=CURSOR_FIELDS + VALIDATOR_FIELDS)).filter(*filters)
+        agents, next_cursor = await paginate_async(db, query, Agent, page)
+        response = ORJSONResponse(project_page(agents, AgentRead, next_cursor, fields))
+        return set_validators(response, collection_etag(agents, next_cursor, fields))
     except Exception as e:
         logger.error(f"Error fetching agents: {str(e)}")
         raise HTTPException(
@@ -52,15 +73,15 @@ async def get_agents(
             detail="An error occurred while fetching agents"
         )
 
-@router.post("/", response_model=dict)
+@router.post("/", response_model=AgentRead)
 async def create_agent(
     name: str,
     description: str = None,
     config: dict = None,
     mcp_tools: List[str] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
-) -> dict:
+) -> ORJSONResponse:
     """Create a new agent."""
     try:
         new_agent = Agent(
@@ -75,23 +96,12 @@ async def create_agent(
         )
         
         db.add(new_agent)
-        db.commit()
-        db.refresh(new_agent)
+        await db.commit()
+        await db.refresh(new_agent)
         
         logger.info(f"New agent created: {new_agent.name}")
         
-        return {
-            "id": new_agent.id,
-            "name": new_agent.name,
-            "description": new_agent.description,
-            "config": new_agent.config,
-            "status": new_agent.status,
-            "last_executed": new_agent.last_executed,
-            "performance_metrics": new_agent.performance_metrics,
-            "owner_id": new_agent.owner_id,
-            "created_at": new_agent.created_at,
-            "updated_at": new_agent.updated_at
-        }
+        return ORJSONResponse(project(new_agent, AgentRead))
     except Exception as e:
         logger.error(f"Error creating agent: {str(e)}")
         raise HTTPException(
@@ -99,30 +109,64 @@ async def create_agent(
             detail="An error occurred while creating agent"
         )
 
-@router.get("/{agent_id}", response_model=dict)
-async def get_agent(agent_id: str, db: Session = Depends(get_db)) -> dict:
-    """Get a specific agent by ID."""
+@router.post("/batch", response_model=BatchResult)
+async def batch_agents(
+    batch: BatchRequest,
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER, max_length=255),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user)
+) -> ORJSONResponse:
+    """Create, update and delete agents in one transaction.
+    
+    Items are validated one at a time; bad ones are reported by operation and position and the rest
+    are applied, unless the batch is ``atomic``, in which case nothing is and the response is a 422.
+    Send an ``Idempotency-Key`` header to make retries safe: a retry with the same key gets the first
+    response back instead of applying the batch again.
+    """
     try:
-        agent = db.query(Agent).filter(Agent.id == uuid.UUID(agent_id)).first()
+        response, changed = await run_batch(
+            db, Agent, batch, AgentCreate, AgentUpdate, AGENT_DEFAULTS, current_user.id, "agents/batch", idempotency_key,
+            on_delete=remove_agent_memberships
+        )
+        agent_cache.invalidate(*changed)
+        return response
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error applying agent batch: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while applying agent batch"
+        )
+
+@router.get("/{agent_id}", response_model=AgentRead)
+async def get_agent(
+    agent_id: str,
+    request: Request,
+    fields: Tuple[str, ...] = Depends(FieldSelector(AgentRead)),
+    db: AsyncSession = Depends(get_async_db)
+) -> Response:
+    """Get a specific agent by ID, with all its fields or just the ``fields`` asked for.
+    
+    Served from the entity cache when the agent is in it. Answers ``If-None-Match`` and
+    ``If-Modified-Since`` with a 304 while the agent is unchanged.
+    """
+    try:
+        agent = await agent_cache.get(db, uuid.UUID(agent_id))
         if not agent:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Agent not found"
             )
         
-        return {
-            "id": agent.id,
-            "name": agent.name,
-            "description": agent.description,
-            "config": agent.config,
-            "status": agent.status,
-            "last_executed": agent.last_executed,
-            "performance_metrics": agent.performance_metrics,
-            "mcp_tools": agent.mcp_tools,
-            "owner_id": agent.owner_id,
-            "created_at": agent.created_at,
-            "updated_at": agent.updated_at
-        }
+        etag = entity_etag(agent, fields)
+        if is_not_modified(request, etag, agent.updated_at):
+            return not_modified(etag, agent.updated_at)
+        
+        response = ORJSONResponse(project(agent, AgentRead, fields))
+        return set_validators(response, etag, agent.updated_at)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching agent {agent_id}: {str(e)}")
         raise HTTPException(
@@ -130,7 +174,7 @@ async def get_agent(agent_id: str, db: Session = Depends(get_db)) -> dict:
             detail="An error occurred while fetching agent"
         )
 
-@router.put("/{agent_id}", response_model=dict)
+@router.put("/{agent_id}", response_model=AgentRead)
 async def update_agent(
     agent_id: str,
     name: str = None,
@@ -140,11 +184,11 @@ async def update_agent(
     last_executed: datetime = None,
     performance_metrics: dict = None,
     mcp_tools: List[str] = None,
-    db: Session = Depends(get_db)
-) -> dict:
+    db: AsyncSession = Depends(get_async_db)
+) -> ORJSONResponse:
     """Update an existing agent."""
     try:
-        agent = db.query(Agent).filter(Agent.id == uuid.UUID(agent_id)).first()
+        agent = await db.get(Agent, uuid.UUID(agent_id))
         if not agent:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -166,27 +210,17 @@ async def update_agent(
             agent.performance_metrics = performance_metrics
         if mcp_tools is not None:
             agent.mcp_tools = mcp_tools
-            
+        
         agent.updated_at = datetime.utcnow()
+        agent.row_version = Agent.row_version + 1
         
-        db.commit()
-        db.refresh(agent)
+        await db.commit()
+        await db.refresh(agent)
+        agent_cache.put(AgentSnapshot.parse_obj(project(agent, AgentSnapshot)))
         
         logger.info(f"Agent updated: {agent.name}")
         
-        return {
-            "id": agent.id,
-            "name": agent.name,
-            "description": agent.description,
-            "config": agent.config,
-            "status": agent.status,
-            "last_executed": agent.last_executed,
-            "performance_metrics": agent.performance_metrics,
-            "mcp_tools": agent.mcp_tools,
-            "owner_id": agent.owner_id,
-            "created_at": agent.created_at,
-            "updated_at": agent.updated_at
-        }
+        return ORJSONResponse(project(agent, AgentRead))
     except Exception as e:
         logger.error(f"Error updating agent {agent_id}: {str(e)}")
         raise HTTPException(
@@ -195,21 +229,23 @@ async def update_agent(
         )
 
 @router.delete("/{agent_id}")
-async def delete_agent(agent_id: str, db: Session = Depends(get_db)) -> None:
+async def delete_agent(agent_id: str, db: AsyncSession = Depends(get_async_db)) -> None:
     """Delete an agent."""
     try:
-        agent = db.query(Agent).filter(Agent.id == uuid.UUID(agent_id)).first()
+        agent = await db.get(Agent, uuid.UUID(agent_id))
         if not agent:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Agent not found"
             )
         
-        db.delete(agent)
-        db.commit()
+        await remove_agent_memberships(db, [agent.id])
+        await db.delete(agent)
+        await db.commit()
+        agent_cache.invalidate(agent.id)
         
         logger.info(f"Agent deleted: {agent.name}")
-        
+    
     except Exception as e:
         logger.error(f"Error deleting agent {agent_id}: {str(e)}")
         raise HTTPException(
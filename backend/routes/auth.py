@@ -4,14 +4,17 @@ Authentication endpoints for user registration and login with JWT.
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
 from typing import Dict
 import os
 
-from ..models import User, get_db, engine
+from ..models import User, get_async_db, engine
 from ..config import settings
+from ..services.usage_meter import usage_meter
 from ..utils.logging import logger
 
 # Import JWT utilities
@@ -20,6 +23,9 @@ from passlib.context import CryptContext
 
 router = APIRouter()
 
+# OAuth2 scheme for JWT token authentication
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
+
 # Password hashing context
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -47,16 +53,25 @@ def create_access_token(data: dict, expires_delta: timedelta = None) -> str:
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def authenticate_user(db: Session, email: str, password: str) -> User:
+async def get_user_by_email(db: AsyncSession, email: str) -> User:
+    """Get the user with an email address, or None."""
+    result = await db.execute(select(User).filter(User.email == email))
+    return result.scalars().first()
+
+async def authenticate_user(db: AsyncSession, email: str, password: str) -> User:
     """Authenticate a user by email and password."""
-    user = db.query(User).filter(User.email == email).first()
+    user = await get_user_by_email(db, email)
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    # bcrypt is deliberately slow, so keep it off the event loop
+    if not await run_in_threadpool(verify_password, password, user.hashed_password):
         return False
     return user
 
-def get_current_user_from_token(token: str, db: Session) -> User:
+async def get_current_user_from_token(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db)
+) -> User:
     """Get current user from JWT token."""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -71,7 +86,7 @@ def get_current_user_from_token(token: str, db: Session) -> User:
     except JWTError:
         raise credentials_exception
     
-    user = db.query(User).filter(User.email == email).first()
+    user = await get_user_by_email(db, email)
     if user is None:
         raise credentials_exception
     return user
@@ -80,6 +95,16 @@ def get_current_active_user(current_user: User = Depends(get_current_user_from_t
     """Get current active user."""
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
+    usage_meter.record_request(current_user.id)
+    return current_user
+
+def require_quota(current_user: User = Depends(get_current_active_user)) -> User:
+    """Reject the request if the user has exhausted their usage quota."""
+    if not usage_meter.check_quota(current_user.id):
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Usage quota exceeded"
+        )
     return current_user
 
 def require_role(required_role: str):
@@ -99,12 +124,12 @@ async def register_user(
     password: str,
     full_name: str,
     user_persona: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> Dict:
     """Register a new user."""
     try:
         # Check if user already exists
-        existing_user = db.query(User).filter(User.email == email).first()
+        existing_user = await get_user_by_email(db, email)
         if existing_user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -112,7 +137,7 @@ async def register_user(
             )
         
         # Create new user
-        hashed_password = get_password_hash(password)
+        hashed_password = await run_in_threadpool(get_password_hash, password)
         new_user = User(
             email=email,
             hashed_password=hashed_password,
@@ -121,8 +146,8 @@ async def register_user(
         )
         
         db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
+        await db.commit()
+        await db.refresh(new_user)
         
         logger.info(f"New user registered: {new_user.email}")
         
@@ -144,11 +169,11 @@ async def register_user(
 @router.post("/login")
 async def login_user(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> Dict:
     """Login a user and return JWT token."""
     try:
-        user = authenticate_user(db, form_data.username, form_data.password)
+        user = await authenticate_user(db, form_data.username, form_data.password)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -3,40 +3,153 @@
 CRUD endpoints for managing prompt templates with versioning.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy import delete, exists, func, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import time
 import uuid
 from datetime import datetime
 
-from ..models import Prompt, User, get_db, engine
+from ..models import AsyncSessionLocal, Prompt, PromptTag, User, get_async_db, engine
+from ..services.prompt_store import get_prompt_store
+from ..schemas import (
+    CURSOR_FIELDS, FieldSelector, Page, PromptRead, PromptVersionRead, TagCount, columns, project, project_page
+)
+from ..utils.conditional import (
+    VALIDATOR_FIELDS, collection_etag, entity_etag, is_conditional, is_not_modified, load_validators, not_modified,
+    set_validators
+)
+from ..utils import bulk
 from ..utils.logging import logger
+from ..utils.pagination import PageRequest, get_page_request, paginate_async
 from ..routes.auth import get_current_active_user
 
 router = APIRouter()
 
+# Rows inserted per transaction by the bulk import
+BULK_CHUNK_SIZE = 500
+# Rows fetched per round trip, and sent per chunk, by the export
+EXPORT_BATCH_SIZE = 1000
 
-@router.get("/", response_model=List[dict])
+# Most results a semantic search may ask for
+MAX_SEMANTIC_RESULTS = 100
+
+# Most tags one request may filter by
+MAX_FILTER_TAGS = 20
+# Tags on more prompts than this are matched by walking prompts in listing order and probing each
+# one's tags, which fills a page quickly; rarer tags are matched by looking their prompts up by tag
+TAG_SCAN_THRESHOLD = 1000
+
+def _tag_rows(prompt_id: uuid.UUID, tags: List[str]) -> List[Dict[str, Any]]:
+    """Get the PromptTag rows indexing a prompt's tags, each tag once."""
+    return [{"prompt_id": prompt_id, "tag": tag} for tag in dict.fromkeys(tags)]
+
+async def _insert_tags(db: AsyncSession, rows: List[Dict[str, Any]]) -> None:
+    """Insert PromptTag rows, in the caller's transaction."""
+    if rows:
+        await db.execute(PromptTag.__table__.insert(), rows)
+
+async def _replace_tags(db: AsyncSession, prompt_id: uuid.UUID, tags: List[str]) -> None:
+    """Re-index a prompt's tags, in the caller's transaction."""
+    await db.execute(delete(PromptTag).where(PromptTag.prompt_id == prompt_id))
+    await _insert_tags(db, _tag_rows(prompt_id, tags))
+
+def get_tag_filter(
+    tag: Optional[str] = None,
+    tags: Optional[str] = Query(None, description="Comma-separated tags to filter prompts by"),
+    tag_match: str = Query("all", regex="^(all|any)$", description="Whether prompts need all of the tags or any")
+) -> Tuple[List[str], bool]:
+    """Get the tags to filter prompts by, and whether prompts must have all of them, from the query string.
+    
+    ``tag`` is the single-tag filter the listing took before ``tags``; it is added to them.
+    """
+    names = [name.strip() for name in (tags or "").split(",")]
+    if tag is not None:
+        names.append(tag)
+    names = list(dict.fromkeys(name for name in names if name))
+    if len(names) > MAX_FILTER_TAGS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_FILTER_TAGS} tags can be filtered by"
+        )
+    return names, tag_match == "all"
+
+async def _tag_sizes(db: AsyncSession, tags: List[str]) -> Dict[str, int]:
+    """Count the prompts with each tag from the tag index, stopping one past ``TAG_SCAN_THRESHOLD``."""
+    counts = [
+        select(func.count()).select_from(
+            select(PromptTag.prompt_id).filter(PromptTag.tag == tag).limit(TAG_SCAN_THRESHOLD + 1).subquery()
+        ).scalar_subquery()
+        for tag in tags
+    ]
+    result = await db.execute(select(*counts))
+    return dict(zip(tags, result.one()))
+
+def _has_tag(*tags: str):
+    """Get a filter for prompts with any of ``tags``, probing each prompt's tags by primary key."""
+    return exists().where(PromptTag.prompt_id == Prompt.id, PromptTag.tag.in_(tags))
+
+async def _prompt_filters(db: AsyncSession, owner_id: Optional[uuid.UUID], tag_filter: Tuple[List[str], bool],
+                          paginated: bool = True) -> list:
+    """Build the filters on prompts shared by the listing and the tag counts.
+    
+    Tags are matched through the tag index in whichever direction is cheaper. A page of prompts
+    with common tags is found by probing prompts in listing order until the page is full; rarer
+    tags, and anything that is not paginated, start from the prompts with the rarest tag.
+    """
+    filters = []
+    if owner_id is not None:
+        filters.append(Prompt.owner_id == owner_id)
+    tags, match_all = tag_filter
+    if not tags:
+        return filters
+    
+    sizes = await _tag_sizes(db, tags)
+    if match_all:
+        rarest = min(tags, key=sizes.get)
+        others = [_has_tag(tag) for tag in tags if tag != rarest]
+        if paginated and sizes[rarest] > TAG_SCAN_THRESHOLD:
+            return filters + [_has_tag(rarest), *others]
+        return filters + [Prompt.id.in_(select(PromptTag.prompt_id).filter(PromptTag.tag == rarest)), *others]
+    if paginated and sum(sizes.values()) > TAG_SCAN_THRESHOLD:
+        return filters + [_has_tag(*tags)]
+    return filters + [Prompt.id.in_(select(PromptTag.prompt_id).filter(PromptTag.tag.in_(tags)))]
+
+
+@router.get("/", response_model=Page[PromptRead])
 async def get_prompts(
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db)
-) -> List[dict]:
-    """Get all prompts with pagination."""
+    request: Request,
+    owner_id: Optional[uuid.UUID] = None,
+    tag_filter: Tuple[List[str], bool] = Depends(get_tag_filter),
+    page: PageRequest = Depends(get_page_request),
+    fields: Tuple[str, ...] = Depends(FieldSelector(PromptRead)),
+    db: AsyncSession = Depends(get_async_db)
+) -> Response:
+    """Get a page of prompts, oldest first, optionally filtered by owner and tags.
+    
+    ``tags`` is a comma-separated list; prompts must have all of them, or any with ``tag_match=any``.
+    Pass the returned ``next_cursor`` as ``cursor`` to get the following page, and ``fields`` to get
+    only some of each prompt's fields. Send the page's ``ETag`` back as ``If-None-Match`` to get a 304
+    while none of its prompts have changed.
+    """
     try:
-        prompts = db.query(Prompt).offset(skip).limit(limit).all()
-        return [
-            {
-                "id": prompt.id,
-                "body": prompt.body,
-                "version": prompt.version,
-                "tags": prompt.tags,
-                "owner_id": prompt.owner_id,
-                "created_at": prompt.created_at,
-                "updated_at": prompt.updated_at
-            }
-            for prompt in prompts
-        ]
+        filters = await _prompt_filters(db, owner_id, tag_filter)
+        
+        if is_conditional(request):
+            key_query = select(*columns(Prompt, VALIDATOR_FIELDS, extra=CURSOR_FIELDS)).filter(*filters)
+            keys, next_cursor = await paginate_async(db, key_query, Prompt, page)
+            etag = collection_etag(keys, next_cursor, fields)
+            if is_not_modified(request, etag):
+                return not_modified(etag)
+        
+        query = select(*columns(Prompt, fields, extra=CURSOR_FIELDS + VALIDATOR_FIELDS)).filter(*filters)
+        prompts, next_cursor = await paginate_async(db, query, Prompt, page)
+        response = ORJSONResponse(project_page(prompts, PromptRead, next_cursor, fields))
+        return set_validators(response, collection_etag(prompts, next_cursor, fields))
     except Exception as e:
         logger.error(f"Error fetching prompts: {str(e)}")
         raise HTTPException(
@@ -44,14 +157,14 @@ async def get_prompts(
             detail="An error occurred while fetching prompts"
         )
 
-@router.post("/", response_model=dict)
+@router.post("/", response_model=PromptRead)
 async def create_prompt(
     body: str,
     version: str = "1.0",
     tags: List[str] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
-) -> dict:
+) -> ORJSONResponse:
     """Create a new prompt."""
     try:
         new_prompt = Prompt(
@@ -62,20 +175,15 @@ async def create_prompt(
         )
         
         db.add(new_prompt)
-        db.commit()
-        db.refresh(new_prompt)
+        # The prompt goes in before the tag rows that reference it
+        await db.flush()
+        await _insert_tags(db, _tag_rows(new_prompt.id, new_prompt.tags))
+        await db.commit()
+        await db.refresh(new_prompt)
         
         logger.info(f"New prompt created: {new_prompt.id}")
         
-        return {
-            "id": new_prompt.id,
-            "body": new_prompt.body,
-            "version": new_prompt.version,
-            "tags": new_prompt.tags,
-            "owner_id": new_prompt.owner_id,
-            "created_at": new_prompt.created_at,
-            "updated_at": new_prompt.updated_at
-        }
+        return ORJSONResponse(project(new_prompt, PromptRead))
     except Exception as e:
         logger.error(f"Error creating prompt: {str(e)}")
         raise HTTPException(
@@ -83,26 +191,237 @@ async def create_prompt(
             detail="An error occurred while creating prompt"
         )
 
-@router.get("/{prompt_id}", response_model=dict)
-async def get_prompt(prompt_id: str, db: Session = Depends(get_db)) -> dict:
-    """Get a specific prompt by ID."""
+async def _read_bulk_rows(request: Request) -> AsyncIterator[Any]:
+    """Yield the rows of a bulk import body.
+    
+    A JSON array (``application/json``) is parsed whole. Anything else is read as NDJSON, one row
+    per line, and parsed as the request streams in.
+    """
+    if request.headers.get("content-type", "").split(";")[0].strip() == "application/json":
+        try:
+            rows = bulk.parse_json_array(await request.body())
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        for row in rows:
+            yield row
+        return
+    
+    async for row in bulk.aiter_ndjson(request.stream()):
+        yield row
+
+async def _insert_prompt_chunk(db: AsyncSession, chunk: List[Tuple[int, Any]], owner_id: uuid.UUID,
+                               result: Dict[str, Any]) -> None:
+    """Insert one chunk of bulk import rows in a single transaction, reporting bad rows by position."""
+    now = datetime.utcnow()
+    values = []
+    for index, (body, version, tags) in bulk.validate_chunk(chunk, result):
+        # Core inserts skip the model's Python-side defaults, so fill them in here
+        values.append((index, {
+            "id": uuid.uuid4(),
+            "body": body,
+            "version": version,
+            "tags": tags,
+            "owner_id": owner_id,
+            "audit_log": {},
+            "created_at": now,
+            "updated_at": now
+        }))
+    
+    inserted = []
+    if values:
+        try:
+            await db.execute(Prompt.__table__.insert(), [value for _, value in values])
+            await _insert_tags(db, [row for _, value in values for row in _tag_rows(value["id"], value["tags"])])
+            await db.commit()
+            inserted = [value["id"] for _, value in values]
+        except SQLAlchemyError:
+            await db.rollback()
+            # Retry the chunk row by row to find the rows that failed
+            for index, value in values:
+                try:
+                    await db.execute(Prompt.__table__.insert(), value)
+                    await _insert_tags(db, _tag_rows(value["id"], value["tags"]))
+                    await db.commit()
+                except SQLAlchemyError as e:
+                    await db.rollback()
+                    bulk.add_error(result, index, getattr(e, "orig", None) or e)
+                    continue
+                inserted.append(value["id"])
+    bulk.add_imported(result, inserted)
+
+@router.post("/bulk", response_model=dict)
+async def import_prompts(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user)
+) -> dict:
+    """Create prompts in bulk from an NDJSON stream or a JSON array of ``{"body", "version", "tags"}``.
+    
+    Rows are inserted ``BULK_CHUNK_SIZE`` to a transaction. Rows that are malformed or fail to insert
+    are reported by their position and skipped without failing the rest.
+    """
+    try:
+        result = bulk.new_result()
+        async for chunk in bulk.achunked(_read_bulk_rows(request), BULK_CHUNK_SIZE):
+            await _insert_prompt_chunk(db, chunk, current_user.id, result)
+        
+        logger.info(f"Bulk imported {result['imported']} prompts ({result['failed']} failed)")
+        
+        return result
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error importing prompts: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while importing prompts"
+        )
+
+async def _export_chunks(export_format: str, sessions=AsyncSessionLocal) -> AsyncIterator[bytes]:
+    """Encode every prompt for export, one batch of rows per chunk.
+    
+    Runs on its own session from ``sessions`` because the response is still streaming after the
+    request's session is closed.
+    """
+    try:
+        async with sessions() as db:
+            result = await db.stream(
+                select(
+                    Prompt.id, Prompt.body, Prompt.version, Prompt.tags,
+                    Prompt.owner_id, Prompt.created_at, Prompt.updated_at
+                ).order_by(Prompt.created_at, Prompt.id).execution_options(yield_per=EXPORT_BATCH_SIZE)
+            )
+            
+            encoder = bulk.ExportEncoder(export_format)
+            yield encoder.start()
+            async for prompts in result.partitions(EXPORT_BATCH_SIZE):
+                yield encoder.batch(
+                    {
+                        "id": str(prompt.id),
+                        "body": prompt.body,
+                        "version": prompt.version,
+                        "tags": prompt.tags,
+                        "owner_id": str(prompt.owner_id),
+                        "created_at": prompt.created_at.isoformat(),
+                        "updated_at": prompt.updated_at.isoformat()
+                    }
+                    for prompt in prompts
+                )
+            yield encoder.end()
+    except Exception as e:
+        # Headers are already sent, so all that can be done is to cut the stream short
+        logger.error(f"Error exporting prompts: {str(e)}")
+        raise
+
+@router.get("/export")
+async def export_prompts(
+    format: str = "ndjson",
+    current_user: User = Depends(get_current_active_user)
+) -> StreamingResponse:
+    """Stream every prompt as NDJSON (the bulk import format) or as a JSON array, oldest first."""
+    if format not in bulk.EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported export format: {format}"
+        )
+    return StreamingResponse(_export_chunks(format), media_type=bulk.EXPORT_FORMATS[format])
+
+@router.get("/semantic-search", response_model=dict)
+async def semantic_search_prompts(
+    q: str,
+    k: int = 10,
+    budget_ms: float = 50.0,
+    current_user: User = Depends(get_current_active_user)
+) -> dict:
+    """Find the ``k`` prompts in the prompt library closest in meaning to ``q``.
+    
+    The search stops after ``budget_ms`` milliseconds and returns the best prompts found by then,
+    with ``truncated`` set. Embedding the query may call a model server, so the search runs in the
+    threadpool.
+    """
+    if not 1 <= k <= MAX_SEMANTIC_RESULTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"k must be between 1 and {MAX_SEMANTIC_RESULTS}"
+        )
+    prompt_store = get_prompt_store()
+    if prompt_store.vector_index is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Semantic search is not enabled"
+        )
     try:
-        prompt = db.query(Prompt).filter(Prompt.id == uuid.UUID(prompt_id)).first()
+        start = time.perf_counter()
+        result = await run_in_threadpool(prompt_store.semantic_search, q, k=k, budget_ms=budget_ms)
+        result["elapsed_ms"] = (time.perf_counter() - start) * 1000
+        return result
+    except Exception as e:
+        logger.error(f"Error searching prompts for {q!r}: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while searching prompts"
+        )
+
+@router.get("/tags", response_model=List[TagCount])
+async def get_tag_counts(
+    owner_id: Optional[uuid.UUID] = None,
+    tag_filter: Tuple[List[str], bool] = Depends(get_tag_filter),
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_async_db)
+) -> ORJSONResponse:
+    """Count the prompts with each tag, most used first, among the prompts the same filters list.
+    
+    With ``tags``, this gives the tags the matching prompts also have, to narrow a search further.
+    """
+    try:
+        count = func.count().label("count")
+        query = select(PromptTag.tag, count).group_by(PromptTag.tag).order_by(count.desc(), PromptTag.tag).limit(limit)
+        filters = await _prompt_filters(db, owner_id, tag_filter, paginated=False)
+        if filters:
+            query = query.filter(PromptTag.prompt_id.in_(select(Prompt.id).filter(*filters)))
+        
+        result = await db.execute(query)
+        return ORJSONResponse([{"tag": tag, "count": count} for tag, count in result.all()])
+    except Exception as e:
+        logger.error(f"Error counting prompt tags: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while counting prompt tags"
+        )
+
+@router.get("/{prompt_id}", response_model=PromptRead)
+async def get_prompt(
+    prompt_id: str,
+    request: Request,
+    fields: Tuple[str, ...] = Depends(FieldSelector(PromptRead)),
+    db: AsyncSession = Depends(get_async_db)
+) -> Response:
+    """Get a specific prompt by ID, with all its fields or just the ``fields`` asked for.
+    
+    Answers ``If-None-Match`` and ``If-Modified-Since`` with a 304 while the prompt is unchanged.
+    """
+    try:
+        if is_conditional(request):
+            validators = await load_validators(db, Prompt, uuid.UUID(prompt_id))
+            if validators:
+                etag = entity_etag(validators, fields)
+                if is_not_modified(request, etag, validators.updated_at):
+                    return not_modified(etag, validators.updated_at)
+        
+        result = await db.execute(
+            select(*columns(Prompt, fields, extra=VALIDATOR_FIELDS)).filter(Prompt.id == uuid.UUID(prompt_id))
+        )
+        prompt = result.first()
         if not prompt:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Prompt not found"
             )
         
-        return {
-            "id": prompt.id,
-            "body": prompt.body,
-            "version": prompt.version,
-            "tags": prompt.tags,
-            "owner_id": prompt.owner_id,
-            "created_at": prompt.created_at,
-            "updated_at": prompt.updated_at
-        }
+        response = ORJSONResponse(project(prompt, PromptRead, fields))
+        return set_validators(response, entity_etag(prompt, fields), prompt.updated_at)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching prompt {prompt_id}: {str(e)}")
         raise HTTPException(
@@ -110,17 +429,17 @@ async def get_prompt(prompt_id: str, db: Session = Depends(get_db)) -> dict:
             detail="An error occurred while fetching prompt"
         )
 
-@router.put("/{prompt_id}", response_model=dict)
+@router.put("/{prompt_id}", response_model=PromptRead)
 async def update_prompt(
     prompt_id: str,
     body: str = None,
     version: str = None,
     tags: List[str] = None,
-    db: Session = Depends(get_db)
-) -> dict:
+    db: AsyncSession = Depends(get_async_db)
+) -> ORJSONResponse:
     """Update an existing prompt."""
     try:
-        prompt = db.query(Prompt).filter(Prompt.id == uuid.UUID(prompt_id)).first()
+        prompt = await db.get(Prompt, uuid.UUID(prompt_id))
         if not prompt:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -134,23 +453,17 @@ async def update_prompt(
             prompt.version = version
         if tags is not None:
             prompt.tags = tags
-            
+            await _replace_tags(db, prompt.id, tags)
+        
         prompt.updated_at = datetime.utcnow()
+        prompt.row_version = Prompt.row_version + 1
         
-        db.commit()
-        db.refresh(prompt)
+        await db.commit()
+        await db.refresh(prompt)
         
         logger.info(f"Prompt updated: {prompt.id}")
         
-        return {
-            "id": prompt.id,
-            "body": prompt.body,
-            "version": prompt.version,
-            "tags": prompt.tags,
-            "owner_id": prompt.owner_id,
-            "created_at": prompt.created_at,
-            "updated_at": prompt.updated_at
-        }
+        return ORJSONResponse(project(prompt, PromptRead))
     except Exception as e:
         logger.error(f"Error updating prompt {prompt_id}: {str(e)}")
         raise HTTPException(
@@ -159,21 +472,22 @@ async def update_prompt(
         )
 
 @router.delete("/{prompt_id}")
-async def delete_prompt(prompt_id: str, db: Session = Depends(get_db)) -> None:
+async def delete_prompt(prompt_id: str, db: AsyncSession = Depends(get_async_db)) -> None:
     """Delete a prompt."""
     try:
-        prompt = db.query(Prompt).filter(Prompt.id == uuid.UUID(prompt_id)).first()
+        prompt = await db.get(Prompt, uuid.UUID(prompt_id))
         if not prompt:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Prompt not found"
             )
         
-        db.delete(prompt)
-        db.commit()
+        await db.execute(delete(PromptTag).where(PromptTag.prompt_id == prompt.id))
+        await db.delete(prompt)
+        await db.commit()
         
         logger.info(f"Prompt deleted: {prompt.id}")
-        
+    
     except Exception as e:
         logger.error(f"Error deleting prompt {prompt_id}: {str(e)}")
         raise HTTPException(
@@ -181,13 +495,13 @@ async def delete_prompt(prompt_id: str, db: Session = Depends(get_db)) -> None:
             detail="An error occurred while deleting prompt"
         )
 
-@router.get("/{prompt_id}/versions", response_model=List[dict])
-async def get_prompt_versions(prompt_id: str, db: Session = Depends(get_db)) -> List[dict]:
+@router.get("/{prompt_id}/versions", response_model=List[PromptVersionRead])
+async def get_prompt_versions(prompt_id: str, db: AsyncSession = Depends(get_async_db)) -> ORJSONResponse:
     """Get all versions of a specific prompt."""
     try:
         # In a real implementation, this would query version history
         # For now, we'll return the prompt itself as it's the only version
-        prompt = db.query(Prompt).filter(Prompt.id == uuid.UUID(prompt_id)).first()
+        prompt = await db.get(Prompt, uuid.UUID(prompt_id))
         if not prompt:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -195,13 +509,7 @@ async def get_prompt_versions(prompt_id: str, db: Session = Depends(get_db)) ->
             )
         
         # Return the current version (in a real implementation, this would be a history)
-        return [
-            {
-                "version": prompt.version,
-                "body": prompt.body,
-                "created_at": prompt.created_at
-            }
-        ]
+        return ORJSONResponse([project(prompt, PromptVersionRead)])
     except Exception as e:
         logger.error(f"Error fetching prompt versions {prompt_id}: {str(e)}")
         raise HTTPException(
@@ -3,43 +3,191 @@
 CRUD endpoints for managing AI agent teams.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import asyncio
 import uuid
 
-from ..models import Team, User, get_db, engine
+from ..models import Agent, Team, TeamMembership, User, get_async_db, engine
+from ..services.entity_cache import TEAM_SNAPSHOT_COLUMNS, agent_cache, team_cache, team_snapshot
+from ..services.orchestrator import orchestrator
+from ..schemas import (
+    CURSOR_FIELDS, AgentRead, AgentSnapshot, BatchRequest, BatchResult, FieldSelector, Page, TeamCreate,
+    TeamMemberAssignment, TeamMemberSlot, TeamRead, TeamSnapshot, TeamUpdate, TeamWithAgentsRead, columns, project,
+    project_page
+)
+from ..utils.batch import run_batch
+from ..utils.conditional import (
+    VALIDATOR_FIELDS, collection_etag, entity_etag, is_conditional, is_not_modified, not_modified, set_validators
+)
+from ..utils.idempotency import IDEMPOTENCY_HEADER
 from ..utils.logging import logger
-from ..routes.auth import get_current_active_user
+from ..utils.pagination import PageRequest, get_page_request, paginate_async
+from ..routes.auth import get_current_active_user, require_quota
 from datetime import datetime
 
 router = APIRouter()
 
+# Columns a new team starts with that TeamCreate doesn't take; members are assigned separately
+TEAM_DEFAULTS = {}
 
-@router.get("/", response_model=List[dict])
+# TeamRead's members come from TeamMembership rather than a column of the team table
+MEMBERS_FIELD = "members"
+
+def team_columns(fields: Sequence[str], extra: Sequence[str] = ()) -> List[Any]:
+    """Get the team columns to SELECT for ``fields``, leaving out members."""
+    return columns(Team, [name for name in fields if name != MEMBERS_FIELD], extra)
+
+class _TeamWithMembers:
+    """A team row with the IDs of its agents attached, to project as a TeamRead."""
+    
+    def __init__(self, row: Any, members: List[uuid.UUID]):
+        self._row = row
+        self.members = members
+    
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._row, name)
+
+async def load_members(db: AsyncSession, team_ids: Sequence[uuid.UUID]) -> Dict[uuid.UUID, List[uuid.UUID]]:
+    """Get the IDs of each team's agents, in team order, with one query for all the teams."""
+    members = {team_id: [] for team_id in team_ids}
+    if members:
+        result = await db.execute(
+            select(TeamMembership.team_id, TeamMembership.agent_id)
+            .filter(TeamMembership.team_id.in_(list(members)))
+            .order_by(TeamMembership.team_id, TeamMembership.position)
+        )
+        for team_id, agent_id in result:
+            members[team_id].append(agent_id)
+    return members
+
+async def with_members(db: AsyncSession, teams: Sequence[Any], fields: Sequence[str] = (MEMBERS_FIELD,)) -> List[Any]:
+    """Attach their members to team rows, if ``fields`` asks for them."""
+    if MEMBERS_FIELD not in fields:
+        return list(teams)
+    members = await load_members(db, [team.id for team in teams])
+    return [_TeamWithMembers(team, members[team.id]) for team in teams]
+
+# A team's agents in order, each with its position and role in the team; agents are Agent rows or,
+# from the entity cache, AgentSnapshots
+TeamAgents = List[Tuple[int, Optional[str], Any]]
+
+async def load_team_with_agents(db: AsyncSession, team_id: uuid.UUID) -> Optional[Tuple[Team, TeamAgents]]:
+    """Get a team and its agents, in team order with their positions and roles, in one query.
+    
+    Returns None if the team doesn't exist.
+    """
+    result = await db.execute(
+        select(Team, TeamMembership.position, TeamMembership.role, Agent)
+        .outerjoin(TeamMembership, TeamMembership.team_id == Team.id)
+        .outerjoin(Agent, Agent.id == TeamMembership.agent_id)
+        .filter(Team.id == team_id)
+        .order_by(TeamMembership.position)
+    )
+    rows = result.all()
+    if not rows:
+        return None
+    return rows[0][0], [(position, role, agent) for _, position, role, agent in rows if agent is not None]
+
+async def cached_team_with_agents(db: AsyncSession, team_id: uuid.UUID) -> Optional[Tuple[TeamSnapshot, TeamAgents]]:
+    """Get a team and its agents, in team order with their positions and roles, through the entity cache.
+    
+    A team that is not cached is loaded with its agents in one query by ``load_team_with_agents``,
+    and the agents fill the agent cache. Returns None if the team doesn't exist.
+    """
+    joined = {}
+    
+    async def load_team(db: AsyncSession, keys: List[str]) -> Dict[str, TeamSnapshot]:
+        checkpoint = agent_cache.checkpoint()
+        loaded = await load_team_with_agents(db, team_id)
+        if loaded is None:
+            return {}
+        team, members = loaded
+        joined["agents"] = {
+            str(agent.id): AgentSnapshot.parse_obj(project(agent, AgentSnapshot)) for _, _, agent in members
+        }
+        agent_cache.fill(joined["agents"], checkpoint)
+        return {str(team.id): team_snapshot({
+            **project(team, TeamSnapshot, TEAM_SNAPSHOT_COLUMNS),
+            "memberships": [
+                TeamMemberSlot(agent_id=agent.id, position=position, role=role) for position, role, agent in members
+            ]
+        })}
+    
+    team = await team_cache.get(db, team_id, load_team)
+    if team is None:
+        return None
+    agents = joined["agents"] if "agents" in joined else await agent_cache.get_many(db, team.members)
+    return team, [
+        (slot.position, slot.role, agents[str(slot.agent_id)])
+        for slot in team.memberships if str(slot.agent_id) in agents
+    ]
+
+async def remove_agent_memberships(db: AsyncSession, agent_ids: List[uuid.UUID]) -> None:
+    """Take agents out of their teams ahead of deleting them, marking those teams as changed."""
+    result = await db.execute(select(TeamMembership.team_id.distinct()).filter(TeamMembership.agent_id.in_(agent_ids)))
+    team_ids = result.scalars().all()
+    if not team_ids:
+        return
+    await db.execute(
+        update(Team).where(Team.id.in_(team_ids))
+        .values(updated_at=datetime.utcnow(), row_version=Team.row_version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    team_cache.invalidate_on_commit(db, team_ids)
+    await db.execute(
+        delete(TeamMembership).where(TeamMembership.agent_id.in_(agent_ids))
+        .execution_options(synchronize_session=False)
+    )
+
+async def remove_team_memberships(db: AsyncSession, team_ids: List[uuid.UUID]) -> None:
+    """Remove teams' memberships ahead of deleting the teams."""
+    await db.execute(
+        delete(TeamMembership).where(TeamMembership.team_id.in_(team_ids)).execution_options(synchronize_session=False)
+    )
+
+
+@router.get("/", response_model=Page[TeamRead])
 async def get_teams(
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db)
-) -> List[dict]:
-    """Get all teams with pagination."""
+    request: Request,
+    owner_id: Optional[uuid.UUID] = None,
+    agent_id: Optional[uuid.UUID] = None,
+    workflow_status: Optional[str] = Query(None, alias="status"),
+    page: PageRequest = Depends(get_page_request),
+    fields: Tuple[str, ...] = Depends(FieldSelector(TeamRead)),
+    db: AsyncSession = Depends(get_async_db)
+) -> Response:
+    """Get a page of teams, oldest first, optionally filtered by owner, member agent and workflow status.
+    
+    Pass the returned ``next_cursor`` as ``cursor`` to get the following page, and ``fields`` to get
+    only some of each team's fields. Send the page's ``ETag`` back as ``If-None-Match`` to get a 304
+    while none of its teams have changed.
+    """
     try:
-        teams = db.query(Team).offset(skip).limit(limit).all()
-        return [
-            {
-                "id": team.id,
-                "name": team.name,
-                "description": team.description,
-                "members": team.members,
-                "owner_id": team.owner_id,
-                "orchestration_rules": team.orchestration_rules,
-                "last_workflow_execution": team.last_workflow_execution,
-                "workflow_status": team.workflow_status,
-                "created_at": team.created_at,
-                "updated_at": team.updated_at
-            }
-            for team in teams
-        ]
+        filters = []
+        if owner_id is not None:
+            filters.append(Team.owner_id == owner_id)
+        if agent_id is not None:
+            # Found through the agent-first membership index, without scanning teams
+            filters.append(Team.id.in_(select(TeamMembership.team_id).filter(TeamMembership.agent_id == agent_id)))
+        if workflow_status is not None:
+            filters.append(Team.workflow_status == workflow_status)
+        
+        if is_conditional(request):
+            key_query = select(*columns(Team, VALIDATOR_FIELDS, extra=CURSOR_FIELDS)).filter(*filters)
+            keys, next_cursor = await paginate_async(db, key_query, Team, page)
+            etag = collection_etag(keys, next_cursor, fields)
+            if is_not_modified(request, etag):
+                return not_modified(etag)
+        
+        query = select(*team_columns(fields, extra=CURSOR_FIELDS + VALIDATOR_FIELDS)).filter(*filters)
+        teams, next_cursor = await paginate_async(db, query, Team, page)
+        teams = await with_members(db, teams, fields)
+        response = ORJSONResponse(project_page(teams, TeamRead, next_cursor, fields))
+        return set_validators(response, collection_etag(teams, next_cursor, fields))
     except Exception as e:
         logger.error(f"Error fetching teams: {str(e)}")
         raise HTTPException(
@@ -47,22 +195,21 @@ async def get_teams(
             detail="An error occurred while fetching teams"
         )
 
-@router.post("/", response_model=dict)
+@router.post("/", response_model=TeamRead)
 async def create_team(
     name: str,
     description: str = None,
     orchestration_rules: dict = None,
     last_workflow_execution: Optional[datetime] = None,
     workflow_status: Optional[str] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
-) -> dict:
+) -> ORJSONResponse:
     """Create a new team."""
     try:
         new_team = Team(
             name=name,
             description=description,
-            members=[],
             owner_id=current_user.id,
             orchestration_rules=orchestration_rules or {},
             last_workflow_execution=last_workflow_execution,
@@ -70,23 +217,12 @@ async def create_team(
         )
         
         db.add(new_team)
-        db.commit()
-        db.refresh(new_team)
+        await db.commit()
+        await db.refresh(new_team)
         
         logger.info(f"New team created: {new_team.name}")
         
-        return {
-            "id": new_team.id,
-            "name": new_team.name,
-            "description": new_team.description,
-            "members": new_team.members,
-            "owner_id": new_team.owner_id,
-            "orchestration_rules": new_team.orchestration_rules,
-            "last_workflow_execution": new_team.last_workflow_execution,
-            "workflow_status": new_team.workflow_status,
-            "created_at": new_team.created_at,
-            "updated_at": new_team.updated_at
-        }
+        return ORJSONResponse(project(_TeamWithMembers(new_team, []), TeamRead))
     except Exception as e:
         logger.error(f"Error creating team: {str(e)}")
         raise HTTPException(
@@ -94,29 +230,64 @@ async def create_team(
             detail="An error occurred while creating team"
         )
 
-@router.get("/{team_id}", response_model=dict)
-async def get_team(team_id: str, db: Session = Depends(get_db)) -> dict:
-    """Get a specific team by ID."""
+@router.post("/batch", response_model=BatchResult)
+async def batch_teams(
+    batch: BatchRequest,
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER, max_length=255),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user)
+) -> ORJSONResponse:
+    """Create, update and delete teams in one transaction.
+    
+    Items are validated one at a time; bad ones are reported by operation and position and the rest
+    are applied, unless the batch is ``atomic``, in which case nothing is and the response is a 422.
+    Send an ``Idempotency-Key`` header to make retries safe: a retry with the same key gets the first
+    response back instead of applying the batch again.
+    """
     try:
-        team = db.query(Team).filter(Team.id == uuid.UUID(team_id)).first()
+        response, changed = await run_batch(
+            db, Team, batch, TeamCreate, TeamUpdate, TEAM_DEFAULTS, current_user.id, "teams/batch", idempotency_key,
+            on_delete=remove_team_memberships
+        )
+        team_cache.invalidate(*changed)
+        return response
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error applying team batch: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while applying team batch"
+        )
+
+@router.get("/{team_id}", response_model=TeamRead)
+async def get_team(
+    team_id: str,
+    request: Request,
+    fields: Tuple[str, ...] = Depends(FieldSelector(TeamRead)),
+    db: AsyncSession = Depends(get_async_db)
+) -> Response:
+    """Get a specific team by ID, with all its fields or just the ``fields`` asked for.
+    
+    Served from the entity cache when the team is in it. Answers ``If-None-Match`` and
+    ``If-Modified-Since`` with a 304 while the team is unchanged.
+    """
+    try:
+        team = await team_cache.get(db, uuid.UUID(team_id))
         if not team:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Team not found"
             )
         
-        return {
-            "id": team.id,
-            "name": team.name,
-            "description": team.description,
-            "members": team.members,
-            "owner_id": team.owner_id,
-            "orchestration_rules": team.orchestration_rules,
-            "last_workflow_execution": team.last_workflow_execution,
-            "workflow_status": team.workflow_status,
-            "created_at": team.created_at,
-            "updated_at": team.updated_at
-        }
+        etag = entity_etag(team, fields)
+        if is_not_modified(request, etag, team.updated_at):
+            return not_modified(etag, team.updated_at)
+        
+        response = ORJSONResponse(project(team, TeamRead, fields))
+        return set_validators(response, etag, team.updated_at)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching team {team_id}: {str(e)}")
         raise HTTPException(
@@ -124,7 +295,7 @@ async def get_team(team_id: str, db: Session = Depends(get_db)) -> dict:
             detail="An error occurred while fetching team"
         )
 
-@router.put("/{team_id}", response_model=dict)
+@router.put("/{team_id}", response_model=TeamRead)
 async def update_team(
     team_id: str,
     name: str = None,
@@ -132,11 +303,11 @@ async def update_team(
     orchestration_rules: dict = None,
     last_workflow_execution: Optional[datetime] = None,
     workflow_status: Optional[str] = None,
-    db: Session = Depends(get_db)
-) -> dict:
+    db: AsyncSession = Depends(get_async_db)
+) -> ORJSONResponse:
     """Update an existing team."""
     try:
-        team = db.query(Team).filter(Team.id == uuid.UUID(team_id)).first()
+        team = await db.get(Team, uuid.UUID(team_id))
         if not team:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -154,26 +325,19 @@ async def update_team(
             team.last_workflow_execution = last_workflow_execution
         if workflow_status is not None:
             team.workflow_status = workflow_status
-                     
+        
         team.updated_at = datetime.utcnow()
+        team.row_version = Team.row_version + 1
         
-        db.commit()
-        db.refresh(team)
+        await db.commit()
+        await db.refresh(team)
+        # The cached team has its memberships too, which this doesn't load, so it is dropped rather than written through
+        team_cache.invalidate(team.id)
         
         logger.info(f"Team updated: {team.name}")
         
-        return {
-            "id": team.id,
-            "name": team.name,
-            "description": team.description,
-            "members": team.members,
-            "owner_id": team.owner_id,
-            "orchestration_rules": team.orchestration_rules,
-            "last_workflow_execution": team.last_workflow_execution,
-            "workflow_status": team.workflow_status,
-            "created_at": team.created_at,
-            "updated_at": team.updated_at
-        }
+        team, = await with_members(db, [team])
+        return ORJSONResponse(project(team, TeamRead))
     except Exception as e:
         logger.error(f"Error updating team {team_id}: {str(e)}")
         raise HTTPException(
@@ -182,24 +346,194 @@ async def update_team(
         )
 
 @router.delete("/{team_id}")
-async def delete_team(team_id: str, db: Session = Depends(get_db)) -> None:
+async def delete_team(team_id: str, db: AsyncSession = Depends(get_async_db)) -> None:
     """Delete a team."""
     try:
-        team = db.query(Team).filter(Team.id == uuid.UUID(team_id)).first()
+        team = await db.get(Team, uuid.UUID(team_id))
         if not team:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Team not found"
             )
         
-        db.delete(team)
-        db.commit()
+        await remove_team_memberships(db, [team.id])
+        await db.delete(team)
+        await db.commit()
+        team_cache.invalidate(team.id)
         
         logger.info(f"Team deleted: {team.name}")
-        
+    
     except Exception as e:
         logger.error(f"Error deleting team {team_id}: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="An error occurred while deleting team"
-        )
\ No newline at end of file
+        )
+
+@router.get("/{team_id}/with-agents", response_model=TeamWithAgentsRead)
+async def get_team_with_agents(team_id: str, db: AsyncSession = Depends(get_async_db)) -> ORJSONResponse:
+    """Get a team along with its agents, in team order, through the entity cache."""
+    try:
+        loaded = await cached_team_with_agents(db, uuid.UUID(team_id))
+        if loaded is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Team not found"
+            )
+        
+        team, members = loaded
+        body = project(_TeamWithMembers(team, [agent.id for _, _, agent in members]), TeamRead)
+        body["agents"] = [
+            {**project(agent, AgentRead), "position": position, "role": role}
+            for position, role, agent in members
+        ]
+        return ORJSONResponse(body)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching team {team_id} with agents: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while fetching team"
+        )
+
+@router.put("/{team_id}/members", response_model=TeamRead)
+async def set_team_members(
+    team_id: str,
+    members: List[TeamMemberAssignment],
+    db: AsyncSession = Depends(get_async_db)
+) -> ORJSONResponse:
+    """Replace a team's members with the agents given, in the order given."""
+    try:
+        team = await db.get(Team, uuid.UUID(team_id))
+        if not team:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Team not found"
+            )
+        
+        agent_ids = [member.agent_id for member in members]
+        if len(set(agent_ids)) != len(agent_ids):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="An agent can only be in a team once"
+            )
+        found = set()
+        if agent_ids:
+            found = set((await db.execute(select(Agent.id).filter(Agent.id.in_(agent_ids)))).scalars())
+        missing = [str(agent_id) for agent_id in agent_ids if agent_id not in found]
+        if missing:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Agents not found: {', '.join(missing)}"
+            )
+        
+        await remove_team_memberships(db, [team.id])
+        if members:
+            now = datetime.utcnow()
+            await db.execute(TeamMembership.__table__.insert(), [
+                {
+                    "team_id": team.id, "agent_id": member.agent_id, "position": position, "role": member.role,
+                    "created_at": now
+                }
+                for position, member in enumerate(members)
+            ])
+        team.updated_at = datetime.utcnow()
+        team.row_version = Team.row_version + 1
+        
+        await db.commit()
+        await db.refresh(team)
+        team_cache.put(team_snapshot({
+            **project(team, TeamSnapshot, TEAM_SNAPSHOT_COLUMNS),
+            "memberships": [
+                TeamMemberSlot(agent_id=member.agent_id, position=position, role=member.role)
+                for position, member in enumerate(members)
+            ]
+        }))
+        
+        logger.info(f"Team {team.name} now has {len(members)} members")
+        
+        return ORJSONResponse(project(_TeamWithMembers(team, agent_ids), TeamRead))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error setting members of team {team_id}: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while setting team members"
+        )
+
+async def _watch_disconnect(request: Request, cancel_event: asyncio.Event, interval: float = 0.5) -> None:
+    """Set the cancel event as soon as the client goes away."""
+    while not cancel_event.is_set():
+        if await request.is_disconnected():
+            logger.info(f"Client disconnected from {request.url.path}, cancelling workflow")
+            cancel_event.set()
+            return
+        await asyncio.sleep(interval)
+
+@router.post("/{team_id}/execute", response_model=dict)
+async def execute_team_workflow(
+    team_id: str,
+    prompt: str,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(require_quota)
+) -> dict:
+    """Run a team's workflow, honouring its deadlines and stopping if the client disconnects."""
+    try:
+        loaded = await cached_team_with_agents(db, uuid.UUID(team_id))
+        if loaded is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Team not found"
+            )
+        team, members = loaded
+        
+        cancel_event = asyncio.Event()
+        watcher = asyncio.ensure_future(_watch_disconnect(request, cancel_event))
+        try:
+            result = await orchestrator.execute_agent_workflow(
+                agents=[
+                    {"id": str(agent.id), "config": agent.config, "mcp_tools": agent.mcp_tools}
+                    for _, _, agent in members
+                ],
+                prompt=prompt,
+                user_id=current_user.id,
+                orchestration_rules=team.orchestration_rules,
+                cancel_event=cancel_event
+            )
+        finally:
+            watcher.cancel()
+        
+        now = datetime.utcnow()
+        changes = {"last_workflow_execution": now, "workflow_status": result["status"], "updated_at": now}
+        # Move the team on from the version it was read at, so the cached team can be written through,
+        # unless it has changed since
+        updated = await db.execute(
+            update(Team).where(Team.id == team.id, Team.row_version == team.row_version)
+            .values(**changes, row_version=team.row_version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        if updated.rowcount:
+            await db.commit()
+            team_cache.put(team.copy(update={**changes, "row_version": team.row_version + 1}))
+        else:
+            await db.execute(
+                update(Team).where(Team.id == team.id).values(**changes, row_version=Team.row_version + 1)
+                .execution_options(synchronize_session=False)
+            )
+            team_cache.invalidate_on_commit(db, [team.id])
+            await db.commit()
+        
+        logger.info(f"Team {team.name} workflow finished with status {result['status']}")
+        
+        return result
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error executing workflow for team {team_id}: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while executing team workflow"
+        )
@@ -0,0 +1,202 @@
+# AI Agentic Platform - Response Schemas
+"""
+Response schemas for the agent, team and prompt routes, and the projection from database rows to
+response bodies.
+
+Routes project rows with ``project`` and return the result in an ``ORJSONResponse``, which encodes
+UUIDs and datetimes natively. Returning a response directly skips FastAPI's revalidation of the body
+against ``response_model`` and its ``jsonable_encoder`` pass, the bulk of the cost of a large listing,
+so the schemas serve as the documented contract and the tests check projections against them.
+
+A ``fields=`` query parameter narrows a response to some of a schema's fields. ``FieldSelector``
+reads it, ``columns`` turns it into the columns to SELECT so the rest are never loaded, and the
+projection then works the same on those rows as on whole models.
+
+The batch routes validate each item of a batch against the ``*Create`` and ``*Update`` schemas on
+its own, so one bad item is reported without rejecting the rest.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, Generic, List, Optional, Sequence, Tuple, Type, TypeVar
+from uuid import UUID
+
+from fastapi import HTTPException, Query, status
+from pydantic import BaseModel, Extra
+from pydantic.generics import GenericModel
+
+class AgentRead(BaseModel):
+    id: UUID
+    name: str
+    description: Optional[str] = None
+    config: Dict[str, Any] = {}
+    status: str
+    last_executed: Optional[datetime] = None
+    performance_metrics: Dict[str, Any] = {}
+    mcp_tools: List[str] = []
+    owner_id: UUID
+    created_at: datetime
+    updated_at: datetime
+
+class TeamRead(BaseModel):
+    id: UUID
+    name: str
+    description: Optional[str] = None
+    members: List[UUID] = []  # Agent IDs in team order
+    owner_id: UUID
+    orchestration_rules: Dict[str, Any] = {}
+    last_workflow_execution: Optional[datetime] = None
+    workflow_status: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+class TeamMemberRead(AgentRead):
+    position: int
+    role: Optional[str] = None
+
+class TeamWithAgentsRead(TeamRead):
+    agents: List[TeamMemberRead] = []
+
+# What the entity cache keeps of an agent or team: everything they are served with, and their row
+# version for ETags
+class AgentSnapshot(AgentRead):
+    row_version: int
+
+class TeamMemberSlot(BaseModel):
+    agent_id: UUID
+    position: int
+    role: Optional[str] = None
+
+class TeamSnapshot(TeamRead):
+    row_version: int
+    memberships: List[TeamMemberSlot] = []  # In team order, matching members
+
+class PromptRead(BaseModel):
+    id: UUID
+    body: str
+    version: str
+    tags: List[str] = []
+    owner_id: UUID
+    created_at: datetime
+    updated_at: datetime
+
+class TagCount(BaseModel):
+    tag: str
+    count: int
+
+class PromptVersionRead(BaseModel):
+    version: str
+    body: str
+    created_at: datetime
+
+class AgentCreate(BaseModel, extra=Extra.forbid):
+    name: str
+    description: Optional[str] = None
+    config: Dict[str, Any] = {}
+    mcp_tools: List[str] = []
+
+class AgentUpdate(BaseModel, extra=Extra.forbid):
+    id: UUID
+    name: Optional[str] = None
+    description: Optional[str] = None
+    config: Optional[Dict[str, Any]] = None
+    status: Optional[str] = None
+    last_executed: Optional[datetime] = None
+    performance_metrics: Optional[Dict[str, Any]] = None
+    mcp_tools: Optional[List[str]] = None
+
+class TeamCreate(BaseModel, extra=Extra.forbid):
+    name: str
+    description: Optional[str] = None
+    orchestration_rules: Dict[str, Any] = {}
+    last_workflow_execution: Optional[datetime] = None
+    workflow_status: Optional[str] = None
+
+class TeamUpdate(BaseModel, extra=Extra.forbid):
+    id: UUID
+    name: Optional[str] = None
+    description: Optional[str] = None
+    orchestration_rules: Optional[Dict[str, Any]] = None
+    last_workflow_execution: Optional[datetime] = None
+    workflow_status: Optional[str] = None
+
+class TeamMemberAssignment(BaseModel, extra=Extra.forbid):
+    agent_id: UUID
+    role: Optional[str] = None
+
+class BatchRequest(BaseModel):
+    """Creates, updates and deletes to apply in one transaction.
+    
+    Items are validated one by one, so they are left loosely typed here. With ``atomic``, any bad
+    item fails the whole batch; otherwise the bad items are skipped and reported.
+    """
+    create: List[Any] = []
+    update: List[Any] = []
+    delete: List[Any] = []
+    atomic: bool = False
+
+class BatchError(BaseModel):
+    operation: str
+    index: int
+    error: str
+
+class BatchResult(BaseModel):
+    created: List[UUID] = []
+    updated: List[UUID] = []
+    deleted: List[UUID] = []
+    errors: List[BatchError] = []
+    applied: bool
+
+T = TypeVar("T")
+
+class Page(GenericModel, Generic[T]):
+    """One page of a listing; pass ``next_cursor`` back as ``cursor`` for the next one."""
+    items: List[T]
+    next_cursor: Optional[str] = None
+
+# Columns every listing loads, whatever fields are asked for, to build its next cursor
+CURSOR_FIELDS = ("id", "created_at")
+
+def parse_fields(fields: Optional[str], schema: Type[BaseModel]) -> Tuple[str, ...]:
+    """Get the schema fields a comma-separated ``fields`` parameter names, in schema order.
+    
+    All of them if it is empty. Raises ValueError for names the schema doesn't have.
+    """
+    names = tuple(schema.__fields__)
+    if not fields:
+        return names
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested.difference(names)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return tuple(name for name in names if name in requested)
+
+class FieldSelector:
+    """Dependency that reads the ``fields`` query parameter of a route returning ``schema``."""
+    
+    def __init__(self, schema: Type[BaseModel]):
+        self.schema = schema
+    
+    def __call__(self, fields: Optional[str] = Query(
+        None, description="Comma-separated fields to return instead of all of them"
+    )) -> Tuple[str, ...]:
+        try:
+            return parse_fields(fields, self.schema)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+def columns(model: Any, fields: Sequence[str], extra: Sequence[str] = ()) -> List[Any]:
+    """Get the model columns to SELECT for ``fields``, plus any ``extra`` ones needed to build the response."""
+    return [getattr(model, name) for name in dict.fromkeys((*fields, *extra))]
+
+def project(row: Any, schema: Type[BaseModel], fields: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    """Get the fields of ``schema``, or just ``fields``, from a database row, as a response body."""
+    return {name: getattr(row, name) for name in fields or schema.__fields__}
+
+def project_page(rows: List[Any], schema: Type[BaseModel], next_cursor: Optional[str],
+                 fields: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    """Get a page of database rows as a response body, with all of ``schema``'s fields or just ``fields``."""
+    fields = tuple(fields or schema.__fields__)
+    return {
+        "items": [{name: getattr(row, name) for name in fields} for row in rows],
+        "next_cursor": next_cursor
+    }
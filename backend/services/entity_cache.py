@@ -0,0 +1,440 @@
+# AI Agentic Platform - Entity Cache Service
+"""
+Read-through cache of agent and team records, keyed by ID.
+
+Each process keeps the records it reads in a bounded LRU whose entries expire after
+``entity_cache_ttl_seconds``. With ``entity_cache_shared_path`` set, records are also kept in a
+SQLite file shared by the worker processes on a host, so a record one process has loaded is a
+local read for the others.
+
+Loads are single-flight: while one request loads a record, other requests for it wait for that load
+instead of each querying the database, so a hot record expiring does not send a burst of identical
+queries. Expiry times are spread a little so records loaded together do not expire together.
+
+Writes keep the cache current themselves. Routes that have the whole new record write it through
+with ``put``; others ``invalidate`` the records they changed once their transaction commits. An
+invalidation also disowns loads still in flight for its keys, so a load that read a record before
+the write cannot cache it afterwards; in the shared tier, the invalidation leaves a tombstone that
+refuses records read before it. Another process's own LRU may serve a record for up to its TTL
+after a write, which bounds how stale a read can be.
+
+The shared tier's SQLite statements run on a thread of its own, so the event loop never waits on
+the file. Reads are awaited; writes are queued behind the statements before them and not waited for.
+
+A loader that reads other records along with the ones asked for can ``fill`` their caches, from a
+``checkpoint`` taken before it read them; the records are dropped if either cache was written since.
+
+``cache_stats`` reports each cache's hits, misses and hit rate.
+"""
+
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Type
+from uuid import UUID
+import asyncio
+import random
+import sqlite3
+import threading
+import time
+
+import orjson
+from pydantic import BaseModel
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models import Agent, Team, TeamMembership
+from ..schemas import AgentSnapshot, TeamMemberSlot, TeamSnapshot, columns, project
+from ..utils.logging import logger
+
+# Loads the records for some keys, returning them by key; keys with no record are left out
+Loader = Callable[[AsyncSession, List[str]], Awaitable[Dict[str, BaseModel]]]
+
+# Fraction of a TTL by which expiry times are spread
+TTL_JITTER = 0.1
+
+# The fields of a cached team that are columns of the team table, rather than from its memberships
+TEAM_SNAPSHOT_COLUMNS = tuple(name for name in TeamSnapshot.__fields__ if name not in ("members", "memberships"))
+
+# Session.info key for the invalidations waiting on a transaction to commit
+_PENDING_INVALIDATIONS = "entity_cache_invalidations"
+
+class SharedEntityStore:
+    """Cache tier in a SQLite file, shared by every process that opens it.
+    
+    Each entry records when it was written. Invalidating a key replaces its entry with a tombstone
+    written at that time, and a record read before then is not stored over it.
+    
+    The methods below block on the file; the entity caches call them through ``run`` and ``submit``,
+    which run them in order on the store's thread.
+    """
+    
+    def __init__(self, path: str):
+        """Open or create the shared cache at ``path``."""
+        self.path = path
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shared-entity-cache")
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entity_cache ("
+            " namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB, written_at REAL NOT NULL,"
+            " expires_at REAL NOT NULL, PRIMARY KEY (namespace, key))"
+        )
+        pruned = self.prune()
+        if pruned:
+            logger.info(f"Pruned {pruned} expired entries from the shared entity cache")
+    
+    async def run(self, method: Callable[..., Any], *args: Any) -> Any:
+        """Run one of the store's methods on its thread, after the writes already queued."""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, method, *args)
+    
+    def submit(self, method: Callable[..., Any], *args: Any) -> None:
+        """Queue a write to run on the store's thread, without waiting for it."""
+        self._executor.submit(method, *args).add_done_callback(self._log_failure)
+    
+    @staticmethod
+    def _log_failure(future: Future) -> None:
+        """Log a queued write that failed, as no caller is waiting to see its error."""
+        if not future.cancelled() and future.exception() is not None:
+            logger.error(f"Error writing to the shared entity cache: {str(future.exception())}")
+    
+    def flush(self) -> None:
+        """Wait for the writes queued so far to finish."""
+        self._executor.submit(lambda: None).result()
+    
+    def get_many(self, namespace: str, keys: Sequence[str]) -> Dict[str, bytes]:
+        """Get the unexpired entries for some keys, leaving out tombstones."""
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT key, value FROM entity_cache WHERE namespace = ? AND key IN ({placeholders})"
+                " AND expires_at > ? AND value IS NOT NULL",
+                (namespace, *keys, time.time())
+            ).fetchall()
+        return dict(rows)
+    
+    def put_many(self, namespace: str, values: Dict[str, bytes], read_at: float, ttl: float) -> None:
+        """Store entries read from the database at ``read_at``, unless their keys were written since."""
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO entity_cache VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT (namespace, key) DO UPDATE SET value = excluded.value,"
+                " written_at = excluded.written_at, expires_at = excluded.expires_at"
+                " WHERE entity_cache.written_at <= excluded.written_at",
+                [(namespace, key, value, read_at, read_at + ttl) for key, value in values.items()]
+            )
+    
+    def invalidate(self, namespace: str, keys: Sequence[str], ttl: float) -> None:
+        """Replace the entries for some keys with tombstones, outliving any record read before them."""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO entity_cache VALUES (?, ?, NULL, ?, ?)",
+                [(namespace, key, now, now + ttl) for key in keys]
+            )
+    
+    def prune(self) -> int:
+        """Delete expired entries and tombstones, returning how many were deleted."""
+        with self._lock:
+            return self._conn.execute("DELETE FROM entity_cache WHERE expires_at <= ?", (time.time(),)).rowcount
+    
+    def close(self) -> None:
+        """Finish the queued writes and close the connection to the shared cache."""
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            self._conn.close()
+
+class EntityCache:
+    """Read-through LRU cache of one kind of record, with an optional shared tier."""
+    
+    def __init__(self, name: str, schema: Type[BaseModel], load: Loader,
+                 max_entries: int = settings.entity_cache_max_entries,
+                 ttl: float = settings.entity_cache_ttl_seconds,
+                 shared: Optional[SharedEntityStore] = None,
+                 shared_ttl: float = settings.entity_cache_shared_ttl_seconds):
+        """Initialize the cache.
+        
+        ``schema`` is the type of the cached records, each with an ``id``; ``load`` reads records
+        from the database when they are not cached.
+        """
+        self.name = name
+        self.schema = schema
+        self.load = load
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.shared = shared
+        self.shared_ttl = shared_ttl
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # Key -> (expiry, record), least recent first
+        self._loading: Dict[str, asyncio.Future] = {}  # Key -> the load in flight for it
+        self._writes = 0  # Puts and invalidations so far, for fill to tell whether records are still current
+        self._stats = dict.fromkeys(
+            ("hits", "shared_hits", "coalesced", "misses", "evictions", "expirations", "invalidations"), 0
+        )
+    
+    def _expiry(self, now: float) -> float:
+        """Get the expiry time of an entry stored now."""
+        return now + self.ttl * (1 - TTL_JITTER * random.random())
+    
+    def _lookup(self, key: str, now: float) -> Optional[BaseModel]:
+        """Get an unexpired record from the LRU, marking it most recently used. Caller must hold the lock."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= now:
+            del self._entries[key]
+            self._stats["expirations"] += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+    
+    def _store(self, key: str, record: BaseModel, now: float) -> None:
+        """Put a record in the LRU, evicting the least recently used past the limit. Caller must hold the lock."""
+        self._entries[key] = (self._expiry(now), record)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+    
+    async def get(self, db: AsyncSession, key: Any, load: Optional[Loader] = None) -> Optional[BaseModel]:
+        """Get a record by ID, loading it on ``db`` if it is not cached. Returns None if it doesn't exist."""
+        return (await self.get_many(db, [key], load)).get(str(key))
+    
+    async def get_many(self, db: AsyncSession, keys: Iterable[Any], load: Optional[Loader] = None
+                       ) -> Dict[str, BaseModel]:
+        """Get records by ID, keyed by the string form of their IDs, loading the ones not cached in one go.
+        
+        ``load`` replaces the cache's loader for this call. IDs with no record are left out. Records
+        returned are shared with the cache and other requests, so must not be changed.
+        """
+        found, waiting, missing = {}, {}, []
+        now = time.monotonic()
+        with self._lock:
+            for key in dict.fromkeys(str(key) for key in keys):
+                record = self._lookup(key, now)
+                if record is not None:
+                    found[key] = record
+                    self._stats["hits"] += 1
+                elif key in self._loading:
+                    waiting[key] = self._loading[key]
+                    self._stats["coalesced"] += 1
+                else:
+                    missing.append(key)
+        
+        if missing:
+            found.update(await self._load(db, missing, load or self.load))
+        for key, future in waiting.items():
+            try:
+                record = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # The request loading it went away before the load finished; load it here instead
+                record = (await self._load(db, [key], load or self.load)).get(key)
+            if record is not None:
+                found[key] = record
+        return found
+    
+    async def _load(self, db: AsyncSession, keys: List[str], load: Loader) -> Dict[str, BaseModel]:
+        """Load records from the shared tier or the database, letting other requests wait on the loads."""
+        loop = asyncio.get_running_loop()
+        futures = {}
+        with self._lock:
+            for key in keys:
+                future = futures[key] = self._loading[key] = loop.create_future()
+                # Waiters see a failed load's error; this keeps it from being reported as unretrieved
+                future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        
+        read_at = time.time()
+        try:
+            records = await self._get_shared(keys)
+            unshared = [key for key in keys if key not in records]
+            with self._lock:
+                self._stats["shared_hits"] += len(records)
+                self._stats["misses"] += len(unshared)
+            loaded = await load(db, unshared) if unshared else {}
+            records.update(loaded)
+        except BaseException as e:
+            with self._lock:
+                for key, future in futures.items():
+                    if self._loading.get(key) is future:
+                        del self._loading[key]
+            for future in futures.values():
+                if isinstance(e, asyncio.CancelledError):
+                    future.cancel()
+                else:
+                    future.set_exception(e)
+            raise
+        
+        now = time.monotonic()
+        owned = {}
+        with self._lock:
+            for key, future in futures.items():
+                # A write since the load started disowned it, so what it read may be out of date
+                if self._loading.get(key) is future:
+                    del self._loading[key]
+                    if key in records:
+                        self._store(key, records[key], now)
+                        if key in loaded:
+                            owned[key] = loaded[key]
+        for key, future in futures.items():
+            future.set_result(records.get(key))
+        if owned and self.shared is not None:
+            self.shared.submit(self.shared.put_many, self.name, self._encode_all(owned), read_at, self.shared_ttl)
+        return records
+    
+    async def _get_shared(self, keys: List[str]) -> Dict[str, BaseModel]:
+        """Get records from the shared tier, if there is one."""
+        if self.shared is None:
+            return {}
+        values = await self.shared.run(self.shared.get_many, self.name, keys)
+        return {key: self.schema.parse_obj(orjson.loads(value)) for key, value in values.items()}
+    
+    def _encode_all(self, records: Dict[str, BaseModel]) -> Dict[str, bytes]:
+        """Encode records for the shared tier."""
+        return {key: orjson.dumps(record.dict()) for key, record in records.items()}
+    
+    def checkpoint(self) -> tuple:
+        """Get a checkpoint to ``fill`` the cache from, taken before reading the records from the database."""
+        with self._lock:
+            return self._writes, time.time()
+    
+    def fill(self, records: Dict[str, BaseModel], checkpoint: tuple) -> None:
+        """Cache records read from the database after ``checkpoint``, unless the cache was written since.
+        
+        Keys already being loaded are left to their loads.
+        """
+        writes, read_at = checkpoint
+        now = time.monotonic()
+        with self._lock:
+            if writes != self._writes:
+                return
+            records = {key: record for key, record in records.items() if key not in self._loading}
+            for key, record in records.items():
+                self._store(key, record, now)
+        if records and self.shared is not None:
+            self.shared.submit(self.shared.put_many, self.name, self._encode_all(records), read_at, self.shared_ttl)
+    
+    def put(self, record: BaseModel) -> None:
+        """Write through a record a transaction has just committed, replacing any cached copy."""
+        key = str(record.id)
+        with self._lock:
+            self._writes += 1
+            self._loading.pop(key, None)
+            self._store(key, record, time.monotonic())
+        if self.shared is not None:
+            values = self._encode_all({key: record})
+            self.shared.submit(self.shared.put_many, self.name, values, time.time(), self.shared_ttl)
+    
+    def invalidate(self, *keys: Any) -> None:
+        """Drop records a transaction has just changed or deleted."""
+        keys = [str(key) for key in keys]
+        if not keys:
+            return
+        with self._lock:
+            self._writes += 1
+            for key in keys:
+                self._loading.pop(key, None)
+                self._entries.pop(key, None)
+            self._stats["invalidations"] += len(keys)
+        if self.shared is not None:
+            self.shared.submit(self.shared.invalidate, self.name, keys, self.shared_ttl)
+    
+    def invalidate_on_commit(self, db: Any, keys: Iterable[Any]) -> None:
+        """Drop records when the transaction ``db`` is in commits; nothing is dropped if it rolls back."""
+        session = db.sync_session if isinstance(db, AsyncSession) else db
+        session.info.setdefault(_PENDING_INVALIDATIONS, []).append((self, list(keys)))
+    
+    def clear(self) -> None:
+        """Drop every record cached in this process."""
+        with self._lock:
+            self._entries.clear()
+            self._loading.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get the cache's counters and hit rates since the process started.
+        
+        ``hit_rate`` counts reads served without a database query, including those that waited on
+        another request's load; ``local_hit_rate`` counts only reads served from this process's LRU.
+        """
+        with self._lock:
+            stats = dict(self._stats, size=len(self._entries), max_entries=self.max_entries)
+        reads = stats["hits"] + stats["shared_hits"] + stats["coalesced"] + stats["misses"]
+        stats["hit_rate"] = (reads - stats["misses"]) / reads if reads else 0.0
+        stats["local_hit_rate"] = stats["hits"] / reads if reads else 0.0
+        return stats
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending_invalidations(session: Session) -> None:
+    """Drop the records a transaction changed once it has committed."""
+    for cache, keys in session.info.pop(_PENDING_INVALIDATIONS, ()):
+        cache.invalidate(*keys)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_invalidations(session: Session) -> None:
+    """Forget the invalidations of a transaction that rolled back."""
+    session.info.pop(_PENDING_INVALIDATIONS, None)
+
+async def load_agents(db: AsyncSession, keys: List[str]) -> Dict[str, AgentSnapshot]:
+    """Load agents for the agent cache."""
+    result = await db.execute(
+        select(*columns(Agent, AgentSnapshot.__fields__)).filter(Agent.id.in_([UUID(key) for key in keys]))
+    )
+    return {str(row.id): AgentSnapshot.parse_obj(row._mapping) for row in result}
+
+async def load_teams(db: AsyncSession, keys: List[str]) -> Dict[str, TeamSnapshot]:
+    """Load teams, with their memberships in team order, for the team cache."""
+    result = await db.execute(
+        select(
+            *columns(Team, TEAM_SNAPSHOT_COLUMNS), TeamMembership.agent_id, TeamMembership.position, TeamMembership.role
+        )
+        .outerjoin(TeamMembership, TeamMembership.team_id == Team.id)
+        .filter(Team.id.in_([UUID(key) for key in keys]))
+        .order_by(Team.id, TeamMembership.position)
+    )
+    teams = {}
+    for row in result:
+        team = teams.setdefault(str(row.id), {**project(row, TeamSnapshot, TEAM_SNAPSHOT_COLUMNS), "memberships": []})
+        if row.agent_id is not None:
+            team["memberships"].append(TeamMemberSlot(agent_id=row.agent_id, position=row.position, role=row.role))
+    return {key: team_snapshot(team) for key, team in teams.items()}
+
+def team_snapshot(team: Dict[str, Any]) -> TeamSnapshot:
+    """Build a team's cached record from its columns and its memberships in team order."""
+    return TeamSnapshot.parse_obj({**team, "members": [slot.agent_id for slot in team["memberships"]]})
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Get the stats of every entity cache."""
+    return {cache.name: cache.stats() for cache in (agent_cache, team_cache)}
+
+# Global entity caches; the shared tier, if one is configured, is opened when the application starts
+# so importing this module touches no files
+agent_cache = EntityCache("agents", AgentSnapshot, load_agents)
+team_cache = EntityCache("teams", TeamSnapshot, load_teams)
+_shared_entity_store: Optional[SharedEntityStore] = None
+_shared_entity_store_lock = threading.Lock()
+
+def open_shared_entity_store() -> Optional[SharedEntityStore]:
+    """Open the configured shared tier and give it to the global caches, returning it.
+    
+    Returns None if no shared tier is configured.
+    """
+    global _shared_entity_store
+    if settings.entity_cache_shared_path and _shared_entity_store is None:
+        with _shared_entity_store_lock:
+            if _shared_entity_store is None:
+                _shared_entity_store = SharedEntityStore(settings.entity_cache_shared_path)
+                agent_cache.shared = team_cache.shared = _shared_entity_store
+    return _shared_entity_store
+
+def close_shared_entity_store() -> None:
+    """Take the shared tier from the global caches and close it, finishing its queued writes."""
+    global _shared_entity_store
+    with _shared_entity_store_lock:
+        if _shared_entity_store is not None:
+            agent_cache.shared = team_cache.shared = None
+            _shared_entity_store.close()
+            _shared_entity_store = None
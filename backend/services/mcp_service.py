@@ -52,7 +52,7 @@ class MCPService:
         try:
             if not HAS_MCP:
                 return False
-                
+            
             self.connections[connection.name] = connection
             logger.info(f"Added MCP connection: {connection.name}")
             return True
@@ -79,7 +79,7 @@ class MCPService:
         try:
             if not HAS_MCP:
                 return False
-                
+            
             if connection_name not in self.connections:
                 logger.error(f"MCP connection {connection_name} not found")
                 return False
@@ -110,7 +110,7 @@ class MCPService:
             
             logger.info(f"Connected to MCP server: {connection_name}")
             return True
-            
+        
         except Exception as e:
             logger.error(f"Error connecting to MCP server {connection_name}: {str(e)}")
             return False
@@ -120,19 +120,20 @@ class MCPService:
         try:
             if not HAS_MCP or connection_name not in self.clients:
                 return
-                
+            
             client = self.clients[connection_name]
             
             # This would typically call the server's tool discovery API
             # For now, we'll simulate this with a placeholder
             logger.info(f"Fetching tools from MCP server: {connection_name}")
-            
+        
         except Exception as e:
             logger.error(f"Error fetching tools from MCP server {connection_name}: {str(e)}")
     
     async def execute_tool(self, tool_name: str, arguments: Dict[str, Any], 
-                          connection_name: str = None) -> Dict[str, Any]:
-        """Execute a tool with given arguments."""
+                          connection_name: str = None, timeout: Optional[float] = None,
+                          cancel_event: Optional[asyncio.Event] = None) -> Dict[str, Any]:
+        """Execute a tool with given arguments, giving up after ``timeout`` seconds or once ``cancel_event`` is set."""
         try:
             if not HAS_MCP:
                 return {"error": "MCP libraries not available"}
@@ -154,22 +155,44 @@ class MCPService:
             
             client = self.clients[connection_name]
             
-            # Execute the tool call
-            # This is a simplified version - actual implementation would depend on MCP protocol
-            result = {
-                "tool_name": tool_name,
-                "arguments": arguments,
-                "result": f"Executed {tool_name} with args: {arguments}",
-                "connection": connection_name
-            }
+            # Execute the tool call; cancellation of the caller, or through the event, propagates into the call
+            call = asyncio.ensure_future(self._call_tool(client, tool_name, arguments, connection_name))
+            waiters = [call]
+            if cancel_event is not None:
+                waiters.append(asyncio.ensure_future(cancel_event.wait()))
+            try:
+                done, _ = await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                for waiter in waiters:
+                    waiter.cancel()
+            if call not in done:
+                if cancel_event is not None and cancel_event.is_set():
+                    logger.info(f"Tool {tool_name} cancelled")
+                    return {"error": f"Tool {tool_name} cancelled", "status": "cancelled"}
+                raise asyncio.TimeoutError()
+            result = call.result()
             
             logger.info(f"Executed tool {tool_name} via connection {connection_name}")
             return result
-            
+        
+        except asyncio.TimeoutError:
+            logger.warning(f"Tool {tool_name} timed out after {timeout}s")
+            return {"error": f"Tool {tool_name} timed out", "status": "timeout"}
         except Exception as e:
             logger.error(f"Error executing tool {tool_name}: {str(e)}")
             return {"error": str(e)}
     
+    async def _call_tool(self, client: Any, tool_name: str, arguments: Dict[str, Any],
+                         connection_name: str) -> Dict[str, Any]:
+        """Send a tool call to an MCP server."""
+        # This is a simplified version - actual implementation would depend on MCP protocol
+        return {
+            "tool_name": tool_name,
+            "arguments": arguments,
+            "result": f"Executed {tool_name} with args: {arguments}",
+            "connection": connection_name
+        }
+    
     async def list_available_tools(self) -> List[Dict[str, Any]]:
         """List all available tools."""
         try:
@@ -3,9 +3,11 @@
 Multi-agent execution logic, local vs cloud model loader, and prompt fetching.
 """
 
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
+from uuid import UUID
 import asyncio
 from datetime import datetime
+import functools
 import os
 
 # Import LLM libraries
@@ -36,14 +38,18 @@ except ImportError:
 
 from ..utils.logging import logger
 from ..models import get_db, Agent
+from ..services.entity_cache import agent_cache
+from ..services.usage_meter import usage_meter
+from ..services.prompt_store import PromptStoreService, get_prompt_store
 from sqlalchemy.orm import Session
 
 class OrchestratorService:
     """Service for orchestrating multi-agent workflows."""
     
-    def __init__(self, db_session: Session = None):
+    def __init__(self, db_session: Session = None, prompt_store: PromptStoreService = None):
         """Initialize the orchestrator with LLM configurations and optional database session."""
         self.db_session = db_session
+        self._prompt_store = prompt_store
         self.ollama_client = None
         self.openai_client = None
         self.anthropic_client = None
@@ -51,182 +57,329 @@ class OrchestratorService:
         # Initialize clients based on available libraries and environment variables
         if HAS_OLLAMA:
             ollama_host = os.getenv("OLLAMA_HOST", "http://localhost:11434")
-            self.ollama_client = ollama.Client(host=ollama_host)
-            
+            # Async, so a call cut short by its timeout is cancelled instead of holding a worker thread
+            self.ollama_client = ollama.AsyncClient(host=ollama_host)
+        
         if HAS_OPENAI:
             openai_api_key = os.getenv("OPENAI_API_KEY")
             if openai_api_key:
                 self.openai_client = OpenAI(api_key=openai_api_key)
-                
+        
         if HAS_ANTHROPIC:
             anthropic_api_key = os.getenv("ANTHROPIC_API_KEY")
             if anthropic_api_key:
                 self.anthropic_client = anthropic.Anthropic(api_key=anthropic_api_key)
     
-    async def execute_agent_workflow(self, agents: List[Dict], prompt: str) -> Dict[str, Any]:
-        """Execute a workflow with multiple agents."""
-        try:
-            results = {}
+    @property
+    def prompt_store(self) -> PromptStoreService:
+        """The prompt store passed in, or the global one, which is only opened once prompts are needed."""
+        return self._prompt_store or get_prompt_store()
+    
+    async def execute_agent_workflow(self, agents: List[Dict], prompt: str, user_id: Optional[UUID] = None,
+                                     orchestration_rules: Optional[Dict[str, Any]] = None,
+                                     cancel_event: Optional[asyncio.Event] = None) -> Dict[str, Any]:
+        """Execute a workflow with multiple agents.
+        
+        ``orchestration_rules["timeout_seconds"]`` bounds the whole workflow and each agent's
+        ``config["timeout_seconds"]`` bounds that agent. Setting ``cancel_event`` (for example when
+        the client disconnects) cancels every running agent. Agents that did not finish are reported
+        with a "timeout", "cancelled" or "skipped" status alongside the results that did complete.
+        """
+        rules = orchestration_rules or {}
+        loop = asyncio.get_event_loop()
+        workflow_timeout = rules.get("timeout_seconds")
+        deadline = loop.time() + workflow_timeout if workflow_timeout else None
+        cancel_event = cancel_event or asyncio.Event()
+        
+        results = {}
+        tasks = {}
+        workflow_status = "success"
+        cancel_waiter = asyncio.ensure_future(cancel_event.wait())
+        
+        def start(agent: Dict) -> asyncio.Task:
+            agent_id = agent.get("id")
+            agent_config = agent.get("config", {})
             
+            # Get the appropriate LLM based on configuration
+            llm_type = agent_config.get("llm_type", "ollama")
+            model_name = agent_config.get("model_name", "llama3")
+            
+            # The agent gets its own budget, capped by whatever is left of the workflow's
+            timeout = agent_config.get("timeout_seconds")
+            if deadline is not None:
+                remaining = deadline - loop.time()
+                timeout = remaining if timeout is None else min(timeout, remaining)
+            
+            task = asyncio.ensure_future(self._execute_agent(
+                agent_id=agent_id,
+                prompt=prompt,
+                llm_type=llm_type,
+                model_name=model_name,
+                user_id=user_id,
+                timeout=timeout,
+                mcp_tools=agent.get("mcp_tools") or agent_config.get("mcp_tools", []),
+                cancel_event=cancel_event
+            ))
+            tasks[agent_id] = task
+            return task
+        
+        async def wait(pending: List[asyncio.Task]) -> None:
+            """Wait for tasks until they finish, the deadline passes or the workflow is cancelled."""
+            nonlocal workflow_status
+            while pending:
+                timeout = None if deadline is None else max(deadline - loop.time(), 0)
+                done, _ = await asyncio.wait(pending + [cancel_waiter], timeout=timeout,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                pending = [task for task in pending if not task.done()]
+                if cancel_waiter in done:
+                    workflow_status = "cancelled"
+                    return
+                if not done:
+                    workflow_status = "timeout"
+                    return
+        
+        try:
             # Execute each agent in sequence or parallel based on configuration
+            if rules.get("execution_mode") == "parallel":
+                await wait([start(agent) for agent in agents])
+            else:
+                for agent in agents:
+                    await wait([start(agent)])
+                    if workflow_status != "success":
+                        break
+            
             for agent in agents:
                 agent_id = agent.get("id")
-                agent_config = agent.get("config", {})
-                
-                # Get the appropriate LLM based on configuration
-                llm_type = agent_config.get("llm_type", "ollama")
-                model_name = agent_config.get("model_name", "llama3")
-                
-                # Execute the agent with the prompt
-                result = await self._execute_agent(
-                    agent_id=agent_id,
-                    prompt=prompt,
-                    llm_type=llm_type,
-                    model_name=model_name
-                )
-                
-                results[agent_id] = result
-                
+                task = tasks.get(agent_id)
+                if task is None:
+                    results[agent_id] = {"agent_id": agent_id, "status": "skipped"}
+                elif not task.done():
+                    task.cancel()
+                    results[agent_id] = {"agent_id": agent_id, "status": workflow_status}
+                elif task.cancelled():
+                    results[agent_id] = {"agent_id": agent_id, "status": "cancelled"}
+                elif isinstance(task.exception(), asyncio.TimeoutError):
+                    results[agent_id] = {"agent_id": agent_id, "status": "timeout"}
+                    if workflow_status == "success":
+                        workflow_status = "partial"
+                else:
+                    # Re-raises errors other than timeouts, as before
+                    results[agent_id] = task.result()
+            
+            if workflow_status != "success":
+                logger.warning(f"Agent workflow finished with status {workflow_status}")
+            
             return {
-                "status": "success",
+                "status": workflow_status,
                 "results": results,
-                "timestamp": asyncio.get_event_loop().time()
+                "timestamp": loop.time()
             }
-            
+        
         except Exception as e:
             logger.error(f"Error executing agent workflow: {str(e)}")
             raise
+        finally:
+            # Never leave child tasks running behind the workflow
+            cancel_waiter.cancel()
+            pending = [task for task in tasks.values() if not task.done()]
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
     
-    async def _execute_agent(self, agent_id: str, prompt: str, llm_type: str, model_name: str) -> Dict[str, Any]:
-        """Execute a single agent with the given prompt."""
-        # Update agent status and last_executed if database session is available
-        if self.db_session:
-            try:
-                agent = self.db_session.query(Agent).filter(Agent.id == agent_id).first()
-                if agent:
-                    agent.status = "executing"
+    def _set_agent_status(self, agent_id: str, status: str, executed: bool = False) -> None:
+        """Update an agent's status if a database session is available."""
+        if not self.db_session:
+            return
+        try:
+            agent = self.db_session.query(Agent).filter(Agent.id == agent_id).first()
+            if agent:
+                agent.status = status
+                if executed:
                     agent.last_executed = datetime.utcnow()
-                    self.db_session.commit()
-            except Exception as e:
-                logger.warning(f"Could not update agent status for {agent_id}: {str(e)}")
+                agent_cache.invalidate_on_commit(self.db_session, [agent.id])
+                self.db_session.commit()
+        except Exception as e:
+            logger.warning(f"Could not update agent status for {agent_id}: {str(e)}")
+    
+    async def _call_provider(self, timeout: Optional[float], func, **kwargs) -> Any:
+        """Make a provider call, bounded by the timeout.
+        
+        Async calls are cancelled when the timeout passes, which closes their HTTP request. Blocking
+        calls run in a worker thread and are handed the timeout too, so the SDK abandons the request
+        rather than leaving it running in the thread after the caller gives up.
+        """
+        if timeout is not None and timeout <= 0:
+            raise asyncio.TimeoutError()
+        if asyncio.iscoroutinefunction(func):
+            return await asyncio.wait_for(func(**kwargs), timeout=timeout)
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        loop = asyncio.get_event_loop()
+        call = loop.run_in_executor(None, functools.partial(func, **kwargs))
+        return await asyncio.wait_for(call, timeout=timeout)
+    
+    async def _execute_agent(self, agent_id: str, prompt: str, llm_type: str, model_name: str,
+                             user_id: Optional[UUID] = None, timeout: Optional[float] = None,
+                             mcp_tools: Optional[List[str]] = None,
+                             cancel_event: Optional[asyncio.Event] = None) -> Dict[str, Any]:
+        """Execute a single agent with the given prompt, giving up after ``timeout`` seconds.
+        
+        MCP agents call their ``mcp_tools`` in turn, handing each what is left of the timeout and the
+        workflow's ``cancel_event``.
+        """
+        # Update agent status and last_executed if database session is available
+        self._set_agent_status(agent_id, "executing", executed=True)
         
         try:
             response = None
             
             if llm_type == "ollama" and self.ollama_client:
                 # Use Ollama for local LLMs
-                response = self.ollama_client.generate(
+                response = await self._call_provider(
+                    timeout,
+                    self.ollama_client.generate,
                     model=model_name,
                     prompt=prompt,
                     stream=False
                 )
-                
+            
             elif llm_type == "openai" and self.openai_client:
                 # Use OpenAI cloud LLMs
-                response = self.openai_client.chat.completions.create(
+                response = await self._call_provider(
+                    timeout,
+                    self.openai_client.chat.completions.create,
                     model=model_name,
                     messages=[{"role": "user", "content": prompt}],
                     stream=False
                 )
-                
+            
             elif llm_type == "anthropic" and self.anthropic_client:
                 # Use Anthropic cloud LLMs
-                response = self.anthropic_client.messages.create(
+                response = await self._call_provider(
+                    timeout,
+                    self.anthropic_client.messages.create,
                     model=model_name,
                     max_tokens=1024,
                     messages=[{"role": "user", "content": prompt}]
                 )
-                
+            
             elif llm_type == "mcp" and HAS_MCP:
                 # Use MCP for tool execution
-                # This would integrate with the MCP service to execute tools
-                response = await self._execute_mcp_tool(prompt)
-                
+                response = await self._execute_mcp_tool(prompt, mcp_tools or [], timeout, cancel_event)
+            
             else:
                 # Fallback to a default approach or raise an error
                 raise ValueError(f"Unsupported LLM type: {llm_type}")
             
+            # Meter the call against the requesting user's quota
+            if user_id:
+                usage_meter.record_call(user_id, tokens=self._count_tokens(response))
+            
             result = {
                 "agent_id": agent_id,
                 "prompt": prompt,
                 "response": response,
+                "status": "success",
                 "timestamp": asyncio.get_event_loop().time()
             }
             
             # Update agent status to active if database session is available
-            if self.db_session:
-                try:
-                    agent = self.db_session.query(Agent).filter(Agent.id == agent_id).first()
-                    if agent:
-                        agent.status = "active"
-                        self.db_session.commit()
-                except Exception as e:
-                    logger.warning(f"Could not update agent status for {agent_id}: {str(e)}")
+            self._set_agent_status(agent_id, "active")
             
             return result
-            
+        
+        except asyncio.TimeoutError:
+            self._set_agent_status(agent_id, "active")
+            logger.warning(f"Agent {agent_id} timed out after {timeout}s")
+            raise
+        except asyncio.CancelledError:
+            self._set_agent_status(agent_id, "active")
+            logger.info(f"Agent {agent_id} execution cancelled")
+            raise
         except Exception as e:
             # Update agent status to error if database session is available
-            if self.db_session:
-                try:
-                    agent = self.db_session.query(Agent).filter(Agent.id == agent_id).first()
-                    if agent:
-                        agent.status = "error"
-                        self.db_session.commit()
-                except Exception as db_e:
-                    logger.warning(f"Could not update agent status for {agent_id}: {str(db_e)}")
-            
+            self._set_agent_status(agent_id, "error")
             logger.error(f"Error executing agent {agent_id}: {str(e)}")
             raise
     
-    async def _execute_mcp_tool(self, prompt: str) -> Dict[str, Any]:
-        """Execute MCP tools based on the prompt."""
+    def _count_tokens(self, response: Any) -> int:
+        """Extract the number of tokens consumed from a provider response."""
         try:
-            # This is a placeholder implementation
-            # In a real implementation, this would parse the prompt to determine which tools to call
-            # and then execute them via the MCP service
+            if isinstance(response, dict):
+                # Ollama reports prompt and completion token counts separately
+                return int(response.get("prompt_eval_count", 0) or 0) + int(response.get("eval_count", 0) or 0)
             
-            # For now, we'll just return a mock response
-            result = {
-                "status": "success",
-                "message": f"MCP tool execution completed for prompt: {prompt[:50]}...",
-                "tools_executed": [],
-                "timestamp": asyncio.get_event_loop().time()
-            }
+            usage = getattr(response, "usage", None)
+            if usage is None:
+                return 0
+            if getattr(usage, "total_tokens", None) is not None:
+                # OpenAI
+                return int(usage.total_tokens)
+            # Anthropic
+            return int(getattr(usage, "input_tokens", 0) or 0) + int(getattr(usage, "output_tokens", 0) or 0)
+        except (TypeError, ValueError):
+            return 0
+    
+    async def _execute_mcp_tool(self, prompt: str, tools: List[str], timeout: Optional[float] = None,
+                                cancel_event: Optional[asyncio.Event] = None) -> Dict[str, Any]:
+        """Call each of an agent's MCP tools with the prompt, within ``timeout`` seconds in all.
+        
+        Each call gets what is left of the timeout and ``cancel_event``, so the MCP service stops it
+        itself. Raises asyncio.TimeoutError or asyncio.CancelledError when a call is cut short, as
+        the other providers do; a tool that fails is reported in its result.
+        """
+        try:
+            if not tools:
+                raise ValueError("MCP agent has no tools to call")
+            loop = asyncio.get_event_loop()
+            deadline = loop.time() + timeout if timeout is not None else None
             
-            logger.info(f"Executed MCP tools for prompt: {prompt[:50]}...")
-            return result
+            tools_executed = []
+            for tool_name in tools:
+                remaining = deadline - loop.time() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    raise asyncio.TimeoutError()
+                result = await mcp_service.execute_tool(
+                    tool_name, {"prompt": prompt}, timeout=remaining, cancel_event=cancel_event
+                )
+                if result.get("status") == "timeout":
+                    raise asyncio.TimeoutError()
+                if result.get("status") == "cancelled":
+                    raise asyncio.CancelledError()
+                tools_executed.append({"tool_name": tool_name, "result": result})
             
+            failed = [executed["tool_name"] for executed in tools_executed if "error" in executed["result"]]
+            logger.info(f"Executed {len(tools_executed)} MCP tools ({len(failed)} failed) for prompt: {prompt[:50]}...")
+            return {
+                "status": "error" if failed else "success",
+                "tools_executed": tools_executed,
+                "timestamp": loop.time()
+            }
+        
         except Exception as e:
             logger.error(f"Error executing MCP tools: {str(e)}")
             raise
     
-    def load_prompt_by_version(self, prompt_id: str, version: str = None) -> Dict[str, Any]:
-        """Load a specific version of a prompt."""
-        # In a real implementation, this would fetch from the database
-        # For now, we'll return a mock response
-        return {
-            "id": prompt_id,
-            "version": version or "1.0",
-            "body": f"Prompt content for {prompt_id} (version {version or '1.0'})",
-            "tags": [],
-            "created_at": "2025-08-27T00:00:00Z"
-        }
+    def load_prompt_by_version(self, prompt_id: str, version: str = None,
+                               as_of: str = None) -> Optional[Dict[str, Any]]:
+        """Load a specific version of a prompt.
+        
+        ``version`` may be exact ("1.2") or a pattern ("1.x" for the highest 1.* version); ``as_of``
+        loads the version that was current at that time. With neither, the current prompt is loaded.
+        Returns None if the prompt or version does not exist.
+        """
+        if version is None and as_of is None:
+            return self.prompt_store.get_prompt(prompt_id)
+        return self.prompt_store.find_prompt_version(prompt_id, version=version, as_of=as_of)
     
     def fetch_prompts_by_tags(self, tags: List[str]) -> List[Dict[str, Any]]:
-        """Fetch prompts by tags."""
-        # In a real implementation, this would query the database
-        # For now, we'll return mock data
-        return [
-            {
-                "id": f"prompt_{i}",
-                "body": f"Prompt content with tag {tag}",
-                "version": "1.0",
-                "tags": tags,
-                "created_at": "2025-08-27T00:00:00Z"
-            }
-            for i, tag in enumerate(tags)
-        ]
+        """Fetch the prompts carrying any of ``tags``, oldest first."""
+        return self.prompt_store.search_prompts(tags=tags)
+    
+    def fetch_relevant_prompts(self, query: str, k: int = 5, budget_ms: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Fetch the ``k`` prompts closest in meaning to ``query``, best first, each with its ``score``."""
+        return self.prompt_store.semantic_search(query, k=k, budget_ms=budget_ms)["results"]
     
     async def monitor_performance(self) -> Dict[str, Any]:
         """Monitor agent performance metrics."""
@@ -0,0 +1,184 @@
+# AI Agentic Platform - Prompt Archive
+"""
+Streaming archive format for prompt backups.
+
+An archive is a header followed by length-prefixed frames, each holding one compressed JSON record:
+
+    MAGIC, archive version, codec
+    [length: u32][crc32: u32][payload]   repeated, the first record is the archive header
+    [index offset: u64] END_MAGIC
+
+The last frame is an index of record offsets by prompt ID, so a single prompt can be read with two
+seeks. Frames are compressed independently, which keeps both writing and reading one record at a
+time and lets a reader jump straight to any record.
+"""
+
+from typing import Any, BinaryIO, Dict, Iterator, Optional
+import json
+import struct
+import zlib
+
+try:
+    import zstandard
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
+
+MAGIC = b"OPRA"
+END_MAGIC = b"OPRZ"
+ARCHIVE_VERSION = 1
+
+CODECS = {"none": 0, "zlib": 1, "zstd": 2}
+
+FRAME_HEADER = struct.Struct(">II")
+TRAILER = struct.Struct(">Q4s")
+
+# Refuse frames larger than this rather than allocating whatever a corrupt length says
+MAX_FRAME_SIZE = 256 * 1024 * 1024
+
+class ArchiveError(ValueError):
+    """Raised when an archive is truncated, corrupt or not an archive at all."""
+
+def is_archive(path: str) -> bool:
+    """Check whether a file starts like a prompt archive."""
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+def _compressor(codec: str):
+    """Get the compress function for a codec."""
+    if codec == "zlib":
+        return zlib.compress
+    if codec == "zstd":
+        if not HAS_ZSTD:
+            raise ArchiveError("zstd compression requires the zstandard package")
+        return zstandard.ZstdCompressor().compress
+    if codec == "none":
+        return bytes
+    raise ArchiveError(f"Unknown compression codec: {codec}")
+
+def _decompressor(codec: str):
+    """Get the decompress function for a codec."""
+    if codec == "zlib":
+        return zlib.decompress
+    if codec == "zstd":
+        if not HAS_ZSTD:
+            raise ArchiveError("Archive is zstd-compressed but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress
+    return bytes
+
+class ArchiveWriter:
+    """Writes records to an archive one frame at a time."""
+    
+    def __init__(self, fileobj: BinaryIO, header: Dict[str, Any], compression: str = "zlib"):
+        """Start an archive on ``fileobj`` and write its header record."""
+        self._file = fileobj
+        self._compress = _compressor(compression)
+        self._offsets: Dict[str, int] = {}
+        self._file.write(MAGIC + bytes([ARCHIVE_VERSION, CODECS[compression]]))
+        self._position = len(MAGIC) + 2
+        self._write_frame(dict(header, type="header"))
+    
+    def _write_frame(self, record: Dict[str, Any]) -> int:
+        """Write one record and return the offset of its frame."""
+        payload = self._compress(json.dumps(record, separators=(",", ":")).encode("utf-8"))
+        offset = self._position
+        self._file.write(FRAME_HEADER.pack(len(payload), zlib.crc32(payload)))
+        self._file.write(payload)
+        self._position += FRAME_HEADER.size + len(payload)
+        return offset
+    
+    def write(self, prompt_id: str, record: Dict[str, Any]) -> None:
+        """Write the record for a prompt."""
+        self._offsets[prompt_id] = self._write_frame(dict(record, id=prompt_id))
+    
+    def close(self) -> int:
+        """Write the index and trailer, returning the number of records written."""
+        index_offset = self._write_frame({"type": "index", "offsets": self._offsets})
+        self._file.write(TRAILER.pack(index_offset, END_MAGIC))
+        return len(self._offsets)
+
+class ArchiveReader:
+    """Reads an archive sequentially, or single records through its index."""
+    
+    def __init__(self, fileobj: BinaryIO):
+        """Open an archive and read its header record."""
+        self._file = fileobj
+        prefix = self._file.read(len(MAGIC) + 2)
+        if len(prefix) < len(MAGIC) + 2 or prefix[:len(MAGIC)] != MAGIC:
+            raise ArchiveError("Not a prompt archive")
+        if prefix[len(MAGIC)] != ARCHIVE_VERSION:
+            raise ArchiveError(f"Unsupported archive version: {prefix[len(MAGIC)]}")
+        codecs = {value: name for name, value in CODECS.items()}
+        if prefix[len(MAGIC) + 1] not in codecs:
+            raise ArchiveError(f"Unknown compression codec: {prefix[len(MAGIC) + 1]}")
+        self._decompress = _decompressor(codecs[prefix[len(MAGIC) + 1]])
+        
+        self.header = self._read_frame()
+        if self.header.get("type") != "header":
+            raise ArchiveError("Archive does not start with a header record")
+    
+    def _read_frame(self) -> Dict[str, Any]:
+        """Read and validate the frame at the current position."""
+        frame_header = self._file.read(FRAME_HEADER.size)
+        if len(frame_header) < FRAME_HEADER.size:
+            raise ArchiveError("Archive is truncated")
+        length, checksum = FRAME_HEADER.unpack(frame_header)
+        if length > MAX_FRAME_SIZE:
+            raise ArchiveError(f"Frame of {length} bytes exceeds the maximum frame size")
+        payload = self._file.read(length)
+        if len(payload) < length:
+            raise ArchiveError("Archive is truncated")
+        if zlib.crc32(payload) != checksum:
+            raise ArchiveError("Frame checksum mismatch")
+        try:
+            record = json.loads(self._decompress(payload))
+        except Exception as e:
+            raise ArchiveError(f"Undecodable frame: {str(e)}")
+        if not isinstance(record, dict) or "type" not in record:
+            raise ArchiveError("Malformed record")
+        return record
+    
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """Yield each prompt record in order, validating frames as they are read.
+        
+        The archive is only known to be complete once iteration finishes: a missing index or a
+        record count that disagrees with it raises ``ArchiveError``.
+        """
+        count = 0
+        while True:
+            record = self._read_frame()
+            if record["type"] == "index":
+                break
+            if "id" not in record:
+                raise ArchiveError("Record has no prompt ID")
+            count += 1
+            yield record
+        
+        if count != len(record.get("offsets", {})):
+            raise ArchiveError(f"Archive index lists {len(record.get('offsets', {}))} records but {count} were read")
+        trailer = self._file.read(TRAILER.size)
+        if len(trailer) < TRAILER.size or TRAILER.unpack(trailer)[1] != END_MAGIC:
+            raise ArchiveError("Archive trailer is missing")
+    
+    def read_index(self) -> Dict[str, int]:
+        """Get the record offsets by prompt ID from the index at the end of the archive."""
+        self._file.seek(-TRAILER.size, 2)
+        index_offset, end_magic = TRAILER.unpack(self._file.read(TRAILER.size))
+        if end_magic != END_MAGIC:
+            raise ArchiveError("Archive trailer is missing")
+        self._file.seek(index_offset)
+        index = self._read_frame()
+        if index["type"] != "index":
+            raise ArchiveError("Archive trailer does not point at the index")
+        return index["offsets"]
+    
+    def read_record(self, prompt_id: str) -> Optional[Dict[str, Any]]:
+        """Read a single prompt's record, or None if the archive does not contain it."""
+        offset = self.read_index().get(prompt_id)
+        if offset is None:
+            return None
+        self._file.seek(offset)
+        record = self._read_frame()
+        if record.get("id") != prompt_id:
+            raise ArchiveError(f"Archive index points at the wrong record for {prompt_id}")
+        return record
@@ -0,0 +1,404 @@
+# AI Agentic Platform - Shared Prompt Cache
+"""
+Memory-mapped prompt cache shared by every worker process on a host.
+
+A generation is an immutable file holding all current prompts with their tags and version index:
+
+    header: MAGIC, format version, generation, prompt count, stale record count, section offsets
+    records: one fixed-size record per prompt, in creation order
+    id index: record numbers sorted by prompt ID, for binary search
+    tags / versions: fixed-size entries referenced by records
+    heap: UTF-8 strings; each distinct string (body, tag, version, timestamp) is stored once
+
+Strings are referenced as (offset, length) into the heap, so the file is used in place: workers map
+it read-only and only decode the fields they return, and the page cache holds one copy for all of
+them. A writer publishes a new generation by writing a temporary file and ``os.replace``-ing it over
+the old one; readers notice the new file on their next lookup and map it, while lookups already in
+progress finish on the generation they started with. Nothing is locked on either side.
+
+A generation can be built from the one before it and the prompts changed since: the tag, version and
+heap sections are copied as they are with the changed prompts' entries appended, unchanged records
+are copied byte for byte, and the changed ones are rewritten. What replaced records referenced is
+left behind, so the header counts them as stale until a full rebuild drops them.
+"""
+
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import mmap
+import os
+import struct
+import threading
+import time
+
+import numpy
+
+MAGIC = b"OPCG"
+CACHE_FORMAT = 2
+
+HEADER = struct.Struct("<4sHHQQQ5Q")  # magic, format, reserved, generation, count, stale, section offsets
+STRING_REF = "QI"  # heap offset, byte length
+RECORD = struct.Struct("<Q" + STRING_REF * 5 + "IIII")  # seq, id, body, version, created, updated, tags, versions
+TAG_ENTRY = struct.Struct("<" + STRING_REF)
+VERSION_ENTRY = struct.Struct("<I" + STRING_REF * 2)  # seq, version, timestamp
+ID_ENTRY = struct.Struct("<I")
+
+class CacheError(ValueError):
+    """Raised when a cache file is not a prompt cache or is truncated."""
+
+class _Heap:
+    """Accumulates the string heap of a generation being written."""
+    
+    def __init__(self, size: int = 0):
+        """Initialize a heap whose new strings start at ``size``, after those already written."""
+        self._chunks: List[bytes] = []
+        self._refs: Dict[str, Tuple[int, int]] = {}
+        self.size = size
+    
+    def ref(self, text: str) -> Tuple[int, int]:
+        """Get the heap reference for a string, storing it if it is new."""
+        ref = self._refs.get(text)
+        if ref is None:
+            data = text.encode("utf-8")
+            ref = self._refs[text] = (self.size, len(data))
+            self._chunks.append(data)
+            self.size += len(data)
+        return ref
+    
+    def chunks(self) -> List[bytes]:
+        """Get the heap contents in order."""
+        return self._chunks
+
+class _Entries:
+    """Packs records, with the tag, version and heap entries they reference, for a generation being written."""
+    
+    def __init__(self, tag_count: int = 0, version_count: int = 0, heap_size: int = 0):
+        """Initialize the entries, numbered after the tag and version entries and heap already written."""
+        self.heap = _Heap(heap_size)
+        self.tags: List[bytes] = []
+        self.versions: List[bytes] = []
+        self._tag_count = tag_count
+        self._version_count = version_count
+    
+    def record(self, prompt_data: Dict[str, Any], history: List[Tuple[int, str, str]]) -> bytes:
+        """Pack a prompt's record, adding its tags, version entries and strings."""
+        heap = self.heap
+        record = RECORD.pack(
+            prompt_data["seq"],
+            *heap.ref(prompt_data["id"]),
+            *heap.ref(prompt_data["body"]),
+            *heap.ref(prompt_data["version"]),
+            *heap.ref(prompt_data["created_at"]),
+            *heap.ref(prompt_data["updated_at"]),
+            self._tag_count + len(self.tags), len(prompt_data["tags"]),
+            self._version_count + len(self.versions), len(history)
+        )
+        self.tags.extend(TAG_ENTRY.pack(*heap.ref(tag)) for tag in prompt_data["tags"])
+        self.versions.extend(
+            VERSION_ENTRY.pack(seq, *heap.ref(version), *heap.ref(timestamp))
+            for seq, version, timestamp in history
+        )
+        return record
+
+def _write(path: str, generation: int, count: int, stale: int, sections: List[List[bytes]],
+           replace: Callable[[str, str], None]) -> None:
+    """Write a generation's header and its records, ID index, tag, version and heap sections, then publish it.
+    
+    The generation is written to a temporary file that ``replace`` moves over ``path``.
+    """
+    offsets = [HEADER.size]
+    for section in sections[:-1]:
+        offsets.append(offsets[-1] + sum(len(chunk) for chunk in section))
+    
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, CACHE_FORMAT, 0, generation, count, stale, *offsets))
+            for section in sections:
+                f.writelines(section)
+            f.flush()
+            os.fsync(f.fileno())
+        replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def write_generation(path: str, generation: int, prompts: Iterable[Dict[str, Any]],
+                     versions: Dict[str, List[Tuple[int, str, str]]],
+                     replace: Callable[[str, str], None] = os.replace) -> int:
+    """Atomically publish a cache generation at ``path`` and return the number of prompts in it.
+    
+    ``prompts`` are prompt dicts in creation order, each with a ``seq``; ``versions`` maps prompt IDs
+    to their ``(seq, version, timestamp)`` entries. ``replace`` moves the written file into place.
+    """
+    entries = _Entries()
+    records, ids = [], []
+    for prompt_data in prompts:
+        records.append(entries.record(prompt_data, versions.get(prompt_data["id"], [])))
+        ids.append(prompt_data["id"].encode("utf-8"))
+    
+    id_index = sorted(range(len(ids)), key=ids.__getitem__)
+    _write(path, generation, len(records), 0, [
+        records, [ID_ENTRY.pack(number) for number in id_index], entries.tags, entries.versions, entries.heap.chunks()
+    ], replace)
+    return len(records)
+
+def update_generation(path: str, base: "_Generation", generation: int, changed_ids: Iterable[str],
+                      prompts: Iterable[Dict[str, Any]], versions: Dict[str, List[Tuple[int, str, str]]],
+                      replace: Callable[[str, str], None] = os.replace) -> int:
+    """Publish a generation that is ``base`` with the prompts in ``changed_ids`` replaced, returning its prompt count.
+    
+    ``prompts`` are the changed prompts that still exist, as for ``write_generation``; the others
+    were deleted. Only the changed prompts are packed, so this costs a copy of ``base`` rather than
+    a rebuild.
+    """
+    view = base.view
+    removed = sorted({number for number in map(base.locate, changed_ids) if number is not None})
+    keep = numpy.ones(base.count, dtype=bool)
+    keep[removed] = False
+    survivors = numpy.flatnonzero(keep)
+    
+    # New and rewritten records go in creation order among the ones kept, which move up past them
+    prompts = sorted(prompts, key=lambda prompt_data: prompt_data["seq"])
+    insert_at = numpy.searchsorted(base.seqs()[survivors], numpy.array([p["seq"] for p in prompts], dtype=numpy.uint64))
+    kept = numpy.arange(len(survivors))
+    survivor_numbers = kept + numpy.searchsorted(insert_at, kept, "right")
+    new_numbers = insert_at + numpy.arange(len(prompts))
+    
+    entries = _Entries(base.tag_count, base.version_count, base.heap_size)
+    records = numpy.empty((len(survivors) + len(prompts), RECORD.size), dtype=numpy.uint8)
+    records[survivor_numbers] = numpy.frombuffer(
+        view, dtype=numpy.uint8, count=base.count * RECORD.size, offset=base.records_offset
+    ).reshape(base.count, RECORD.size)[survivors]
+    for number, prompt_data in zip(new_numbers, prompts):
+        record = entries.record(prompt_data, versions.get(prompt_data["id"], []))
+        records[number] = numpy.frombuffer(record, dtype=numpy.uint8)
+    
+    # The ID index keeps its order: kept entries are renumbered and the new ones inserted where they sort
+    numbers = numpy.full(base.count, -1, dtype=numpy.int64)
+    numbers[survivors] = survivor_numbers
+    id_index = numbers[numpy.frombuffer(view, dtype="<u4", count=base.count, offset=base.ids_offset)]
+    dropped_before = numpy.concatenate(([0], numpy.cumsum(id_index < 0)))
+    new_ids = sorted((prompt_data["id"].encode("utf-8"), number) for prompt_data, number in zip(prompts, new_numbers))
+    positions = [base.id_position(key) for key, _ in new_ids]
+    id_index = numpy.insert(
+        id_index[id_index >= 0],
+        [position - dropped_before[position] for position in positions],
+        [number for _, number in new_ids]
+    )
+    
+    _write(path, generation, len(records), base.stale + len(removed), [
+        [records.tobytes()],
+        [id_index.astype("<u4").tobytes()],
+        [view[base.tags_offset:base.versions_offset], *entries.tags],
+        [view[base.versions_offset:base.heap_offset], *entries.versions],
+        [view[base.heap_offset:], *entries.heap.chunks()]
+    ], replace)
+    return len(records)
+
+def published_generation(path: str) -> Optional[int]:
+    """Read the number of the generation published at ``path``, or None if there is no readable one."""
+    try:
+        with open(path, "rb") as f:
+            header = f.read(HEADER.size)
+    except FileNotFoundError:
+        return None
+    if len(header) < HEADER.size:
+        return None
+    magic, cache_format, _, generation = HEADER.unpack(header)[:4]
+    return generation if magic == MAGIC and cache_format == CACHE_FORMAT else None
+
+class _Generation:
+    """One mapped cache generation. Never changes once mapped."""
+    
+    def __init__(self, path: str):
+        """Map the generation currently published at ``path``."""
+        with open(path, "rb") as f:
+            self.stat = os.fstat(f.fileno())
+            if self.stat.st_size < HEADER.size:
+                raise CacheError("Cache file is truncated")
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self._map)
+        magic, cache_format = struct.unpack_from("<4sH", self.view)
+        if magic != MAGIC:
+            raise CacheError("Not a prompt cache")
+        if cache_format != CACHE_FORMAT:
+            raise CacheError(f"Unsupported cache format: {cache_format}")
+        (_, _, _, self.generation, self.count, self.stale, self.records_offset, self.ids_offset,
+         self.tags_offset, self.versions_offset, self.heap_offset) = HEADER.unpack_from(self.view)
+        if self.heap_offset > len(self.view):
+            raise CacheError("Cache file is truncated")
+        self.tag_count = (self.versions_offset - self.tags_offset) // TAG_ENTRY.size
+        self.version_count = (self.heap_offset - self.versions_offset) // VERSION_ENTRY.size
+        self.heap_size = len(self.view) - self.heap_offset
+    
+    def _bytes(self, offset: int, length: int) -> memoryview:
+        """Get a heap string's bytes without copying them."""
+        start = self.heap_offset + offset
+        return self.view[start:start + length]
+    
+    def _str(self, offset: int, length: int) -> str:
+        """Decode a heap string."""
+        return str(self._bytes(offset, length), "utf-8")
+    
+    def record(self, number: int) -> tuple:
+        """Unpack a record by its position."""
+        return RECORD.unpack_from(self.view, self.records_offset + number * RECORD.size)
+    
+    def seqs(self) -> numpy.ndarray:
+        """Get the seq of every record, by record number."""
+        return numpy.ndarray(
+            (self.count,), dtype=numpy.dtype({"names": ["seq"], "formats": ["<u8"], "itemsize": RECORD.size}),
+            buffer=self.view, offset=self.records_offset
+        )["seq"]
+    
+    def _number_at(self, position: int) -> int:
+        """Get the record number at a position of the ID index."""
+        return ID_ENTRY.unpack_from(self.view, self.ids_offset + position * ID_ENTRY.size)[0]
+    
+    def id_position(self, key: bytes) -> int:
+        """Binary search the ID index for the first position whose ID is not less than ``key``."""
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            record = self.record(self._number_at(middle))
+            if bytes(self._bytes(record[1], record[2])) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+    
+    def locate(self, prompt_id: str) -> Optional[int]:
+        """Get the record number of a prompt, or None if it is not in the generation."""
+        key = prompt_id.encode("utf-8")
+        position = self.id_position(key)
+        if position == self.count:
+            return None
+        number = self._number_at(position)
+        record = self.record(number)
+        return number if self._bytes(record[1], record[2]) == key else None
+    
+    def find(self, prompt_id: str) -> Optional[tuple]:
+        """Get a prompt's record, or None if it is not in the generation."""
+        number = self.locate(prompt_id)
+        return self.record(number) if number is not None else None
+    
+    def body(self, record: tuple) -> memoryview:
+        """Get a record's body as UTF-8 bytes mapped from the file."""
+        return self._bytes(record[3], record[4])
+    
+    def prompt(self, record: tuple) -> Dict[str, Any]:
+        """Decode a record into the prompt dict returned by the prompt store."""
+        (_, id_offset, id_length, body_offset, body_length, version_offset, version_length,
+         created_offset, created_length, updated_offset, updated_length, tags_start, tags_count, _, _) = record
+        return {
+            "id": self._str(id_offset, id_length),
+            "body": self._str(body_offset, body_length),
+            "version": self._str(version_offset, version_length),
+            "tags": [
+                self._str(*TAG_ENTRY.unpack_from(self.view, self.tags_offset + (tags_start + i) * TAG_ENTRY.size))
+                for i in range(tags_count)
+            ],
+            "created_at": self._str(created_offset, created_length),
+            "updated_at": self._str(updated_offset, updated_length)
+        }
+    
+    def versions(self, record: tuple) -> List[Tuple[int, str, str]]:
+        """Decode a record's version index entries."""
+        start, count = record[-2:]
+        entries = []
+        for i in range(count):
+            seq, version_offset, version_length, timestamp_offset, timestamp_length = VERSION_ENTRY.unpack_from(
+                self.view, self.versions_offset + (start + i) * VERSION_ENTRY.size
+            )
+            entries.append((seq, self._str(version_offset, version_length), self._str(timestamp_offset, timestamp_length)))
+        return entries
+
+class SharedPromptCache:
+    """Lock-free reader for the prompt cache published at a path."""
+    
+    def __init__(self, path: str, check_interval: float = 0.0):
+        """Open the cache at ``path``.
+        
+        ``check_interval`` is how many seconds a reader may go without checking whether a new
+        generation has been published; 0 checks on every lookup, which costs one ``stat`` call.
+        """
+        self.path = path
+        self.check_interval = check_interval
+        self._generation: Optional[_Generation] = None
+        self._checked_at = 0.0
+    
+    def _current(self) -> Optional[_Generation]:
+        """Get the latest published generation, mapping it if it is new."""
+        generation = self._generation
+        now = time.monotonic()
+        if generation is not None and now - self._checked_at < self.check_interval:
+            return generation
+        self._checked_at = now
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return generation
+        if generation is None or (stat.st_ino, stat.st_mtime_ns) != (generation.stat.st_ino, generation.stat.st_mtime_ns):
+            # Threads racing here may each map the file; whichever mapping is stored last wins and
+            # the others are released once their lookups finish
+            generation = self._generation = _Generation(self.path)
+        return generation
+    
+    def snapshot(self) -> Optional[_Generation]:
+        """Get the latest published generation, to build the next one from, or None if none has been published."""
+        return self._current()
+    
+    @property
+    def generation(self) -> Optional[int]:
+        """Get the number of the current generation, or None if none has been published."""
+        generation = self._current()
+        return generation.generation if generation is not None else None
+    
+    def __len__(self) -> int:
+        """Get the number of prompts in the current generation."""
+        generation = self._current()
+        return generation.count if generation is not None else 0
+    
+    def get_prompt(self, prompt_id: str) -> Optional[Dict[str, Any]]:
+        """Get a prompt by ID, or None if it is not in the current generation."""
+        generation = self._current()
+        record = generation.find(prompt_id) if generation is not None else None
+        return generation.prompt(record) if record is not None else None
+    
+    def get_record(self, prompt_id: str) -> Tuple[Optional[int], Optional[Tuple[int, Dict[str, Any]]]]:
+        """Look a prompt up, returning the generation searched and the prompt's ``(seq, prompt dict)``.
+        
+        Both come from the same generation, so callers can tell which writes the prompt reflects.
+        The prompt is None if it is not in the generation.
+        """
+        generation = self._current()
+        if generation is None:
+            return None, None
+        record = generation.find(prompt_id)
+        return generation.generation, (record[0], generation.prompt(record)) if record is not None else None
+    
+    def get_body(self, prompt_id: str) -> Optional[memoryview]:
+        """Get a prompt's body as UTF-8 bytes mapped straight from the cache file."""
+        generation = self._current()
+        record = generation.find(prompt_id) if generation is not None else None
+        return generation.body(record) if record is not None else None
+    
+    def get_versions(self, prompt_id: str) -> List[Tuple[int, str, str]]:
+        """Get a prompt's ``(seq, version, timestamp)`` version entries, oldest first."""
+        generation = self._current()
+        record = generation.find(prompt_id) if generation is not None else None
+        return generation.versions(record) if record is not None else []
+    
+    def iter_records(self) -> Tuple[Optional[int], Iterator[Tuple[int, Dict[str, Any]]]]:
+        """Get the current generation's number and an iterator over its ``(seq, prompt dict)`` pairs in creation order."""
+        generation = self._current()
+        if generation is None:
+            return None, iter(())
+        records = map(generation.record, range(generation.count))
+        return generation.generation, ((record[0], generation.prompt(record)) for record in records)
+    
+    def iter_prompts(self) -> Iterator[Dict[str, Any]]:
+        """Yield every prompt of the current generation in creation order."""
+        generation = self._current()
+        for number in range(generation.count if generation is not None else 0):
+            yield generation.prompt(generation.record(number))
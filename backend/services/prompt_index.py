@@ -0,0 +1,724 @@
+# AI Agentic Platform - Prompt Index
+"""
+In-memory indexes over the prompt library, maintained incrementally by the prompt store.
+"""
+
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from array import array
+import bisect
+import hashlib
+import heapq
+import math
+import re
+
+try:
+    import numpy
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+WORD_PATTERN = re.compile(r"\w+")
+
+# Prefix queries expand to at most this many indexed terms
+MAX_PREFIX_EXPANSIONS = 64
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase word tokens."""
+    return WORD_PATTERN.findall(text.lower())
+
+def trigrams(text: str) -> set:
+    """Get the distinct character trigrams of lowercased text."""
+    text = text.lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+# A bitmap stores its members in chunks of 2 ** CHUNK_BITS consecutive values
+CHUNK_BITS = 12
+_CHUNK_MASK = (1 << CHUNK_BITS) - 1
+
+def _popcount(chunk: int) -> int:
+    """Count the set bits of an int."""
+    try:
+        return chunk.bit_count()
+    except AttributeError:  # Python < 3.10
+        return bin(chunk).count("1")
+
+class Bitmap:
+    """Set of non-negative ints, kept as a bitmap per chunk of ``2 ** CHUNK_BITS`` values.
+    
+    Only chunks with members are stored, each as a Python int of at most ``2 ** CHUNK_BITS`` bits,
+    so memory and the cost of set operations follow the number of members and how they cluster
+    rather than the largest member: prompt seqs are never reused, and a library whose seqs have run
+    into the millions costs what its live prompts cost. AND, OR and AND NOT work chunk by chunk and
+    counts are a popcount per chunk, as with the bitmap containers of a roaring bitmap.
+    
+    Set operations return new bitmaps; ``add`` and ``discard`` change a bitmap in place.
+    """
+    
+    __slots__ = ("_chunks",)
+    __hash__ = None
+    
+    def __init__(self, members: Iterable[int] = ()):
+        """Build a bitmap holding ``members``."""
+        self._chunks: Dict[int, int] = {}  # Chunk number -> bits of its members, never 0
+        for member in members:
+            self.add(member)
+    
+    @classmethod
+    def _of(cls, chunks: Dict[int, int]) -> "Bitmap":
+        """Wrap chunks built by a set operation."""
+        bitmap = cls.__new__(cls)
+        bitmap._chunks = chunks
+        return bitmap
+    
+    def add(self, member: int) -> None:
+        """Add a member."""
+        key = member >> CHUNK_BITS
+        self._chunks[key] = self._chunks.get(key, 0) | (1 << (member & _CHUNK_MASK))
+    
+    def discard(self, member: int) -> None:
+        """Remove a member if it is present."""
+        key = member >> CHUNK_BITS
+        chunk = self._chunks.get(key)
+        if chunk is None:
+            return
+        chunk &= ~(1 << (member & _CHUNK_MASK))
+        if chunk:
+            self._chunks[key] = chunk
+        else:
+            del self._chunks[key]
+    
+    def copy(self) -> "Bitmap":
+        """Get a copy that later changes to this bitmap leave alone."""
+        return Bitmap._of(dict(self._chunks))
+    
+    def __contains__(self, member: int) -> bool:
+        return bool(self._chunks.get(member >> CHUNK_BITS, 0) >> (member & _CHUNK_MASK) & 1)
+    
+    def __len__(self) -> int:
+        return sum(_popcount(chunk) for chunk in self._chunks.values())
+    
+    def __bool__(self) -> bool:
+        return bool(self._chunks)
+    
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Bitmap):
+            return NotImplemented
+        return self._chunks == other._chunks
+    
+    def __and__(self, other: "Bitmap") -> "Bitmap":
+        small, large = sorted((self._chunks, other._chunks), key=len)
+        chunks = {}
+        for key, chunk in small.items():
+            both = chunk & large.get(key, 0)
+            if both:
+                chunks[key] = both
+        return Bitmap._of(chunks)
+    
+    def __or__(self, other: "Bitmap") -> "Bitmap":
+        chunks = dict(self._chunks)
+        for key, chunk in other._chunks.items():
+            chunks[key] = chunks.get(key, 0) | chunk
+        return Bitmap._of(chunks)
+    
+    def __sub__(self, other: "Bitmap") -> "Bitmap":
+        chunks = {}
+        for key, chunk in self._chunks.items():
+            rest = chunk & ~other._chunks.get(key, 0)
+            if rest:
+                chunks[key] = rest
+        return Bitmap._of(chunks)
+    
+    def __iter__(self) -> Iterator[int]:
+        return self.iter()
+    
+    def iter(self, offset: int = 0, limit: Optional[int] = None) -> Iterator[int]:
+        """Yield the members in ascending order, skipping the first ``offset``.
+        
+        Skipped chunks are counted rather than walked, so deep pages cost little more than the first.
+        """
+        if limit is not None and limit <= 0:
+            return
+        for key in sorted(self._chunks):
+            chunk = self._chunks[key]
+            if offset:
+                count = _popcount(chunk)
+                if offset >= count:
+                    offset -= count
+                    continue
+            base = key << CHUNK_BITS
+            while chunk:
+                lowest = chunk & -chunk
+                chunk ^= lowest
+                if offset:
+                    offset -= 1
+                    continue
+                yield base + lowest.bit_length() - 1
+                if limit is not None:
+                    limit -= 1
+                    if not limit:
+                        return
+
+class TagIndex:
+    """Inverted index from each tag to a ``Bitmap`` of the prompt ordinals carrying it.
+    
+    AND/OR/NOT queries are set operations on the bitmaps and result counts are a popcount, so
+    neither needs the matching prompts to be materialized. Queries return new bitmaps, so a reader
+    holding a result is never affected by a later write.
+    """
+    
+    def __init__(self):
+        """Initialize an empty index."""
+        self._bitmaps: Dict[str, Bitmap] = {}
+        self._tags: Dict[int, Tuple[str, ...]] = {}
+        self._all = Bitmap()
+    
+    def add(self, ordinal: int, tags: Iterable[str]) -> None:
+        """Index a prompt, replacing whatever was indexed for it before."""
+        unique = tuple(dict.fromkeys(tags))
+        # Keep the caller's tuple when it has no duplicates rather than holding a second copy
+        tags = tags if isinstance(tags, tuple) and len(tags) == len(unique) else unique
+        previous = self._tags.get(ordinal, ())
+        if ordinal in self._tags and previous == tags:
+            return
+        
+        for tag in previous:
+            if tag not in tags:
+                bitmap = self._bitmaps[tag]
+                bitmap.discard(ordinal)
+                if not bitmap:
+                    del self._bitmaps[tag]
+        for tag in tags:
+            if tag not in previous:
+                self._bitmaps.setdefault(tag, Bitmap()).add(ordinal)
+        
+        self._tags[ordinal] = tags
+        self._all.add(ordinal)
+    
+    def remove(self, ordinal: int) -> None:
+        """Remove a prompt from the index."""
+        if ordinal not in self._tags:
+            return
+        self.add(ordinal, ())
+        del self._tags[ordinal]
+        self._all.discard(ordinal)
+    
+    def clear(self) -> None:
+        """Remove every prompt from the index."""
+        self._bitmaps = {}
+        self._tags = {}
+        self._all = Bitmap()
+    
+    def query(self, any_tags: List[str] = None, all_tags: List[str] = None,
+              exclude_tags: List[str] = None) -> Bitmap:
+        """Get the bitmap of prompts matching a tag query.
+        
+        A prompt matches if it has at least one of ``any_tags``, every one of ``all_tags`` and none
+        of ``exclude_tags``. Omitted clauses do not restrict the result.
+        """
+        empty = Bitmap()
+        result = self._all
+        if any_tags:
+            matches = empty
+            for tag in any_tags:
+                matches = matches | self._bitmaps.get(tag, empty)
+            result = result & matches
+        for tag in all_tags or ():
+            result = result & self._bitmaps.get(tag, empty)
+        for tag in exclude_tags or ():
+            result = result - self._bitmaps.get(tag, empty)
+        return result.copy() if result is self._all else result
+    
+    def matches(self, ordinal: int, any_tags: List[str] = None, all_tags: List[str] = None,
+                exclude_tags: List[str] = None) -> bool:
+        """Check a single prompt against a tag query without touching the bitmaps."""
+        tags = self._tags.get(ordinal)
+        if tags is None:
+            return False
+        if any_tags and not any(tag in tags for tag in any_tags):
+            return False
+        if all_tags and not all(tag in tags for tag in all_tags):
+            return False
+        return not (exclude_tags and any(tag in tags for tag in exclude_tags))
+    
+    def count(self, any_tags: List[str] = None, all_tags: List[str] = None,
+              exclude_tags: List[str] = None) -> int:
+        """Count the prompts matching a tag query."""
+        return len(self.query(any_tags, all_tags, exclude_tags))
+    
+    def tag_counts(self) -> Dict[str, int]:
+        """Get the number of prompts carrying each tag."""
+        return {tag: len(bitmap) for tag, bitmap in self._bitmaps.items()}
+
+
+class FullTextIndex:
+    """Positional inverted index over prompt bodies and tags, ranked with BM25.
+    
+    Queries are whitespace-separated clauses that must all match: plain terms, ``prefix*`` terms and
+    ``"quoted phrases"``. An optional trigram index narrows substring searches to the prompts that
+    contain every trigram of the needle.
+    """
+    
+    def __init__(self, k1: float = 1.2, b: float = 0.75, substring_index: bool = False):
+        """Initialize an empty index."""
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[int, Tuple[int, ...]]] = {}
+        self._terms: List[str] = []  # Sorted vocabulary for prefix lookups
+        self._doc_terms: Dict[int, Tuple[str, ...]] = {}
+        self._doc_lengths: Dict[int, int] = {}
+        self._doc_keys: Dict[int, int] = {}
+        self._total_length = 0
+        self._trigrams: Optional[Dict[str, Bitmap]] = {} if substring_index else None
+        self._doc_trigrams: Dict[int, Tuple[str, ...]] = {}
+    
+    @property
+    def substring_index(self) -> bool:
+        """Whether substring searches can use the trigram index."""
+        return self._trigrams is not None
+    
+    def add(self, ordinal: int, body: str, tags: Iterable[str] = ()) -> None:
+        """Index a prompt, replacing whatever was indexed for it before."""
+        tags = tuple(tags)
+        key = hash((body, tags))
+        if self._doc_keys.get(ordinal) == key:
+            return
+        self.remove(ordinal)
+        
+        # Tags are indexed after the body, one position apart so phrases never span the two
+        tokens = tokenize(body)
+        for tag in tags:
+            tokens.append(None)
+            tokens.extend(tokenize(tag))
+        
+        positions: Dict[str, List[int]] = {}
+        for position, token in enumerate(tokens):
+            if token is not None:
+                positions.setdefault(token, []).append(position)
+        
+        for term, term_positions in positions.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                bisect.insort(self._terms, term)
+            postings[ordinal] = tuple(term_positions)
+        
+        length = sum(len(term_positions) for term_positions in positions.values())
+        self._doc_terms[ordinal] = tuple(positions)
+        self._doc_lengths[ordinal] = length
+        self._doc_keys[ordinal] = key
+        self._total_length += length
+        
+        if self._trigrams is not None:
+            grams = tuple(trigrams(body))
+            for gram in grams:
+                self._trigrams.setdefault(gram, Bitmap()).add(ordinal)
+            self._doc_trigrams[ordinal] = grams
+    
+    def remove(self, ordinal: int) -> None:
+        """Remove a prompt from the index."""
+        terms = self._doc_terms.pop(ordinal, None)
+        if terms is None:
+            return
+        
+        for term in terms:
+            postings = self._postings[term]
+            del postings[ordinal]
+            if not postings:
+                del self._postings[term]
+                del self._terms[bisect.bisect_left(self._terms, term)]
+        
+        self._total_length -= self._doc_lengths.pop(ordinal)
+        del self._doc_keys[ordinal]
+        
+        if self._trigrams is not None:
+            for gram in self._doc_trigrams.pop(ordinal, ()):
+                bitmap = self._trigrams[gram]
+                bitmap.discard(ordinal)
+                if not bitmap:
+                    del self._trigrams[gram]
+    
+    def clear(self) -> None:
+        """Remove every prompt from the index."""
+        self.__init__(self.k1, self.b, self.substring_index)
+    
+    def _expand_prefix(self, prefix: str) -> List[str]:
+        """Get the indexed terms starting with a prefix."""
+        start = bisect.bisect_left(self._terms, prefix)
+        expansions = []
+        for term in self._terms[start:start + MAX_PREFIX_EXPANSIONS]:
+            if not term.startswith(prefix):
+                break
+            expansions.append(term)
+        return expansions
+    
+    def _parse(self, query: str) -> List[Tuple[str, List[str]]]:
+        """Split a query into ("term" | "prefix" | "phrase", tokens) clauses."""
+        clauses = []
+        for phrase, word in re.findall(r'"([^"]*)"|(\S+)', query):
+            if phrase:
+                tokens = tokenize(phrase)
+                if len(tokens) > 1:
+                    clauses.append(("phrase", tokens))
+                elif tokens:
+                    clauses.append(("term", tokens))
+            elif word.endswith("*") and tokenize(word):
+                clauses.append(("prefix", tokenize(word)[-1:]))
+                clauses.extend(("term", [token]) for token in tokenize(word)[:-1])
+            else:
+                clauses.extend(("term", [token]) for token in tokenize(word))
+        return clauses
+    
+    def _has_phrase(self, ordinal: int, tokens: List[str]) -> bool:
+        """Check whether a prompt contains the tokens as consecutive words."""
+        following = [set(self._postings[token][ordinal]) for token in tokens[1:]]
+        for start in self._postings[tokens[0]][ordinal]:
+            if all(start + offset + 1 in positions for offset, positions in enumerate(following)):
+                return True
+        return False
+    
+    def search(self, query: str, offset: int = 0, limit: Optional[int] = 20,
+               accept: Optional[Callable[[int], bool]] = None) -> List[Tuple[int, float]]:
+        """Get ``(ordinal, score)`` pairs for the best-ranked matches of a query.
+        
+        ``accept`` can reject candidates (for example on tags) before they are scored.
+        """
+        clauses = self._parse(query)
+        if not clauses:
+            return []
+        
+        # Each clause is satisfied by a group of terms; a prompt has to satisfy every clause
+        groups = []
+        for kind, tokens in clauses:
+            terms = self._expand_prefix(tokens[0]) if kind == "prefix" else tokens
+            if not terms or any(term not in self._postings for term in terms):
+                return []
+            groups.append((kind, tokens, terms))
+        
+        # Start from the rarest clause and narrow down
+        groups.sort(key=lambda group: sum(len(self._postings[term]) for term in group[2]))
+        candidates = None
+        for kind, tokens, terms in groups:
+            if kind == "prefix":
+                matches = set()
+                for term in terms:
+                    matches.update(self._postings[term] if candidates is None
+                                   else candidates.intersection(self._postings[term]))
+                candidates = matches
+            else:
+                for term in sorted(terms, key=lambda term: len(self._postings[term])):
+                    if candidates is None:
+                        candidates = set(self._postings[term])
+                    else:
+                        candidates.intersection_update(self._postings[term])
+            if not candidates:
+                return []
+        for kind, tokens, terms in groups:
+            if kind == "phrase":
+                candidates = {ordinal for ordinal in candidates if self._has_phrase(ordinal, tokens)}
+        if accept is not None:
+            candidates = {ordinal for ordinal in candidates if accept(ordinal)}
+        if not candidates:
+            return []
+        
+        # BM25 over every term the query touched
+        count = len(self._doc_lengths)
+        average_length = self._total_length / count if count else 0
+        scores = dict.fromkeys(candidates, 0.0)
+        for term in {term for _, _, terms in groups for term in terms}:
+            postings = self._postings[term]
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            # Walk whichever side is smaller
+            if len(postings) < len(candidates):
+                matches = ((ordinal, positions) for ordinal, positions in postings.items() if ordinal in scores)
+            else:
+                matches = ((ordinal, postings[ordinal]) for ordinal in candidates if ordinal in postings)
+            for ordinal, positions in matches:
+                frequency = len(positions)
+                norm = 1 - self.b + self.b * self._doc_lengths[ordinal] / (average_length or 1)
+                scores[ordinal] += idf * frequency * (self.k1 + 1) / (frequency + self.k1 * norm)
+        
+        wanted = None if limit is None else offset + limit
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0])) if wanted is None else \
+            heapq.nsmallest(wanted, scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[offset:wanted]
+    
+    def substring_candidates(self, needle: str) -> Optional[Bitmap]:
+        """Get a bitmap of prompts that may contain ``needle``, or None if every prompt might.
+        
+        Candidates still have to be checked against the text; the trigram index only rules prompts out.
+        """
+        if self._trigrams is None:
+            return None
+        grams = trigrams(needle)
+        if not grams:
+            return None
+        postings = [self._trigrams.get(gram) for gram in grams]
+        if any(bitmap is None for bitmap in postings):
+            return Bitmap()
+        postings.sort(key=len)
+        result = postings[0].copy()
+        for bitmap in postings[1:]:
+            result = result & bitmap
+            if not result:
+                break
+        return result
+
+
+def shingles(text: str, size: int = 3) -> set:
+    """Get the distinct word ``size``-grams of text; shorter texts are one shingle of all their words."""
+    tokens = tokenize(text)
+    if len(tokens) <= size:
+        return {" ".join(tokens)} if tokens else set()
+    return {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+def minhash_similarity(first: bytes, second: bytes) -> float:
+    """Estimate the Jaccard similarity of two texts from their MinHash signatures."""
+    first, second = memoryview(first).cast("I"), memoryview(second).cast("I")
+    return sum(a == b for a, b in zip(first, second)) / len(first)
+
+class MinHashIndex:
+    """Locality-sensitive hashing index for finding near-duplicate prompts.
+    
+    Each prompt's word shingles are reduced to a MinHash signature of ``num_perm`` 32-bit minimums,
+    one per hash function; two signatures agree in a slot with probability equal to the Jaccard
+    similarity of the shingle sets. Signatures are cut into ``bands`` bands and prompts sharing any
+    whole band land in the same bucket, so a lookup only compares against bucket mates rather than
+    every prompt. With the defaults (16 bands of 4 rows) pairs at 0.8 similarity share a bucket with
+    probability above 0.999 and pairs at 0.3 about one time in eight.
+    """
+    
+    def __init__(self, num_perm: int = 64, bands: int = 16, shingle_size: int = 3):
+        """Initialize an empty index."""
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.shingle_size = shingle_size
+        self._band_size = 4 * num_perm // bands  # Bytes per band
+        self._signatures: Dict[int, bytes] = {}
+        # Band key -> ordinal, or set of ordinals once a bucket has more than one
+        self._buckets: List[Dict[bytes, object]] = [{} for _ in range(bands)]
+    
+    def __len__(self) -> int:
+        """Get the number of indexed prompts."""
+        return len(self._signatures)
+    
+    def signature(self, text: str) -> Optional[bytes]:
+        """Compute a text's MinHash signature, or None if it has no words."""
+        # One SHAKE digest per shingle yields all of its hash values at once
+        digests = [
+            hashlib.shake_128(shingle.encode("utf-8")).digest(4 * self.num_perm)
+            for shingle in shingles(text, self.shingle_size)
+        ]
+        if len(digests) <= 1:
+            return digests[0] if digests else None
+        if HAS_NUMPY:
+            hashes = numpy.frombuffer(b"".join(digests), dtype=numpy.uint32)
+            return hashes.reshape(len(digests), self.num_perm).min(axis=0).tobytes()
+        return array("I", map(min, *(array("I", digest) for digest in digests))).tobytes()
+    
+    def _band_keys(self, signature: bytes) -> Iterator[Tuple[Dict[bytes, object], bytes]]:
+        """Yield each band's bucket table with the signature's key in it."""
+        size = self._band_size
+        for band, buckets in enumerate(self._buckets):
+            yield buckets, signature[band * size:(band + 1) * size]
+    
+    def add(self, ordinal: int, body: str) -> None:
+        """Index a prompt, replacing whatever was indexed for it before."""
+        signature = self.signature(body)
+        if self._signatures.get(ordinal) == signature and signature is not None:
+            return
+        self.remove(ordinal)
+        if signature is None:
+            return
+        
+        self._signatures[ordinal] = signature
+        for buckets, key in self._band_keys(signature):
+            members = buckets.get(key)
+            if members is None:
+                buckets[key] = ordinal
+            elif isinstance(members, set):
+                members.add(ordinal)
+            else:
+                buckets[key] = {members, ordinal}
+    
+    def remove(self, ordinal: int) -> None:
+        """Remove a prompt from the index."""
+        signature = self._signatures.pop(ordinal, None)
+        if signature is None:
+            return
+        for buckets, key in self._band_keys(signature):
+            members = buckets[key]
+            if not isinstance(members, set):
+                del buckets[key]
+                continue
+            members.discard(ordinal)
+            if len(members) == 1:
+                buckets[key] = members.pop()
+    
+    def clear(self) -> None:
+        """Remove every prompt from the index."""
+        self.__init__(self.num_perm, self.bands, self.shingle_size)
+    
+    def get_signature(self, ordinal: int) -> Optional[bytes]:
+        """Get an indexed prompt's signature."""
+        return self._signatures.get(ordinal)
+    
+    def signatures(self) -> Dict[int, bytes]:
+        """Get a copy of every indexed signature, keyed by ordinal."""
+        return dict(self._signatures)
+    
+    def query(self, signature: bytes, threshold: float = 0.8,
+              limit: Optional[int] = None) -> List[Tuple[int, float]]:
+        """Find indexed prompts whose estimated similarity to a signature is at least ``threshold``.
+        
+        Returns ``(ordinal, similarity)`` pairs, most similar first.
+        """
+        candidates = set()
+        for buckets, key in self._band_keys(signature):
+            members = buckets.get(key)
+            if isinstance(members, set):
+                candidates |= members
+            elif members is not None:
+                candidates.add(members)
+        
+        matches = []
+        for ordinal in candidates:
+            similarity = minhash_similarity(signature, self._signatures[ordinal])
+            if similarity >= threshold:
+                matches.append((ordinal, similarity))
+        matches.sort(key=lambda match: (-match[1], match[0]))
+        return matches if limit is None else matches[:limit]
+
+def cluster_signatures(signatures: Dict[int, bytes], bands: int = 16,
+                       threshold: float = 0.8) -> List[List[int]]:
+    """Group ordinals into clusters of near-duplicates by their MinHash signatures.
+    
+    Prompts are bucketed by band as in ``MinHashIndex`` and two prompts are joined when they share
+    a bucket and their estimated similarity reaches ``threshold``; clusters are the connected
+    components, so a chain of small edits ends up in one cluster. Each prompt is compared only with
+    the clusters already present in its buckets, which keeps large groups of identical prompts
+    linear. Returns clusters of two or more ordinals, largest first.
+    """
+    parents = {ordinal: ordinal for ordinal in signatures}
+    
+    def find(ordinal: int) -> int:
+        root = ordinal
+        while parents[root] != root:
+            root = parents[root]
+        while parents[ordinal] != root:
+            parents[ordinal], ordinal = root, parents[ordinal]
+        return root
+    
+    size = len(next(iter(signatures.values()), b"")) // bands  # Bytes per band
+    for band in range(bands):
+        buckets: Dict[bytes, List[int]] = {}
+        for ordinal, signature in signatures.items():
+            buckets.setdefault(signature[band * size:(band + 1) * size], []).append(ordinal)
+        
+        for members in buckets.values():
+            if len(members) < 2:
+                continue
+            # Representatives of the clusters met in this bucket so far
+            representatives: List[int] = []
+            for ordinal in members:
+                root = find(ordinal)
+                for representative in representatives:
+                    other = find(representative)
+                    if other == root:
+                        break
+                    if minhash_similarity(signatures[ordinal], signatures[representative]) >= threshold:
+                        parents[other] = root
+                        break
+                else:
+                    representatives.append(ordinal)
+    
+    clusters: Dict[int, List[int]] = {}
+    for ordinal in signatures:
+        clusters.setdefault(find(ordinal), []).append(ordinal)
+    return sorted(
+        (sorted(members) for members in clusters.values() if len(members) > 1),
+        key=lambda members: (-len(members), members[0])
+    )
+
+
+VERSION_PART_PATTERN = re.compile(r"[.\-+]")
+
+# Sorts after every version part, bounding prefix ranges
+_PART_MAX = (2,)
+
+def version_key(version: str) -> tuple:
+    """Get a sort key under which "1.10" follows "1.9" and numeric parts precede textual ones."""
+    return tuple(
+        (0, int(part)) if part.isdigit() else (1, part)
+        for part in VERSION_PART_PATTERN.split(version)
+    )
+
+class VersionIndex:
+    """Index of one prompt's stored versions by version number and by time.
+    
+    Entries are ``(seq, version, timestamp)`` for each row of the prompt's history. Exact and
+    wildcard version lookups, as-of lookups and history pages all take O(log n).
+    """
+    
+    def __init__(self, entries: Iterable[Tuple[int, str, str]] = ()):
+        """Build the index from version entries."""
+        self._seqs: List[int] = []
+        self._by_version: List[Tuple[tuple, int]] = []
+        self._by_time: List[Tuple[str, int]] = []
+        for seq, version, timestamp in entries:
+            self.add(seq, version, timestamp)
+    
+    def __len__(self) -> int:
+        """Get the number of versions."""
+        return len(self._seqs)
+    
+    @property
+    def last_seq(self) -> Optional[int]:
+        """Get the seq of the most recently stored version, or None if there are none."""
+        return self._seqs[-1] if self._seqs else None
+    
+    def add(self, seq: int, version: str, timestamp: str) -> None:
+        """Index a newly stored version."""
+        if self._seqs and seq > self._seqs[-1]:
+            self._seqs.append(seq)
+        else:
+            bisect.insort(self._seqs, seq)
+        bisect.insort(self._by_version, (version_key(version), seq))
+        bisect.insort(self._by_time, (timestamp, seq))
+    
+    def find(self, version: str) -> Optional[int]:
+        """Get the seq of the first stored row of an exact version."""
+        key = version_key(version)
+        position = bisect.bisect_left(self._by_version, (key,))
+        if position < len(self._by_version) and self._by_version[position][0] == key:
+            return self._by_version[position][1]
+        return None
+    
+    def latest_matching(self, pattern: str) -> Optional[int]:
+        """Get the seq of the highest version matching a pattern such as "1.x" or "2.*".
+        
+        A pattern without a wildcard is an exact version. Among rows of the same version, the most
+        recently stored one wins.
+        """
+        parts = VERSION_PART_PATTERN.split(pattern)
+        if parts[-1] not in ("x", "X", "*"):
+            key = version_key(pattern)
+            upper = bisect.bisect_right(self._by_version, (key, float("inf")))
+            if upper and self._by_version[upper - 1][0] == key:
+                return self._by_version[upper - 1][1]
+            return None
+        
+        prefix = version_key(".".join(parts[:-1])) if len(parts) > 1 else ()
+        lower = bisect.bisect_left(self._by_version, (prefix,))
+        upper = bisect.bisect_left(self._by_version, (prefix + (_PART_MAX,),))
+        return self._by_version[upper - 1][1] if upper > lower else None
+    
+    def as_of(self, timestamp: str) -> Optional[int]:
+        """Get the seq of the latest version stored at or before an ISO timestamp."""
+        position = bisect.bisect_right(self._by_time, (timestamp, float("inf")))
+        return self._by_time[position - 1][1] if position else None
+    
+    def page(self, offset: int = 0, limit: Optional[int] = None) -> List[int]:
+        """Get the seqs of a page of history, oldest first."""
+        return self._seqs[offset:None if limit is None else offset + limit]
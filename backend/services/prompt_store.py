@@ -1,54 +1,1085 @@
 # AI Agentic Platform - Prompt Store Service
 """
 Interfaces to store, tag, version, rollback prompts with backup capabilities.
+
+Prompts are persisted in SQLite (WAL mode, so any number of worker processes can read while one
+writes) and served from an in-memory cache of compact ``PromptRecord``s. Every write appends to a change log; before reading,
+each process checks ``PRAGMA data_version`` and replays changes committed by other processes.
+
+Version history is stored as a full snapshot every ``SNAPSHOT_INTERVAL`` versions with word-level
+diffs in between, so any version is rebuilt from at most ``SNAPSHOT_INTERVAL - 1`` diffs. Audit
+entries live in their own append-only table, one per action.
+
+Bodies are content-addressed: each distinct body is stored once in ``prompt_blobs`` under its SHA-256
+and reference-counted by the prompts and version snapshots pointing at it, so copied templates,
+re-tags and rollbacks to a stored body add no text.
+
+Backups are streamed one prompt at a time into the archive format in ``prompt_archive``; the change
+log doubles as the checkpoint for incremental backups. Only a prompt's latest change is kept, and
+``prune_changes`` drops the tombstones of deleted prompts once no incremental backup needs them.
+
+Within a process, writes are serialized by one lock held for the whole transaction. Readers never
+wait for a transaction: ``get_prompt`` reads the cache without locking, since writers replace a
+prompt's dict rather than changing it in place; searches and counts share a read lock that writers
+hold only while swapping a prompt into the cache and indexes; and history reads go through a
+connection per thread that sees the last committed state. Cache changes made by a transaction are
+applied once it commits, so readers never see a write that could still roll back.
+
+With ``shared_cache_path`` set, the library is not loaded into each process. Committed writes are
+published as a new generation of the memory-mapped cache in ``prompt_cache`` at most once every
+``publish_interval`` seconds, and single prompts, their versions and exports are read from it. A generation is
+built from the one before and the prompts the change log says changed since, reading a snapshot on a
+connection of its own; the write lock is only taken to swap the new file in. Prompts
+changed since the generation was published are found by replaying the change log as usual and kept
+in a small overlay until a newer generation includes them. Searches need the in-memory indexes, so the
+first one loads the library after all.
+
+Near-duplicates are found by MinHash signatures over word shingles; with ``duplicate_index`` set the
+signatures are kept in an LSH index next to the others, so lookups compare only bucket mates. With
+an ``embedder``, bodies are also embedded into the vector index in ``prompt_vectors`` for semantic
+search. Vectors are stored next to the blobs, keyed by body hash and embedder, so a body is embedded
+once: writes embed new bodies before their transaction begins, and loading or catching up only embeds
+bodies nothing has stored a vector for, in batches.
 """
 
-from typing import Dict, List, Any, Optional
-from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Any, Optional, Union
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import difflib
+import hashlib
 import json
 import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+
+import numpy
 
-from ..models import Prompt
+from ..config import (
+    OLLAMA_HOST, PROMPT_CACHE_PATH, PROMPT_CACHE_PUBLISH_INTERVAL, PROMPT_DUPLICATE_INDEX, PROMPT_EMBEDDER,
+    PROMPT_STORE_PATH
+)
+from .prompt_archive import ArchiveError, ArchiveReader, ArchiveWriter, is_archive
+from .prompt_cache import CacheError, SharedPromptCache, published_generation, update_generation, write_generation
+from .prompt_index import (
+    FullTextIndex, MinHashIndex, TagIndex, VersionIndex, cluster_signatures, minhash_similarity
+)
+from .prompt_vectors import Embedder, VectorIndex, make_embedder
+from ..utils import bulk
+from ..utils.concurrency import ReadWriteLock
 from ..utils.logging import logger
 
+SCHEMA_VERSION = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS prompts (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT UNIQUE,
+    body_hash TEXT NOT NULL,
+    version TEXT NOT NULL,
+    tags TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS prompt_versions (
+    prompt_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    version TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    body_hash TEXT,
+    PRIMARY KEY (prompt_id, seq)
+);
+CREATE TABLE IF NOT EXISTS prompt_audit (
+    prompt_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    version_seq INTEGER,
+    entry TEXT NOT NULL,
+    PRIMARY KEY (prompt_id, seq)
+);
+CREATE TABLE IF NOT EXISTS prompt_changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    prompt_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS prompt_changes_prompt_id ON prompt_changes (prompt_id);
+CREATE TABLE IF NOT EXISTS prompt_embeddings (
+    body_hash TEXT NOT NULL,
+    embedder TEXT NOT NULL,
+    vector BLOB NOT NULL,
+    PRIMARY KEY (body_hash, embedder)
+);
+CREATE TABLE IF NOT EXISTS prompt_meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS prompt_blobs (
+    hash TEXT PRIMARY KEY,
+    body TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    refcount INTEGER NOT NULL
+);
+"""
+
+# Current prompt rows with their bodies
+PROMPT_SELECT = (
+    "SELECT prompts.*, prompt_blobs.body FROM prompts "
+    "JOIN prompt_blobs ON prompt_blobs.hash = prompts.body_hash"
+)
+
+# Version rows, with the body for snapshots
+VERSION_SELECT = (
+    "SELECT prompt_versions.*, prompt_blobs.body FROM prompt_versions "
+    "LEFT JOIN prompt_blobs ON prompt_blobs.hash = prompt_versions.body_hash"
+)
+
+PROMPT_ID_PATTERN = re.compile(r"^prompt_(\d+)$")
+
+# Store a full copy of the body every N versions; everything in between is a diff
+SNAPSHOT_INTERVAL = 32
+
+# Stored size of a reference to an existing blob; diffs larger than this refer to the blob instead
+BLOB_REF_SIZE = 64
+
+# Bodies passed to the embedder per call when embedding many at once
+EMBED_BATCH_SIZE = 64
+
+def body_hash(body: str) -> str:
+    """Get the content address of a prompt body."""
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+TOKEN_PATTERN = re.compile(r"\s+|\S+")
+
+def diff_body(old: str, new: str) -> List[list]:
+    """Encode ``new`` as word-level ``[start, end, replacement]`` edits against ``old``."""
+    old_tokens = TOKEN_PATTERN.findall(old)
+    new_tokens = TOKEN_PATTERN.findall(new)
+    matcher = difflib.SequenceMatcher(None, old_tokens, new_tokens)
+    return [
+        [i1, i2, "".join(new_tokens[j1:j2])]
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+        if tag != "equal"
+    ]
+
+def apply_body_diff(old: str, ops: List[list]) -> str:
+    """Rebuild a body from the body it was diffed against and the edits from ``diff_body``."""
+    tokens = TOKEN_PATTERN.findall(old)
+    parts = []
+    position = 0
+    for start, end, replacement in ops:
+        parts.append("".join(tokens[position:start]))
+        parts.append(replacement)
+        position = end
+    parts.append("".join(tokens[position:]))
+    return "".join(parts)
+
+EPOCH = datetime(1970, 1, 1)
+
+def encode_timestamp(timestamp: Union[str, int]) -> Union[str, int]:
+    """Convert an ISO timestamp to integer microseconds since the epoch.
+    
+    Timestamps that would not convert back to the same string (time zones, foreign formats) are
+    kept as they are.
+    """
+    try:
+        value = (datetime.fromisoformat(timestamp) - EPOCH) // timedelta(microseconds=1)
+    except (TypeError, ValueError):
+        return timestamp
+    return value if decode_timestamp(value) == timestamp else timestamp
+
+def decode_timestamp(value: Union[str, int]) -> str:
+    """Convert a timestamp from ``encode_timestamp`` back to its ISO string."""
+    if not isinstance(value, int):
+        return value
+    seconds, microseconds = divmod(value, 1000000)
+    return (EPOCH + timedelta(0, seconds, microseconds)).isoformat()
+
+class PromptRecord:
+    """Compact cached form of a prompt.
+    
+    Versions and tags are interned, timestamps are stored by ``encode_timestamp`` and bodies are
+    shared between records by the store. The audit log stays in ``prompt_audit``; only the latest
+    action is kept, which is all that writes need. Records are never changed once cached: updates
+    cache a new record in place of the old one.
+    """
+    
+    __slots__ = ("seq", "id", "body", "version", "tags", "created_at", "updated_at", "last_action")
+    
+    def __init__(self, seq: int, prompt_id: str, body: str, version: str, tags: Iterable[str],
+                 created_at: Union[str, int], updated_at: Union[str, int], last_action: Optional[str] = None):
+        """Build a record, compacting its fields."""
+        self.seq = seq
+        self.id = prompt_id
+        self.body = body
+        self.version = sys.intern(version)
+        self.tags = tuple(sys.intern(tag) for tag in tags)
+        self.created_at = encode_timestamp(created_at)
+        self.updated_at = encode_timestamp(updated_at)
+        self.last_action = sys.intern(last_action) if last_action is not None else None
+    
+    def __eq__(self, other: Any) -> bool:
+        """Compare records field by field."""
+        if not isinstance(other, PromptRecord):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+    
+    def replace(self, **changes: Any) -> "PromptRecord":
+        """Get a copy of the record with some fields changed."""
+        fields = {name: getattr(self, name) for name in self.__slots__}
+        fields.update(changes)
+        fields["prompt_id"] = fields.pop("id")
+        return PromptRecord(**fields)
+    
+    def to_dict(self, audit_log: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """Expand the record into the prompt dict returned by the service."""
+        prompt_data = {
+            "id": self.id,
+            "body": self.body,
+            "version": self.version,
+            "tags": list(self.tags),
+            "created_at": decode_timestamp(self.created_at),
+            "updated_at": decode_timestamp(self.updated_at)
+        }
+        if audit_log is not None:
+            prompt_data["audit_log"] = audit_log
+        return prompt_data
+
 class PromptStoreService:
     """Service for managing prompt storage and versioning."""
     
-    def __init__(self):
-        """Initialize the prompt store service."""
-        # In a real implementation, this would connect to a database or file system
-        self.prompts = {}  # In-memory storage for demonstration
-        self.version_history = {}  # Track version history
+    def __init__(self, db_path: str = ":memory:", substring_index: bool = False,
+                 shared_cache_path: Optional[str] = None, duplicate_index: bool = False,
+                 embedder: Optional[Embedder] = None, publish_interval: float = 1.0):
+        """Initialize the prompt store service, loading existing prompts from ``db_path``.
+        
+        ``substring_index`` keeps a trigram index so substring searches skip most prompts.
+        ``duplicate_index`` keeps a MinHash index so near-duplicate lookups skip most prompts.
+        ``embedder`` embeds prompt bodies into a vector index for ``semantic_search``.
+        ``shared_cache_path`` is where the shared prompt cache is published and read from instead of
+        loading the library; writes are published at most ``publish_interval`` seconds after they
+        commit, or right away with 0.
+        """
+        self.db_path = db_path
+        self.shared_cache_path = shared_cache_path
+        self.shared_cache = SharedPromptCache(shared_cache_path) if shared_cache_path else None
+        self.publish_interval = publish_interval
+        self._publish_timer = None  # Pending publish of the shared cache
+        self._lock = threading.RLock()  # Held by writers for the whole transaction
+        self._index_lock = ReadWriteLock()  # Guards the cache's indexes while they are being changed
+        self._local = threading.local()  # Per-thread reader connection and data version
+        self._reader_conns = []
+        self._version_indexes = {}  # Prompt ID -> VersionIndex, built on first use
+        self._pending_versions = {}  # Prompt ID -> versions written by the open transaction, None if rewritten
+        self._pending_cache = None  # Prompt ID -> record cached by the open transaction, None if dropped
+        self._pending_vectors = {}  # Body hash -> vector stored by the open transaction
+        self._conn = self._connect()
+        self.prompts = {}  # Prompt ID -> PromptRecord, kept in sync with the database once loaded
+        self._loaded = False
+        self._overlay = {}  # Prompt ID -> (change seq, record or None) changed since the shared generation
+        self._ids = {}  # Row seq -> prompt ID; a record's seq is its position in the indexes
+        self._bodies = {}  # Body -> the copy cached records share
+        self._body_refs = Counter()  # Body -> number of cached records using it
+        self.tag_index = TagIndex()
+        self.text_index = FullTextIndex(substring_index=substring_index)
+        self.duplicate_index = MinHashIndex() if duplicate_index else None
+        self.embedder = embedder
+        self.vector_index = VectorIndex() if embedder is not None else None
+        self._change_seq = 0
+        if self.shared_cache is None:
+            self._load()
+        else:
+            self._open_shared_cache()
     
-    def create_prompt(self, body: str, version: str = "1.0", tags: List[str] = None) -> Dict[str, Any]:
-        """Create a new prompt with versioning."""
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database connection and make sure the schema exists."""
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA busy_timeout = 5000")
+        if self.db_path != ":memory:":
+            # WAL lets readers in other processes proceed while a write is in progress;
+            # NORMAL sync keeps the database consistent across crashes without an fsync per commit
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+        self._migrate(conn)
+        conn.executescript(SCHEMA)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        return conn
+    
+    def _migrate(self, conn: sqlite3.Connection) -> None:
+        """Convert a database written by an older version of the store to the current layout."""
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+            return
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(prompt_versions)")}
+        if columns and "data" not in columns and "body_hash" not in columns:
+            self._migrate_blobs(conn)
+            return
+        if "data" not in columns:
+            return
+        
+        conn.execute("BEGIN IMMEDIATE")
         try:
-            prompt_id = f"prompt_{len(self.prompts) + 1}"
-            
-            prompt_data = {
-                "id": prompt_id,
-                "body": body,
-                "version": version,
-                "tags": tags or [],
-                "created_at": datetime.utcnow().isoformat(),
-                "updated_at": datetime.utcnow().isoformat(),
-                "audit_log": [
-                    {
-                        "action": "create",
-                        "timestamp": datetime.utcnow().isoformat(),
-                        "version": version
-                    }
-                ]
-            }
+            prompts = [dict(row) for row in conn.execute("SELECT * FROM prompts ORDER BY seq")]
+            history = {}
+            for row in conn.execute("SELECT prompt_id, data FROM prompt_versions ORDER BY prompt_id, seq"):
+                history.setdefault(row["prompt_id"], []).append(json.loads(row["data"]))
             
-            self.prompts[prompt_id] = prompt_data
+            conn.execute("DROP TABLE prompts")
+            conn.execute("DROP TABLE prompt_versions")
+            for statement in SCHEMA.split(";"):
+                if statement.strip():
+                    conn.execute(statement)
             
-            # Initialize version history for this prompt
-            self.version_history[prompt_id] = [prompt_data]
+            for prompt_data in prompts:
+                prompt_data["tags"] = json.loads(prompt_data["tags"])
+                prompt_data["audit_log"] = json.loads(prompt_data["audit_log"])
+                self._import_prompt(conn, prompt_data, history.get(prompt_data["id"], []))
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        logger.info(f"Migrated {len(prompts)} prompts to delta-encoded version history")
+    
+    def _migrate_blobs(self, conn: sqlite3.Connection) -> None:
+        """Move bodies stored inline in prompts and snapshots into the content-addressed blob table."""
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Dropping the table resets its AUTOINCREMENT counter, which must survive so IDs are never reused
+            sequence = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'prompts'").fetchone()
+            prompts = [dict(row) for row in conn.execute("SELECT * FROM prompts ORDER BY seq")]
+            snapshots = conn.execute(
+                "SELECT prompt_id, seq, payload FROM prompt_versions WHERE kind = 'snapshot'"
+            ).fetchall()
             
-            logger.info(f"Created new prompt: {prompt_id}")
-            return prompt_data
+            conn.execute("DROP TABLE prompts")
+            conn.execute("ALTER TABLE prompt_versions ADD COLUMN body_hash TEXT")
+            for statement in SCHEMA.split(";"):
+                if statement.strip():
+                    conn.execute(statement)
+            
+            for prompt_data in prompts:
+                conn.execute(
+                    "INSERT INTO prompts (seq, id, body_hash, version, tags, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        prompt_data["seq"],
+                        prompt_data["id"],
+                        self._blob_ref(conn, prompt_data["body"]),
+                        prompt_data["version"],
+                        prompt_data["tags"],
+                        prompt_data["created_at"],
+                        prompt_data["updated_at"]
+                    )
+                )
+            for row in snapshots:
+                payload = json.loads(row["payload"])
+                conn.execute(
+                    "UPDATE prompt_versions SET body_hash = ?, payload = ? WHERE prompt_id = ? AND seq = ?",
+                    (self._blob_ref(conn, payload.pop("body")), json.dumps(payload), row["prompt_id"], row["seq"])
+                )
             
+            if sequence is not None:
+                conn.execute("DELETE FROM sqlite_sequence WHERE name = 'prompts'")
+                conn.execute(
+                    "INSERT INTO sqlite_sequence (name, seq) VALUES ('prompts', ?)",
+                    (max([sequence[0]] + [prompt_data["seq"] for prompt_data in prompts]),)
+                )
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        logger.info(f"Migrated {len(prompts)} prompts to content-addressed bodies")
+    
+    def _reader_conn(self) -> sqlite3.Connection:
+        """Get this thread's read-only connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA busy_timeout = 5000")
+            conn.execute("PRAGMA query_only = ON")
+            self._reader_conns.append(conn)
+        return conn
+    
+    @contextmanager
+    def _reader(self):
+        """Yield a connection that sees one consistent state of the database.
+        
+        File databases are read through this thread's own connection in a read transaction, so
+        readers hold up neither writers nor each other; WAL keeps the transaction on the last commit
+        made before it started. An in-memory database has only the one connection and is read under
+        the write lock.
+        """
+        if self.db_path == ":memory:":
+            with self._lock:
+                yield self._conn
+            return
+        
+        conn = self._reader_conn()
+        if conn.in_transaction:
+            yield conn
+            return
+        conn.execute("BEGIN")
+        try:
+            yield conn
+        finally:
+            conn.execute("COMMIT")
+    
+    @contextmanager
+    def _transaction(self):
+        """Run a write transaction, holding the database write lock for its whole duration."""
+        with self._lock:
+            self._pending_versions = {}
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Nobody else can write now, so catch up with other processes first
+                self._replay_changes()
+                change_seq = self._change_seq
+                self._pending_cache = {}
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                self._pending_versions = {}
+                self._pending_cache = None
+                self._pending_vectors = {}
+                raise
+            self._conn.execute("COMMIT")
+            self._apply_cache_changes()
+            self._apply_version_changes()
+            if self.shared_cache is not None and self._change_seq != change_seq:
+                self._schedule_publish()
+    
+    def _apply_cache_changes(self) -> None:
+        """Apply the cache changes of the transaction that just committed."""
+        pending, self._pending_cache = self._pending_cache, None
+        vectors, self._pending_vectors = self._pending_vectors, {}
+        self._apply_records(pending, vectors)
+    
+    def _apply_records(self, changes: Dict[str, Optional[PromptRecord]], vectors: Dict[str, Any] = None) -> None:
+        """Store or drop cached prompts. Caller must hold the write lock.
+        
+        New bodies take their vectors from ``vectors``, by body hash, or else from those stored or
+        embedded in batches now. Until the library is loaded, the changes go to the overlay instead.
+        """
+        if not self._loaded:
+            self._apply_overlay(changes)
+            return
+        vectors = dict(vectors or {})
+        if self.vector_index is not None:
+            vectors.update(self._vectors_for([
+                record.body for prompt_id, record in changes.items()
+                if record is not None and getattr(self.prompts.get(prompt_id), "body", None) != record.body
+                and body_hash(record.body) not in vectors
+            ]))
+        for prompt_id, record in changes.items():
+            if record is None:
+                self._drop_cached(prompt_id)
+            else:
+                self._put_cached(record, vectors.get(body_hash(record.body)))
+    
+    def _apply_overlay(self, changes: Dict[str, Optional[PromptRecord]]) -> None:
+        """Note prompts changed since the shared generation. Caller must hold the write lock.
+        
+        Entries are dropped once the shared cache has published a generation that includes them.
+        """
+        generation = self.shared_cache.generation or 0
+        with self._index_lock.write():
+            for prompt_id, record in changes.items():
+                self._overlay[prompt_id] = (self._change_seq, record)
+            for prompt_id in [prompt_id for prompt_id, (seq, _) in self._overlay.items() if seq <= generation]:
+                del self._overlay[prompt_id]
+    
+    def _apply_version_changes(self) -> None:
+        """Bring loaded version indexes up to date with the transaction that just committed.
+        
+        Versions appended right after an index's last entry are added to it. Any other change to a
+        prompt's history drops its index, and the next read rebuilds it from the committed rows.
+        """
+        pending, self._pending_versions = self._pending_versions, {}
+        with self._index_lock.write():
+            for prompt_id, entries in pending.items():
+                index = self._version_indexes.get(prompt_id)
+                if index is None:
+                    continue
+                last_seq = -1 if index.last_seq is None else index.last_seq
+                if entries and entries[0][0] == last_seq + 1:
+                    for entry in entries:
+                        index.add(*entry)
+                else:
+                    del self._version_indexes[prompt_id]
+    
+    def _row_to_record(self, row: sqlite3.Row, last_action: Optional[str]) -> PromptRecord:
+        """Convert a joined prompts row into a cache record."""
+        return PromptRecord(
+            row["seq"],
+            row["id"],
+            row["body"],
+            row["version"],
+            json.loads(row["tags"]),
+            row["created_at"],
+            row["updated_at"],
+            last_action
+        )
+    
+    def _load(self) -> None:
+        """Load every current prompt into the cache."""
+        with self._lock:
+            change_seq = self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM prompt_changes").fetchone()[0]
+            
+            last_actions = {
+                row["prompt_id"]: json.loads(row["entry"]).get("action")
+                for row in self._conn.execute(
+                    "SELECT prompt_id, entry FROM prompt_audit "
+                    "WHERE seq = (SELECT MAX(seq) FROM prompt_audit AS latest WHERE latest.prompt_id = prompt_audit.prompt_id)"
+                )
+            }
+            records = []
+            bodies = {}  # Identical bodies share one string until the cache interns them
+            for row in self._conn.execute(f"{PROMPT_SELECT} ORDER BY prompts.seq"):
+                record = self._row_to_record(row, last_actions.get(row["id"]))
+                record.body = bodies.setdefault(record.body, record.body)
+                records.append(record)
+            bodies = None
+            # Readers keep the old cache while vectors are read or embedded
+            vectors = self._vectors_for([record.body for record in records])
+            
+            with self._index_lock.write():
+                self._change_seq = change_seq
+                self._loaded = True
+                self._overlay = {}
+                self.prompts = {}
+                self._ids = {}
+                self.tag_index.clear()
+                self.text_index.clear()
+                if self.duplicate_index is not None:
+                    self.duplicate_index.clear()
+                if self.vector_index is not None:
+                    self.vector_index.clear()
+                self._version_indexes = {}
+                self._pending_versions = {}
+                self._bodies = {}
+                self._body_refs = Counter()
+                for record in records:
+                    self._put_cached(record, vectors.get(body_hash(record.body)))
+    
+    def _open_shared_cache(self) -> None:
+        """Start reading prompts from the shared cache, publishing a generation first if it has none.
+        
+        Changes committed after the published generation are replayed into the overlay.
+        """
+        with self._lock:
+            change_seq = self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM prompt_changes").fetchone()[0]
+            floor = self._conn.execute("SELECT value FROM prompt_meta WHERE key = 'change_floor'").fetchone()
+            try:
+                generation = self.shared_cache.generation
+            except CacheError:
+                generation = None
+            if generation is None or generation > change_seq or (floor is not None and generation < floor[0]):
+                # Missing, unreadable, from another database, or older than the change log can replay
+                self._change_seq = change_seq
+                self.publish_shared_cache(full=True)
+            else:
+                self._change_seq = generation
+                self._replay_changes()
+    
+    def _ensure_loaded(self) -> None:
+        """Load the library into this process, for reads that need the in-memory indexes."""
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._load()
+    
+    def _cached(self, prompt_id: str) -> Optional[PromptRecord]:
+        """Get a prompt's cached record, from the overlay or the shared cache until the library is loaded.
+        
+        Records read from the shared cache do not know their last action, so writes use ``_current``.
+        """
+        if self._loaded:
+            return self.prompts.get(prompt_id)
+        generation, found = self.shared_cache.get_record(prompt_id)
+        entry = self._overlay.get(prompt_id)
+        if entry is not None and entry[0] > (generation or 0):
+            return entry[1]
+        if found is None:
+            return None
+        seq, prompt_data = found
+        return PromptRecord(
+            seq,
+            prompt_id,
+            prompt_data["body"],
+            prompt_data["version"],
+            prompt_data["tags"],
+            prompt_data["created_at"],
+            prompt_data["updated_at"]
+        )
+    
+    def _current(self, conn: sqlite3.Connection, prompt_id: str) -> Optional[PromptRecord]:
+        """Get the record a write to a prompt starts from. Must be called inside a transaction."""
+        if self._loaded:
+            return self.prompts.get(prompt_id)
+        row = conn.execute(f"{PROMPT_SELECT} WHERE prompts.id = ?", (prompt_id,)).fetchone()
+        return self._row_to_record(row, self._last_action(prompt_id)) if row is not None else None
+    
+    def _last_action(self, prompt_id: str) -> Optional[str]:
+        """Read the action of a prompt's latest audit entry."""
+        row = self._conn.execute(
+            "SELECT entry FROM prompt_audit WHERE prompt_id = ? ORDER BY seq DESC LIMIT 1", (prompt_id,)
+        ).fetchone()
+        return json.loads(row["entry"]).get("action") if row else None
+    
+    def _read_audit_logs(self, conn: sqlite3.Connection, prompt_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """Read the audit entries of several prompts, each in order."""
+        audit_logs = {prompt_id: [] for prompt_id in prompt_ids}
+        for start in range(0, len(prompt_ids), 500):
+            chunk = prompt_ids[start:start + 500]
+            for row in conn.execute(
+                f"SELECT prompt_id, entry FROM prompt_audit WHERE prompt_id IN ({','.join('?' * len(chunk))}) "
+                "ORDER BY prompt_id, seq",
+                chunk
+            ):
+                audit_logs[row["prompt_id"]].append(json.loads(row["entry"]))
+        return audit_logs
+    
+    def _to_dicts(self, conn: sqlite3.Connection, records: List[PromptRecord]) -> List[Dict[str, Any]]:
+        """Expand cached records into the prompt dicts returned by the service, with their audit logs."""
+        audit_logs = self._read_audit_logs(conn, [record.id for record in records])
+        return [record.to_dict(audit_logs[record.id]) for record in records]
+    
+    def _replay_changes(self) -> None:
+        """Refresh cached prompts changed by other processes since the last replay."""
+        if self._pending_cache is not None:
+            # The open transaction replayed when it began, and nobody else can have written since
+            return
+        floor = self._conn.execute("SELECT value FROM prompt_meta WHERE key = 'change_floor'").fetchone()
+        if floor is not None and self._change_seq < floor[0]:
+            # Tombstones this process had not seen were pruned, so only a reload finds every delete
+            self._load()
+            return
+        
+        rows = self._conn.execute(
+            "SELECT seq, prompt_id FROM prompt_changes WHERE seq > ? ORDER BY seq", (self._change_seq,)
+        ).fetchall()
+        if not rows:
+            return
+        
+        self._change_seq = rows[-1]["seq"]
+        # Collected and applied together, so new bodies are embedded in batches
+        self._pending_cache = {}
+        try:
+            for prompt_id in {row["prompt_id"] for row in rows}:
+                self._refresh(prompt_id)
+        except BaseException:
+            self._pending_cache = None
+            raise
+        self._apply_cache_changes()
+    
+    def _refresh(self, prompt_id: str) -> None:
+        """Reload a single prompt from the database into the cache."""
+        row = self._conn.execute(f"{PROMPT_SELECT} WHERE prompts.id = ?", (prompt_id,)).fetchone()
+        with self._index_lock.write():
+            self._version_indexes.pop(prompt_id, None)
+        if row is None:
+            self._cache_drop(prompt_id)
+        else:
+            self._cache_put(self._row_to_record(row, self._last_action(prompt_id)))
+    
+    def _intern_body(self, body: str) -> str:
+        """Get the shared copy of a body and count one more cached record using it."""
+        shared = self._bodies.setdefault(body, body)
+        self._body_refs[shared] += 1
+        return shared
+    
+    def _release_body(self, body: str) -> None:
+        """Drop one cached record's use of a body."""
+        self._body_refs[body] -= 1
+        if self._body_refs[body] <= 0:
+            del self._body_refs[body]
+            del self._bodies[body]
+    
+    def _cache_put(self, record: PromptRecord) -> None:
+        """Store a prompt in the cache, once the open transaction commits if there is one."""
+        if self._pending_cache is not None:
+            self._pending_cache[record.id] = record
+        else:
+            self._apply_records({record.id: record})
+    
+    def _cache_drop(self, prompt_id: str) -> None:
+        """Remove a prompt from the cache, once the open transaction commits if there is one."""
+        if self._pending_cache is not None:
+            self._pending_cache[prompt_id] = None
+        else:
+            self._apply_records({prompt_id: None})
+    
+    def _put_cached(self, record: PromptRecord, vector: Optional[Any] = None) -> None:
+        """Store a prompt in the cache and bring the indexes up to date with it.
+        
+        The record replaces the cached one whole, so lock-free readers see either the old or the new
+        state of every field, never a mix. ``vector`` is the body's embedding, needed when there is a
+        vector index and the body is new or changed.
+        """
+        with self._index_lock.write():
+            record.body = self._intern_body(record.body)
+            previous = self.prompts.get(record.id)
+            self.prompts[record.id] = record
+            if previous is not None:
+                self._release_body(previous.body)
+            self._ids[record.seq] = record.id
+            self.tag_index.add(record.seq, record.tags)
+            self.text_index.add(record.seq, record.body, record.tags)
+            if self.duplicate_index is not None:
+                self.duplicate_index.add(record.seq, record.body)
+            if vector is not None:
+                self.vector_index.add(record.seq, vector)
+    
+    def _drop_cached(self, prompt_id: str) -> None:
+        """Remove a prompt from the cache and the indexes."""
+        with self._index_lock.write():
+            self._version_indexes.pop(prompt_id, None)
+            record = self.prompts.pop(prompt_id, None)
+            if record is not None:
+                self._release_body(record.body)
+                del self._ids[record.seq]
+                self.tag_index.remove(record.seq)
+                self.text_index.remove(record.seq)
+                if self.duplicate_index is not None:
+                    self.duplicate_index.remove(record.seq)
+                if self.vector_index is not None:
+                    self.vector_index.remove(record.seq)
+    
+    def _sync(self) -> None:
+        """Pick up writes committed by other processes, if there were any.
+        
+        Each thread checks ``PRAGMA data_version`` on its own connection. Replaying needs the write
+        lock; if a transaction holds it, the reader carries on with the cache as it is (the writer
+        catches up when its transaction begins) and checks again on its next read.
+        """
+        if self.db_path == ":memory:":
+            return
+        data_version = self._reader_conn().execute("PRAGMA data_version").fetchone()[0]
+        if data_version != getattr(self._local, "data_version", None) and self._lock.acquire(blocking=False):
+            try:
+                self._replay_changes()
+                self._local.data_version = data_version
+            finally:
+                self._lock.release()
+    
+    def _record_change(self, conn: sqlite3.Connection, prompt_id: str) -> None:
+        """Append a prompt to the change log. Must be called inside a transaction."""
+        cursor = conn.execute("INSERT INTO prompt_changes (prompt_id) VALUES (?)", (prompt_id,))
+        # Replays and incremental backups only need to know that a prompt changed after a checkpoint
+        conn.execute("DELETE FROM prompt_changes WHERE prompt_id = ? AND seq < ?", (prompt_id, cursor.lastrowid))
+        self._change_seq = cursor.lastrowid
+    
+    def _blob_ref(self, conn: sqlite3.Connection, body: str) -> str:
+        """Add a reference to a body's blob, storing the body if it is new, and return its hash."""
+        digest = body_hash(body)
+        cursor = conn.execute("UPDATE prompt_blobs SET refcount = refcount + 1 WHERE hash = ?", (digest,))
+        if cursor.rowcount == 0:
+            conn.execute(
+                "INSERT INTO prompt_blobs (hash, body, size, refcount) VALUES (?, ?, ?, 1)",
+                (digest, body, len(body.encode("utf-8")))
+            )
+        return digest
+    
+    def _blob_release(self, conn: sqlite3.Connection, digests: Iterable[str]) -> None:
+        """Drop references to blobs, deleting the ones nothing points at any more."""
+        for digest, count in Counter(digests).items():
+            conn.execute("UPDATE prompt_blobs SET refcount = refcount - ? WHERE hash = ?", (count, digest))
+            if conn.execute("DELETE FROM prompt_blobs WHERE hash = ? AND refcount <= 0", (digest,)).rowcount:
+                conn.execute("DELETE FROM prompt_embeddings WHERE body_hash = ?", (digest,))
+    
+    def _delete_rows(self, conn: sqlite3.Connection, prompt_id: str) -> None:
+        """Delete a prompt's rows and release its blobs. Must be called inside a transaction."""
+        digests = [
+            row[0] for row in conn.execute(
+                "SELECT body_hash FROM prompts WHERE id = ? "
+                "UNION ALL SELECT body_hash FROM prompt_versions WHERE prompt_id = ? AND body_hash IS NOT NULL",
+                (prompt_id, prompt_id)
+            )
+        ]
+        conn.execute("DELETE FROM prompts WHERE id = ?", (prompt_id,))
+        conn.execute("DELETE FROM prompt_versions WHERE prompt_id = ?", (prompt_id,))
+        conn.execute("DELETE FROM prompt_audit WHERE prompt_id = ?", (prompt_id,))
+        self._blob_release(conn, digests)
+        self._pending_versions[prompt_id] = None
+    
+    def _delete_all_rows(self, conn: sqlite3.Connection) -> None:
+        """Delete every prompt, version, audit entry and blob. Must be called inside a transaction.
+        
+        Stored vectors are kept for the bodies written back by a restore; call ``_drop_stale_vectors``
+        once they are.
+        """
+        for table in ("prompts", "prompt_versions", "prompt_audit", "prompt_blobs"):
+            conn.execute(f"DELETE FROM {table}")
+        self._version_indexes = {}
+    
+    def _drop_stale_vectors(self, conn: sqlite3.Connection) -> None:
+        """Delete stored vectors of bodies that no longer have a blob. Must be called inside a transaction."""
+        conn.execute("DELETE FROM prompt_embeddings WHERE body_hash NOT IN (SELECT hash FROM prompt_blobs)")
+    
+    def _stored_vectors(self, conn: sqlite3.Connection, digests: List[str]) -> Dict[str, Any]:
+        """Read the vectors this store's embedder produced for bodies, by body hash."""
+        vectors = {}
+        for start in range(0, len(digests), EMBED_BATCH_SIZE):
+            batch = digests[start:start + EMBED_BATCH_SIZE]
+            rows = conn.execute(
+                f"SELECT body_hash, vector FROM prompt_embeddings WHERE embedder = ? "
+                f"AND body_hash IN ({', '.join('?' * len(batch))})",
+                [self.embedder.name, *batch]
+            )
+            for digest, vector in rows:
+                vectors[digest] = numpy.frombuffer(vector, dtype=numpy.float32)
+        return vectors
+    
+    def _embed_batches(self, bodies: Dict[str, str]) -> Dict[str, Any]:
+        """Embed bodies given by hash, ``EMBED_BATCH_SIZE`` per embedder call, returning vectors by hash."""
+        digests = list(bodies)
+        vectors = {}
+        for start in range(0, len(digests), EMBED_BATCH_SIZE):
+            batch = digests[start:start + EMBED_BATCH_SIZE]
+            vectors.update(zip(batch, self.embedder.embed([bodies[digest] for digest in batch])))
+        return vectors
+    
+    def _embed_new(self, bodies: Iterable[str]) -> Dict[str, Any]:
+        """Embed bodies about to be written, before their transaction, returning the vectors to store.
+        
+        Bodies that already have a stored vector are skipped. No lock is held while embedding.
+        """
+        if self.vector_index is None:
+            return {}
+        wanted = {body_hash(body): body for body in bodies}
+        with self._reader() as conn:
+            stored = self._stored_vectors(conn, list(wanted))
+        return self._embed_batches({digest: body for digest, body in wanted.items() if digest not in stored})
+    
+    def _store_vectors(self, conn: sqlite3.Connection, vectors: Dict[str, Any]) -> None:
+        """Store vectors by body hash for bodies that have a blob. Must be called inside a transaction."""
+        conn.executemany(
+            "INSERT OR IGNORE INTO prompt_embeddings (body_hash, embedder, vector) "
+            "SELECT ?, ?, ? WHERE EXISTS (SELECT 1 FROM prompt_blobs WHERE hash = ?)",
+            [
+                (digest, self.embedder.name, numpy.asarray(vector, dtype=numpy.float32).tobytes(), digest)
+                for digest, vector in vectors.items()
+            ]
+        )
+        if self._pending_cache is not None:
+            self._pending_vectors.update(vectors)
+    
+    def _vectors_for(self, bodies: Iterable[str]) -> Dict[str, Any]:
+        """Get vectors for bodies by hash, embedding and storing the ones nothing stored yet.
+        
+        Caller must hold the write lock outside of a transaction.
+        """
+        if self.vector_index is None:
+            return {}
+        wanted = {body_hash(body): body for body in bodies}
+        if not wanted:
+            return {}
+        vectors = self._stored_vectors(self._conn, list(wanted))
+        embedded = self._embed_batches({digest: body for digest, body in wanted.items() if digest not in vectors})
+        vectors.update(embedded)
+        if embedded:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._store_vectors(self._conn, embedded)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return vectors
+    
+    def _save_prompt(self, conn: sqlite3.Connection, prompt_data: Dict[str, Any]) -> None:
+        """Write the current state of a prompt. Must be called inside a transaction."""
+        previous = conn.execute("SELECT body_hash FROM prompts WHERE id = ?", (prompt_data["id"],)).fetchone()[0]
+        digest = body_hash(prompt_data["body"])
+        if digest != previous:
+            self._blob_ref(conn, prompt_data["body"])
+            self._blob_release(conn, [previous])
+        conn.execute(
+            "UPDATE prompts SET body_hash = ?, version = ?, tags = ?, updated_at = ? WHERE id = ?",
+            (
+                digest,
+                prompt_data["version"],
+                json.dumps(prompt_data["tags"]),
+                prompt_data["updated_at"],
+                prompt_data["id"]
+            )
+        )
+    
+    def _append_audit(self, conn: sqlite3.Connection, prompt_id: str, entry: Dict[str, Any],
+                      version_seq: Optional[int] = None) -> None:
+        """Append an audit entry. Entries are never updated once written."""
+        conn.execute(
+            "INSERT INTO prompt_audit (prompt_id, seq, version_seq, entry) "
+            "VALUES (?, (SELECT COALESCE(MAX(seq) + 1, 0) FROM prompt_audit WHERE prompt_id = ?), ?, ?)",
+            (prompt_id, prompt_id, version_seq, json.dumps(entry))
+        )
+    
+    def _version_index(self, conn: sqlite3.Connection, prompt_id: str) -> Optional[VersionIndex]:
+        """Get a prompt's version index, building it from ``conn`` on first use.
+        
+        This must be the first read in ``conn``'s transaction, so a new index is built from the
+        latest commit; versions committed while it is being built are added when they are applied.
+        """
+        index = self._version_indexes.get(prompt_id)
+        if index is None:
+            with self._index_lock.write():
+                index = self._version_indexes.get(prompt_id)
+                if index is None and self._cached(prompt_id) is not None:
+                    index = self._version_indexes[prompt_id] = VersionIndex(
+                        tuple(row) for row in conn.execute(
+                            "SELECT seq, version, timestamp FROM prompt_versions WHERE prompt_id = ? ORDER BY seq",
+                            (prompt_id,)
+                        )
+                    )
+        return index
+    
+    def _decode_versions(self, conn: sqlite3.Connection, prompt_id: str, first_seq: int, last_seq: int):
+        """Yield ``(row, body, tags)`` for each stored version from ``first_seq`` to ``last_seq``.
+        
+        Decoding starts at the nearest snapshot at or before ``first_seq``.
+        """
+        rows = conn.execute(
+            f"{VERSION_SELECT} WHERE prompt_versions.prompt_id = ? AND prompt_versions.seq <= ? AND prompt_versions.seq >= "
+            "(SELECT MAX(seq) FROM prompt_versions WHERE prompt_id = ? AND seq <= ? AND kind = 'snapshot') "
+            "ORDER BY prompt_versions.seq",
+            (prompt_id, last_seq, prompt_id, first_seq)
+        )
+        body = None
+        for row in rows:
+            payload = json.loads(row["payload"])
+            body = row["body"] if row["kind"] == "snapshot" else apply_body_diff(body, payload["ops"])
+            if row["seq"] >= first_seq:
+                yield row, body, payload["tags"]
+    
+    def _reconstruct(self, conn: sqlite3.Connection, prompt_id: str, seq: int) -> Optional[Dict[str, Any]]:
+        """Rebuild the body and tags of one version from its nearest snapshot."""
+        for row, body, tags in self._decode_versions(conn, prompt_id, seq, seq):
+            return {"row": row, "body": body, "tags": tags}
+        return None
+    
+    def _head_body(self, conn: sqlite3.Connection, record: PromptRecord) -> Optional[str]:
+        """Get the body of a prompt's latest stored version, which new diffs are taken against."""
+        if record.last_action != "rollback":
+            # Without a rollback since, the current body is the latest version's body
+            return record.body
+        
+        seq = conn.execute(
+            "SELECT MAX(seq) FROM prompt_versions WHERE prompt_id = ?", (record.id,)
+        ).fetchone()[0]
+        version = self._reconstruct(conn, record.id, seq) if seq is not None else None
+        return version["body"] if version else None
+    
+    def _append_version(self, conn: sqlite3.Connection, prompt_data: Dict[str, Any],
+                        base_body: Optional[str] = None) -> int:
+        """Append the prompt's current state to its version history. Must be called inside a transaction.
+        
+        ``base_body`` is the body of the previous version; the new version is stored as a diff against
+        it unless a snapshot is due or the diff would not be smaller than the body. A body that is
+        already stored as a blob is referenced rather than diffed, unless the diff is smaller still.
+        """
+        last_seq = conn.execute(
+            "SELECT MAX(seq) FROM prompt_versions WHERE prompt_id = ?", (prompt_data["id"],)
+        ).fetchone()[0]
+        seq = 0 if last_seq is None else last_seq + 1
+        
+        kind = "snapshot"
+        payload = {"body": prompt_data["body"], "tags": prompt_data["tags"]}
+        if base_body is not None and seq % SNAPSHOT_INTERVAL != 0:
+            ops = diff_body(base_body, prompt_data["body"])
+            size = len(json.dumps(ops))
+            if size < len(prompt_data["body"]) and not (size > BLOB_REF_SIZE and self._blob_exists(conn, prompt_data["body"])):
+                kind = "delta"
+                payload = {"ops": ops, "tags": prompt_data["tags"]}
+        
+        self._insert_version(conn, prompt_data["id"], seq, prompt_data["version"], kind, payload, prompt_data["updated_at"])
+        return seq
+    
+    def _blob_exists(self, conn: sqlite3.Connection, body: str) -> bool:
+        """Check whether a body is already stored as a blob."""
+        return conn.execute("SELECT 1 FROM prompt_blobs WHERE hash = ?", (body_hash(body),)).fetchone() is not None
+    
+    def _insert_version(self, conn: sqlite3.Connection, prompt_id: str, seq: int, version: str, kind: str,
+                        payload: Dict[str, Any], timestamp: str) -> None:
+        """Insert a version row, moving a snapshot's body into its blob. Must be called inside a transaction."""
+        digest = None
+        if kind == "snapshot":
+            payload = dict(payload)
+            digest = self._blob_ref(conn, payload.pop("body"))
+        conn.execute(
+            "INSERT INTO prompt_versions (prompt_id, seq, version, kind, payload, timestamp, body_hash) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (prompt_id, seq, version, kind, json.dumps(payload), timestamp, digest)
+        )
+        # Loaded indexes only learn about the version once it is committed
+        entries = self._pending_versions.setdefault(prompt_id, [])
+        if entries is not None:
+            entries.append((seq, version, timestamp))
+    
+    def _import_prompt(self, conn: sqlite3.Connection, prompt_data: Dict[str, Any],
+                       version_history: List[Dict[str, Any]]) -> None:
+        """Insert a prompt given as full dicts, as found in old databases and backups."""
+        # Keep numeric IDs on their original key so new IDs never collide with them
+        match = PROMPT_ID_PATTERN.match(prompt_data["id"])
+        conn.execute(
+            "INSERT INTO prompts (seq, id, body_hash, version, tags, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                int(match.group(1)) if match else None,
+                prompt_data["id"],
+                self._blob_ref(conn, prompt_data["body"]),
+                prompt_data["version"],
+                json.dumps(prompt_data.get("tags", [])),
+                prompt_data["created_at"],
+                prompt_data["updated_at"]
+            )
+        )
+        
+        version_seqs = []
+        base_body = None
+        for version_data in version_history:
+            version_seqs.append(self._append_version(conn, dict(version_data, id=prompt_data["id"]), base_body))
+            base_body = version_data["body"]
+        
+        # Creates and updates each produced a version, in the same order
+        versioned = iter(version_seqs)
+        for entry in prompt_data.get("audit_log", []):
+            version_seq = next(versioned, None) if entry.get("action") in ("create", "update") else None
+            self._append_audit(conn, prompt_data["id"], entry, version_seq)
+    
+    def _insert_prompt(self, conn: sqlite3.Connection, body: str, version: str, tags: List[str],
+                       now: str) -> PromptRecord:
+        """Insert a new prompt with its first version and audit entry. Must be called inside a transaction."""
+        # IDs come from an AUTOINCREMENT key, so they are never reused after a delete
+        cursor = conn.execute(
+            "INSERT INTO prompts (body_hash, version, tags, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (self._blob_ref(conn, body), version, json.dumps(tags), now, now)
+        )
+        prompt_id = f"prompt_{cursor.lastrowid}"
+        conn.execute("UPDATE prompts SET id = ? WHERE seq = ?", (prompt_id, cursor.lastrowid))
+        
+        record = PromptRecord(cursor.lastrowid, prompt_id, body, version, tags, now, now, "create")
+        
+        # Initialize version history for this prompt
+        version_seq = self._append_version(conn, record.to_dict())
+        self._append_audit(conn, prompt_id, {"action": "create", "timestamp": now, "version": version}, version_seq)
+        self._record_change(conn, prompt_id)
+        return record
+    
+    def create_prompt(self, body: str, version: str = "1.0", tags: List[str] = None) -> Dict[str, Any]:
+        """Create a new prompt with versioning."""
+        try:
+            now = datetime.utcnow().isoformat()
+            vectors = self._embed_new([body])
+            
+            with self._transaction() as conn:
+                record = self._insert_prompt(conn, body, version, tags or [], now)
+                self._store_vectors(conn, vectors)
+                self._cache_put(record)
+            
+            logger.info(f"Created new prompt: {record.id}")
+            return record.to_dict([{"action": "create", "timestamp": now, "version": version}])
+        
         except Exception as e:
             logger.error(f"Error creating prompt: {str(e)}")
             raise
@@ -56,7 +1087,12 @@ class PromptStoreService:
     def get_prompt(self, prompt_id: str) -> Optional[Dict[str, Any]]:
         """Get a specific prompt by ID."""
         try:
-            return self.prompts.get(prompt_id)
+            self._sync()
+            record = self._cached(prompt_id)
+            if record is None:
+                return None
+            with self._reader() as conn:
+                return self._to_dicts(conn, [record])[0]
         except Exception as e:
             logger.error(f"Error fetching prompt {prompt_id}: {str(e)}")
             raise
@@ -64,35 +1100,44 @@ class PromptStoreService:
     def update_prompt(self, prompt_id: str, body: str = None, version: str = None, tags: List[str] = None) -> Dict[str, Any]:
         """Update an existing prompt and create a new version."""
         try:
-            if prompt_id not in self.prompts:
-                raise ValueError(f"Prompt {prompt_id} not found")
+            vectors = self._embed_new([body] if body is not None else [])
             
-            prompt_data = self.prompts[prompt_id]
-            
-            # Update fields if provided
-            if body is not None:
-                prompt_data["body"] = body
-            if version is not None:
-                prompt_data["version"] = version
-            if tags is not None:
-                prompt_data["tags"] = tags
+            with self._transaction() as conn:
+                current = self._current(conn, prompt_id)
+                if current is None:
+                    raise ValueError(f"Prompt {prompt_id} not found")
                 
-            prompt_data["updated_at"] = datetime.utcnow().isoformat()
-            
-            # Add audit log entry
-            audit_entry = {
-                "action": "update",
-                "timestamp": datetime.utcnow().isoformat(),
-                "version": version or prompt_data["version"]
-            }
-            prompt_data["audit_log"].append(audit_entry)
-            
-            # Update version history
-            self.version_history[prompt_id].append(prompt_data.copy())
+                # Build a new record so the cache is untouched if the write fails
+                record = current.replace(
+                    body=current.body if body is None else body,
+                    version=current.version if version is None else version,
+                    tags=current.tags if tags is None else tags,
+                    updated_at=datetime.utcnow().isoformat(),
+                    last_action="update"
+                )
+                
+                # Add audit log entry
+                audit_entry = {
+                    "action": "update",
+                    "timestamp": datetime.utcnow().isoformat(),
+                    "version": version or record.version
+                }
+                
+                prompt_data = record.to_dict()
+                self._save_prompt(conn, prompt_data)
+                
+                # Update version history
+                version_seq = self._append_version(conn, prompt_data, self._head_body(conn, current))
+                self._append_audit(conn, prompt_id, audit_entry, version_seq)
+                self._record_change(conn, prompt_id)
+                self._store_vectors(conn, vectors)
+                
+                self._cache_put(record)
+                prompt_data = self._to_dicts(conn, [record])[0]
             
             logger.info(f"Updated prompt: {prompt_id}")
             return prompt_data
-            
+        
         except Exception as e:
             logger.error(f"Error updating prompt {prompt_id}: {str(e)}")
             raise
@@ -100,116 +1145,974 @@ class PromptStoreService:
     def delete_prompt(self, prompt_id: str) -> bool:
         """Delete a prompt."""
         try:
-            if prompt_id in self.prompts:
-                del self.prompts[prompt_id]
-                if prompt_id in self.version_history:
-                    del self.version_history[prompt_id]
-                logger.info(f"Deleted prompt: {prompt_id}")
-                return True
-            return False
+            with self._transaction() as conn:
+                if self._current(conn, prompt_id) is None:
+                    return False
+                
+                self._delete_rows(conn, prompt_id)
+                self._record_change(conn, prompt_id)
+                
+                self._cache_drop(prompt_id)
+            
+            logger.info(f"Deleted prompt: {prompt_id}")
+            return True
         except Exception as e:
             logger.error(f"Error deleting prompt {prompt_id}: {str(e)}")
             raise
     
-    def get_prompt_versions(self, prompt_id: str) -> List[Dict[str, Any]]:
-        """Get all versions of a specific prompt."""
+    def get_prompt_versions(self, prompt_id: str, offset: int = 0, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Get a page of a prompt's versions, oldest first.
+        
+        Each version is a prompt dict like ``get_prompt``'s, with the audit log as it stood once the
+        version was written. ``get_version_log`` pages the same versions with only the audit entry
+        that created each, without reading the rest of the log.
+        """
         try:
-            return self.version_history.get(prompt_id, [])
+            self._sync()
+            record = self._cached(prompt_id)
+            if record is None:
+                return []
+            with self._reader() as conn:
+                seqs = self._version_page(conn, prompt_id, offset, limit)
+                if not seqs:
+                    return []
+                
+                # A version's log runs up to the first entry pointing at it, the one that created it
+                audit_log = []
+                created = {}
+                for row in conn.execute("SELECT version_seq, entry FROM prompt_audit WHERE prompt_id = ? ORDER BY seq",
+                                        (prompt_id,)):
+                    audit_log.append(json.loads(row["entry"]))
+                    created.setdefault(row["version_seq"], len(audit_log))
+                
+                versions = []
+                for row, body, tags in self._decode_versions(conn, prompt_id, seqs[0], seqs[-1]):
+                    versions.append(self._version_to_dict(
+                        record, row, body, tags, audit_log=audit_log[:created.get(row["seq"], len(audit_log))]
+                    ))
+                return versions
         except Exception as e:
             logger.error(f"Error fetching versions for prompt {prompt_id}: {str(e)}")
             raise
     
+    def get_version_log(self, prompt_id: str, offset: int = 0, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Get a page of a prompt's versions, oldest first, each with the ``audit`` entry that created it."""
+        try:
+            self._sync()
+            record = self._cached(prompt_id)
+            if record is None:
+                return []
+            with self._reader() as conn:
+                seqs = self._version_page(conn, prompt_id, offset, limit)
+                if not seqs:
+                    return []
+                
+                # The first entry pointing at a version is the one that created it
+                audit_entries = {}
+                for row in conn.execute(
+                    "SELECT version_seq, entry FROM prompt_audit WHERE prompt_id = ? AND version_seq BETWEEN ? AND ? "
+                    "ORDER BY seq",
+                    (prompt_id, seqs[0], seqs[-1])
+                ):
+                    audit_entries.setdefault(row["version_seq"], json.loads(row["entry"]))
+                
+                return [
+                    self._version_to_dict(record, row, body, tags, audit=audit_entries.get(row["seq"]))
+                    for row, body, tags in self._decode_versions(conn, prompt_id, seqs[0], seqs[-1])
+                ]
+        except Exception as e:
+            logger.error(f"Error fetching version log for prompt {prompt_id}: {str(e)}")
+            raise
+    
+    def _version_page(self, conn: sqlite3.Connection, prompt_id: str, offset: int,
+                      limit: Optional[int]) -> List[int]:
+        """Get the seqs of a page of a prompt's versions, oldest first."""
+        index = self._version_index(conn, prompt_id)
+        if index is None:
+            return []
+        with self._index_lock.read():
+            return index.page(offset, limit)
+    
+    def find_prompt_version(self, prompt_id: str, version: str = None,
+                            as_of: Union[str, datetime] = None) -> Optional[Dict[str, Any]]:
+        """Find one version of a prompt.
+        
+        ``version`` is an exact version or a pattern such as "1.x" for the highest matching version;
+        ``as_of`` finds the version that was current at that time. With neither, the latest stored
+        version is returned. Returns None if nothing matches.
+        """
+        if version is not None and as_of is not None:
+            raise ValueError("Pass either version or as_of, not both")
+        try:
+            self._sync()
+            record = self._cached(prompt_id)
+            if record is None:
+                return None
+            with self._reader() as conn:
+                index = self._version_index(conn, prompt_id)
+                if index is None:
+                    return None
+                with self._index_lock.read():
+                    if version is not None:
+                        seq = index.latest_matching(version)
+                    elif as_of is not None:
+                        seq = index.as_of(as_of.isoformat() if isinstance(as_of, datetime) else as_of)
+                    else:
+                        seq = index.last_seq
+                if seq is None:
+                    return None
+                
+                # None if the prompt was deleted since the index was read
+                target_version = self._reconstruct(conn, prompt_id, seq)
+                if target_version is None:
+                    return None
+                audit_row = conn.execute(
+                    "SELECT entry FROM prompt_audit WHERE prompt_id = ? AND version_seq = ? ORDER BY seq LIMIT 1",
+                    (prompt_id, seq)
+                ).fetchone()
+                return self._version_to_dict(
+                    record,
+                    target_version["row"],
+                    target_version["body"],
+                    target_version["tags"],
+                    audit=json.loads(audit_row["entry"]) if audit_row else None
+                )
+        except Exception as e:
+            logger.error(f"Error finding version of prompt {prompt_id}: {str(e)}")
+            raise
+    
+    def _version_to_dict(self, record: PromptRecord, row: sqlite3.Row, body: str, tags: List[str],
+                         **audit: Any) -> Dict[str, Any]:
+        """Build the version dict returned by the service for a version of a cached prompt.
+        
+        ``audit`` is its ``audit_log`` or the single ``audit`` entry, depending on the caller.
+        """
+        return {
+            "id": record.id,
+            "body": body,
+            "version": row["version"],
+            "tags": tags,
+            "created_at": decode_timestamp(record.created_at),
+            "updated_at": row["timestamp"],
+            **audit
+        }
+    
     def rollback_prompt(self, prompt_id: str, version: str) -> Dict[str, Any]:
         """Rollback a prompt to a specific version."""
         try:
-            if prompt_id not in self.version_history:
-                raise ValueError(f"Prompt {prompt_id} not found")
-            
-            # Find the version
-            versions = self.version_history[prompt_id]
-            target_version = next((v for v in versions if v["version"] == version), None)
-            
-            if not target_version:
-                raise ValueError(f"Version {version} not found for prompt {prompt_id}")
+            vectors = {}
+            if self.vector_index is not None:
+                target = self.find_prompt_version(prompt_id, version)
+                vectors = self._embed_new([target["body"]] if target else [])
             
-            # Update current prompt to this version
-            self.prompts[prompt_id] = target_version.copy()
-            
-            # Add audit log entry
-            audit_entry = {
-                "action": "rollback",
-                "timestamp": datetime.utcnow().isoformat(),
-                "version": version,
-                "original_version": self.prompts[prompt_id]["version"]
-            }
-            self.prompts[prompt_id]["audit_log"].append(audit_entry)
+            with self._transaction() as conn:
+                current = self._current(conn, prompt_id)
+                if current is None:
+                    raise ValueError(f"Prompt {prompt_id} not found")
+                
+                # Find the version
+                seq = self._version_index(conn, prompt_id).find(version)
+                target_version = self._reconstruct(conn, prompt_id, seq) if seq is not None else None
+                
+                if not target_version:
+                    raise ValueError(f"Version {version} not found for prompt {prompt_id}")
+                
+                # Update current prompt to this version
+                record = current.replace(
+                    body=target_version["body"],
+                    version=target_version["row"]["version"],
+                    tags=target_version["tags"],
+                    updated_at=target_version["row"]["timestamp"],
+                    last_action="rollback"
+                )
+                
+                # Add audit log entry
+                audit_entry = {
+                    "action": "rollback",
+                    "timestamp": datetime.utcnow().isoformat(),
+                    "version": version,
+                    "original_version": current.version
+                }
+                
+                self._save_prompt(conn, record.to_dict())
+                self._append_audit(conn, prompt_id, audit_entry, target_version["row"]["seq"])
+                self._record_change(conn, prompt_id)
+                self._store_vectors(conn, vectors)
+                
+                self._cache_put(record)
+                prompt_data = self._to_dicts(conn, [record])[0]
             
             logger.info(f"Rolled back prompt {prompt_id} to version {version}")
-            return self.prompts[prompt_id]
-            
+            return prompt_data
+        
         except Exception as e:
             logger.error(f"Error rolling back prompt {prompt_id}: {str(e)}")
             raise
     
-    def search_prompts(self, tags: List[str] = None, query: str = None) -> List[Dict[str, Any]]:
-        """Search prompts by tags or text query."""
+    def search_prompts(self, tags: List[str] = None, query: str = None, all_tags: List[str] = None,
+                       exclude_tags: List[str] = None, offset: int = 0, limit: Optional[int] = None,
+                       ranked: bool = False) -> List[Dict[str, Any]]:
+        """Search prompts by tags or text query.
+        
+        Prompts must carry at least one of ``tags``, all of ``all_tags`` and none of ``exclude_tags``.
+        A ``query`` is a case-insensitive substring match on bodies, and results are in creation order.
+        With ``ranked`` the query is instead a full-text search over bodies and tags (terms,
+        ``prefix*`` and ``"phrases"``) ranked by BM25 relevance. Results can be paged either way, and
+        come with their audit logs as from ``get_prompt``.
+        """
         try:
-            results = []
+            self._sync()
+            self._ensure_loaded()
+            with self._index_lock.read():
+                records = self._search(tags, query, all_tags, exclude_tags, offset, limit, ranked)
+            with self._reader() as conn:
+                return self._to_dicts(conn, records)
+        except Exception as e:
+            logger.error(f"Error searching prompts: {str(e)}")
+            raise
+    
+    def _search(self, tags: Optional[List[str]], query: Optional[str], all_tags: Optional[List[str]],
+                exclude_tags: Optional[List[str]], offset: int, limit: Optional[int],
+                ranked: bool) -> List[PromptRecord]:
+        """Find the matching cached records. Caller must hold the index read lock."""
+        bitmap = self.tag_index.query(any_tags=tags, all_tags=all_tags, exclude_tags=exclude_tags)
+        
+        if not query:
+            return [
+                self.prompts[self._ids[ordinal]]
+                for ordinal in bitmap.iter(offset=offset, limit=limit)
+            ]
+        
+        if ranked:
+            accept = None
+            if tags or all_tags or exclude_tags:
+                accept = lambda ordinal: self.tag_index.matches(ordinal, tags, all_tags, exclude_tags)
+            matches = self.text_index.search(query, offset=offset, limit=limit, accept=accept)
+            return [self.prompts[self._ids[ordinal]] for ordinal, _ in matches]
+        
+        # Substring match, narrowed by the trigram index when there is one
+        candidates = self.text_index.substring_candidates(query)
+        if candidates is not None:
+            bitmap = bitmap & candidates
+        results = []
+        query = query.lower()
+        for ordinal in bitmap:
+            record = self.prompts[self._ids[ordinal]]
+            if query in record.body.lower():
+                results.append(record)
+        
+        return results[offset:None if limit is None else offset + limit]
+    
+    def count_prompts(self, tags: List[str] = None, all_tags: List[str] = None,
+                      exclude_tags: List[str] = None) -> int:
+        """Count the prompts matching a tag query without building the result list."""
+        self._sync()
+        self._ensure_loaded()
+        with self._index_lock.read():
+            return len(self.tag_index.query(any_tags=tags, all_tags=all_tags, exclude_tags=exclude_tags))
+    
+    def get_tag_counts(self) -> Dict[str, int]:
+        """Get the number of prompts carrying each tag."""
+        self._sync()
+        self._ensure_loaded()
+        with self._index_lock.read():
+            return self.tag_index.tag_counts()
+    
+    def find_duplicates(self, prompt_id: str, threshold: float = 0.8,
+                        limit: Optional[int] = 10) -> List[Dict[str, Any]]:
+        """Find prompts whose bodies are near-duplicates of a prompt's body.
+        
+        Returns the other prompts with an estimated Jaccard ``similarity`` of their word shingles of
+        at least ``threshold``, most similar first and without audit logs.
+        """
+        try:
+            self._sync()
+            self._ensure_loaded()
+            record = self.prompts.get(prompt_id)
+            if record is None:
+                raise ValueError(f"Prompt {prompt_id} not found")
+            return self._similar(record.body, threshold, limit, exclude=prompt_id)
+        except Exception as e:
+            logger.error(f"Error finding duplicates of prompt {prompt_id}: {str(e)}")
+            raise
+    
+    def find_similar_prompts(self, body: str, threshold: float = 0.8,
+                             limit: Optional[int] = 10) -> List[Dict[str, Any]]:
+        """Find stored prompts whose bodies are near-duplicates of ``body``, as ``find_duplicates`` does.
+        
+        Useful before creating a prompt, to reuse a stored one that differs only by small edits.
+        """
+        try:
+            self._sync()
+            self._ensure_loaded()
+            return self._similar(body, threshold, limit)
+        except Exception as e:
+            logger.error(f"Error finding similar prompts: {str(e)}")
+            raise
+    
+    def _similar(self, body: str, threshold: float, limit: Optional[int],
+                 exclude: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Look up near-duplicates of a body, through the MinHash index when there is one."""
+        index = self.duplicate_index or MinHashIndex()
+        signature = index.signature(body)
+        if signature is None:
+            return []
+        
+        with self._index_lock.read():
+            if self.duplicate_index is not None:
+                matches = [
+                    (self.prompts[self._ids[ordinal]], similarity)
+                    for ordinal, similarity in self.duplicate_index.query(signature, threshold)
+                ]
+            else:
+                # Without the index every prompt has to be compared
+                matches = []
+                for record in self.prompts.values():
+                    other = index.signature(record.body)
+                    similarity = minhash_similarity(signature, other) if other is not None else 0.0
+                    if similarity >= threshold:
+                        matches.append((record, similarity))
+                matches.sort(key=lambda match: (-match[1], match[0].seq))
+        
+        matches = [(record, similarity) for record, similarity in matches if record.id != exclude]
+        return [
+            dict(record.to_dict(), similarity=similarity)
+            for record, similarity in (matches if limit is None else matches[:limit])
+        ]
+    
+    def semantic_search(self, query: str, k: int = 10, budget_ms: Optional[float] = None,
+                        nprobe: Optional[int] = None) -> Dict[str, Any]:
+        """Find the ``k`` prompts whose bodies are closest in meaning to ``query``.
+        
+        ``budget_ms`` bounds the time spent, embedding the query included; when it runs out the best
+        prompts found so far are returned. Returns the prompts (without audit logs) with their cosine
+        ``score``, best first, and whether the budget ``truncated`` the search.
+        """
+        try:
+            if self.vector_index is None:
+                raise ValueError("Semantic search needs the prompt store to have an embedder")
+            deadline = None if budget_ms is None else time.monotonic() + budget_ms / 1000
+            self._sync()
+            self._ensure_loaded()
+            vector = self.embedder.embed([query])
+            with self._index_lock.read():
+                (matches,), truncated = self.vector_index.search(vector, k=k, nprobe=nprobe, deadline=deadline)
+                results = [
+                    dict(self.prompts[self._ids[ordinal]].to_dict(), score=score)
+                    for ordinal, score in matches
+                ]
+            return {"results": results, "truncated": truncated}
+        except Exception as e:
+            logger.error(f"Error in semantic prompt search: {str(e)}")
+            raise
+    
+    def cluster_duplicates(self, threshold: float = 0.8) -> List[List[str]]:
+        """Group the whole library into clusters of near-duplicate prompts.
+        
+        Meant to run as a batch job: clusters are built from a snapshot of the MinHash signatures, so
+        writes are only held up while it is taken, and without the index the signatures are computed
+        on the fly. Returns clusters of two or more prompt IDs, largest first, each oldest first.
+        """
+        try:
+            self._sync()
+            self._ensure_loaded()
+            if self.duplicate_index is not None:
+                with self._index_lock.read():
+                    signatures = self.duplicate_index.signatures()
+                bands = self.duplicate_index.bands
+            else:
+                index = MinHashIndex()
+                signatures = {}
+                for record in list(self.prompts.values()):
+                    signature = index.signature(record.body)
+                    if signature is not None:
+                        signatures[record.seq] = signature
+                bands = index.bands
             
-            for prompt_data in self.prompts.values():
-                # Check if tags match
-                if tags:
-                    if any(tag in prompt_data["tags"] for tag in tags):
-                        results.append(prompt_data)
-                # Check if query matches body or other fields
-                elif query:
-                    if query.lower() in prompt_data["body"].lower():
-                        results.append(prompt_data)
-                else:
-                    results.append(prompt_data)
+            clusters = []
+            for ordinals in cluster_signatures(signatures, bands=bands, threshold=threshold):
+                # Prompts deleted since the snapshot drop out
+                prompt_ids = [prompt_id for prompt_id in map(self._ids.get, ordinals) if prompt_id is not None]
+                if len(prompt_ids) > 1:
+                    clusters.append(prompt_ids)
             
-            return results
+            logger.info(f"Found {len(clusters)} clusters of near-duplicate prompts")
+            return clusters
+        
         except Exception as e:
-            logger.error(f"Error searching prompts: {str(e)}")
+            logger.error(f"Error clustering duplicate prompts: {str(e)}")
             raise
     
-    def backup_prompts(self, backup_path: str = None) -> bool:
-        """Backup all prompts to a file."""
+    def get_storage_stats(self) -> Dict[str, Any]:
+        """Report how much body storage content addressing saved.
+        
+        ``referenced_bytes`` is what the prompts and version snapshots would take with a copy each;
+        ``stored_bytes`` is what the deduplicated blobs actually take.
+        """
+        with self._reader() as conn:
+            row = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(size * refcount), 0), COALESCE(SUM(refcount), 0) "
+                "FROM prompt_blobs"
+            ).fetchone()
+        blobs, stored, referenced, references = row
+        return {
+            "blobs": blobs,
+            "references": references,
+            "stored_bytes": stored,
+            "referenced_bytes": referenced,
+            "saved_bytes": referenced - stored,
+            "dedup_ratio": referenced / stored if stored else 1.0
+        }
+    
+    def _prompt_record(self, conn: sqlite3.Connection, row: sqlite3.Row) -> Dict[str, Any]:
+        """Build the archive record for a prompts table row, with its stored history and audit entries."""
+        return {
+            "type": "prompt",
+            "seq": row["seq"],
+            "prompt": {
+                "body": row["body"],
+                "version": row["version"],
+                "tags": json.loads(row["tags"]),
+                "created_at": row["created_at"],
+                "updated_at": row["updated_at"]
+            },
+            "versions": [
+                [
+                    version["seq"],
+                    version["version"],
+                    version["kind"],
+                    # Archives are self-contained, so snapshots carry their body rather than a blob hash
+                    dict(json.loads(version["payload"]), body=version["body"]) if version["kind"] == "snapshot"
+                    else json.loads(version["payload"]),
+                    version["timestamp"]
+                ]
+                for version in conn.execute(
+                    f"{VERSION_SELECT} WHERE prompt_versions.prompt_id = ? ORDER BY prompt_versions.seq", (row["id"],)
+                )
+            ],
+            "audit": [
+                [audit["seq"], audit["version_seq"], json.loads(audit["entry"])]
+                for audit in conn.execute(
+                    "SELECT * FROM prompt_audit WHERE prompt_id = ? ORDER BY seq", (row["id"],)
+                )
+            ]
+        }
+    
+    def import_prompts(self, prompts: Iterable[Any], chunk_size: int = 500) -> Dict[str, Any]:
+        """Create prompts in bulk, committing one transaction per ``chunk_size`` rows.
+        
+        ``prompts`` is any iterable of ``{"body", "version", "tags"}`` objects and is consumed one
+        chunk at a time, so it can be ``bulk.iter_ndjson`` reading a file or request stream. Rows are
+        validated as by ``POST /prompts/bulk``: a row that is malformed or fails to insert is reported
+        by its position and skipped, and the rest of its chunk still commits. Returns the number of
+        prompts imported and failed, the new IDs and the per-row errors.
+        """
         try:
-            if not backup_path:
-                backup_path = f"prompts_backup_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.json"
+            result = bulk.new_result()
+            for chunk in bulk.chunked(prompts, chunk_size):
+                self._import_chunk(chunk, result)
             
-            backup_data = {
-                "prompts": self.prompts,
-                "version_history": self.version_history,
-                "backup_timestamp": datetime.utcnow().isoformat()
-            }
+            logger.info(f"Imported {result['imported']} prompts ({result['failed']} failed)")
+            return result
+        
+        except Exception as e:
+            logger.error(f"Error importing prompts: {str(e)}")
+            raise
+    
+    def _import_chunk(self, chunk: bulk.Chunk, result: Dict[str, Any]) -> None:
+        """Insert one chunk of bulk import rows in a single transaction."""
+        now = datetime.utcnow().isoformat()
+        # Rows are validated up front so their bodies can be embedded before the transaction
+        rows = bulk.validate_chunk(chunk, result)
+        vectors = self._embed_new([body for _, (body, _, _) in rows])
+        
+        imported = []
+        with self._transaction() as conn:
+            for index, (body, version, tags) in rows:
+                change_seq = self._change_seq
+                conn.execute("SAVEPOINT import_row")
+                try:
+                    record = self._insert_prompt(conn, body, version, tags, now)
+                except sqlite3.Error as e:
+                    # The row's IDs are handed out again, so nothing may point at them; pending
+                    # versions for the ID are harmless as no index can be loaded for a new prompt
+                    conn.execute("ROLLBACK TO import_row")
+                    conn.execute("RELEASE import_row")
+                    self._change_seq = change_seq
+                    bulk.add_error(result, index, e)
+                    continue
+                conn.execute("RELEASE import_row")
+                
+                self._cache_put(record)
+                imported.append(record.id)
+            self._store_vectors(conn, vectors)
+        bulk.add_imported(result, imported)
+    
+    def export_prompts(self, tags: List[str] = None) -> Iterator[Dict[str, Any]]:
+        """Yield current prompts in creation order, optionally only those carrying one of ``tags``.
+        
+        Prompts are built one at a time from the cache as the caller consumes them, so an export
+        never holds more than the list of IDs. A prompt updated while an export is running is
+        exported as it is when reached, and one deleted before then is skipped. Until the library is
+        loaded, prompts are read from one generation of the shared cache instead.
+        """
+        self._sync()
+        if not self._loaded:
+            yield from self._export_shared(tags)
+            return
+        with self._index_lock.read():
+            if tags:
+                prompt_ids = [self._ids[ordinal] for ordinal in self.tag_index.query(any_tags=tags)]
+            else:
+                prompt_ids = list(self.prompts)
+        
+        for prompt_id in prompt_ids:
+            record = self.prompts.get(prompt_id)
+            if record is not None:
+                yield record.to_dict()
+    
+    def _export_shared(self, tags: Optional[List[str]]) -> Iterator[Dict[str, Any]]:
+        """Yield current prompts from the shared cache, with the overlay's newer ones in their place.
+        
+        Prompts created since the generation come last, in creation order.
+        """
+        wanted = set(tags or [])
+        generation, records = self.shared_cache.iter_records()
+        overlay = {
+            prompt_id: record for prompt_id, (seq, record) in list(self._overlay.items())
+            if seq > (generation or 0)
+        }
+        for seq, prompt_data in records:
+            if prompt_data["id"] in overlay:
+                record = overlay.pop(prompt_data["id"])
+                prompt_data = record.to_dict() if record is not None else None
+            if prompt_data is not None and (not wanted or wanted.intersection(prompt_data["tags"])):
+                yield prompt_data
+        for record in sorted(filter(None, overlay.values()), key=lambda record: record.seq):
+            if not wanted or wanted.intersection(record.tags):
+                yield record.to_dict()
+    
+    def export_chunks(self, export_format: str = "ndjson", tags: List[str] = None,
+                      batch_size: int = 1000) -> Iterator[bytes]:
+        """Encode ``export_prompts`` as ``GET /prompts/export`` does, one chunk per ``batch_size`` prompts."""
+        return bulk.encode_export(self.export_prompts(tags), export_format, batch_size)
+    
+    def backup_prompts(self, backup_path: str = None, since: int = 0, compression: str = "zlib") -> int:
+        """Stream prompts to a backup archive and return the archive's checkpoint.
+        
+        Records are read and written one prompt at a time, with version history in its stored form
+        (snapshots and diffs). Passing the checkpoint of an earlier backup as ``since`` writes an
+        incremental backup holding only the prompts changed after it, with deletions as tombstones.
+        """
+        try:
+            if not backup_path:
+                kind = "incremental" if since else "full"
+                backup_path = f"prompts_backup_{kind}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.opra"
             
-            with open(backup_path, 'w') as f:
-                json.dump(backup_data, f, indent=2)
+            with self._reader() as conn:
+                floor = conn.execute("SELECT value FROM prompt_meta WHERE key = 'change_floor'").fetchone()
+                if since and floor is not None and since < floor[0]:
+                    raise ValueError(
+                        f"Checkpoint {since} is older than the change log, which starts at {floor[0]}; "
+                        "take a full backup"
+                    )
             
-            logger.info(f"Backed up prompts to {backup_path}")
-            return True
+            with self._reader() as conn, open(backup_path, 'wb') as f:
+                checkpoint = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM prompt_changes").fetchone()[0]
+                writer = ArchiveWriter(f, {
+                    "format": SCHEMA_VERSION,
+                    "since": since,
+                    "checkpoint": checkpoint,
+                    "backup_timestamp": datetime.utcnow().isoformat()
+                }, compression=compression)
+                
+                if since:
+                    changed = conn.execute(
+                        "SELECT DISTINCT prompt_id FROM prompt_changes WHERE seq > ? ORDER BY prompt_id", (since,)
+                    ).fetchall()
+                    for change in changed:
+                        row = conn.execute(f"{PROMPT_SELECT} WHERE prompts.id = ?", (change["prompt_id"],)).fetchone()
+                        if row is None:
+                            writer.write(change["prompt_id"], {"type": "deleted"})
+                        else:
+                            writer.write(row["id"], self._prompt_record(conn, row))
+                else:
+                    for row in conn.execute(f"{PROMPT_SELECT} ORDER BY prompts.seq"):
+                        writer.write(row["id"], self._prompt_record(conn, row))
+                
+                count = writer.close()
             
+            logger.info(f"Backed up {count} prompts to {backup_path} (checkpoint {checkpoint})")
+            return checkpoint
+        
         except Exception as e:
             logger.error(f"Error backing up prompts: {str(e)}")
             raise
     
-    def restore_prompts(self, backup_path: str) -> bool:
-        """Restore prompts from a backup file."""
+    def prune_changes(self, before: int) -> int:
+        """Drop the change log tombstones of prompts deleted at or before the checkpoint ``before``.
+        
+        Each change already replaces the prompt's earlier entries, so the log holds one entry per
+        prompt plus one per deleted prompt. Tombstones tell incremental backups and other processes
+        about deletes, so prune only up to the oldest checkpoint an incremental backup will still be
+        taken from: older checkpoints are refused afterwards, and processes that had not caught up
+        reload the library. Returns the number of entries dropped.
+        """
         try:
-            with open(backup_path, 'r') as f:
-                backup_data = json.load(f)
+            with self._transaction() as conn:
+                before = min(before, self._change_seq)
+                # Databases written before entries were replaced can still hold superseded ones
+                superseded = conn.execute(
+                    "DELETE FROM prompt_changes "
+                    "WHERE seq NOT IN (SELECT MAX(seq) FROM prompt_changes GROUP BY prompt_id)"
+                ).rowcount
+                # The latest entry stays, as it is the checkpoint the next backup starts from
+                tombstones = conn.execute(
+                    "DELETE FROM prompt_changes WHERE seq <= ? AND seq < ? "
+                    "AND NOT EXISTS (SELECT 1 FROM prompts WHERE prompts.id = prompt_changes.prompt_id)",
+                    (before, self._change_seq)
+                ).rowcount
+                conn.execute(
+                    "INSERT INTO prompt_meta (key, value) VALUES ('change_floor', ?) "
+                    "ON CONFLICT (key) DO UPDATE SET value = MAX(value, excluded.value)",
+                    (before,)
+                )
             
-            self.prompts = backup_data.get("prompts", {})
-            self.version_history = backup_data.get("version_history", {})
+            logger.info(f"Pruned {superseded + tombstones} prompt change log entries up to checkpoint {before}")
+            return superseded + tombstones
+        
+        except Exception as e:
+            logger.error(f"Error pruning prompt change log: {str(e)}")
+            raise
+    
+    def _restore_record(self, conn: sqlite3.Connection, record: Dict[str, Any], replace: bool = True) -> None:
+        """Replace a prompt with the state in an archive record. Must be called inside a transaction."""
+        prompt_id = record["id"]
+        if replace:
+            self._delete_rows(conn, prompt_id)
+        self._record_change(conn, prompt_id)
+        if record["type"] == "deleted":
+            return
+        if record["type"] != "prompt":
+            raise ArchiveError(f"Unexpected {record['type']} record for {prompt_id}")
+        
+        try:
+            prompt_data = record["prompt"]
+            match = PROMPT_ID_PATTERN.match(prompt_id)
+            conn.execute(
+                "INSERT INTO prompts (seq, id, body_hash, version, tags, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    record.get("seq") or (int(match.group(1)) if match else None),
+                    prompt_id,
+                    self._blob_ref(conn, prompt_data["body"]),
+                    prompt_data["version"],
+                    json.dumps(prompt_data.get("tags", [])),
+                    prompt_data["created_at"],
+                    prompt_data["updated_at"]
+                )
+            )
+            for seq, version, kind, payload, timestamp in record.get("versions", []):
+                self._insert_version(conn, prompt_id, seq, version, kind, payload, timestamp)
+            conn.executemany(
+                "INSERT INTO prompt_audit (prompt_id, seq, version_seq, entry) VALUES (?, ?, ?, ?)",
+                [
+                    (prompt_id, seq, version_seq, json.dumps(entry))
+                    for seq, version_seq, entry in record.get("audit", [])
+                ]
+            )
+        except (KeyError, TypeError, ValueError) as e:
+            raise ArchiveError(f"Invalid record for {prompt_id}: {str(e)}")
+    
+    def restore_prompts(self, backup_path: str) -> bool:
+        """Restore prompts from a backup file.
+        
+        A full backup replaces the current contents of the store; an incremental one is applied on
+        top of them. Records are validated as they stream in, and nothing is changed unless the whole
+        archive is intact.
+        """
+        try:
+            if not is_archive(backup_path):
+                self._restore_json(backup_path)
+            else:
+                with open(backup_path, 'rb') as f:
+                    reader = ArchiveReader(f)
+                    with self._transaction() as conn:
+                        incremental = bool(reader.header.get("since"))
+                        if not incremental:
+                            for (prompt_id,) in conn.execute("SELECT id FROM prompts").fetchall():
+                                self._record_change(conn, prompt_id)
+                            self._delete_all_rows(conn)
+                        
+                        restored = []
+                        for record in reader:
+                            self._restore_record(conn, record, replace=incremental)
+                            restored.append(record["id"])
+                        
+                        if incremental:
+                            for prompt_id in restored:
+                                self._refresh(prompt_id)
+                        else:
+                            self._drop_stale_vectors(conn)
+                if not incremental:
+                    self._reload()
             
             logger.info(f"Restored prompts from {backup_path}")
             return True
-            
+        
         except Exception as e:
             logger.error(f"Error restoring prompts: {str(e)}")
             raise
+    
+    def restore_prompt(self, backup_path: str, prompt_id: str) -> bool:
+        """Restore a single prompt from a backup archive, reading only its record.
+        
+        Returns False if the archive does not contain the prompt.
+        """
+        try:
+            with open(backup_path, 'rb') as f:
+                record = ArchiveReader(f).read_record(prompt_id)
+            if record is None:
+                return False
+            
+            with self._transaction() as conn:
+                self._restore_record(conn, record)
+                self._refresh(prompt_id)
+            
+            logger.info(f"Restored prompt {prompt_id} from {backup_path}")
+            return True
+        
+        except Exception as e:
+            logger.error(f"Error restoring prompt {prompt_id}: {str(e)}")
+            raise
+    
+    def _restore_json(self, backup_path: str) -> None:
+        """Restore a JSON backup written before backups were streamed, replacing the store."""
+        with open(backup_path, 'r') as f:
+            backup_data = json.load(f)
+        
+        with self._transaction() as conn:
+            for (prompt_id,) in conn.execute("SELECT id FROM prompts").fetchall():
+                self._record_change(conn, prompt_id)
+            self._delete_all_rows(conn)
+            
+            for prompt_id, prompt_data in backup_data.get("prompts", {}).items():
+                if "versions" not in backup_data:
+                    # Backups from before delta-encoded history carry full copies of each version
+                    self._import_prompt(conn, prompt_data, backup_data.get("version_history", {}).get(prompt_id, []))
+                    self._record_change(conn, prompt_id)
+                    continue
+                
+                self._restore_record(conn, {
+                    "type": "prompt",
+                    "id": prompt_id,
+                    "prompt": prompt_data,
+                    "versions": backup_data["versions"].get(prompt_id, []),
+                    "audit": backup_data.get("audit", {}).get(prompt_id, [])
+                }, replace=False)
+            self._drop_stale_vectors(conn)
+        
+        self._reload()
+    
+    def _reload(self) -> None:
+        """Start over from the database after the whole library was replaced.
+        
+        A loaded library is loaded again; otherwise a new shared generation replaces the overlay.
+        """
+        if self._loaded or self.shared_cache is None:
+            self._load()
+            return
+        with self._lock:
+            self.publish_shared_cache(full=True)
+            with self._index_lock.write():
+                self._overlay = {}
+                self._version_indexes = {}
+    
+    def _schedule_publish(self) -> None:
+        """Publish the shared cache once ``publish_interval`` has passed, unless a publish is already due.
+        
+        Writes made meanwhile go into the same generation. Caller must hold the write lock.
+        """
+        if self.publish_interval <= 0:
+            self.publish_shared_cache()
+        elif self._publish_timer is None:
+            self._publish_timer = threading.Timer(self.publish_interval, self._publish_due)
+            self._publish_timer.daemon = True
+            self._publish_timer.start()
+    
+    def _publish_due(self) -> None:
+        """Publish the shared cache for the writes since the last generation, unless the store was closed.
+        
+        Writes carry on while it is built; any that miss the snapshot schedule the next publish.
+        """
+        with self._lock:
+            if self._publish_timer is None:
+                return
+            self._publish_timer = None
+        try:
+            self.publish_shared_cache()
+        except Exception:
+            # Already logged; the next write schedules another publish
+            pass
+    
+    @contextmanager
+    def _publisher(self):
+        """Yield a connection for publishing the shared cache.
+        
+        File databases get a connection of their own, so a publish holds up neither writers nor the
+        thread that scheduled it; an in-memory database has only the one connection, used under the
+        write lock.
+        """
+        if self.db_path == ":memory:":
+            with self._lock:
+                yield self._conn
+            return
+        
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA busy_timeout = 5000")
+        try:
+            yield conn
+        finally:
+            conn.close()
+    
+    def _generation_versions(self, conn: sqlite3.Connection, prompt_ids: Optional[List[str]] = None
+                             ) -> Dict[str, List[tuple]]:
+        """Read the version index entries of some prompts, or of all of them, for a shared cache generation."""
+        query = "SELECT prompt_id, seq, version, timestamp FROM prompt_versions"
+        chunks = [None] if prompt_ids is None else [prompt_ids[i:i + 500] for i in range(0, len(prompt_ids), 500)]
+        versions = {}
+        for chunk in chunks:
+            where = "" if chunk is None else f" WHERE prompt_id IN ({','.join('?' * len(chunk))})"
+            for row in conn.execute(f"{query}{where} ORDER BY prompt_id, seq", chunk or ()):
+                versions.setdefault(row["prompt_id"], []).append((row["seq"], row["version"], row["timestamp"]))
+        return versions
+    
+    def _generation_prompts(self, conn: sqlite3.Connection, prompt_ids: Optional[List[str]] = None
+                            ) -> Iterable[Dict[str, Any]]:
+        """Read some prompts, or all of them in creation order, for a shared cache generation."""
+        if prompt_ids is None:
+            rows = conn.execute(f"{PROMPT_SELECT} ORDER BY prompts.seq")
+        else:
+            rows = [
+                row for i in range(0, len(prompt_ids), 500)
+                for row in conn.execute(
+                    f"{PROMPT_SELECT} WHERE prompts.id IN ({','.join('?' * len(prompt_ids[i:i + 500]))})",
+                    prompt_ids[i:i + 500]
+                )
+            ]
+        return (dict(self._row_to_record(row, None).to_dict(), seq=row["seq"]) for row in rows)
+    
+    def publish_shared_cache(self, path: str = None, full: bool = False) -> int:
+        """Publish the committed prompts and version indexes as a new shared cache generation.
+        
+        The generation is numbered by the change log checkpoint of the snapshot it was read from.
+        Unless ``full`` is set it is built from the published generation and the prompts changed
+        since, and only rebuilt from every prompt once the generation it would copy holds more stale
+        records than live ones, or the change log no longer reaches back to it. Either way the
+        database write lock is only held while the file is swapped in, which is skipped if another
+        process has published a generation at least as new meanwhile; ``full`` swaps regardless.
+        Returns the generation number.
+        """
+        try:
+            path = path or self.shared_cache_path
+            base = None
+            if not full and path == self.shared_cache_path:
+                try:
+                    base = self.shared_cache.snapshot()
+                except CacheError:
+                    base = None
+            
+            with self._publisher() as conn:
+                conn.execute("BEGIN")
+                try:
+                    generation = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM prompt_changes").fetchone()[0]
+                    floor = conn.execute("SELECT value FROM prompt_meta WHERE key = 'change_floor'").fetchone()
+                    if base is not None and (
+                        base.generation > generation or base.stale > base.count
+                        or (floor is not None and base.generation < floor[0])
+                    ):
+                        base = None
+                    if base is not None and base.generation == generation:
+                        return generation
+                    
+                    replace = self._swap_generation(conn, generation, full)
+                    if base is None:
+                        prompts = self._generation_prompts(conn)
+                        count = write_generation(path, generation, prompts, self._generation_versions(conn), replace)
+                    else:
+                        changed = [row[0] for row in conn.execute(
+                            "SELECT DISTINCT prompt_id FROM prompt_changes WHERE seq > ?", (base.generation,)
+                        )]
+                        prompts = self._generation_prompts(conn, changed)
+                        versions = self._generation_versions(conn, changed)
+                        count = update_generation(path, base, generation, changed, prompts, versions, replace)
+                finally:
+                    if conn.in_transaction:
+                        conn.execute("COMMIT")
+            
+            logger.debug(f"Published {count} prompts to the shared cache at {path} (generation {generation})")
+            return generation
+        
+        except Exception as e:
+            logger.error(f"Error publishing shared prompt cache: {str(e)}")
+            raise
+    
+    def _swap_generation(self, conn: sqlite3.Connection, generation: int, force: bool):
+        """Get the function that moves a written generation into place under the database write lock.
+        
+        The snapshot the generation was read from is released first. Taking the write lock orders
+        publishes between processes: a generation is dropped if one at least as new is already
+        published, unless ``force`` is set.
+        """
+        def replace(temp_path: str, path: str) -> None:
+            conn.execute("COMMIT")
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                published = published_generation(path)
+                if force or published is None or published < generation:
+                    os.replace(temp_path, path)
+                else:
+                    os.remove(temp_path)
+            finally:
+                conn.execute("COMMIT")
+        return replace
+    
+    def close(self) -> None:
+        """Publish any writes still waiting for the shared cache and close the database connections."""
+        with self._lock:
+            if self._publish_timer is not None:
+                self._publish_timer.cancel()
+                self._publish_timer = None
+                self.publish_shared_cache()
+            for conn in self._reader_conns:
+                conn.close()
+            self._reader_conns = []
+            self._local = threading.local()
+            self._conn.close()
+
+# Global prompt store instance, opened on first use so importing this module touches no files
+_prompt_store: Optional[PromptStoreService] = None
+_prompt_store_lock = threading.Lock()
+
+def get_prompt_store() -> PromptStoreService:
+    """Get the global prompt store, opening and loading it on first use."""
+    global _prompt_store
+    if _prompt_store is None:
+        with _prompt_store_lock:
+            if _prompt_store is None:
+                _prompt_store = PromptStoreService(
+                    db_path=PROMPT_STORE_PATH,
+                    shared_cache_path=PROMPT_CACHE_PATH,
+                    publish_interval=PROMPT_CACHE_PUBLISH_INTERVAL,
+                    duplicate_index=PROMPT_DUPLICATE_INDEX,
+                    embedder=make_embedder(PROMPT_EMBEDDER, host=OLLAMA_HOST) if PROMPT_EMBEDDER else None
+                )
+    return _prompt_store
 
-# Global prompt store instance
-prompt_store = PromptStoreService()
\ No newline at end of file
+def close_prompt_store() -> None:
+    """Close the global prompt store if it was opened."""
+    global _prompt_store
+    with _prompt_store_lock:
+        if _prompt_store is not None:
+            _prompt_store.close()
+            _prompt_store = None
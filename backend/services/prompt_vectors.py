@@ -0,0 +1,312 @@
+# AI Agentic Platform - Prompt Vectors
+"""
+Embeddings and a vector index for semantic prompt retrieval.
+
+Embedders turn texts into unit-length vectors, so cosine similarity is a dot product. ``HashingEmbedder``
+needs no model: it hashes words and word pairs into a fixed number of signed buckets. ``OllamaEmbedder``
+asks a local Ollama model instead. ``make_embedder`` builds either from a config string.
+
+``VectorIndex`` keeps the vectors in one NumPy matrix. Small libraries are searched exactly, a block
+of rows at a time. Past ``ivf_threshold`` vectors the index also clusters them with k-means (an IVF
+index): a query then scores only the rows in the ``nprobe`` clusters nearest to it. Either way a
+search can be given a deadline, and it returns the best matches found when the deadline passes.
+"""
+
+from typing import Dict, List, Optional, Set, Tuple
+import abc
+import math
+import time
+import zlib
+
+import numpy
+
+try:
+    import ollama
+    HAS_OLLAMA = True
+except ImportError:
+    HAS_OLLAMA = False
+
+from .prompt_index import tokenize
+
+# Lloyd iterations when training the IVF clusters, and sampled vectors per cluster
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE_PER_LIST = 32
+
+def normalize(vectors: numpy.ndarray) -> numpy.ndarray:
+    """Scale each row to unit length in place, leaving all-zero rows as they are."""
+    norms = numpy.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    vectors /= norms
+    return vectors
+
+class Embedder(abc.ABC):
+    """Turns texts into unit-length float32 vectors.
+    
+    ``name`` identifies the model and its settings, so stored vectors are only reused by an embedder
+    that would produce the same ones.
+    """
+    
+    name = "embedder"
+    
+    @abc.abstractmethod
+    def embed(self, texts: List[str]) -> numpy.ndarray:
+        """Embed texts into a ``(len(texts), dim)`` matrix of unit-length rows."""
+
+class HashingEmbedder(Embedder):
+    """Embeds texts by hashing their words and adjacent word pairs into ``dim`` signed buckets.
+    
+    Counts are damped with ``log1p`` so repeated words do not dominate. The hash is CRC-32, so
+    vectors are the same in every process.
+    """
+    
+    def __init__(self, dim: int = 256):
+        """Initialize the embedder."""
+        self.dim = dim
+        self.name = f"hashing:{dim}"
+    
+    def embed(self, texts: List[str]) -> numpy.ndarray:
+        """Embed texts into a ``(len(texts), dim)`` matrix of unit-length rows."""
+        vectors = numpy.zeros((len(texts), self.dim), dtype=numpy.float32)
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            features = tokens + [f"{first} {second}" for first, second in zip(tokens, tokens[1:])]
+            if not features:
+                continue
+            hashes = numpy.fromiter(
+                (zlib.crc32(feature.encode("utf-8")) for feature in features),
+                dtype=numpy.uint32, count=len(features)
+            )
+            # The top bit picks the sign, so colliding features tend to cancel out
+            signs = numpy.where(hashes & 0x80000000, 1.0, -1.0)
+            counts = numpy.bincount(hashes % self.dim, weights=signs, minlength=self.dim)
+            vectors[row] = numpy.sign(counts) * numpy.log1p(numpy.abs(counts))
+        return normalize(vectors)
+
+class OllamaEmbedder(Embedder):
+    """Embeds texts with a local embedding model served by Ollama."""
+    
+    def __init__(self, model: str = "nomic-embed-text", host: Optional[str] = None, client=None):
+        """Initialize the embedder with an Ollama client, creating one for ``host`` if none is given."""
+        if client is None:
+            if not HAS_OLLAMA:
+                raise RuntimeError("The ollama package is required for Ollama embeddings")
+            client = ollama.Client(host=host)
+        self.client = client
+        self.model = model
+        self.name = f"ollama:{model}"
+    
+    def embed(self, texts: List[str]) -> numpy.ndarray:
+        """Embed texts into a ``(len(texts), dim)`` matrix of unit-length rows."""
+        if hasattr(self.client, "embed"):
+            # Clients with the batch endpoint embed every text in one request
+            vectors = self.client.embed(model=self.model, input=texts)["embeddings"]
+        else:
+            vectors = [self.client.embeddings(model=self.model, prompt=text)["embedding"] for text in texts]
+        return normalize(numpy.array(vectors, dtype=numpy.float32))
+
+def make_embedder(spec: str, host: Optional[str] = None) -> Embedder:
+    """Build an embedder from a config string: ``hashing``, ``hashing:<dim>`` or ``ollama:<model>``."""
+    kind, _, argument = spec.partition(":")
+    if kind == "hashing":
+        return HashingEmbedder(int(argument) if argument else 256)
+    if kind == "ollama":
+        return OllamaEmbedder(argument or "nomic-embed-text", host=host)
+    raise ValueError(f"Unknown embedder: {spec}")
+
+def _top_k(scores: numpy.ndarray, rows: numpy.ndarray, k: int) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """Keep the ``k`` highest scores and their rows, best first."""
+    if len(scores) > k:
+        best = numpy.argpartition(-scores, k - 1)[:k]
+        scores, rows = scores[best], rows[best]
+    order = numpy.argsort(-scores, kind="stable")
+    return scores[order], rows[order]
+
+class VectorIndex:
+    """Cosine similarity index over unit-length vectors, keyed by prompt ordinal.
+    
+    Vectors live in the first ``len(self)`` rows of one matrix; removing a vector moves the last
+    row into its place, so the rows scanned are always contiguous.
+    """
+    
+    def __init__(self, ivf_threshold: int = 20000, nprobe: int = 8, block_size: int = 16384):
+        """Initialize an empty index; the dimension is taken from the first vector added."""
+        self.ivf_threshold = ivf_threshold
+        self.nprobe = nprobe
+        self.block_size = block_size
+        self.dim: Optional[int] = None
+        self._vectors = numpy.empty((0, 0), dtype=numpy.float32)
+        self._ordinals = numpy.empty(0, dtype=numpy.int64)
+        self._rows: Dict[int, int] = {}  # Ordinal -> row
+        self._count = 0
+        # IVF clusters, once trained: centroids, each row's cluster and each cluster's rows
+        self._centroids: Optional[numpy.ndarray] = None
+        self._assignments = numpy.empty(0, dtype=numpy.int32)
+        self._lists: List[Set[int]] = []
+        self._trained_at = 0
+    
+    def __len__(self) -> int:
+        """Get the number of indexed vectors."""
+        return self._count
+    
+    @property
+    def is_approximate(self) -> bool:
+        """Whether searches go through the IVF clusters rather than scanning every vector."""
+        return self._centroids is not None
+    
+    def _grow(self, dim: int) -> None:
+        """Double the capacity of the row arrays."""
+        capacity = max(1024, 2 * len(self._vectors))
+        vectors = numpy.empty((capacity, dim), dtype=numpy.float32)
+        if self._count:
+            vectors[:self._count] = self._vectors[:self._count]
+        self._vectors = vectors
+        self._ordinals = numpy.resize(self._ordinals, capacity)
+        self._assignments = numpy.resize(self._assignments, capacity)
+    
+    def add(self, ordinal: int, vector: numpy.ndarray) -> None:
+        """Index a prompt's vector, replacing whatever was indexed for it before."""
+        if self.dim is None:
+            self.dim = len(vector)
+        elif len(vector) != self.dim:
+            raise ValueError(f"Expected a vector of dimension {self.dim}, got {len(vector)}")
+        
+        row = self._rows.get(ordinal)
+        if row is None:
+            if self._count == len(self._vectors):
+                self._grow(self.dim)
+            row = self._count
+            self._count += 1
+            self._rows[ordinal] = row
+            self._ordinals[row] = ordinal
+        elif self._centroids is not None:
+            self._lists[self._assignments[row]].discard(row)
+        self._vectors[row] = vector
+        
+        if self._centroids is not None:
+            cluster = int(numpy.argmax(self._centroids @ vector))
+            self._assignments[row] = cluster
+            self._lists[cluster].add(row)
+        
+        # Retrain as the library doubles, so clusters keep up with where the vectors are
+        if self._count >= self.ivf_threshold and self._count >= 2 * self._trained_at:
+            self.train()
+    
+    def remove(self, ordinal: int) -> None:
+        """Remove a prompt's vector from the index."""
+        row = self._rows.pop(ordinal, None)
+        if row is None:
+            return
+        last = self._count - 1
+        if self._centroids is not None:
+            self._lists[self._assignments[row]].discard(row)
+        if row != last:
+            self._vectors[row] = self._vectors[last]
+            self._ordinals[row] = self._ordinals[last]
+            self._rows[int(self._ordinals[row])] = row
+            if self._centroids is not None:
+                cluster = self._assignments[last]
+                self._lists[cluster].discard(last)
+                self._lists[cluster].add(row)
+                self._assignments[row] = cluster
+        self._count = last
+        
+        if self._centroids is not None and self._count < self.ivf_threshold // 2:
+            self._centroids = None
+            self._lists = []
+            self._trained_at = 0
+    
+    def clear(self) -> None:
+        """Remove every vector from the index."""
+        self.__init__(self.ivf_threshold, self.nprobe, self.block_size)
+    
+    def train(self) -> None:
+        """Cluster the indexed vectors with spherical k-means into about ``sqrt(n)`` IVF lists."""
+        count = self._count
+        if not count:
+            return
+        lists = max(1, int(math.sqrt(count)))
+        rng = numpy.random.default_rng(0)
+        sample = self._vectors[rng.choice(count, size=min(count, lists * KMEANS_SAMPLE_PER_LIST), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=lists, replace=False)].copy()
+        for _ in range(KMEANS_ITERATIONS):
+            nearest = numpy.argmax(sample @ centroids.T, axis=1)
+            sums = numpy.zeros_like(centroids)
+            numpy.add.at(sums, nearest, sample)
+            # Clusters that lost every member keep their old centroid
+            filled = numpy.bincount(nearest, minlength=lists) > 0
+            centroids[filled] = normalize(sums[filled])
+        
+        assignments = numpy.empty(count, dtype=numpy.int32)
+        for start in range(0, count, self.block_size):
+            end = min(start + self.block_size, count)
+            assignments[start:end] = numpy.argmax(self._vectors[start:end] @ centroids.T, axis=1)
+        order = numpy.argsort(assignments, kind="stable")
+        bounds = numpy.searchsorted(assignments[order], numpy.arange(lists + 1))
+        
+        self._centroids = centroids
+        self._assignments[:count] = assignments
+        self._lists = [set(order[bounds[i]:bounds[i + 1]].tolist()) for i in range(lists)]
+        self._trained_at = count
+    
+    def search(self, queries: numpy.ndarray, k: int = 10, nprobe: Optional[int] = None,
+               deadline: Optional[float] = None) -> Tuple[List[List[Tuple[int, float]]], bool]:
+        """Find the ``k`` most similar indexed vectors for each row of ``queries``.
+        
+        ``deadline`` is a ``time.monotonic()`` value; a search still running then stops and returns
+        the best matches found so far. Returns ``(ordinal, score)`` lists, best first, one per query,
+        and whether the deadline cut the search short.
+        """
+        queries = numpy.atleast_2d(numpy.asarray(queries, dtype=numpy.float32))
+        if not self._count or k <= 0:
+            return [[] for _ in queries], False
+        if self._centroids is None:
+            return self._search_exact(queries, k, deadline)
+        return self._search_ivf(queries, k, nprobe or self.nprobe, deadline)
+    
+    def _results(self, scores: numpy.ndarray, rows: numpy.ndarray) -> List[Tuple[int, float]]:
+        """Pair matched rows' ordinals with their scores."""
+        return list(zip(self._ordinals[rows].tolist(), scores.tolist()))
+    
+    def _search_exact(self, queries: numpy.ndarray, k: int,
+                      deadline: Optional[float]) -> Tuple[List[List[Tuple[int, float]]], bool]:
+        """Score every vector against all queries at once, a block of rows at a time."""
+        best = [(numpy.empty(0, dtype=numpy.float32), numpy.empty(0, dtype=numpy.int64)) for _ in queries]
+        truncated = False
+        for start in range(0, self._count, self.block_size):
+            if deadline is not None and start and time.monotonic() >= deadline:
+                truncated = True
+                break
+            end = min(start + self.block_size, self._count)
+            scores = queries @ self._vectors[start:end].T
+            rows = numpy.arange(start, end)
+            for i, (best_scores, best_rows) in enumerate(best):
+                block_scores, block_rows = _top_k(scores[i], rows, k)
+                best[i] = _top_k(
+                    numpy.concatenate([best_scores, block_scores]), numpy.concatenate([best_rows, block_rows]), k
+                )
+        return [self._results(scores, rows) for scores, rows in best], truncated
+    
+    def _search_ivf(self, queries: numpy.ndarray, k: int, nprobe: int,
+                    deadline: Optional[float]) -> Tuple[List[List[Tuple[int, float]]], bool]:
+        """Score each query against the vectors in its ``nprobe`` nearest clusters."""
+        nearest = numpy.argsort(-(queries @ self._centroids.T), axis=1)[:, :nprobe]
+        results = []
+        truncated = False
+        for query, clusters in zip(queries, nearest):
+            best_scores = numpy.empty(0, dtype=numpy.float32)
+            best_rows = numpy.empty(0, dtype=numpy.int64)
+            for probed, cluster in enumerate(clusters):
+                # The nearest cluster is always searched, so there is something to return
+                if deadline is not None and probed and time.monotonic() >= deadline:
+                    truncated = True
+                    break
+                members = self._lists[cluster]
+                if not members:
+                    continue
+                rows = numpy.fromiter(members, dtype=numpy.int64, count=len(members))
+                scores = self._vectors[rows] @ query
+                best_scores, best_rows = _top_k(
+                    numpy.concatenate([best_scores, scores]), numpy.concatenate([best_rows, rows]), k
+                )
+            results.append(self._results(best_scores, best_rows))
+        return results, truncated
@@ -0,0 +1,259 @@
+# AI Agentic Platform - Usage Meter Service
+"""
+In-memory usage metering with batched, interval-based flushes into the User quota fields.
+"""
+
+from typing import Dict, Iterable, List, Optional, Set
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from uuid import UUID
+import asyncio
+import threading
+
+from sqlalchemy import bindparam, select
+
+from ..config import USAGE_FLUSH_INTERVAL_SECONDS, USAGE_RESET_PERIOD_DAYS
+from ..models import User, SessionLocal
+from ..utils.logging import logger
+
+@dataclass
+class UsageDelta:
+    """Usage accumulated for a user since the last flush, within one quota period."""
+    tokens: int = 0
+    calls: int = 0
+    requests: int = 0
+    last_accessed: Optional[datetime] = None
+    recorded_at: datetime = field(default_factory=datetime.utcnow)  # When usage was last added to it
+
+@dataclass
+class QuotaState:
+    """Last persisted quota state for a user, refreshed on every flush."""
+    quota: Optional[int] = None
+    used_tokens: int = 0
+    reset_date: Optional[datetime] = None
+    refreshed_at: datetime = field(default_factory=datetime.utcnow)
+
+class UsageMeter:
+    """Accumulates per-user usage in memory and flushes it to the database in batches."""
+    
+    def __init__(self, session_factory=SessionLocal,
+                 flush_interval: float = USAGE_FLUSH_INTERVAL_SECONDS,
+                 reset_period_days: int = USAGE_RESET_PERIOD_DAYS):
+        """Initialize the usage meter."""
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.reset_period = timedelta(days=reset_period_days)
+        self._lock = threading.Lock()
+        self._pending: Dict[UUID, List[UsageDelta]] = {}  # Oldest first, split where a quota period ends
+        self._snapshot: Dict[UUID, QuotaState] = {}
+        self._wanted: Set[UUID] = set()  # Users whose quota state should be loaded on the next flush
+        self._task: Optional[asyncio.Task] = None
+    
+    def _delta(self, user_id: UUID, now: datetime) -> UsageDelta:
+        """Get the pending delta to add a user's usage to now. Caller must hold the lock.
+        
+        Starts a new delta once the user's known reset date has passed, so usage from before the
+        reset is not counted in the period after it.
+        """
+        deltas = self._pending.setdefault(user_id, [])
+        state = self._snapshot.get(user_id)
+        reset_date = state.reset_date if state is not None else None
+        if not deltas or (reset_date is not None and deltas[-1].recorded_at < reset_date <= now):
+            deltas.append(UsageDelta())
+        delta = deltas[-1]
+        delta.recorded_at = now
+        return delta
+    
+    def record_request(self, user_id: UUID) -> None:
+        """Record an API request made by a user."""
+        now = datetime.utcnow()
+        with self._lock:
+            delta = self._delta(user_id, now)
+            delta.requests += 1
+            delta.last_accessed = now
+    
+    def record_call(self, user_id: UUID, tokens: int = 0) -> None:
+        """Record an LLM or tool call and the tokens it consumed."""
+        with self._lock:
+            delta = self._delta(user_id, datetime.utcnow())
+            delta.calls += 1
+            delta.tokens += tokens
+    
+    def remaining_quota(self, user_id: UUID) -> Optional[int]:
+        """Get the remaining token allowance for a user, or None if unlimited or not yet known.
+        
+        The persisted part of the answer is at most one flush interval old; usage recorded by
+        this process since the last flush is always included.
+        """
+        with self._lock:
+            state = self._snapshot.get(user_id)
+            if state is None:
+                self._wanted.add(user_id)
+                return None
+            if state.quota is None:
+                return None
+            
+            used = state.used_tokens
+            period_start = None
+            if state.reset_date is not None and state.reset_date <= datetime.utcnow():
+                used = 0
+                period_start = state.reset_date
+            used += _current_usage(self._pending.get(user_id, ()), period_start).tokens
+            return max(state.quota - used, 0)
+    
+    def check_quota(self, user_id: UUID) -> bool:
+        """Check whether a user still has quota left without touching the database."""
+        remaining = self.remaining_quota(user_id)
+        return remaining is None or remaining > 0
+    
+    def _next_reset_date(self, reset_date: datetime, now: datetime) -> datetime:
+        """Advance a reset date by whole periods until it lies in the future."""
+        while reset_date <= now:
+            reset_date += self.reset_period
+        return reset_date
+    
+    def flush(self) -> int:
+        """Flush pending usage to the database in batched updates.
+        
+        Returns the number of users whose counters were written.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            user_ids = set(pending) | self._wanted
+            self._wanted = set()
+        
+        if not user_ids:
+            return 0
+        
+        table = User.__table__
+        session = self.session_factory()
+        try:
+            now = datetime.utcnow()
+            rows = session.execute(
+                select(table.c.id, table.c.usage_quota, table.c.usage_reset_date, table.c.usage_tokens)
+                .where(table.c.id.in_(user_ids))
+            ).all()
+            
+            # Roll over counters for users whose reset date has passed
+            resets = {
+                row.id: self._next_reset_date(row.usage_reset_date, now)
+                for row in rows
+                if row.usage_reset_date is not None and row.usage_reset_date <= now
+            }
+            # Usage recorded before the current period started belongs to a period already reset
+            period_starts = {
+                row.id: resets.get(row.id, row.usage_reset_date) - self.reset_period
+                for row in rows
+                if row.usage_reset_date is not None
+            }
+            usage = {user_id: _current_usage(deltas, period_starts.get(user_id)) for user_id, deltas in pending.items()}
+            if resets:
+                session.execute(
+                    table.update()
+                    .where(table.c.id == bindparam("b_id"))
+                    .values(
+                        usage_tokens=0,
+                        usage_calls=0,
+                        usage_requests=0,
+                        usage_reset_date=bindparam("b_reset_date")
+                    ),
+                    [{"b_id": user_id, "b_reset_date": reset_date} for user_id, reset_date in resets.items()]
+                )
+            
+            if pending:
+                session.execute(
+                    table.update()
+                    .where(table.c.id == bindparam("b_id"))
+                    .values(
+                        usage_tokens=table.c.usage_tokens + bindparam("b_tokens"),
+                        usage_calls=table.c.usage_calls + bindparam("b_calls"),
+                        usage_requests=table.c.usage_requests + bindparam("b_requests"),
+                        last_accessed=bindparam("b_last_accessed")
+                    ),
+                    [
+                        {
+                            "b_id": user_id,
+                            "b_tokens": delta.tokens,
+                            "b_calls": delta.calls,
+                            "b_requests": delta.requests,
+                            "b_last_accessed": delta.last_accessed or now
+                        }
+                        for user_id, delta in usage.items()
+                    ]
+                )
+            
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            # Put the usage back so it is retried on the next flush
+            with self._lock:
+                for user_id, deltas in pending.items():
+                    self._pending[user_id] = deltas + self._pending.get(user_id, [])
+            logger.error(f"Error flushing usage for {len(pending)} users: {str(e)}")
+            raise
+        finally:
+            session.close()
+        
+        # Refresh the in-memory quota snapshot from what was just persisted
+        with self._lock:
+            for row in rows:
+                used = 0 if row.id in resets else (row.usage_tokens or 0)
+                delta = usage.get(row.id)
+                if delta is not None:
+                    used += delta.tokens
+                self._snapshot[row.id] = QuotaState(
+                    quota=row.usage_quota,
+                    used_tokens=used,
+                    reset_date=resets.get(row.id, row.usage_reset_date),
+                    refreshed_at=now
+                )
+        
+        logger.debug(f"Flushed usage for {len(pending)} users")
+        return len(pending)
+    
+    async def _run(self) -> None:
+        """Flush pending usage on a fixed interval until cancelled."""
+        loop = asyncio.get_event_loop()
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await loop.run_in_executor(None, self.flush)
+            except Exception:
+                # Already logged and re-queued by flush; keep the loop alive
+                pass
+    
+    def start(self) -> None:
+        """Start the background flush loop on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_event_loop().create_task(self._run())
+            logger.info(f"Usage meter started (flush interval {self.flush_interval}s)")
+    
+    async def stop(self) -> None:
+        """Stop the background flush loop and flush whatever is still pending."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await asyncio.get_event_loop().run_in_executor(None, self.flush)
+        logger.info("Usage meter stopped")
+
+def _current_usage(deltas: Iterable[UsageDelta], period_start: Optional[datetime]) -> UsageDelta:
+    """Sum the deltas recorded since ``period_start``, or all of them if there is none.
+    
+    The sum keeps the latest ``last_accessed`` of every delta, counted or not.
+    """
+    total = UsageDelta()
+    for delta in deltas:
+        if delta.last_accessed is not None:
+            total.last_accessed = max(delta.last_accessed, total.last_accessed or delta.last_accessed)
+        if period_start is None or delta.recorded_at >= period_start:
+            total.tokens += delta.tokens
+            total.calls += delta.calls
+            total.requests += delta.requests
+    return total
+
+# Global usage meter instance
+usage_meter = UsageMeter()
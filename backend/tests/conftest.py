@@ -0,0 +1,31 @@
+# AI Agentic Platform - Test Fixtures
+"""
+Fixtures shared by the backend tests.
+"""
+
+from typing import AsyncIterator
+
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from sqlmodel import SQLModel
+
+# Import our models so every table is created
+from .. import models
+
+@pytest_asyncio.fixture
+async def db() -> AsyncIterator[AsyncSession]:
+    """Yield a session on a fresh in-memory database.
+    
+    The engine is disposed of afterwards, as its connection thread would otherwise outlive the test.
+    """
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    session = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)()
+    try:
+        yield session
+    finally:
+        await session.close()
+        await engine.dispose()
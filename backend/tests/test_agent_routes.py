@@ -0,0 +1,94 @@
+# AI Agentic Platform - Agent Route Tests
+"""
+Unit tests for the agent routes, called through the application on async database sessions.
+"""
+
+import uuid
+from types import SimpleNamespace
+from typing import AsyncIterator
+
+import httpx
+import pytest
+import pytest_asyncio
+from fastapi import FastAPI
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import SQLModel
+
+# Import our agent routes
+from .. import models
+from ..config import Settings
+from ..models import create_async_database_engine, get_async_db
+from ..routes import agents
+from ..routes.auth import get_current_active_user
+
+@pytest_asyncio.fixture
+async def async_engine(tmp_path) -> AsyncIterator[AsyncEngine]:
+    """Point the ``get_async_db`` dependency at a fresh database file and yield its engine.
+    
+    The engine is configured as the platform's is, and the dependency itself is not overridden, so
+    requests open and close pooled sessions as in production.
+    """
+    engine = create_async_database_engine(Settings(database_url=f"sqlite:///{tmp_path / 'agents.db'}"))
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    sessions = models.AsyncSessionLocal
+    models.AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+    try:
+        yield engine
+    finally:
+        models.AsyncSessionLocal = sessions
+        await engine.dispose()
+
+def make_client(user_id: uuid.UUID) -> httpx.AsyncClient:
+    """Get a client for an application serving only the agent routes, signed in as ``user_id``."""
+    app = FastAPI()
+    app.include_router(agents.router, prefix="/agents")
+    app.dependency_overrides[get_current_active_user] = lambda: SimpleNamespace(id=user_id)
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+@pytest.mark.asyncio
+async def test_get_async_db_closes_its_session(async_engine):
+    """Test that the dependency yields an async session and returns its connection when done."""
+    dependency = get_async_db()
+    db = await dependency.__anext__()
+    assert isinstance(db, AsyncSession)
+    assert (await db.execute(text("SELECT 1"))).scalar() == 1
+    assert async_engine.sync_engine.pool.checkedout() == 1
+    
+    await dependency.aclose()
+    assert async_engine.sync_engine.pool.checkedout() == 0
+
+@pytest.mark.asyncio
+async def test_agent_routes_read_their_writes(async_engine):
+    """Test creating, reading, updating and listing agents, each request on its own async session."""
+    owner_id = uuid.uuid4()
+    async with make_client(owner_id) as client:
+        response = await client.post("/agents/", params={"name": "Support", "description": "Answers tickets"})
+        assert response.status_code == 200
+        created = response.json()
+        assert created["owner_id"] == str(owner_id) and created["status"] == "inactive"
+        
+        response = await client.get(f"/agents/{created['id']}")
+        assert response.status_code == 200
+        assert response.json()["name"] == "Support"
+        
+        response = await client.put(f"/agents/{created['id']}", params={"status": "active"})
+        assert response.status_code == 200
+        assert response.json()["status"] == "active"
+        
+        response = await client.get("/agents/", params={"status": "active", "fields": "id,name,status"})
+        assert response.status_code == 200
+        assert response.json() == {
+            "items": [{"id": created["id"], "name": "Support", "status": "active"}],
+            "next_cursor": None
+        }
+        
+        assert (await client.get(f"/agents/{uuid.uuid4()}")).status_code == 404
+    
+    # Every request's session was closed when its response was sent
+    assert async_engine.sync_engine.pool.checkedout() == 0
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -3,19 +3,51 @@
 Unit tests for authentication endpoints.
 """
 
+from typing import AsyncIterator
+
+import httpx
 import pytest
-from fastapi.testclient import TestClient
-from sqlalchemy.orm import Session
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
 
 # Import our application
+from ..config import Settings
 from ..main import app
-from ..models import get_db
+from ..migrate import migrate
+from ..models import create_async_database_engine, create_database_engine, get_async_db
 
-client = TestClient(app)
+@pytest_asyncio.fixture
+async def client(tmp_path) -> AsyncIterator[httpx.AsyncClient]:
+    """Yield a client for the application, running on a temporary database.
+    
+    The application leaves the schema to the migration step, as a deploy runs it before starting,
+    so the database is migrated first.
+    """
+    config = Settings(database_url=f"sqlite:///{tmp_path / 'auth.db'}")
+    sync_engine = create_database_engine(config)
+    migrate(sync_engine)
+    sync_engine.dispose()
+    
+    async_engine = create_async_database_engine(config)
+    sessions = sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+    
+    async def get_test_db():
+        async with sessions() as db:
+            yield db
+    
+    app.dependency_overrides[get_async_db] = get_test_db
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            yield client
+    finally:
+        app.dependency_overrides.pop(get_async_db, None)
+        await async_engine.dispose()
 
-def test_register_user():
+@pytest.mark.asyncio
+async def test_register_user(client):
     """Test user registration endpoint."""
-    response = client.post(
+    response = await client.post(
         "/auth/register",
         json={
             "email": "test@example.com",
@@ -30,10 +62,11 @@ def test_register_user():
     assert data["email"] == "test@example.com"
     assert data["full_name"] == "Test User"
 
-def test_login_user():
+@pytest.mark.asyncio
+async def test_login_user(client):
     """Test user login endpoint."""
     # First register a user
-    client.post(
+    await client.post(
         "/auth/register",
         json={
             "email": "login_test@example.com",
@@ -44,7 +77,7 @@ def test_login_user():
     )
     
     # Then login
-    response = client.post(
+    response = await client.post(
         "/auth/login",
         data={
             "username": "login_test@example.com",
@@ -58,4 +91,4 @@ def test_login_user():
     assert data["token_type"] == "bearer"
 
 if __name__ == "__main__":
-    pytest.main([__file__, "-v"])
\ No newline at end of file
+    pytest.main([__file__, "-v"])
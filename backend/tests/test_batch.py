@@ -0,0 +1,89 @@
+# AI Agentic Platform - Batch Write Tests
+"""
+Unit tests for batch writes and idempotency keys.
+"""
+
+import json
+import uuid
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Import our batch helpers
+from ..models import Agent
+from ..routes.agents import AGENT_DEFAULTS
+from ..schemas import AgentCreate, AgentUpdate, BatchRequest
+from ..utils.batch import apply_batch, run_batch
+
+async def run_agent_batch(db: AsyncSession, owner_id: uuid.UUID, key: str = None, **operations):
+    """Run a batch of agent operations and return the response status and body."""
+    batch = BatchRequest(**operations)
+    response, _ = await run_batch(db, Agent, batch, AgentCreate, AgentUpdate, AGENT_DEFAULTS, owner_id, "agents/batch", key)
+    return response.status_code, json.loads(response.body)
+
+@pytest.mark.asyncio
+async def test_batch_applies_valid_items_and_reports_the_rest(db):
+    """Test that a batch writes its valid items and reports bad ones by operation and position."""
+    owner_id = uuid.uuid4()
+    
+    status_code, result = await run_agent_batch(db, owner_id, create=[{"name": "a"}, {"name": "b"}, {"nome": "c"}])
+    assert status_code == 200
+    assert len(result["created"]) == 2
+    assert [(e["operation"], e["index"]) for e in result["errors"]] == [("create", 2)]
+    
+    first, second = result["created"]
+    status_code, result = await run_agent_batch(
+        db, owner_id,
+        update=[{"id": first, "status": "active"}, {"id": str(uuid.uuid4()), "name": "missing"}],
+        delete=[second, first]
+    )
+    assert result["updated"] == [first] and result["deleted"] == [second]
+    assert [(e["operation"], e["index"]) for e in result["errors"]] == [("update", 1), ("delete", 1)]
+    
+    agents = (await db.execute(select(Agent))).scalars().all()
+    assert [(agent.name, agent.status, agent.row_version) for agent in agents] == [("a", "active", 2)]
+
+@pytest.mark.asyncio
+async def test_atomic_batch_applies_nothing_on_error(db):
+    """Test that an atomic batch with a bad item writes nothing."""
+    result = await apply_batch(
+        db, Agent, BatchRequest(create=[{"name": "a"}, {}], atomic=True), AgentCreate, AgentUpdate, AGENT_DEFAULTS,
+        uuid.uuid4()
+    )
+    assert not result["applied"] and result["created"] == []
+    assert (await db.execute(select(Agent))).first() is None
+
+@pytest.mark.asyncio
+async def test_idempotency_key_replays_response(db):
+    """Test that a retry with the same key replays the first response, and a different request is refused."""
+    owner_id = uuid.uuid4()
+    
+    first = await run_agent_batch(db, owner_id, key="provision-1", create=[{"name": "a"}])
+    assert await run_agent_batch(db, owner_id, key="provision-1", create=[{"name": "a"}]) == first
+    assert len((await db.execute(select(Agent))).all()) == 1
+    
+    with pytest.raises(HTTPException) as error:
+        await run_agent_batch(db, owner_id, key="provision-1", create=[{"name": "b"}])
+    assert error.value.status_code == 422
+
+@pytest.mark.asyncio
+async def test_run_batch_returns_the_rows_it_changed(db):
+    """Test that a batch reports the IDs it updated or deleted, and a replay reports none."""
+    owner_id = uuid.uuid4()
+    _, result = await run_agent_batch(db, owner_id, create=[{"name": "a"}, {"name": "b"}])
+    first, second = result["created"]
+    
+    batch = BatchRequest(update=[{"id": first, "status": "active"}], delete=[second])
+    response, changed = await run_batch(
+        db, Agent, batch, AgentCreate, AgentUpdate, AGENT_DEFAULTS, owner_id, "agents/batch", "cleanup-1"
+    )
+    assert changed == [first, second]
+    replayed, changed = await run_batch(
+        db, Agent, batch, AgentCreate, AgentUpdate, AGENT_DEFAULTS, owner_id, "agents/batch", "cleanup-1"
+    )
+    assert replayed.body == response.body and changed == []
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
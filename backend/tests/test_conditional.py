@@ -0,0 +1,62 @@
+# AI Agentic Platform - Conditional Request Tests
+"""
+Unit tests for ETags and conditional GET handling.
+"""
+
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from starlette.requests import Request
+
+# Import our helpers
+from ..utils.conditional import collection_etag, entity_etag, etag_matches, http_date, is_not_modified
+
+def make_request(**headers) -> Request:
+    """Build a GET request carrying the given headers."""
+    raw = [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw})
+
+def make_row(version: int = 1) -> SimpleNamespace:
+    """Build a row with the columns ETags are computed from."""
+    return SimpleNamespace(id=uuid.UUID(int=1), row_version=version, updated_at=datetime(2024, 5, 1, 12, 30, 15, 500))
+
+def test_etags_track_state_and_fields():
+    """Test that ETags change with the row version and the fields served, and with a page's rows."""
+    etag = entity_etag(make_row(), ("id", "name"))
+    
+    assert etag.startswith('"') and etag.endswith('"')
+    assert etag == entity_etag(make_row(), ("id", "name"))
+    assert etag != entity_etag(make_row(version=2), ("id", "name"))
+    assert etag != entity_etag(make_row(), ("id",))
+    
+    page = collection_etag([make_row()], None, ("id",))
+    assert page != collection_etag([make_row(), make_row(version=2)], None, ("id",))
+    assert page != collection_etag([make_row()], "cursor", ("id",))
+
+def test_if_none_match():
+    """Test weak comparison against single, listed and wildcard If-None-Match values."""
+    etag = entity_etag(make_row(), ("id",))
+    
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"stale", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"stale"', etag)
+
+def test_if_modified_since():
+    """Test If-Modified-Since at second resolution, and that If-None-Match takes precedence over it."""
+    row = make_row()
+    etag = entity_etag(row, ("id",))
+    
+    assert is_not_modified(make_request(if_modified_since=http_date(row.updated_at)), etag, row.updated_at)
+    earlier = http_date(row.updated_at - timedelta(seconds=1))
+    assert not is_not_modified(make_request(if_modified_since=earlier), etag, row.updated_at)
+    assert not is_not_modified(make_request(if_modified_since="yesterday"), etag, row.updated_at)
+    assert not is_not_modified(make_request(if_modified_since=http_date(row.updated_at)), etag)
+    
+    both = make_request(if_none_match='"stale"', if_modified_since=http_date(row.updated_at))
+    assert not is_not_modified(both, etag, row.updated_at)
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,247 @@
+# AI Agentic Platform - Entity Cache Tests
+"""
+Unit tests for the read-through agent and team caches.
+"""
+
+import asyncio
+import os
+import time
+import uuid
+
+import pytest
+from sqlalchemy import event, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Import our cache
+from ..models import Agent, Team, TeamMembership
+from ..schemas import AgentSnapshot
+from ..config import settings
+from ..services import entity_cache
+from ..routes.teams import cached_team_with_agents
+from ..services.entity_cache import EntityCache, SharedEntityStore, load_agents, load_teams
+
+async def add_agents(db: AsyncSession, count: int) -> list:
+    """Add some agents and return their IDs."""
+    agents = [Agent(name=f"agent-{i}", status="inactive", owner_id=uuid.uuid4()) for i in range(count)]
+    db.add_all(agents)
+    await db.commit()
+    return [agent.id for agent in agents]
+
+def counting_cache(delay: float = 0, **options) -> tuple:
+    """Make an agent cache whose loader counts the keys it is asked for and can be slowed down."""
+    calls = []
+    
+    async def load(db, keys):
+        calls.append(list(keys))
+        await asyncio.sleep(delay)
+        return await load_agents(db, keys)
+    
+    return EntityCache("agents", AgentSnapshot, load, **options), calls
+
+@pytest.mark.asyncio
+async def test_reads_through_and_serves_hits(db):
+    """Test that a record is loaded once, served from the cache after, and missing IDs are left out."""
+    first, second = await add_agents(db, 2)
+    cache, calls = counting_cache()
+    
+    assert (await cache.get(db, first)).name == "agent-0"
+    assert (await cache.get(db, str(first))).id == first
+    missing = uuid.uuid4()
+    records = await cache.get_many(db, [first, second, missing])
+    assert set(records) == {str(first), str(second)}
+    assert calls == [[str(first)], [str(second), str(missing)]]
+    
+    stats = cache.stats()
+    assert stats["hits"] == 2 and stats["misses"] == 3
+    assert stats["hit_rate"] == 0.4 and stats["size"] == 2
+
+@pytest.mark.asyncio
+async def test_lru_evicts_least_recent_and_entries_expire(db):
+    """Test that the cache keeps at most ``max_entries`` records, dropping the least recently used, for its TTL."""
+    ids = await add_agents(db, 3)
+    cache, calls = counting_cache(max_entries=2)
+    
+    await cache.get(db, ids[0])
+    await cache.get(db, ids[1])
+    await cache.get(db, ids[0])
+    await cache.get(db, ids[2])
+    assert list(cache._entries) == [str(ids[0]), str(ids[2])]
+    assert cache.stats()["evictions"] == 1
+    
+    short, calls = counting_cache(ttl=0.05)
+    await short.get(db, ids[0])
+    await asyncio.sleep(0.06)
+    await short.get(db, ids[0])
+    assert len(calls) == 2 and short.stats()["expirations"] == 1
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_load(db):
+    """Test that requests missing the same record at once wait on a single load of it."""
+    agent_id, = await add_agents(db, 1)
+    cache, calls = counting_cache(delay=0.05)
+    
+    records = await asyncio.gather(*(cache.get(db, agent_id) for _ in range(10)))
+    assert all(record.id == agent_id for record in records)
+    assert len(calls) == 1
+    assert cache.stats()["coalesced"] == 9
+
+@pytest.mark.asyncio
+async def test_waiters_reload_when_the_load_is_cancelled(db):
+    """Test that requests waiting on a load that is cancelled load the record themselves."""
+    agent_id, = await add_agents(db, 1)
+    cache, calls = counting_cache(delay=0.05)
+    
+    loading = asyncio.ensure_future(cache.get(db, agent_id))
+    await asyncio.sleep(0.01)
+    waiting = asyncio.ensure_future(cache.get(db, agent_id))
+    await asyncio.sleep(0.01)
+    loading.cancel()
+    assert (await waiting).id == agent_id
+    assert len(calls) == 2
+
+@pytest.mark.asyncio
+async def test_invalidation_disowns_a_load_in_flight(db):
+    """Test that a load which read a record before a write doesn't cache what it read."""
+    agent_id, = await add_agents(db, 1)
+    cache, calls = counting_cache(delay=0.05)
+    
+    loading = asyncio.ensure_future(cache.get(db, agent_id))
+    await asyncio.sleep(0.01)
+    cache.invalidate(agent_id)
+    assert (await loading).name == "agent-0"
+    assert cache.stats()["size"] == 0
+
+@pytest.mark.asyncio
+async def test_invalidate_on_commit_waits_for_the_commit(db):
+    """Test that invalidations queued on a transaction apply when it commits and are dropped on rollback."""
+    agent_id, = await add_agents(db, 1)
+    cache, calls = counting_cache()
+    await cache.get(db, agent_id)
+    
+    await db.execute(update(Agent).where(Agent.id == agent_id).values(name="rolled back"))
+    cache.invalidate_on_commit(db, [agent_id])
+    await db.rollback()
+    await db.commit()
+    assert cache.stats()["invalidations"] == 0
+    
+    await db.execute(update(Agent).where(Agent.id == agent_id).values(name="renamed"))
+    cache.invalidate_on_commit(db, [agent_id])
+    assert (await cache.get(db, agent_id)).name == "agent-0"
+    await db.commit()
+    assert (await cache.get(db, agent_id)).name == "renamed"
+
+@pytest.mark.asyncio
+async def test_teams_are_cached_with_their_memberships(db):
+    """Test that a cached team has its members and their roles in team order."""
+    first, second = await add_agents(db, 2)
+    team = Team(name="team", owner_id=uuid.uuid4())
+    empty = Team(name="empty", owner_id=uuid.uuid4())
+    db.add_all([team, empty])
+    db.add_all([
+        TeamMembership(team_id=team.id, agent_id=second, position=0, role="lead"),
+        TeamMembership(team_id=team.id, agent_id=first, position=1)
+    ])
+    await db.commit()
+    
+    teams = await load_teams(db, [str(team.id), str(empty.id)])
+    assert teams[str(team.id)].members == [second, first]
+    assert [(slot.agent_id, slot.role) for slot in teams[str(team.id)].memberships] == [(second, "lead"), (first, None)]
+    assert teams[str(empty.id)].members == [] and teams[str(empty.id)].row_version == 1
+
+@pytest.mark.asyncio
+async def test_shared_tier_serves_other_processes_and_keeps_tombstones(db, tmp_path):
+    """Test that the shared tier serves records to other caches and refuses ones read before an invalidation."""
+    agent_id, = await add_agents(db, 1)
+    path = os.path.join(str(tmp_path), "entity_cache.db")
+    first, first_calls = counting_cache(shared=SharedEntityStore(path))
+    second, second_calls = counting_cache(shared=SharedEntityStore(path))
+    
+    await first.get(db, agent_id)
+    first.shared.flush()
+    assert (await second.get(db, agent_id)).name == "agent-0"
+    assert not second_calls and second.stats()["shared_hits"] == 1
+    
+    read_at = time.time()
+    second.invalidate(agent_id)
+    second.shared.flush()
+    first.shared.put_many("agents", {str(agent_id): b"{}"}, read_at, 60)
+    assert first.shared.get_many("agents", [str(agent_id)]) == {}
+    
+    first.clear()
+    await first.get(db, agent_id)
+    assert len(first_calls) == 2
+    first.shared.flush()
+    assert str(agent_id) in second.shared.get_many("agents", [str(agent_id)])
+    first.shared.close()
+    second.shared.close()
+
+@pytest.mark.asyncio
+async def test_team_with_agents_is_loaded_in_one_query(db):
+    """Test that a team missing from the cache is loaded with its agents in one query, filling both caches."""
+    first, second = await add_agents(db, 2)
+    team = Team(name="team", owner_id=uuid.uuid4())
+    db.add(team)
+    await db.flush()
+    db.add_all([
+        TeamMembership(team_id=team.id, agent_id=second, position=0, role="lead"),
+        TeamMembership(team_id=team.id, agent_id=first, position=1)
+    ])
+    await db.commit()
+    
+    statements = []
+    
+    def listener(conn, cursor, statement, *args):
+        statements.append(statement)
+    
+    event.listen(db.bind.sync_engine, "before_cursor_execute", listener)
+    entity_cache.agent_cache.clear()
+    entity_cache.team_cache.clear()
+    try:
+        loaded, members = await cached_team_with_agents(db, team.id)
+        assert len(statements) == 1
+        assert [(position, role, agent.id) for position, role, agent in members] == [
+            (0, "lead", second), (1, None, first)
+        ]
+        assert loaded.members == [second, first]
+        
+        cached, cached_members = await cached_team_with_agents(db, team.id)
+        assert len(statements) == 1
+        assert cached is loaded and [agent.name for _, _, agent in cached_members] == ["agent-1", "agent-0"]
+    finally:
+        event.remove(db.bind.sync_engine, "before_cursor_execute", listener)
+        entity_cache.agent_cache.clear()
+        entity_cache.team_cache.clear()
+
+@pytest.mark.asyncio
+async def test_fill_skips_records_written_since_the_checkpoint(db):
+    """Test that records read alongside a load are cached only if nothing was written since they were read."""
+    agent_id, = await add_agents(db, 1)
+    cache, calls = counting_cache()
+    record = (await load_agents(db, [str(agent_id)]))[str(agent_id)]
+    
+    checkpoint = cache.checkpoint()
+    cache.invalidate(uuid.uuid4())
+    cache.fill({str(agent_id): record}, checkpoint)
+    assert cache.stats()["size"] == 0
+    
+    cache.fill({str(agent_id): record}, cache.checkpoint())
+    assert await cache.get(db, agent_id) is record
+    assert not calls
+
+def test_shared_tier_is_opened_and_closed_with_the_app(tmp_path, monkeypatch):
+    """Test that the global caches get the configured shared tier when it is opened, not on import."""
+    path = os.path.join(str(tmp_path), "entity_cache.db")
+    monkeypatch.setattr(settings, "entity_cache_shared_path", path)
+    assert entity_cache.agent_cache.shared is None and not os.path.exists(path)
+    
+    store = entity_cache.open_shared_entity_store()
+    assert entity_cache.open_shared_entity_store() is store
+    assert entity_cache.agent_cache.shared is store and entity_cache.team_cache.shared is store
+    
+    entity_cache.close_shared_entity_store()
+    assert entity_cache.agent_cache.shared is None and entity_cache.team_cache.shared is None
+    with pytest.raises(RuntimeError):
+        store.submit(store.prune)
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -3,13 +3,24 @@
 Unit tests for backend components.
 """
 
+import asyncio
+import json
+import random
 import pytest
-from sqlmodel import create_engine, Session
+from sqlmodel import SQLModel, create_engine, select, Session
 from sqlalchemy import text
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from datetime import datetime
+from uuid import uuid4
 
 # Import our models
-from ..models import User, Agent, Team, Prompt, get_db
+from .. import models
+from ..config import Settings
+from ..migrate import migrate
+from ..models import (
+    AppliedMigration, User, Agent, Team, TeamMembership, Prompt, PromptTag, backfill_prompt_tags, get_db,
+    migrate_team_members, create_async_database_engine, create_database_engine, engine_options
+)
 
 def test_database_connection():
     """Test that we can connect to the database."""
@@ -56,7 +67,6 @@ def test_team_model():
     team = Team(
         name="Test Team",
         description="A test team",
-        members=["agent_1", "agent_2"],
         orchestration_rules={"rule1": "value1", "rule2": "value2"},
         last_workflow_execution=datetime.utcnow(),
         workflow_status="running"
@@ -64,11 +74,44 @@ def test_team_model():
     
     assert team.name == "Test Team"
     assert team.description == "A test team"
-    assert team.members == ["agent_1", "agent_2"]
     assert team.orchestration_rules == {"rule1": "value1", "rule2": "value2"}
     assert team.last_workflow_execution is not None
     assert team.workflow_status == "running"
 
+def test_team_membership_model():
+    """Test TeamMembership model creation."""
+    membership = TeamMembership(team_id=uuid4(), agent_id=uuid4(), position=1, role="reviewer")
+    
+    assert membership.position == 1
+    assert membership.role == "reviewer"
+    assert membership.created_at is not None
+
+def test_migrate_team_members(tmp_path):
+    """Test moving members from the legacy JSON column to team memberships, in order and only once."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    SQLModel.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE team ADD COLUMN members JSON"))
+    
+    owner_id = uuid4()
+    first = Agent(name="First", status="active", owner_id=owner_id)
+    second = Agent(name="Second", status="active", owner_id=owner_id)
+    team = Team(name="Team", owner_id=owner_id)
+    with Session(engine) as session:
+        session.add_all([first, second, team])
+        session.commit()
+        first_id, second_id = first.id, second.id
+    
+    legacy = [str(second_id), "not-an-id", str(uuid4()), str(first_id), str(second_id)]
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE team SET members = :members"), {"members": json.dumps(legacy)})
+    
+    assert migrate_team_members(engine) == 2
+    assert migrate_team_members(engine) == 0
+    with Session(engine) as session:
+        memberships = session.exec(select(TeamMembership).order_by(TeamMembership.position)).all()
+    assert [(membership.agent_id, membership.position) for membership in memberships] == [(second_id, 0), (first_id, 1)]
+
 def test_prompt_model():
     """Test Prompt model creation."""
     prompt = Prompt(
@@ -81,5 +124,115 @@ def test_prompt_model():
     assert prompt.version == "1.0"
     assert prompt.tags == ["test", "example"]
 
+def test_backfill_prompt_tags(tmp_path):
+    """Test indexing the tags of existing prompts, each tag once and only on the first run."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'prompts.db'}")
+    SQLModel.metadata.create_all(engine)
+    
+    with Session(engine) as session:
+        session.add_all([
+            Prompt(body="First", version="1.0", tags=["test", "example", "test"], owner_id=uuid4()),
+            Prompt(body="Second", version="1.0", tags=[], owner_id=uuid4())
+        ])
+        session.commit()
+    
+    assert backfill_prompt_tags(engine) == 2
+    assert backfill_prompt_tags(engine) == 0
+    with Session(engine) as session:
+        tags = session.exec(select(PromptTag.tag).order_by(PromptTag.tag)).all()
+    assert tags == ["example", "test"]
+    
+    # A library without tags leaves the tag table empty, but is still only scanned once
+    engine = create_engine(f"sqlite:///{tmp_path / 'untagged.db'}")
+    SQLModel.metadata.create_all(engine)
+    assert backfill_prompt_tags(engine) == 0
+    with Session(engine) as session:
+        session.add(Prompt(body="Later", version="1.0", tags=["new"], owner_id=uuid4()))
+        session.commit()
+    assert backfill_prompt_tags(engine) == 0
+    with Session(engine) as session:
+        assert session.exec(select(AppliedMigration.name)).all() == ["backfill_prompt_tags"]
+
+def test_migrate_creates_and_upgrades_tables(tmp_path):
+    """Test that the migration creates missing tables and adds columns that existing tables lack."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    SQLModel.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE agent DROP COLUMN last_executed"))
+        conn.execute(text("DROP TABLE prompttag"))
+    
+    migrate(engine)
+    migrate(engine)
+    with engine.connect() as conn:
+        assert "last_executed" in {row[1] for row in conn.execute(text("PRAGMA table_info(agent)"))}
+        assert conn.execute(text("SELECT COUNT(*) FROM prompttag")).scalar() == 0
+
+def test_engine_options_follow_the_settings():
+    """Test that file databases get a pool sized by the settings, and in-memory ones keep their default pool."""
+    config = Settings(database_pool_size=3, database_max_overflow=2, database_pool_recycle=60, database_echo=True)
+    options = engine_options("sqlite:///./app.db", config, QueuePool)
+    assert options == {
+        "echo": True, "pool_pre_ping": True, "connect_args": {"check_same_thread": False},
+        "poolclass": QueuePool, "pool_size": 3, "max_overflow": 2, "pool_timeout": 30.0, "pool_recycle": 60
+    }
+    assert engine_options("sqlite://", config, QueuePool) == {"echo": True, "pool_pre_ping": True}
+    
+    # Only pysqlite refuses connections from other threads
+    options = engine_options("sqlite+aiosqlite:///./app.db", config, AsyncAdaptedQueuePool)
+    assert "connect_args" not in options and options["poolclass"] is AsyncAdaptedQueuePool
+
+def test_sqlite_connections_get_the_configured_pragmas(tmp_path):
+    """Test that every new connection, sync or async, is set up with the configured pragmas."""
+    config = Settings(database_url=f"sqlite:///{tmp_path / 'app.db'}", sqlite_busy_timeout_ms=1234)
+    engine = create_database_engine(config)
+    with engine.connect() as conn:
+        pragma = lambda name: conn.execute(text(f"PRAGMA {name}")).scalar()
+        assert pragma("journal_mode") == "wal"
+        assert pragma("synchronous") == 1  # NORMAL
+        assert pragma("busy_timeout") == 1234
+        assert pragma("foreign_keys") == 0
+    engine.dispose()
+    
+    config = Settings(database_url=f"sqlite:///{tmp_path / 'app.db'}", sqlite_synchronous="FULL",
+                      sqlite_foreign_keys=True)
+    async_engine = create_async_database_engine(config)
+    
+    async def read_pragmas():
+        async with async_engine.connect() as conn:
+            pragmas = [(await conn.execute(text(f"PRAGMA {name}"))).scalar()
+                       for name in ("journal_mode", "synchronous", "foreign_keys")]
+        await async_engine.dispose()
+        return pragmas
+    
+    assert asyncio.run(read_pragmas()) == ["wal", 2, 1]
+
+def test_sampled_echo_logs_a_fraction_of_statements(tmp_path, monkeypatch):
+    """Test that with echo off, roughly the configured fraction of statements is logged."""
+    logged = []
+    monkeypatch.setattr(models.logger, "info", logged.append)
+    random.seed(0)
+    
+    statements = 2000
+    for sample_rate, low, high in ((0.0, 0, 0), (0.1, 150, 250), (1.0, statements, statements)):
+        logged.clear()
+        engine = create_database_engine(
+            Settings(database_url=f"sqlite:///{tmp_path / 'app.db'}", database_echo_sample_rate=sample_rate)
+        )
+        with engine.connect() as conn:
+            # Connecting ran the pragmas through the DB-API cursor, which no statement event sees
+            for _ in range(statements):
+                conn.execute(text("SELECT 1"))
+        engine.dispose()
+        assert low <= len(logged) <= high
+        assert all(entry.startswith("SQL: SELECT 1") for entry in logged)
+    
+    # Echo already logs every statement, so sampling stays off
+    logged.clear()
+    engine = create_database_engine(Settings(database_url="sqlite://", database_echo=True, database_echo_sample_rate=1.0))
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    engine.dispose()
+    assert logged == []
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
\ No newline at end of file
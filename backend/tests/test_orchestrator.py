@@ -4,10 +4,15 @@ Unit tests for orchestrator service.
 """
 
 import pytest
-from unittest.mock import Mock, patch
+import asyncio
+from unittest.mock import Mock
 
 # Import our orchestrator
-from ..services.orchestrator import OrchestratorService
+from ..services import mcp_service as mcp_module
+from ..services.mcp_service import MCPService
+from ..services.orchestrator import OrchestratorService, mcp_service
+from ..services.prompt_store import PromptStoreService
+from ..services.prompt_vectors import HashingEmbedder
 
 def test_orchestrator_initialization():
     """Test orchestrator service initialization."""
@@ -18,21 +23,169 @@ def test_orchestrator_initialization():
 
 def test_load_prompt_by_version():
     """Test loading a prompt by version."""
-    orchestrator = OrchestratorService()
+    prompt_store = PromptStoreService()
+    orchestrator = OrchestratorService(prompt_store=prompt_store)
+    prompt_data = prompt_store.create_prompt(body="First draft", version="1.0")
+    prompt_store.update_prompt(prompt_data["id"], body="Second draft", version="1.1")
+    prompt_store.update_prompt(prompt_data["id"], body="Rewrite", version="2.0")
     
     # Test with default parameters
-    result = orchestrator.load_prompt_by_version("test_prompt_id")
+    result = orchestrator.load_prompt_by_version(prompt_data["id"])
     assert "id" in result
     assert "version" in result
     assert "body" in result
+    assert result["body"] == "Rewrite"
+    
+    assert orchestrator.load_prompt_by_version(prompt_data["id"], "1.x")["body"] == "Second draft"
+    assert orchestrator.load_prompt_by_version(prompt_data["id"], "1.0")["body"] == "First draft"
+    assert orchestrator.load_prompt_by_version(prompt_data["id"], "3.x") is None
+    assert orchestrator.load_prompt_by_version("missing_prompt", "1.0") is None
 
 def test_fetch_prompts_by_tags():
     """Test fetching prompts by tags."""
-    orchestrator = OrchestratorService()
+    prompt_store = PromptStoreService(embedder=HashingEmbedder())
+    orchestrator = OrchestratorService(prompt_store=prompt_store)
+    tagged = prompt_store.create_prompt(body="Summarize the report", tags=["test_tag"])
+    prompt_store.create_prompt(body="Translate the poem", tags=["other_tag"])
     
-    # Test with default parameters
     result = orchestrator.fetch_prompts_by_tags(["test_tag"])
-    assert isinstance(result, list)
+    assert [p["id"] for p in result] == [tagged["id"]]
+    assert orchestrator.fetch_relevant_prompts("report summary", k=1)[0]["id"] == tagged["id"]
+
+def make_orchestrator(delays, finished=None):
+    """Create an orchestrator whose Ollama client waits for a per-model delay, noting the models that finish."""
+    orchestrator = OrchestratorService()
+    
+    async def generate(model, prompt, stream):
+        await asyncio.sleep(delays[model])
+        if finished is not None:
+            finished.append(model)
+        return {"response": f"{model} done", "eval_count": 1}
+    
+    orchestrator.ollama_client = Mock(generate=generate)
+    return orchestrator
+
+@pytest.mark.asyncio
+async def test_agent_timeout_returns_partial_results():
+    """Test that an agent exceeding its own deadline does not fail the workflow."""
+    finished = []
+    orchestrator = make_orchestrator({"fast": 0, "slow": 0.3}, finished)
+    
+    result = await orchestrator.execute_agent_workflow(
+        agents=[
+            {"id": "a1", "config": {"model_name": "fast"}},
+            {"id": "a2", "config": {"model_name": "slow", "timeout_seconds": 0.05}}
+        ],
+        prompt="hello"
+    )
+    
+    assert result["status"] == "partial"
+    assert result["results"]["a1"]["status"] == "success"
+    assert result["results"]["a2"]["status"] == "timeout"
+    
+    # The timed out call was stopped, not left running in the background
+    await asyncio.sleep(0.4)
+    assert finished == ["fast"]
+
+@pytest.mark.asyncio
+async def test_workflow_deadline_stops_remaining_agents():
+    """Test that the workflow deadline from the orchestration rules cuts execution short."""
+    orchestrator = make_orchestrator({"fast": 0, "slow": 0.3})
+    
+    result = await orchestrator.execute_agent_workflow(
+        agents=[
+            {"id": "a1", "config": {"model_name": "fast"}},
+            {"id": "a2", "config": {"model_name": "slow"}},
+            {"id": "a3", "config": {"model_name": "fast"}}
+        ],
+        prompt="hello",
+        orchestration_rules={"timeout_seconds": 0.1}
+    )
+    
+    assert result["status"] == "timeout"
+    assert result["results"]["a1"]["status"] == "success"
+    assert result["results"]["a2"]["status"] == "timeout"
+    assert result["results"]["a3"]["status"] == "skipped"
+
+@pytest.mark.asyncio
+async def test_cancel_event_cancels_parallel_agents():
+    """Test that setting the cancel event cancels every running agent."""
+    orchestrator = make_orchestrator({"slow": 0.3})
+    cancel_event = asyncio.Event()
+    asyncio.get_event_loop().call_later(0.05, cancel_event.set)
+    
+    result = await orchestrator.execute_agent_workflow(
+        agents=[
+            {"id": "a1", "config": {"model_name": "slow"}},
+            {"id": "a2", "config": {"model_name": "slow"}}
+        ],
+        prompt="hello",
+        orchestration_rules={"execution_mode": "parallel"},
+        cancel_event=cancel_event
+    )
+    
+    assert result["status"] == "cancelled"
+    assert {r["status"] for r in result["results"].values()} == {"cancelled"}
+
+def make_mcp_service(monkeypatch, delay: float) -> MCPService:
+    """Get an MCP service with one connection whose tools take ``delay`` seconds."""
+    monkeypatch.setattr(mcp_module, "HAS_MCP", True)
+    service = MCPService()
+    service.tools = {"search": Mock(), "summarize": Mock()}
+    service.clients = {"local": Mock()}
+    
+    async def call_tool(client, tool_name, arguments, connection_name):
+        await asyncio.sleep(delay)
+        return {"tool_name": tool_name, "result": f"{tool_name} done"}
+    
+    service._call_tool = call_tool
+    return service
+
+@pytest.mark.asyncio
+async def test_mcp_agent_hands_its_deadline_and_cancel_event_to_the_tools(monkeypatch):
+    """Test that an MCP agent calls its tools through the MCP service with what is left of its timeout."""
+    calls = []
+    service = make_mcp_service(monkeypatch, 0.02)
+    
+    async def execute_tool(tool_name, arguments, connection_name=None, timeout=None, cancel_event=None):
+        calls.append((tool_name, arguments, timeout, cancel_event))
+        return await service.execute_tool(tool_name, arguments, connection_name, timeout, cancel_event)
+    
+    monkeypatch.setattr(mcp_service, "execute_tool", execute_tool)
+    cancel_event = asyncio.Event()
+    result = await OrchestratorService().execute_agent_workflow(
+        agents=[{"id": "a1", "config": {"llm_type": "mcp", "timeout_seconds": 1.0}, "mcp_tools": ["search", "summarize"]}],
+        prompt="hello",
+        cancel_event=cancel_event
+    )
+    
+    assert result["status"] == "success"
+    response = result["results"]["a1"]["response"]
+    assert [executed["result"]["result"] for executed in response["tools_executed"]] == ["search done", "summarize done"]
+    assert [(name, arguments) for name, arguments, _, _ in calls] == [("search", {"prompt": "hello"}),
+                                                                    ("summarize", {"prompt": "hello"})]
+    # Each call gets the agent's remaining budget, not a fresh one
+    assert 1.0 >= calls[0][2] > calls[1][2] > 0.9
+    assert all(event is cancel_event for _, _, _, event in calls)
+
+@pytest.mark.asyncio
+async def test_mcp_tool_calls_stop_at_the_deadline_or_on_cancel(monkeypatch):
+    """Test that the MCP service stops a tool call when its timeout passes or the cancel event is set."""
+    service = make_mcp_service(monkeypatch, 0.3)
+    monkeypatch.setattr(mcp_service, "execute_tool", service.execute_tool)
+    loop = asyncio.get_event_loop()
+    
+    start = loop.time()
+    assert (await service.execute_tool("search", {}, timeout=0.05))["status"] == "timeout"
+    cancel_event = asyncio.Event()
+    loop.call_later(0.05, cancel_event.set)
+    assert (await service.execute_tool("search", {}, cancel_event=cancel_event))["status"] == "cancelled"
+    assert loop.time() - start < 0.25
+    
+    # Through a workflow, the agent reports the same outcome as the other providers
+    agent = {"id": "a1", "config": {"llm_type": "mcp", "timeout_seconds": 0.05}, "mcp_tools": ["search"]}
+    result = await OrchestratorService().execute_agent_workflow(agents=[agent], prompt="hello")
+    assert result["results"]["a1"]["status"] == "timeout"
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
\ No newline at end of file
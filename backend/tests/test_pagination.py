@@ -0,0 +1,127 @@
+# AI Agentic Platform - Pagination Tests
+"""
+Unit tests for keyset pagination and its cursors.
+"""
+
+import base64
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+
+# Import our pagination helpers
+from ..models import Agent
+from ..utils.pagination import (
+    MAX_PAGE_SIZE, PageRequest, decode_cursor, encode_cursor, get_page_request, paginate_async
+)
+
+async def add_agents(db, created_at) -> None:
+    """Insert one agent per creation time, named by position."""
+    owner_id = uuid.uuid4()
+    await db.execute(Agent.__table__.insert(), [
+        {
+            "id": uuid.uuid4(), "name": f"agent-{i}", "status": "active", "config": {}, "owner_id": owner_id,
+            "created_at": timestamp, "updated_at": timestamp
+        }
+        for i, timestamp in enumerate(created_at)
+    ])
+    await db.commit()
+
+async def read_all_pages(db, limit: int):
+    """Follow the cursors from the first page to the last, returning each page's names and next cursor."""
+    statement = select(Agent.id, Agent.name, Agent.created_at)
+    pages = []
+    page = get_page_request(limit=limit)
+    while True:
+        rows, next_cursor = await paginate_async(db, statement, Agent, page)
+        pages.append(([row.name for row in rows], next_cursor))
+        if next_cursor is None:
+            return pages
+        page = get_page_request(cursor=next_cursor, limit=limit)
+
+def test_cursor_round_trip():
+    """Test that a cursor decodes to the position it was encoded from and is URL-safe."""
+    created_at = datetime(2024, 5, 17, 9, 30, 15, 123456)
+    row_id = uuid.uuid4()
+    cursor = encode_cursor(created_at, row_id)
+    
+    assert decode_cursor(cursor) == (created_at, row_id)
+    assert "=" not in cursor and "+" not in cursor and "/" not in cursor
+    assert decode_cursor(encode_cursor(datetime(2024, 1, 1), row_id)) == (datetime(2024, 1, 1), row_id)
+
+def test_invalid_cursors_are_rejected():
+    """Test that malformed cursors raise ValueError and the dependency turns them into a 400."""
+    encode = lambda raw: base64.urlsafe_b64encode(raw).decode("ascii")
+    row_id = uuid.uuid4().hex.encode("ascii")
+    invalid = [
+        "not a cursor",
+        encode(b"2024-01-01T00:00:00"),
+        encode(b"2024-13-01T00:00:00|" + row_id),
+        encode(b"2024-01-01T00:00:00|not-a-uuid"),
+        encode(b"2024-01-01T00:00:00|" + row_id + b"|" + row_id),
+        encode("2024-01-01T00:00:00|é".encode("utf-8")),
+    ]
+    for cursor in invalid:
+        with pytest.raises(ValueError):
+            decode_cursor(cursor)
+        with pytest.raises(HTTPException) as error:
+            get_page_request(cursor=cursor)
+        assert error.value.status_code == 400
+
+def test_tampered_cursor_is_rejected():
+    """Test that a cursor with characters cut or changed no longer decodes."""
+    cursor = encode_cursor(datetime(2024, 1, 1), uuid.uuid4())
+    for tampered in (cursor[:-4], cursor[:10] + "!!" + cursor[12:], cursor[1:]):
+        with pytest.raises(HTTPException) as error:
+            get_page_request(cursor=tampered)
+        assert error.value.status_code == 400
+
+def test_page_size_is_bounded():
+    """Test that the limit must be between 1 and the maximum page size."""
+    assert get_page_request(limit=MAX_PAGE_SIZE) == PageRequest(after=None, limit=MAX_PAGE_SIZE)
+    for limit in (0, -1, MAX_PAGE_SIZE + 1):
+        with pytest.raises(HTTPException) as error:
+            get_page_request(limit=limit)
+        assert error.value.status_code == 400
+
+@pytest.mark.asyncio
+async def test_last_full_page_has_no_next_cursor(db):
+    """Test that when rows fill the last page exactly there is no cursor to an empty page."""
+    start = datetime(2024, 1, 1)
+    await add_agents(db, [start + timedelta(seconds=i) for i in range(6)])
+    
+    pages = await read_all_pages(db, limit=3)
+    assert [names for names, _ in pages] == [["agent-0", "agent-1", "agent-2"], ["agent-3", "agent-4", "agent-5"]]
+    assert pages[-1][1] is None
+    
+    # A cursor past the last row, as a client holding an old one might send, gives an empty page
+    last = (await db.execute(select(Agent.id, Agent.created_at).filter(Agent.name == "agent-5"))).one()
+    page = get_page_request(cursor=encode_cursor(last.created_at, last.id), limit=3)
+    assert await paginate_async(db, select(Agent.id, Agent.created_at), Agent, page) == ([], None)
+
+@pytest.mark.asyncio
+async def test_empty_listing_is_one_empty_page(db):
+    """Test that a listing with no rows is a single empty page."""
+    assert await read_all_pages(db, limit=10) == [([], None)]
+
+@pytest.mark.asyncio
+async def test_ties_on_created_at_are_paged_by_id(db):
+    """Test that rows sharing a creation time are neither skipped nor repeated across pages."""
+    start = datetime(2024, 1, 1)
+    # Runs of rows created in the same instant, straddling page boundaries
+    await add_agents(db, [start] * 5 + [start + timedelta(seconds=1)] * 4 + [start + timedelta(seconds=2)])
+    
+    pages = await read_all_pages(db, limit=3)
+    names = [name for page_names, _ in pages for name in page_names]
+    assert sorted(names) == sorted(f"agent-{i}" for i in range(10))
+    assert len(names) == len(set(names))
+    assert [len(page_names) for page_names, _ in pages] == [3, 3, 3, 1]
+    
+    # Within one creation time the order is by ID, so it is the same on every read
+    rows = (await db.execute(select(Agent.id, Agent.name).order_by(Agent.created_at, Agent.id))).all()
+    assert names == [row.name for row in rows]
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
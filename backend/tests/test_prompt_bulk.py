@@ -0,0 +1,96 @@
+# AI Agentic Platform - Prompt Bulk Import Tests
+"""
+Unit tests for the bulk prompt import and the streaming export.
+"""
+
+import json
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+# Import our prompt routes
+from ..models import Prompt, PromptTag
+from ..routes import prompts
+from ..routes.prompts import _export_chunks, import_prompts
+
+class BulkRequest:
+    """Stands in for a bulk import request, streaming its body a few bytes at a time."""
+    
+    def __init__(self, body: bytes, content_type: str = "application/x-ndjson"):
+        """Keep the body to stream."""
+        self.headers = {"content-type": content_type}
+        self._body = body
+    
+    async def body(self) -> bytes:
+        """Get the whole body."""
+        return self._body
+    
+    async def stream(self):
+        """Yield the body in chunks that split rows."""
+        for start in range(0, len(self._body), 7):
+            yield self._body[start:start + 7]
+
+async def bulk_import(db: AsyncSession, body: bytes, content_type: str = "application/x-ndjson") -> dict:
+    """Run a bulk import as a new user."""
+    request = BulkRequest(body, content_type)
+    return await import_prompts(request=request, db=db, current_user=SimpleNamespace(id=uuid.uuid4()))
+
+@pytest.mark.asyncio
+async def test_bulk_import_reports_bad_rows(db):
+    """Test that a bulk import commits the good rows and reports the bad ones by position."""
+    lines = [json.dumps({"body": f"Prompt {i}", "tags": ["bulk"]}) for i in range(5)]
+    lines[1] = json.dumps({"body": ""})
+    lines[3] = json.dumps({"body": "Tagged", "tags": "bulk"})
+    lines.append("{not json")
+    
+    chunk_size = prompts.BULK_CHUNK_SIZE
+    try:
+        prompts.BULK_CHUNK_SIZE = 2
+        result = await bulk_import(db, "\n".join(lines).encode("utf-8"))
+    finally:
+        prompts.BULK_CHUNK_SIZE = chunk_size
+    
+    assert result["imported"] == 3
+    assert result["failed"] == 3
+    assert [error["index"] for error in result["errors"]] == [1, 3, 5]
+    assert result["errors"][2]["error"].startswith("Invalid JSON")
+    
+    # Imported prompts have their tags indexed like created ones
+    bodies = (await db.execute(select(Prompt.body).order_by(Prompt.body))).scalars().all()
+    assert bodies == ["Prompt 0", "Prompt 2", "Prompt 4"]
+    assert (await db.execute(select(PromptTag.tag))).scalars().all() == ["bulk"] * 3
+
+@pytest.mark.asyncio
+async def test_bulk_import_takes_a_json_array(db):
+    """Test that a JSON array body is imported like NDJSON, and anything but an array is refused."""
+    rows = [{"body": "Summarize the report", "version": "2.0"}, {"body": "Translate the poem", "tags": ["fr"]}]
+    result = await bulk_import(db, json.dumps(rows).encode("utf-8"), "application/json")
+    assert result["imported"] == 2 and result["errors"] == []
+    
+    with pytest.raises(HTTPException) as error:
+        await bulk_import(db, json.dumps(rows[0]).encode("utf-8"), "application/json")
+    assert error.value.status_code == 400
+
+@pytest.mark.asyncio
+async def test_export_streams_every_prompt(db):
+    """Test that the export yields every prompt once, as NDJSON lines or as one JSON array."""
+    result = await bulk_import(db, b"".join(
+        json.dumps({"body": f"Prompt {i}", "tags": ["bulk"]}).encode("utf-8") + b"\n" for i in range(3)
+    ))
+    sessions = sessionmaker(bind=db.bind, class_=AsyncSession, expire_on_commit=False)
+    
+    ndjson = b"".join([chunk async for chunk in _export_chunks("ndjson", sessions)])
+    exported = [json.loads(line) for line in ndjson.splitlines()]
+    assert sorted(prompt["id"] for prompt in exported) == sorted(str(prompt_id) for prompt_id in result["ids"])
+    assert {prompt["body"] for prompt in exported} == {"Prompt 0", "Prompt 1", "Prompt 2"}
+    
+    array = json.loads(b"".join([chunk async for chunk in _export_chunks("json", sessions)]))
+    assert array == exported
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,149 @@
+# AI Agentic Platform - Shared Prompt Cache Tests
+"""
+Unit tests for the memory-mapped prompt cache.
+"""
+
+import pytest
+import time
+
+# Import our prompt cache
+from ..services.prompt_cache import CacheError, SharedPromptCache, write_generation
+from ..services.prompt_store import PromptStoreService
+
+def test_store_publishes_generations(tmp_path):
+    """Test that without a publish interval every committed write publishes a generation readers pick up."""
+    cache_path = str(tmp_path / "prompts.cache")
+    prompt_store = PromptStoreService(db_path=str(tmp_path / "prompts.db"), shared_cache_path=cache_path,
+                                      publish_interval=0)
+    cache = SharedPromptCache(cache_path)
+    assert len(cache) == 0
+    
+    first = prompt_store.create_prompt(body="Summarize the report", tags=["prod", "summary"])
+    second = prompt_store.create_prompt(body="Summarize the report", version="2.0")
+    assert len(cache) == 2
+    assert cache.get_prompt(first["id"]) == {key: first[key] for key in ("id", "body", "version", "tags", "created_at", "updated_at")}
+    assert bytes(cache.get_body(second["id"])) == b"Summarize the report"
+    assert cache.get_prompt("prompt_missing") is None
+    
+    prompt_store.update_prompt(first["id"], body="Summarize the quarterly report", version="1.1")
+    assert cache.get_prompt(first["id"])["body"] == "Summarize the quarterly report"
+    assert [version for _, version, _ in cache.get_versions(first["id"])] == ["1.0", "1.1"]
+    
+    prompt_store.delete_prompt(second["id"])
+    assert [p["id"] for p in cache.iter_prompts()] == [first["id"]]
+    assert cache.generation == prompt_store._change_seq
+
+def test_workers_read_through_the_shared_cache(tmp_path):
+    """Test that a store with a shared cache serves reads from it and its overlay without loading the library."""
+    db_path, cache_path = str(tmp_path / "prompts.db"), str(tmp_path / "prompts.cache")
+    writer = PromptStoreService(db_path=db_path, shared_cache_path=cache_path, publish_interval=0)
+    first = writer.create_prompt(body="Summarize the report", tags=["prod"])
+    second = writer.create_prompt(body="Translate the poem", tags=["draft"])
+    
+    worker = PromptStoreService(db_path=db_path, shared_cache_path=cache_path, publish_interval=60)
+    assert worker.get_prompt(first["id"])["audit_log"][0]["action"] == "create"
+    assert worker.find_prompt_version(first["id"], "1.0")["body"] == "Summarize the report"
+    
+    # Unpublished writes are served from the overlay, in this process and after a replay in others
+    worker.update_prompt(first["id"], body="Summarize the quarterly report", version="1.1")
+    worker.rollback_prompt(first["id"], "1.0")
+    worker.update_prompt(first["id"], version="1.2")
+    worker.delete_prompt(second["id"])
+    third = worker.create_prompt(body="Draft the memo", tags=["prod"])
+    assert SharedPromptCache(cache_path).generation < worker._change_seq
+    for store in (worker, writer):
+        assert store.get_prompt(first["id"])["version"] == "1.2"
+        assert store.get_prompt(second["id"]) is None
+        assert [p["id"] for p in store.export_prompts(tags=["prod"])] == [first["id"], third["id"]]
+    assert [v["body"] for v in worker.get_prompt_versions(first["id"])] == [
+        "Summarize the report", "Summarize the quarterly report", "Summarize the report"
+    ]
+    assert worker.prompts == {} and writer.prompts == {}
+    
+    # Closing publishes what is pending; searches load the library
+    worker.close()
+    cache = SharedPromptCache(cache_path)
+    assert cache.get_prompt(first["id"])["version"] == "1.2"
+    assert [p["id"] for p in writer.search_prompts(tags=["prod"])] == [first["id"], third["id"]]
+    assert set(writer.prompts) == {first["id"], third["id"]}
+    writer.close()
+
+def test_publishes_are_debounced(tmp_path):
+    """Test that writes within the publish interval are published together in one generation."""
+    cache_path = str(tmp_path / "prompts.cache")
+    prompt_store = PromptStoreService(db_path=str(tmp_path / "prompts.db"), shared_cache_path=cache_path,
+                                      publish_interval=0.05)
+    cache = SharedPromptCache(cache_path)
+    for i in range(3):
+        prompt_store.create_prompt(body=f"Prompt {i}")
+    assert len(cache) == 0
+    
+    time.sleep(0.3)
+    assert len(cache) == 3
+    assert cache.generation == prompt_store._change_seq
+    prompt_store.close()
+
+def test_generations_are_built_from_the_last_one(tmp_path):
+    """Test that a publish only rewrites the prompts changed since the last generation, until most records are stale."""
+    cache_path = str(tmp_path / "prompts.cache")
+    prompt_store = PromptStoreService(db_path=str(tmp_path / "prompts.db"), shared_cache_path=cache_path,
+                                      publish_interval=60)
+    cache = SharedPromptCache(cache_path)
+    prompts = [prompt_store.create_prompt(body=f"Prompt {i}", tags=[f"tag{i % 3}"]) for i in range(20)]
+    prompt_store.publish_shared_cache()
+    assert len(cache) == 20 and cache.snapshot().stale == 0
+    
+    prompt_store.update_prompt(prompts[3]["id"], body="Prompt three", version="1.1", tags=["new"])
+    prompt_store.update_prompt(prompts[12]["id"], version="2.0")
+    prompt_store.delete_prompt(prompts[7]["id"])
+    created = prompt_store.create_prompt(body="Prompt 20")
+    assert prompt_store.publish_shared_cache() == prompt_store._change_seq
+    assert cache.snapshot().stale == 3
+    assert cache.get_prompt(prompts[3]["id"])["tags"] == ["new"]
+    assert [version for _, version, _ in cache.get_versions(prompts[12]["id"])] == ["1.0", "2.0"]
+    assert cache.get_prompt(prompts[7]["id"]) is None
+    
+    # The generation matches one built from every prompt
+    rebuilt_path = str(tmp_path / "rebuilt.cache")
+    prompt_store.publish_shared_cache(path=rebuilt_path, full=True)
+    rebuilt = SharedPromptCache(rebuilt_path)
+    assert list(cache.iter_prompts()) == list(rebuilt.iter_prompts())
+    assert [p["id"] for p in cache.iter_prompts()][-1] == created["id"]
+    for prompt in rebuilt.iter_prompts():
+        assert cache.get_prompt(prompt["id"]) == prompt
+        assert cache.get_versions(prompt["id"]) == rebuilt.get_versions(prompt["id"])
+    
+    # Once stale records outnumber live ones, the next publish rebuilds
+    for prompt in prompts:
+        if prompt["id"] != prompts[7]["id"]:
+            prompt_store.update_prompt(prompt["id"], version="3.0")
+    prompt_store.publish_shared_cache()
+    assert cache.snapshot().stale == 22
+    prompt_store.update_prompt(prompts[0]["id"], version="4.0")
+    prompt_store.publish_shared_cache()
+    assert cache.snapshot().stale == 0 and len(cache) == 20
+    prompt_store.close()
+
+def test_lookups_finish_on_their_generation(tmp_path):
+    """Test that a mapped generation stays readable after a new one replaces it."""
+    cache_path = str(tmp_path / "prompts.cache")
+    prompt = {"id": "prompt_1", "seq": 1, "body": "Old body", "version": "1.0", "tags": ["a"],
+              "created_at": "2024-01-01T00:00:00", "updated_at": "2024-01-01T00:00:00"}
+    write_generation(cache_path, 1, [prompt], {})
+    cache = SharedPromptCache(cache_path)
+    old_body = cache.get_body("prompt_1")
+    
+    write_generation(cache_path, 2, [dict(prompt, body="New body")], {})
+    assert bytes(old_body) == b"Old body"
+    assert cache.get_prompt("prompt_1")["body"] == "New body"
+    assert cache.generation == 2
+
+def test_invalid_cache_is_rejected(tmp_path):
+    """Test that a file that is not a prompt cache is refused."""
+    cache_path = tmp_path / "prompts.cache"
+    cache_path.write_bytes(b"not a cache" * 10)
+    with pytest.raises(CacheError):
+        SharedPromptCache(str(cache_path)).get_prompt("prompt_1")
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
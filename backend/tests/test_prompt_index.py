@@ -0,0 +1,195 @@
+# AI Agentic Platform - Prompt Index Tests
+"""
+Unit tests for the in-memory prompt indexes.
+"""
+
+import pytest
+
+# Import our prompt indexes
+from ..services.prompt_index import (
+    CHUNK_BITS, Bitmap, FullTextIndex, MinHashIndex, TagIndex, VersionIndex, cluster_signatures, version_key
+)
+
+def test_bitmap_paging():
+    """Test iterating a bitmap with an offset and limit."""
+    bitmap = Bitmap([1000, 5, 2, 64, 1 << 20])
+    
+    assert list(bitmap) == [2, 5, 64, 1000, 1 << 20]
+    assert list(bitmap.iter(offset=1, limit=2)) == [5, 64]
+    assert list(bitmap.iter(offset=4)) == [1 << 20]
+    assert list(Bitmap()) == []
+    assert len(bitmap) == 5
+
+def test_bitmap_set_operations():
+    """Test AND, OR and AND NOT across chunks, and that emptied chunks are dropped."""
+    left = Bitmap([1, 2, 5000, 9000])
+    right = Bitmap([2, 5000, 7000])
+    
+    assert list(left & right) == [2, 5000]
+    assert list(left | right) == [1, 2, 5000, 7000, 9000]
+    assert list(left - right) == [1, 9000]
+    assert not Bitmap([1]) & Bitmap([1 << 30])
+    
+    left.discard(9000)
+    left.discard(12345)
+    assert 9000 not in left and 5000 in left
+    assert left == Bitmap([1, 2, 5000])
+    assert len(left._chunks) == 2
+
+def test_sparse_bitmaps_with_large_ordinals():
+    """Test that a few prompts with ordinals in the millions cost what a few prompts cost."""
+    index = FullTextIndex(substring_index=True)
+    tags = TagIndex()
+    ordinals = [5_000_000 + i * 100_003 for i in range(50)]
+    for i, ordinal in enumerate(ordinals):
+        tags.add(ordinal, ["even" if i % 2 == 0 else "odd", "all"])
+        index.add(ordinal, f"Summarize report number {i}")
+    
+    result = tags.query(any_tags=["all"], exclude_tags=["odd"])
+    assert list(result) == ordinals[::2]
+    assert list(result.iter(offset=20, limit=10)) == ordinals[40::2]
+    assert tags.count(all_tags=["all", "odd"]) == 25
+    assert list(index.substring_candidates("report number 49")) == [ordinals[49]]
+    
+    # Every posting list holds one small int per chunk rather than a bit per possible ordinal
+    for bitmap in [tags._all, *tags._bitmaps.values(), *index._trigrams.values()]:
+        assert all(chunk.bit_length() <= 1 << CHUNK_BITS for chunk in bitmap._chunks.values())
+    assert len(tags._all._chunks) == 50
+
+def test_tag_queries():
+    """Test AND, OR and NOT tag queries."""
+    index = TagIndex()
+    index.add(1, ["python", "sql"])
+    index.add(2, ["python"])
+    index.add(3, ["sql", "draft"])
+    index.add(4, [])
+    
+    assert list(index.query(any_tags=["python", "sql"])) == [1, 2, 3]
+    assert list(index.query(all_tags=["python", "sql"])) == [1]
+    assert list(index.query(any_tags=["sql"], exclude_tags=["draft"])) == [1]
+    assert list(index.query(exclude_tags=["python"])) == [3, 4]
+    assert list(index.query()) == [1, 2, 3, 4]
+    assert index.count(any_tags=["missing"]) == 0
+
+def test_tag_index_updates():
+    """Test that retagging and removing prompts keeps the index consistent."""
+    index = TagIndex()
+    index.add(1, ["a", "b"])
+    index.add(2, ["b"])
+    
+    index.add(1, ["c"])
+    assert index.tag_counts() == {"b": 1, "c": 1}
+    
+    index.remove(2)
+    assert index.tag_counts() == {"c": 1}
+    assert index.count() == 1
+
+def test_full_text_ranking():
+    """Test that matches are ranked by BM25 and every query term must match."""
+    index = FullTextIndex()
+    index.add(1, "Summarize the report in three bullet points")
+    index.add(2, "Summarize the summary of the summary")
+    index.add(3, "Translate the report into French")
+    
+    assert [ordinal for ordinal, _ in index.search("summary")] == [2]
+    assert [ordinal for ordinal, _ in index.search("summarize")] == [2, 1]  # Shorter body first
+    assert [ordinal for ordinal, _ in index.search("report translate")] == [3]
+    assert [ordinal for ordinal, _ in index.search("summarize", offset=1, limit=1)] == [1]
+    assert index.search("missing") == []
+    
+    # Rarer terms weigh more
+    ranked = index.search("report")
+    assert {ordinal for ordinal, _ in ranked} == {1, 3}
+    assert ranked[0][1] > 0
+
+def test_full_text_prefix_and_phrase_queries():
+    """Test prefix expansion, phrase matching and tag terms."""
+    index = FullTextIndex()
+    index.add(1, "Write a short story", ["fiction"])
+    index.add(2, "Write a story that is short", ["writing"])
+    
+    assert {ordinal for ordinal, _ in index.search("sto*")} == {1, 2}
+    assert [ordinal for ordinal, _ in index.search('"short story"')] == [1]
+    assert [ordinal for ordinal, _ in index.search('"story that"')] == [2]
+    assert [ordinal for ordinal, _ in index.search("fict*")] == [1]
+    assert index.search('"story fiction"') == []  # Phrases never span body and tags
+    assert [ordinal for ordinal, _ in index.search("story", accept=lambda ordinal: ordinal == 2)] == [2]
+
+def test_full_text_updates_and_substrings():
+    """Test that reindexing and removal keep postings and trigrams consistent."""
+    index = FullTextIndex(substring_index=True)
+    index.add(1, "Classify the sentiment")
+    index.add(2, "Extract the entities")
+    
+    index.add(1, "Classify the intent")
+    assert index.search("sentiment") == []
+    assert [ordinal for ordinal, _ in index.search("intent")] == [1]
+    assert list(index.substring_candidates("entit")) == [2]
+    
+    index.remove(2)
+    assert index.search("entities") == []
+    assert not index.substring_candidates("entit")
+    assert index.substring_candidates("e") is None
+
+def test_minhash_near_duplicates():
+    """Test that near-duplicates are found through shared buckets and unrelated prompts are not."""
+    base = " ".join(f"word{i}" for i in range(60))
+    index = MinHashIndex()
+    index.add(1, base)
+    index.add(2, base.replace("word30", "edited"))
+    index.add(3, " ".join(f"other{i}" for i in range(60)))
+    index.add(4, "")
+    
+    matches = index.query(index.signature(base))
+    assert [ordinal for ordinal, _ in matches] == [1, 2]
+    assert matches[0][1] == 1.0 and 0.8 <= matches[1][1] < 1.0
+    assert len(index) == 3
+    
+    # Moving a prompt away from the base takes it out of the results
+    index.add(2, " ".join(f"other{i}" for i in range(55)))
+    assert [ordinal for ordinal, _ in index.query(index.signature(base))] == [1]
+    index.remove(1)
+    assert index.query(index.signature(base)) == []
+
+def test_minhash_clusters():
+    """Test that clustering joins chains of edits and leaves unique prompts out."""
+    index = MinHashIndex()
+    words = [f"word{i}" for i in range(60)]
+    texts = {1: " ".join(words), 5: " ".join(f"other{i}" for i in range(60))}
+    for ordinal in (2, 3, 4):
+        words[ordinal * 10] = f"edit{ordinal}"
+        texts[ordinal] = " ".join(words)
+    texts[6] = texts[5]
+    signatures = {ordinal: index.signature(text) for ordinal, text in texts.items()}
+    
+    assert cluster_signatures(signatures, bands=index.bands) == [[1, 2, 3, 4], [5, 6]]
+    assert cluster_signatures(signatures, bands=index.bands, threshold=1.0) == [[5, 6]]
+
+def test_version_lookups():
+    """Test exact, wildcard and as-of version lookups and history pages."""
+    index = VersionIndex([
+        (0, "1.0", "2025-01-01T00:00:00"),
+        (1, "1.2", "2025-02-01T00:00:00"),
+        (2, "1.10", "2025-03-01T00:00:00"),
+        (3, "2.0", "2025-04-01T00:00:00"),
+        (4, "1.2", "2025-05-01T00:00:00")
+    ])
+    
+    assert version_key("1.10") > version_key("1.9")
+    assert index.find("1.2") == 1
+    assert index.find("1.3") is None
+    assert index.latest_matching("1.x") == 2
+    assert index.latest_matching("1.2") == 4
+    assert index.latest_matching("*") == 3
+    assert index.latest_matching("3.x") is None
+    assert index.as_of("2025-03-15T00:00:00") == 2
+    assert index.as_of("2025-04-01T00:00:00") == 3
+    assert index.as_of("2024-12-31T00:00:00") is None
+    assert index.page(1, 2) == [1, 2]
+    
+    index.add(5, "1.11", "2025-06-01T00:00:00")
+    assert index.latest_matching("1.x") == 5
+    assert len(index) == 6
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,58 @@
+# AI Agentic Platform - Prompt Route Tests
+"""
+Unit tests for the prompt routes, called through the application.
+"""
+
+import uuid
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+# Import our prompt routes
+from ..routes import prompts
+from ..routes.auth import get_current_active_user
+from ..services.prompt_store import PromptStoreService
+from ..services.prompt_vectors import HashingEmbedder
+
+def make_app() -> FastAPI:
+    """Build an application serving only the prompt routes."""
+    app = FastAPI()
+    app.include_router(prompts.router, prefix="/prompts")
+    return app
+
+def make_client(app: FastAPI) -> httpx.AsyncClient:
+    """Get a client sending its requests straight to ``app``."""
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+@pytest.mark.asyncio
+async def test_semantic_search_requires_authentication():
+    """Test that semantic search refuses requests without a token."""
+    async with make_client(make_app()) as client:
+        response = await client.get("/prompts/semantic-search", params={"q": "summarize"})
+    assert response.status_code == 401
+
+@pytest.mark.asyncio
+async def test_semantic_search_finds_related_prompts(monkeypatch):
+    """Test that an authenticated semantic search returns the closest prompt first."""
+    prompt_store = PromptStoreService(embedder=HashingEmbedder(dim=128))
+    prompt_store.create_prompt("Summarize the quarterly sales report")
+    prompt_store.create_prompt("Translate this poem into French")
+    monkeypatch.setattr(prompts, "get_prompt_store", lambda: prompt_store)
+    
+    app = make_app()
+    app.dependency_overrides[get_current_active_user] = lambda: SimpleNamespace(id=uuid.uuid4())
+    async with make_client(app) as client:
+        response = await client.get(
+            "/prompts/semantic-search", params={"q": "quarterly sales summary", "k": 1, "budget_ms": 1000}
+        )
+    prompt_store.close()
+    
+    assert response.status_code == 200
+    result = response.json()
+    assert [prompt["body"] for prompt in result["results"]] == ["Summarize the quarterly sales report"]
+    assert not result["truncated"]
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -4,9 +4,18 @@ Unit tests for prompt store service.
 """
 
 import pytest
+import json
+import random
+import sqlite3
+import threading
 
 # Import our prompt store
-from ..services.prompt_store import PromptStoreService
+from ..services.prompt_archive import ArchiveError
+from ..services.prompt_store import (
+    PromptStoreService, PromptRecord, SNAPSHOT_INTERVAL, diff_body, apply_body_diff, decode_timestamp, encode_timestamp
+)
+from ..services.prompt_vectors import HashingEmbedder
+from ..utils import bulk
 
 def test_prompt_store_initialization():
     """Test prompt store service initialization."""
@@ -58,5 +67,646 @@ def test_update_prompt():
     assert updated_prompt["version"] == "1.1"
     assert updated_prompt["tags"] == ["updated", "test"]
 
+def test_prompts_survive_restart(tmp_path):
+    """Test that prompts are persisted and reloaded by a new store instance."""
+    db_path = str(tmp_path / "prompts.db")
+    prompt_store = PromptStoreService(db_path=db_path)
+    
+    prompt_data = prompt_store.create_prompt(body="Persistent prompt", tags=["durable"])
+    prompt_store.update_prompt(prompt_data["id"], body="Persistent prompt v2", version="1.1")
+    prompt_store.close()
+    
+    reopened = PromptStoreService(db_path=db_path)
+    retrieved_prompt = reopened.get_prompt(prompt_data["id"])
+    assert retrieved_prompt["body"] == "Persistent prompt v2"
+    assert retrieved_prompt["tags"] == ["durable"]
+    assert [v["version"] for v in reopened.get_prompt_versions(prompt_data["id"])] == ["1.0", "1.1"]
+
+def test_writes_are_visible_to_other_instances(tmp_path):
+    """Test that a store picks up writes made through another connection, as in another worker."""
+    db_path = str(tmp_path / "prompts.db")
+    writer = PromptStoreService(db_path=db_path)
+    reader = PromptStoreService(db_path=db_path)
+    
+    prompt_data = writer.create_prompt(body="Shared prompt")
+    assert reader.get_prompt(prompt_data["id"])["body"] == "Shared prompt"
+    
+    writer.update_prompt(prompt_data["id"], body="Shared prompt, edited")
+    assert reader.get_prompt(prompt_data["id"])["body"] == "Shared prompt, edited"
+    
+    writer.delete_prompt(prompt_data["id"])
+    assert reader.get_prompt(prompt_data["id"]) is None
+
+def test_ids_are_not_reused_after_delete():
+    """Test that deleting a prompt does not make the next create collide with an existing ID."""
+    prompt_store = PromptStoreService()
+    
+    first = prompt_store.create_prompt(body="First")
+    second = prompt_store.create_prompt(body="Second")
+    prompt_store.delete_prompt(first["id"])
+    third = prompt_store.create_prompt(body="Third")
+    
+    assert third["id"] not in (first["id"], second["id"])
+    assert prompt_store.get_prompt(second["id"])["body"] == "Second"
+
+def test_rollback_prompt():
+    """Test rolling a prompt back to an earlier version."""
+    prompt_store = PromptStoreService()
+    
+    prompt_data = prompt_store.create_prompt(body="Original prompt", version="1.0")
+    prompt_store.update_prompt(prompt_data["id"], body="Updated prompt", version="1.1")
+    
+    rolled_back = prompt_store.rollback_prompt(prompt_data["id"], "1.0")
+    assert rolled_back["body"] == "Original prompt"
+    assert rolled_back["audit_log"][-1]["action"] == "rollback"
+    assert rolled_back["audit_log"][-1]["original_version"] == "1.1"
+    assert prompt_store.get_prompt(prompt_data["id"])["version"] == "1.0"
+
+def test_body_diff_round_trip():
+    """Test that word-level diffs rebuild the new body exactly."""
+    old = "You are a helpful assistant.\n\nAnswer  briefly."
+    new = "You are a careful, helpful assistant.\nAnswer briefly and cite sources."
+    
+    assert apply_body_diff(old, diff_body(old, new)) == new
+    assert apply_body_diff("", diff_body("", new)) == new
+    assert apply_body_diff(old, diff_body(old, "")) == ""
+
+def test_many_revisions_are_reconstructed():
+    """Test that every version survives storage as snapshots plus diffs."""
+    prompt_store = PromptStoreService()
+    rng = random.Random(7)
+    words = [f"word{i}" for i in range(200)]
+    
+    body = " ".join(words)
+    prompt_data = prompt_store.create_prompt(body=body, version="1.0")
+    expected = [body]
+    for i in range(1, SNAPSHOT_INTERVAL * 3):
+        tokens = body.split(" ")
+        tokens[rng.randrange(len(tokens))] = f"edit{i}"
+        body = " ".join(tokens)
+        prompt_store.update_prompt(prompt_data["id"], body=body, version=f"1.{i}")
+        expected.append(body)
+    
+    versions = prompt_store.get_prompt_versions(prompt_data["id"])
+    assert [v["body"] for v in versions] == expected
+    
+    # Most versions are diffs; only one in SNAPSHOT_INTERVAL is a full copy
+    kinds = [row[0] for row in prompt_store._conn.execute(
+        "SELECT kind FROM prompt_versions WHERE prompt_id = ?", (prompt_data["id"],)
+    )]
+    assert kinds.count("snapshot") == 3
+    
+    rolled_back = prompt_store.rollback_prompt(prompt_data["id"], "1.40")
+    assert rolled_back["body"] == expected[40]
+
+def test_each_version_has_its_own_audit_entry():
+    """Test that versions carry the audit log as of that version, and the version log only its own entry."""
+    prompt_store = PromptStoreService()
+    
+    prompt_data = prompt_store.create_prompt(body="Original prompt", version="1.0")
+    prompt_store.update_prompt(prompt_data["id"], tags=["retagged"], version="1.1")
+    prompt_store.update_prompt(prompt_data["id"], body="Updated prompt", version="1.2")
+    prompt_store.rollback_prompt(prompt_data["id"], "1.0")
+    audit_log = prompt_store.get_prompt(prompt_data["id"])["audit_log"]
+    assert [entry["action"] for entry in audit_log] == ["create", "update", "update", "rollback"]
+    
+    # Versions have the keys of a prompt, as they always have
+    versions = prompt_store.get_prompt_versions(prompt_data["id"])
+    assert set(versions[0]) == set(prompt_store.get_prompt(prompt_data["id"]))
+    assert [v["version"] for v in versions] == ["1.0", "1.1", "1.2"]
+    assert [v["audit_log"] for v in versions] == [audit_log[:1], audit_log[:2], audit_log[:3]]
+    
+    log = prompt_store.get_version_log(prompt_data["id"])
+    assert [v["audit"] for v in log] == audit_log[:3]
+    assert all("audit_log" not in v for v in log)
+    assert prompt_store.get_version_log(prompt_data["id"], offset=1, limit=1) == log[1:2]
+
+def test_backup_and_restore(tmp_path):
+    """Test that a backup restores prompts, history and audit entries."""
+    prompt_store = PromptStoreService()
+    prompt_data = prompt_store.create_prompt(body="Backed up prompt", tags=["backup"])
+    prompt_store.update_prompt(prompt_data["id"], body="Backed up prompt, edited", version="1.1")
+    
+    backup_path = str(tmp_path / "backup.opra")
+    prompt_store.backup_prompts(backup_path)
+    
+    restored = PromptStoreService()
+    restored.restore_prompts(backup_path)
+    assert restored.get_prompt(prompt_data["id"]) == prompt_store.get_prompt(prompt_data["id"])
+    assert restored.get_prompt_versions(prompt_data["id"]) == prompt_store.get_prompt_versions(prompt_data["id"])
+
+def test_incremental_backup_and_single_restore(tmp_path):
+    """Test incremental backups on top of a full one and restoring a single prompt."""
+    db_path = str(tmp_path / "prompts.db")
+    prompt_store = PromptStoreService(db_path=db_path)
+    kept = prompt_store.create_prompt(body="Kept prompt")
+    edited = prompt_store.create_prompt(body="Edited prompt")
+    deleted = prompt_store.create_prompt(body="Deleted prompt")
+    
+    full_path = str(tmp_path / "full.opra")
+    checkpoint = prompt_store.backup_prompts(full_path)
+    
+    prompt_store.update_prompt(edited["id"], body="Edited prompt, second draft", version="1.1")
+    prompt_store.delete_prompt(deleted["id"])
+    added = prompt_store.create_prompt(body="Added prompt")
+    
+    incremental_path = str(tmp_path / "incremental.opra")
+    prompt_store.backup_prompts(incremental_path, since=checkpoint)
+    
+    restored = PromptStoreService()
+    restored.restore_prompts(full_path)
+    assert restored.get_prompt(deleted["id"]) is not None
+    restored.restore_prompts(incremental_path)
+    assert restored.prompts == prompt_store.prompts
+    assert restored.get_prompt_versions(edited["id"]) == prompt_store.get_prompt_versions(edited["id"])
+    assert restored.search_prompts(query="added") == [restored.get_prompt(added["id"])]
+    
+    # A single prompt comes back from the full backup without touching the others
+    restored.update_prompt(kept["id"], body="Broken edit")
+    assert restored.restore_prompt(full_path, kept["id"]) is True
+    assert restored.get_prompt(kept["id"])["body"] == "Kept prompt"
+    assert restored.get_prompt(edited["id"])["body"] == "Edited prompt, second draft"
+    assert restored.restore_prompt(incremental_path, kept["id"]) is False
+
+def test_change_log_keeps_one_entry_per_prompt(tmp_path):
+    """Test that the change log is compacted as it grows and tombstones are pruned on request."""
+    db_path = str(tmp_path / "prompts.db")
+    prompt_store = PromptStoreService(db_path=db_path)
+    reader = PromptStoreService(db_path=db_path)
+    kept = prompt_store.create_prompt(body="Kept prompt")
+    deleted = prompt_store.create_prompt(body="Deleted prompt")
+    checkpoint = prompt_store.backup_prompts(str(tmp_path / "full.opra"))
+    assert reader.get_prompt(deleted["id"]) is not None
+    for i in range(10):
+        prompt_store.update_prompt(kept["id"], body=f"Kept prompt, draft {i}")
+    prompt_store.delete_prompt(deleted["id"])
+    
+    changes = lambda: [row[0] for row in prompt_store._conn.execute("SELECT prompt_id FROM prompt_changes")]
+    assert changes() == [kept["id"], deleted["id"]]
+    
+    # Incremental backups still see both the edit and the delete
+    incremental_path = str(tmp_path / "incremental.opra")
+    prompt_store.backup_prompts(incremental_path, since=checkpoint)
+    restored = PromptStoreService()
+    restored.restore_prompts(str(tmp_path / "full.opra"))
+    restored.restore_prompts(incremental_path)
+    assert restored.prompts == prompt_store.prompts
+    
+    # The reader has not caught up with the delete when its tombstone is pruned, so it reloads
+    assert deleted["id"] in reader.prompts
+    latest = prompt_store.create_prompt(body="Latest prompt")
+    assert prompt_store.prune_changes(prompt_store.backup_prompts(str(tmp_path / "latest.opra"))) == 1
+    assert changes() == [kept["id"], latest["id"]]
+    assert reader.get_prompt(deleted["id"]) is None
+    assert reader.prompts == prompt_store.prompts
+    with pytest.raises(ValueError):
+        prompt_store.backup_prompts(str(tmp_path / "stale.opra"), since=checkpoint)
+
+def test_cache_changes_wait_for_commit():
+    """Test that readers never see a write whose transaction rolls back."""
+    prompt_store = PromptStoreService()
+    prompt_data = prompt_store.create_prompt(body="Original prompt", tags=["original"])
+    
+    with pytest.raises(RuntimeError):
+        with prompt_store._transaction():
+            prompt_store._cache_put(prompt_store.prompts[prompt_data["id"]].replace(body="Uncommitted"))
+            prompt_store._cache_drop("prompt_missing")
+            assert prompt_store.get_prompt(prompt_data["id"])["body"] == "Original prompt"
+            raise RuntimeError("Write failed")
+    
+    assert prompt_store.get_prompt(prompt_data["id"])["body"] == "Original prompt"
+    assert prompt_store.search_prompts(query="uncommitted") == []
+    assert prompt_store._pending_cache is None
+
+def test_corrupt_backup_is_rejected(tmp_path):
+    """Test that a damaged archive is rejected without changing the store."""
+    prompt_store = PromptStoreService()
+    for i in range(5):
+        prompt_store.create_prompt(body=f"Prompt {i}")
+    backup_path = tmp_path / "backup.opra"
+    prompt_store.backup_prompts(str(backup_path))
+    
+    clean = backup_path.read_bytes()
+    data = bytearray(clean)
+    data[len(data) // 2] ^= 0xFF
+    backup_path.write_bytes(bytes(data))
+    
+    target = PromptStoreService()
+    existing = target.create_prompt(body="Existing prompt")
+    with pytest.raises(ArchiveError):
+        target.restore_prompts(str(backup_path))
+    assert list(target.prompts) == [existing["id"]]
+    
+    # A truncated archive is caught too
+    backup_path.write_bytes(clean[:len(clean) - 20])
+    with pytest.raises(ArchiveError):
+        target.restore_prompts(str(backup_path))
+    assert target.get_prompt(existing["id"]) == existing
+
+def test_full_copy_history_is_migrated(tmp_path):
+    """Test that a database with full-copy version history is converted on open."""
+    db_path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(db_path)
+    conn.executescript("""
+        CREATE TABLE prompts (seq INTEGER PRIMARY KEY AUTOINCREMENT, id TEXT UNIQUE, body TEXT NOT NULL,
+            version TEXT NOT NULL, tags TEXT NOT NULL, created_at TEXT NOT NULL, updated_at TEXT NOT NULL,
+            audit_log TEXT NOT NULL);
+        CREATE TABLE prompt_versions (prompt_id TEXT NOT NULL, seq INTEGER NOT NULL, data TEXT NOT NULL,
+            PRIMARY KEY (prompt_id, seq));
+    """)
+    audit_log = [{"action": "create", "version": "1.0"}, {"action": "update", "version": "1.1"}]
+    conn.execute(
+        "INSERT INTO prompts VALUES (1, 'prompt_1', 'Second body', '1.1', '[\"a\"]', 't0', 't1', ?)",
+        (json.dumps(audit_log),)
+    )
+    for seq, (body, version) in enumerate([("First body", "1.0"), ("Second body", "1.1")]):
+        data = {"id": "prompt_1", "body": body, "version": version, "tags": ["a"], "created_at": "t0", "updated_at": "t1"}
+        conn.execute("INSERT INTO prompt_versions VALUES ('prompt_1', ?, ?)", (seq, json.dumps(data)))
+    conn.commit()
+    conn.close()
+    
+    prompt_store = PromptStoreService(db_path=db_path)
+    assert prompt_store.get_prompt("prompt_1")["audit_log"] == audit_log
+    assert [v["body"] for v in prompt_store.get_prompt_versions("prompt_1")] == ["First body", "Second body"]
+    assert prompt_store.create_prompt(body="New")["id"] == "prompt_2"
+
+def test_inline_bodies_are_migrated_to_blobs(tmp_path):
+    """Test that a database with bodies stored inline is moved to content-addressed blobs."""
+    db_path = str(tmp_path / "inline.db")
+    conn = sqlite3.connect(db_path)
+    conn.executescript("""
+        CREATE TABLE prompts (seq INTEGER PRIMARY KEY AUTOINCREMENT, id TEXT UNIQUE, body TEXT NOT NULL,
+            version TEXT NOT NULL, tags TEXT NOT NULL, created_at TEXT NOT NULL, updated_at TEXT NOT NULL);
+        CREATE TABLE prompt_versions (prompt_id TEXT NOT NULL, seq INTEGER NOT NULL, version TEXT NOT NULL,
+            kind TEXT NOT NULL, payload TEXT NOT NULL, timestamp TEXT NOT NULL, PRIMARY KEY (prompt_id, seq));
+        CREATE TABLE prompt_audit (prompt_id TEXT NOT NULL, seq INTEGER NOT NULL, version_seq INTEGER,
+            entry TEXT NOT NULL, PRIMARY KEY (prompt_id, seq));
+        CREATE TABLE prompt_changes (seq INTEGER PRIMARY KEY AUTOINCREMENT, prompt_id TEXT NOT NULL);
+        INSERT INTO prompts VALUES (1, 'prompt_1', 'Shared body', '1.0', '[]', 't0', 't0');
+        INSERT INTO prompts VALUES (3, 'prompt_3', 'Shared body', '1.0', '[]', 't0', 't0');
+        INSERT INTO prompt_versions VALUES ('prompt_1', 0, '1.0', 'snapshot', '{"body": "Shared body", "tags": []}', 't0');
+        INSERT INTO prompt_versions VALUES ('prompt_3', 0, '1.0', 'snapshot', '{"body": "Shared body", "tags": []}', 't0');
+        UPDATE sqlite_sequence SET seq = 4 WHERE name = 'prompts';
+        PRAGMA user_version = 2;
+    """)
+    conn.commit()
+    conn.close()
+    
+    prompt_store = PromptStoreService(db_path=db_path)
+    assert prompt_store.get_prompt("prompt_3")["body"] == "Shared body"
+    assert [v["body"] for v in prompt_store.get_prompt_versions("prompt_1")] == ["Shared body"]
+    assert prompt_store.get_storage_stats()["blobs"] == 1
+    assert prompt_store.create_prompt(body="New")["id"] == "prompt_5"
+
+def test_bodies_are_deduplicated(tmp_path):
+    """Test that identical bodies are stored once and released when nothing uses them."""
+    prompt_store = PromptStoreService(db_path=str(tmp_path / "prompts.db"))
+    template = "You are a helpful assistant. " * 20
+    first = prompt_store.create_prompt(body=template)
+    second = prompt_store.create_prompt(body=template, tags=["copy"])
+    assert prompt_store.get_prompt(second["id"])["body"] is prompt_store.get_prompt(first["id"])["body"]
+    
+    stats = prompt_store.get_storage_stats()
+    assert stats["blobs"] == 1
+    assert stats["saved_bytes"] == 3 * len(template)  # Two prompts and two snapshots share one copy
+    
+    # Re-tags and rollbacks to a stored body add no text
+    prompt_store.update_prompt(first["id"], tags=["retagged"], version="1.1")
+    prompt_store.update_prompt(first["id"], body="A different body", version="1.2")
+    prompt_store.rollback_prompt(first["id"], "1.0")
+    assert prompt_store.get_storage_stats()["stored_bytes"] == stats["stored_bytes"] + len("A different body")
+    assert [v["body"] for v in prompt_store.get_prompt_versions(first["id"])] == [template, template, "A different body"]
+    
+    # Deleting every user of a body deletes its blob
+    prompt_store.delete_prompt(first["id"])
+    assert prompt_store.get_storage_stats()["blobs"] == 1
+    prompt_store.delete_prompt(second["id"])
+    assert prompt_store.get_storage_stats() == {
+        "blobs": 0, "references": 0, "stored_bytes": 0, "referenced_bytes": 0, "saved_bytes": 0, "dedup_ratio": 1.0
+    }
+    assert prompt_store._bodies == {}
+
+def test_version_history_queries():
+    """Test paged history and version lookups by pattern and time."""
+    prompt_store = PromptStoreService()
+    prompt_data = prompt_store.create_prompt(body="Version 0", version="1.0")
+    for i in range(1, SNAPSHOT_INTERVAL + 5):
+        prompt_store.update_prompt(prompt_data["id"], body=f"Version {i}", version=f"1.{i}")
+    prompt_store.update_prompt(prompt_data["id"], body="Major", version="2.0")
+    
+    versions = prompt_store.get_prompt_versions(prompt_data["id"])
+    assert len(versions) == SNAPSHOT_INTERVAL + 6
+    page = prompt_store.get_prompt_versions(prompt_data["id"], offset=SNAPSHOT_INTERVAL - 2, limit=4)
+    assert page == versions[SNAPSHOT_INTERVAL - 2:SNAPSHOT_INTERVAL + 2]
+    
+    log = prompt_store.get_version_log(prompt_data["id"])
+    latest_one = prompt_store.find_prompt_version(prompt_data["id"], "1.x")
+    assert latest_one == log[-2]
+    assert latest_one["audit"]["action"] == "update"
+    assert prompt_store.find_prompt_version(prompt_data["id"], as_of=versions[3]["updated_at"]) == log[3]
+    assert prompt_store.find_prompt_version(prompt_data["id"])["body"] == "Major"
+    assert prompt_store.find_prompt_version(prompt_data["id"], "9.x") is None
+    
+    # Rollbacks resolve through the same index, and new versions are indexed as they are written
+    prompt_store.rollback_prompt(prompt_data["id"], "1.3")
+    assert prompt_store.get_prompt(prompt_data["id"])["body"] == "Version 3"
+    prompt_store.update_prompt(prompt_data["id"], body="Patched", version="1.99")
+    assert prompt_store.find_prompt_version(prompt_data["id"], "1.x")["body"] == "Patched"
+
+def test_search_prompts_by_tags():
+    """Test tag searches and counts through the tag index."""
+    prompt_store = PromptStoreService()
+    first = prompt_store.create_prompt(body="Summarize the text", tags=["summary", "prod"])
+    second = prompt_store.create_prompt(body="Translate the text", tags=["translate", "prod"])
+    third = prompt_store.create_prompt(body="Draft summary", tags=["summary", "draft"])
+    
+    assert [p["id"] for p in prompt_store.search_prompts(tags=["summary"])] == [first["id"], third["id"]]
+    assert [p["id"] for p in prompt_store.search_prompts(all_tags=["summary", "prod"])] == [first["id"]]
+    assert [p["id"] for p in prompt_store.search_prompts(exclude_tags=["draft"], limit=1, offset=1)] == [second["id"]]
+    assert prompt_store.search_prompts(tags=["translate"]) == [prompt_store.get_prompt(second["id"])]
+    assert prompt_store.count_prompts(tags=["prod"], exclude_tags=["translate"]) == 1
+    
+    # The index follows updates, rollbacks and deletes
+    prompt_store.update_prompt(third["id"], tags=["summary", "prod"], version="1.1")
+    assert prompt_store.count_prompts(all_tags=["summary", "prod"]) == 2
+    prompt_store.rollback_prompt(third["id"], "1.0")
+    assert prompt_store.count_prompts(all_tags=["summary", "prod"]) == 1
+    prompt_store.delete_prompt(first["id"])
+    assert prompt_store.get_tag_counts() == {"summary": 1, "prod": 1, "translate": 1, "draft": 1}
+
+def test_tag_index_follows_other_instances(tmp_path):
+    """Test that the tag index picks up tags written by another process."""
+    db_path = str(tmp_path / "prompts.db")
+    writer = PromptStoreService(db_path=db_path)
+    reader = PromptStoreService(db_path=db_path)
+    
+    prompt_data = writer.create_prompt(body="Shared prompt", tags=["shared"])
+    assert reader.count_prompts(tags=["shared"]) == 1
+    
+    writer.update_prompt(prompt_data["id"], tags=["moved"])
+    assert reader.count_prompts(tags=["shared"]) == 0
+    assert [p["id"] for p in reader.search_prompts(tags=["moved"])] == [prompt_data["id"]]
+
+def test_sparse_library_with_large_seqs(tmp_path):
+    """Test tag and substring searches when churn has pushed prompt seqs into the millions."""
+    db_path = str(tmp_path / "prompts.db")
+    prompt_store = PromptStoreService(db_path=db_path, substring_index=True)
+    prompt_store.create_prompt(body="First prompt")
+    prompt_store._conn.execute("UPDATE sqlite_sequence SET seq = 5000000 WHERE name = 'prompts'")
+    created = [
+        prompt_store.create_prompt(body=f"Summarize report {i}", tags=["even" if i % 2 == 0 else "odd"])
+        for i in range(20)
+    ]
+    
+    assert prompt_store.count_prompts(tags=["even"]) == 10
+    page = prompt_store.search_prompts(tags=["odd"], offset=8)
+    assert [p["id"] for p in page] == [created[17]["id"], created[19]["id"]]
+    assert [p["id"] for p in prompt_store.search_prompts(query="report 13")] == [created[13]["id"]]
+    assert all(len(bitmap._chunks) == 1 for bitmap in prompt_store.tag_index._bitmaps.values())
+    
+    reopened = PromptStoreService(db_path=db_path)
+    assert reopened.count_prompts(exclude_tags=["odd"]) == 11
+
+def test_search_prompts_by_text():
+    """Test ranked full-text queries, substring queries and their tag filters."""
+    prompt_store = PromptStoreService(substring_index=True)
+    first = prompt_store.create_prompt(body="Summarize the quarterly report", tags=["prod"])
+    second = prompt_store.create_prompt(body="Summarize the report, then summarize the summary", tags=["draft"])
+    third = prompt_store.create_prompt(body="Translate the report", tags=["prod"])
+    
+    search = lambda query, **options: [p["id"] for p in prompt_store.search_prompts(query=query, **options)]
+    assert search("summarize", ranked=True) == [second["id"], first["id"]]
+    assert search("summarize", tags=["prod"], ranked=True) == [first["id"]]
+    assert search("quarter*", ranked=True) == [first["id"]]
+    ranked = prompt_store.search_prompts(query="the report", ranked=True)
+    assert len(ranked) == 3
+    assert prompt_store.search_prompts(query="the report", limit=1, offset=2, ranked=True) == ranked[2:]
+    assert search("arter") == [first["id"]]
+    
+    # The text index follows updates and deletes
+    prompt_store.update_prompt(third["id"], body="Translate the quarterly figures")
+    assert set(search("quarterly", ranked=True)) == {first["id"], third["id"]}
+    prompt_store.delete_prompt(first["id"])
+    assert search("quarterly", ranked=True) == [third["id"]]
+    assert search("arter") == [third["id"]]
+
+def test_query_search_matches_substrings_by_default():
+    """Test that a plain query matches bodies by case-insensitive substring, in creation order."""
+    prompt_store = PromptStoreService()
+    first = prompt_store.create_prompt(body="Summarize the QUARTERLY report", tags=["prod"])
+    second = prompt_store.create_prompt(body="Summarize the report, then summarize the summary")
+    prompt_store.create_prompt(body="Translate the report", tags=["quarterly"])
+    
+    # The call shape the store has always had: partial words match, tags and ranking play no part
+    assert [p["id"] for p in prompt_store.search_prompts(query="quarter")] == [first["id"]]
+    assert [p["id"] for p in prompt_store.search_prompts(query="summarize")] == [first["id"], second["id"]]
+    assert [p["id"] for p in prompt_store.search_prompts(query="MARIZE THE")] == [first["id"], second["id"]]
+    assert prompt_store.search_prompts(query="quarter*") == []
+
+def test_concurrent_readers_see_whole_updates(tmp_path):
+    """Test that readers running alongside a writer never see a half-applied update."""
+    prompt_store = PromptStoreService(db_path=str(tmp_path / "prompts.db"))
+    prompt_data = prompt_store.create_prompt(body="revision 0", version="1.0", tags=["r0"])
+    stop = threading.Event()
+    errors = []
+    
+    def write():
+        for n in range(1, 100):
+            prompt_store.update_prompt(prompt_data["id"], body=f"revision {n}", version=f"1.{n}", tags=[f"r{n}"])
+        stop.set()
+    
+    def read():
+        try:
+            while not stop.is_set():
+                current = prompt_store.get_prompt(prompt_data["id"])
+                n = current["version"].split(".")[1]
+                assert current["body"] == f"revision {n}" and current["tags"] == [f"r{n}"]
+                
+                for match in prompt_store.search_prompts(query="revision"):
+                    assert match["tags"] == [f"r{match['body'].split()[1]}"]
+                latest = prompt_store.find_prompt_version(prompt_data["id"])
+                assert latest["body"] == f"revision {latest['version'].split('.')[1]}"
+        except Exception as e:
+            errors.append(e)
+    
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for thread in readers:
+        thread.start()
+    write()
+    for thread in readers:
+        thread.join()
+    
+    assert errors == []
+    assert len(prompt_store.get_prompt_versions(prompt_data["id"])) == 100
+    assert prompt_store.find_prompt_version(prompt_data["id"])["version"] == "1.99"
+
+def test_cached_records_are_compact():
+    """Test that cached prompts keep compact fields and still expand to the full prompt dict."""
+    prompt_store = PromptStoreService()
+    first = prompt_store.create_prompt(body="Shared body", tags=["prod"])
+    second = prompt_store.create_prompt(body="Shared body", tags=["prod"])
+    prompt_store.update_prompt(first["id"], version="1.1")
+    
+    record = prompt_store.prompts[first["id"]]
+    assert isinstance(record, PromptRecord)
+    assert isinstance(record.created_at, int)
+    assert decode_timestamp(record.created_at) == first["created_at"]
+    assert record.tags[0] is prompt_store.prompts[second["id"]].tags[0]
+    assert record.body is prompt_store.prompts[second["id"]].body
+    assert not hasattr(record, "__dict__")
+    
+    # The audit log is read from its own table when the prompt is returned
+    assert [entry["action"] for entry in prompt_store.get_prompt(first["id"])["audit_log"]] == ["create", "update"]
+    
+    # Timestamps that do not round-trip through an integer are kept as given
+    assert encode_timestamp("2024-01-01T00:00:00+00:00") == "2024-01-01T00:00:00+00:00"
+    assert encode_timestamp("t0") == "t0"
+
+def test_import_prompts_reports_bad_rows(tmp_path):
+    """Test that a bulk import commits the good rows and reports the bad ones by position."""
+    prompt_store = PromptStoreService(db_path=str(tmp_path / "prompts.db"))
+    rows = [{"body": f"Prompt {i}", "tags": ["bulk"]} for i in range(5)]
+    rows[1] = {"body": ""}
+    rows[3] = {"body": "Tagged", "tags": "bulk"}
+    rows.append(ValueError("Invalid JSON"))
+    
+    result = prompt_store.import_prompts(iter(rows), chunk_size=2)
+    assert result["imported"] == 3
+    assert result["failed"] == 3
+    assert [error["index"] for error in result["errors"]] == [1, 3, 5]
+    assert result["errors"][2]["error"] == "Invalid JSON"
+    assert prompt_store.count_prompts(tags=["bulk"]) == 3
+    
+    # Imported prompts are complete, with a first version and audit entry
+    prompt_data = PromptStoreService(db_path=str(tmp_path / "prompts.db")).get_prompt(result["ids"][0])
+    assert prompt_data["body"] == "Prompt 0"
+    assert [entry["action"] for entry in prompt_data["audit_log"]] == ["create"]
+    assert len(prompt_store.get_prompt_versions(result["ids"][0])) == 1
+
+def test_export_prompts_streams_current_state():
+    """Test that an export yields prompts lazily in creation order and skips ones deleted meanwhile."""
+    prompt_store = PromptStoreService()
+    ids = [prompt_store.create_prompt(body=f"Prompt {i}", tags=["even" if i % 2 == 0 else "odd"])["id"] for i in range(4)]
+    
+    export = prompt_store.export_prompts()
+    assert next(export)["id"] == ids[0]
+    prompt_store.update_prompt(ids[1], body="Updated")
+    prompt_store.delete_prompt(ids[2])
+    assert [(p["id"], p["body"]) for p in export] == [(ids[1], "Updated"), (ids[3], "Prompt 3")]
+    
+    assert [p["id"] for p in prompt_store.export_prompts(tags=["even"])] == [ids[0]]
+
+def test_exports_import_back_as_ndjson():
+    """Test that an NDJSON export, read back with the routes' parser, imports into another store."""
+    prompt_store = PromptStoreService()
+    for i in range(5):
+        prompt_store.create_prompt(body=f"Prompt {i}", version="1.1", tags=["bulk"])
+    exported = list(prompt_store.export_chunks(batch_size=2))
+    assert len([chunk for chunk in exported if chunk]) == 3
+    assert json.loads(b"".join(prompt_store.export_chunks("json")))[0]["body"] == "Prompt 0"
+    
+    copy = PromptStoreService()
+    result = copy.import_prompts(bulk.iter_ndjson(exported + [b'{"body": \n', b"not json\n"]))
+    assert result["imported"] == 5
+    assert [error["index"] for error in result["errors"]] == [5, 6]
+    assert [(p["body"], p["version"], p["tags"]) for p in copy.export_prompts()] == [
+        (f"Prompt {i}", "1.1", ["bulk"]) for i in range(5)
+    ]
+
+def test_duplicate_lookups_and_clusters():
+    """Test near-duplicate lookups and clustering with and without the MinHash index."""
+    body = " ".join(f"step{i}" for i in range(40))
+    for duplicate_index in (True, False):
+        prompt_store = PromptStoreService(duplicate_index=duplicate_index)
+        original = prompt_store.create_prompt(body=body)
+        copy = prompt_store.create_prompt(body=body.replace("step20", "changed"))
+        other = prompt_store.create_prompt(body="Translate the text into French")
+        
+        duplicates = prompt_store.find_duplicates(original["id"])
+        assert [d["id"] for d in duplicates] == [copy["id"]]
+        assert 0.8 <= duplicates[0]["similarity"] < 1.0
+        assert prompt_store.find_similar_prompts("Translate the text into French")[0]["id"] == other["id"]
+        assert prompt_store.cluster_duplicates() == [[original["id"], copy["id"]]]
+        
+        prompt_store.update_prompt(copy["id"], body="Something else entirely")
+        assert prompt_store.find_duplicates(original["id"]) == []
+        assert prompt_store.cluster_duplicates() == []
+
+def test_semantic_search():
+    """Test that semantic search ranks prompts by meaning and follows updates and deletes."""
+    prompt_store = PromptStoreService(embedder=HashingEmbedder())
+    sales = prompt_store.create_prompt(body="Summarize the quarterly sales report for the board")
+    poem = prompt_store.create_prompt(body="Translate this poem into French")
+    prompt_store.create_prompt(body="Write unit tests for the login form")
+    
+    result = prompt_store.semantic_search("summary of the quarterly sales numbers", k=2)
+    assert [p["id"] for p in result["results"]][0] == sales["id"]
+    assert result["results"][0]["score"] > result["results"][1]["score"]
+    assert not result["truncated"]
+    
+    prompt_store.update_prompt(poem["id"], body="Summarize the quarterly sales report for investors")
+    prompt_store.delete_prompt(sales["id"])
+    assert prompt_store.semantic_search("quarterly sales report", k=1)["results"][0]["id"] == poem["id"]
+    
+    with pytest.raises(ValueError):
+        PromptStoreService().semantic_search("quarterly sales report")
+
+class RecordingEmbedder(HashingEmbedder):
+    """Hashing embedder that notes each call's texts and whether the store was locked for it."""
+    
+    def __init__(self, dim: int = 256):
+        super().__init__(dim)
+        self.store = None
+        self.calls = []
+    
+    def embed(self, texts):
+        locked = self.store is not None and (self.store._lock._is_owned() or self.store._conn.in_transaction)
+        self.calls.append((list(texts), locked))
+        return super().embed(texts)
+
+def test_writes_embed_outside_the_transaction():
+    """Test that writes embed new bodies before taking the write lock, once per distinct body."""
+    embedder = RecordingEmbedder()
+    prompt_store = PromptStoreService(embedder=embedder)
+    embedder.store = prompt_store
+    
+    prompt_data = prompt_store.create_prompt(body="Summarize the report")
+    prompt_store.update_prompt(prompt_data["id"], body="Summarize the report briefly", version="1.1")
+    prompt_store.update_prompt(prompt_data["id"], tags=["retagged"], version="1.2")
+    prompt_store.rollback_prompt(prompt_data["id"], "1.0")
+    prompt_store.import_prompts([{"body": "Translate the poem"}, {"body": ""}, {"body": "Summarize the report"}])
+    
+    assert embedder.calls == [
+        (["Summarize the report"], False),
+        (["Summarize the report briefly"], False),
+        (["Translate the poem"], False)
+    ]
+    assert prompt_store.semantic_search("translate poem", k=1)["results"][0]["body"] == "Translate the poem"
+
+def test_vectors_are_stored_and_loaded_in_batches(tmp_path):
+    """Test that a restart reuses stored vectors and a new embedder embeds the library in batches."""
+    db_path = str(tmp_path / "prompts.db")
+    prompt_store = PromptStoreService(db_path=db_path, embedder=HashingEmbedder())
+    kept = prompt_store.create_prompt(body="Summarize the quarterly sales report")
+    deleted = prompt_store.create_prompt(body="Translate this poem into French")
+    prompt_store.import_prompts({"body": f"Write test case {i}"} for i in range(70))
+    prompt_store.delete_prompt(deleted["id"])
+    prompt_store.close()
+    
+    # The deleted prompt's vector went with its body
+    stored = lambda: prompt_store._conn.execute("SELECT embedder, COUNT(*) FROM prompt_embeddings GROUP BY embedder")
+    prompt_store = PromptStoreService(db_path=db_path)
+    assert [tuple(row) for row in stored()] == [("hashing:256", 71)]
+    
+    embedder = RecordingEmbedder()
+    reopened = PromptStoreService(db_path=db_path, embedder=embedder)
+    assert embedder.calls == []
+    assert reopened.semantic_search("quarterly sales", k=1)["results"][0]["id"] == kept["id"]
+    
+    embedder = RecordingEmbedder(dim=64)
+    PromptStoreService(db_path=db_path, embedder=embedder)
+    assert [len(texts) for texts, _ in embedder.calls] == [64, 7]
+    assert [tuple(row) for row in stored()] == [("hashing:256", 71), ("hashing:64", 71)]
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
\ No newline at end of file
@@ -0,0 +1,76 @@
+# AI Agentic Platform - Prompt Tag Tests
+"""
+Unit tests for prompt tag filtering and counts.
+"""
+
+import json
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Import our prompt routes
+from ..models import Prompt, PromptTag
+from ..routes import prompts
+from ..routes.prompts import _prompt_filters, create_prompt, delete_prompt, get_tag_counts, update_prompt
+
+async def add_prompts(db: AsyncSession, *tag_lists) -> list:
+    """Create a prompt with each list of tags, returning their IDs."""
+    user = SimpleNamespace(id=uuid.uuid4())
+    ids = []
+    for i, tags in enumerate(tag_lists):
+        response = await create_prompt(body=f"prompt-{i}", tags=tags, db=db, current_user=user)
+        ids.append(json.loads(response.body)["id"])
+    return ids
+
+async def matching(db: AsyncSession, tags: list, match_all: bool) -> list:
+    """Get the bodies of the prompts the listing's tag filter matches."""
+    filters = await _prompt_filters(db, None, (tags, match_all))
+    result = await db.execute(select(Prompt.body).filter(*filters).order_by(Prompt.body))
+    return result.scalars().all()
+
+@pytest.mark.asyncio
+async def test_tag_filter_matches_all_or_any(db):
+    """Test that prompts are matched on all of the tags by default, or on any, by either tag lookup."""
+    await add_prompts(db, ["a", "b"], ["a"], ["b", "c"], ["a", "a"])
+    
+    threshold = prompts.TAG_SCAN_THRESHOLD
+    try:
+        # Probe every prompt's tags, then look prompts up by tag
+        for value in (0, threshold):
+            prompts.TAG_SCAN_THRESHOLD = value
+            assert await matching(db, ["a"], True) == ["prompt-0", "prompt-1", "prompt-3"]
+            assert await matching(db, ["a", "b"], True) == ["prompt-0"]
+            assert await matching(db, ["a", "c"], False) == ["prompt-0", "prompt-1", "prompt-2", "prompt-3"]
+            assert await matching(db, ["missing"], False) == []
+    finally:
+        prompts.TAG_SCAN_THRESHOLD = threshold
+
+@pytest.mark.asyncio
+async def test_tag_index_follows_updates_and_deletes(db):
+    """Test that updating or deleting a prompt re-indexes its tags."""
+    first, second = await add_prompts(db, ["a", "b"], ["b"])
+    
+    await update_prompt(first, tags=["c"], db=db)
+    await delete_prompt(second, db=db)
+    
+    tags = (await db.execute(select(PromptTag.tag))).scalars().all()
+    assert tags == ["c"]
+
+@pytest.mark.asyncio
+async def test_tag_counts(db):
+    """Test counting tags, most used first, among the prompts matching a tag filter."""
+    await add_prompts(db, ["a", "b"], ["a", "c"], ["a", "b"], ["d"])
+    
+    response = await get_tag_counts(owner_id=None, tag_filter=([], True), limit=100, db=db)
+    assert json.loads(response.body) == [
+        {"tag": "a", "count": 3}, {"tag": "b", "count": 2}, {"tag": "c", "count": 1}, {"tag": "d", "count": 1}
+    ]
+    
+    response = await get_tag_counts(owner_id=None, tag_filter=(["b"], True), limit=100, db=db)
+    assert json.loads(response.body) == [{"tag": "a", "count": 2}, {"tag": "b", "count": 2}]
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
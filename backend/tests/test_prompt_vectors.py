@@ -0,0 +1,101 @@
+# AI Agentic Platform - Prompt Vector Tests
+"""
+Unit tests for prompt embeddings and the vector index.
+"""
+
+import numpy
+import pytest
+
+# Import our prompt vectors
+from ..services.prompt_vectors import Embedder, HashingEmbedder, OllamaEmbedder, VectorIndex, make_embedder
+
+def test_hashing_embedder():
+    """Test that hashed embeddings are unit length, repeatable and closer for related texts."""
+    embedder = HashingEmbedder(dim=128)
+    vectors = embedder.embed([
+        "Summarize the quarterly sales report",
+        "Summarize the quarterly finance report",
+        "Translate this poem into French",
+        ""
+    ])
+    
+    assert vectors.shape == (4, 128)
+    assert numpy.allclose(numpy.linalg.norm(vectors[:3], axis=1), 1.0)
+    assert not vectors[3].any()
+    assert numpy.array_equal(vectors[0], embedder.embed(["Summarize the quarterly sales report"])[0])
+    assert vectors[0] @ vectors[1] > vectors[0] @ vectors[2]
+
+def test_make_embedder():
+    """Test building embedders from config strings."""
+    assert make_embedder("hashing").dim == 256
+    assert make_embedder("hashing:64").dim == 64
+    client = type("Client", (), {"embeddings": lambda self, model, prompt: {"embedding": [3.0, 4.0]}})()
+    assert numpy.allclose(OllamaEmbedder(client=client).embed(["hi"]), [[0.6, 0.8]])
+    assert make_embedder("hashing:64").name == "hashing:64"
+    assert OllamaEmbedder("mxbai", client=client).name == "ollama:mxbai"
+    with pytest.raises(ValueError):
+        make_embedder("word2vec")
+    with pytest.raises(TypeError):
+        Embedder()
+
+def test_ollama_embedder_batches_requests():
+    """Test that clients with the batch endpoint get one request for all texts."""
+    calls = []
+    
+    def embed(self, model, input):
+        calls.append(list(input))
+        return {"embeddings": [[3.0, 4.0]] * len(input)}
+    
+    client = type("Client", (), {"embed": embed})()
+    assert numpy.allclose(OllamaEmbedder(client=client).embed(["a", "b", "c"]), [[0.6, 0.8]] * 3)
+    assert calls == [["a", "b", "c"]]
+
+def test_exact_search():
+    """Test brute-force search across blocks, with replaced and removed vectors."""
+    rng = numpy.random.default_rng(0)
+    vectors = rng.normal(size=(50, 16)).astype(numpy.float32)
+    vectors /= numpy.linalg.norm(vectors, axis=1, keepdims=True)
+    index = VectorIndex(block_size=8)
+    for ordinal, vector in enumerate(vectors):
+        index.add(ordinal, vector)
+    
+    # Each vector is its own best match, for a whole batch of queries at once
+    results, truncated = index.search(vectors[:5], k=3)
+    assert [matches[0][0] for matches in results] == [0, 1, 2, 3, 4]
+    assert results[0][0][1] == pytest.approx(1.0)
+    assert not truncated
+    
+    index.remove(0)
+    index.add(1, vectors[2])
+    (matches,), _ = index.search(vectors[0], k=50)
+    assert len(matches) == 49 and 0 not in [ordinal for ordinal, _ in matches]
+    assert [ordinal for ordinal, _ in index.search(vectors[2], k=2)[0][0]] in ([1, 2], [2, 1])
+    
+    # A deadline that has already passed still scans the first block
+    (matches,), truncated = index.search(vectors[40], k=1, deadline=0)
+    assert truncated and len(matches) == 1
+
+def test_ivf_search():
+    """Test that the IVF index is trained past its threshold and finds clustered neighbours."""
+    rng = numpy.random.default_rng(1)
+    centers = rng.normal(size=(10, 32))
+    vectors = (centers[rng.integers(10, size=2000)] + rng.normal(scale=0.1, size=(2000, 32))).astype(numpy.float32)
+    vectors /= numpy.linalg.norm(vectors, axis=1, keepdims=True)
+    index = VectorIndex(ivf_threshold=1000, nprobe=4)
+    for ordinal, vector in enumerate(vectors):
+        index.add(ordinal, vector)
+    assert index.is_approximate
+    
+    exact = numpy.argsort(-(vectors[:20] @ vectors.T), axis=1)[:, :10]
+    results, _ = index.search(vectors[:20], k=10)
+    recall = numpy.mean([len({o for o, _ in matches} & set(expected)) / 10 for matches, expected in zip(results, exact)])
+    assert recall >= 0.9
+    
+    # Removing most vectors falls back to exact search
+    for ordinal in range(1600):
+        index.remove(ordinal)
+    assert not index.is_approximate and len(index) == 400
+    assert index.search(vectors[1999], k=1)[0][0][0][0] == 1999
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
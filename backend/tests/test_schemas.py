@@ -0,0 +1,65 @@
+# AI Agentic Platform - Schema Tests
+"""
+Unit tests for response schemas and row projection.
+"""
+
+import json
+import uuid
+from datetime import datetime
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse
+
+# Import our schemas
+from ..models import Agent, Prompt, Team
+from ..schemas import (
+    AgentRead, Page, PromptRead, PromptVersionRead, TeamRead, columns, parse_fields, project, project_page
+)
+
+def make_agent() -> Agent:
+    """Build an agent as it would be loaded from the database."""
+    now = datetime.utcnow()
+    return Agent(
+        id=uuid.uuid4(), name="Researcher", description=None, config={"model": "llama2", "tools": ["search"]},
+        status="active", last_executed=now, performance_metrics={"runs": 3}, mcp_tools=["search"],
+        owner_id=uuid.uuid4(), created_at=now, updated_at=now
+    )
+
+def test_projections_match_schemas():
+    """Test that projected rows validate against their response schemas."""
+    agent = make_agent()
+    team = Team(id=uuid.uuid4(), name="Team", orchestration_rules={}, owner_id=agent.owner_id,
+                created_at=agent.created_at, updated_at=agent.updated_at)
+    prompt = Prompt(id=uuid.uuid4(), body="Summarize {text}", version="1.0", tags=["summary"],
+                    owner_id=agent.owner_id, created_at=agent.created_at, updated_at=agent.updated_at)
+    
+    assert AgentRead(**project(agent, AgentRead)).config == agent.config
+    # Members come from team memberships, so a team row alone projects without them
+    team_fields = [name for name in TeamRead.__fields__ if name != "members"]
+    assert TeamRead(**project(team, TeamRead, team_fields)).members == []
+    assert PromptRead(**project(prompt, PromptRead)).tags == ["summary"]
+    assert set(project(prompt, PromptVersionRead)) == {"version", "body", "created_at"}
+    
+    page = Page[AgentRead](**project_page([agent, agent], AgentRead, "cursor"))
+    assert len(page.items) == 2 and page.next_cursor == "cursor"
+
+def test_sparse_fieldsets():
+    """Test parsing the fields parameter and projecting just those fields."""
+    assert parse_fields(None, AgentRead) == tuple(AgentRead.__fields__)
+    assert parse_fields(" status,name ,", AgentRead) == ("name", "status")
+    with pytest.raises(ValueError):
+        parse_fields("name,hashed_password", AgentRead)
+    
+    assert [column.key for column in columns(Agent, ("name",), extra=("id", "created_at"))] == ["name", "id", "created_at"]
+    assert project(make_agent(), AgentRead, ("name", "status")) == {"name": "Researcher", "status": "active"}
+    assert project_page([make_agent()], AgentRead, None, ("id",))["items"][0].keys() == {"id"}
+
+def test_orjson_response_matches_jsonable_encoder():
+    """Test that the fast response encodes UUIDs and datetimes the same way FastAPI's encoder does."""
+    body = project_page([make_agent() for _ in range(3)], AgentRead, None)
+    
+    assert json.loads(ORJSONResponse(body).body) == jsonable_encoder(body)
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
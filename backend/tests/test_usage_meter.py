@@ -0,0 +1,161 @@
+# AI Agentic Platform - Usage Meter Tests
+"""
+Unit tests for the usage metering service.
+"""
+
+import pytest
+from unittest.mock import Mock
+from types import SimpleNamespace
+from datetime import datetime, timedelta
+from uuid import uuid4
+import threading
+
+# Import our usage meter
+from ..services.usage_meter import UsageMeter, QuotaState
+
+def make_session(rows):
+    """Create a mock session whose quota query returns the given rows."""
+    session = Mock()
+    session.execute.return_value.all.return_value = rows
+    return session
+
+def test_unknown_user_is_allowed_and_loaded_on_flush():
+    """Test that quota checks never block on users that have not been loaded yet."""
+    user_id = uuid4()
+    session = make_session([
+        SimpleNamespace(id=user_id, usage_quota=100, usage_reset_date=None, usage_tokens=40)
+    ])
+    meter = UsageMeter(session_factory=lambda: session)
+    
+    assert meter.check_quota(user_id) is True
+    assert meter.remaining_quota(user_id) is None
+    
+    # The user was queued for loading even though no usage was recorded
+    meter.flush()
+    assert meter.remaining_quota(user_id) == 60
+
+def test_pending_usage_counts_against_quota():
+    """Test that unflushed usage is included in the in-memory quota check."""
+    user_id = uuid4()
+    meter = UsageMeter(session_factory=Mock())
+    meter._snapshot[user_id] = QuotaState(quota=100, used_tokens=90)
+    
+    meter.record_call(user_id, tokens=5)
+    assert meter.remaining_quota(user_id) == 5
+    assert meter.check_quota(user_id) is True
+    
+    meter.record_call(user_id, tokens=10)
+    assert meter.remaining_quota(user_id) == 0
+    assert meter.check_quota(user_id) is False
+
+def test_flush_batches_pending_usage():
+    """Test that a flush writes every user's counters in a single batched update."""
+    first, second = uuid4(), uuid4()
+    session = make_session([
+        SimpleNamespace(id=first, usage_quota=1000, usage_reset_date=None, usage_tokens=0),
+        SimpleNamespace(id=second, usage_quota=None, usage_reset_date=None, usage_tokens=0)
+    ])
+    meter = UsageMeter(session_factory=lambda: session)
+    
+    meter.record_request(first)
+    meter.record_call(first, tokens=30)
+    meter.record_call(second, tokens=7)
+    
+    assert meter.flush() == 2
+    session.commit.assert_called_once()
+    
+    # One select for the quota state and one executemany update for the counters
+    assert session.execute.call_count == 2
+    params = {p["b_id"]: p for p in session.execute.call_args_list[1][0][1]}
+    assert params[first]["b_tokens"] == 30
+    assert params[first]["b_requests"] == 1
+    assert params[second]["b_calls"] == 1
+    
+    assert meter.remaining_quota(first) == 970
+    assert meter.flush() == 0
+
+def test_flush_resets_expired_periods():
+    """Test that counters roll over once the usage reset date has passed."""
+    user_id = uuid4()
+    reset_date = datetime.utcnow() - timedelta(days=1)
+    session = make_session([
+        SimpleNamespace(id=user_id, usage_quota=100, usage_reset_date=reset_date, usage_tokens=100)
+    ])
+    meter = UsageMeter(session_factory=lambda: session, reset_period_days=30)
+    
+    meter.record_call(user_id, tokens=10)
+    meter.flush()
+    
+    reset_params = session.execute.call_args_list[1][0][1]
+    assert reset_params[0]["b_reset_date"] == reset_date + timedelta(days=30)
+    assert meter.remaining_quota(user_id) == 90
+
+def test_failed_flush_requeues_usage():
+    """Test that usage is kept for the next flush when the database write fails."""
+    user_id = uuid4()
+    session = make_session([])
+    session.commit.side_effect = RuntimeError("database is locked")
+    meter = UsageMeter(session_factory=lambda: session)
+    
+    meter.record_call(user_id, tokens=12)
+    with pytest.raises(RuntimeError):
+        meter.flush()
+    
+    session.rollback.assert_called_once()
+    assert [delta.tokens for delta in meter._pending[user_id]] == [12]
+
+def test_usage_before_a_reset_is_not_counted_after_it():
+    """Test that usage recorded before the reset date is left out of the period that follows it."""
+    user_id = uuid4()
+    reset_date = datetime.utcnow() - timedelta(hours=1)
+    session = make_session([
+        SimpleNamespace(id=user_id, usage_quota=100, usage_reset_date=reset_date, usage_tokens=95)
+    ])
+    meter = UsageMeter(session_factory=lambda: session, reset_period_days=30)
+    meter._snapshot[user_id] = QuotaState(quota=100, used_tokens=95, reset_date=reset_date)
+    
+    # Recorded before the reset date, then after it
+    meter.record_call(user_id, tokens=5)
+    meter._pending[user_id][-1].recorded_at = reset_date - timedelta(minutes=1)
+    meter.record_call(user_id, tokens=10)
+    assert [delta.tokens for delta in meter._pending[user_id]] == [5, 10]
+    assert meter.remaining_quota(user_id) == 90
+    
+    meter.flush()
+    params = session.execute.call_args_list[2][0][1]
+    assert params[0]["b_tokens"] == 10 and params[0]["b_calls"] == 1
+    assert meter.remaining_quota(user_id) == 90
+
+def test_flush_drops_usage_from_a_period_reset_elsewhere():
+    """Test that usage from before a reset another worker already applied is not added to the new period."""
+    user_id = uuid4()
+    reset_date = datetime.utcnow() + timedelta(days=29)
+    session = make_session([
+        SimpleNamespace(id=user_id, usage_quota=100, usage_reset_date=reset_date, usage_tokens=0)
+    ])
+    meter = UsageMeter(session_factory=lambda: session, reset_period_days=30)
+    
+    meter.record_call(user_id, tokens=7)
+    meter._pending[user_id][-1].recorded_at = reset_date - timedelta(days=31)
+    meter.flush()
+    
+    params = session.execute.call_args_list[1][0][1]
+    assert params[0]["b_tokens"] == 0
+    assert meter.remaining_quota(user_id) == 100
+
+@pytest.mark.asyncio
+async def test_stop_flushes_off_the_event_loop():
+    """Test that stopping the meter flushes what is pending in an executor thread."""
+    user_id = uuid4()
+    threads = []
+    session = make_session([])
+    session.commit.side_effect = lambda: threads.append(threading.current_thread())
+    meter = UsageMeter(session_factory=lambda: session)
+    
+    meter.record_call(user_id, tokens=3)
+    await meter.stop()
+    assert threads and threads[0] is not threading.main_thread()
+    assert meter._pending == {}
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
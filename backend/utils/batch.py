@@ -0,0 +1,182 @@
+# AI Agentic Platform - Batch Writes
+"""
+Batch create, update and delete for the agent and team routes.
+
+A batch is validated item by item before anything is written. Malformed items, updates and deletes
+of rows the caller doesn't own, and rows named twice are each reported by operation and position.
+The remaining items are applied in one transaction, with one statement per kind of write instead
+of one per row: a multi-row INSERT, an executemany UPDATE for each set of columns changed, and a
+DELETE ... IN. An ``atomic`` batch with any bad item applies nothing.
+"""
+
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Type
+from uuid import UUID, uuid4
+
+from fastapi import HTTPException, status
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import bindparam, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..schemas import BatchRequest
+from .idempotency import find_response, record_response, replay, request_fingerprint
+from .logging import logger
+
+# Removes rows that refer to rows about to be deleted, given the session and their IDs
+DeleteHook = Callable[[AsyncSession, List[UUID]], Awaitable[None]]
+
+def _validation_message(error: ValidationError) -> str:
+    """Flatten a validation error into one line per bad field."""
+    return "; ".join(f"{'.'.join(str(part) for part in e['loc'])}: {e['msg']}" for e in error.errors())
+
+async def apply_batch(db: AsyncSession, model: Any, batch: BatchRequest, create_schema: Type[BaseModel],
+                      update_schema: Type[BaseModel], defaults: Dict[str, Any], owner_id: UUID,
+                      on_delete: Optional[DeleteHook] = None) -> Dict[str, Any]:
+    """Validate a batch and, unless it is atomic and has bad items, apply it without committing.
+    
+    New rows get ``defaults`` for the columns their create schema doesn't cover, and ``on_delete``
+    runs in the same transaction before rows are deleted. Returns the IDs created, updated and
+    deleted, the errors, and whether the batch was applied.
+    """
+    operations = len(batch.create) + len(batch.update) + len(batch.delete)
+    if operations > settings.batch_max_operations:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Batch has {operations} operations; at most {settings.batch_max_operations} are allowed"
+        )
+    
+    now = datetime.utcnow()
+    errors = []
+    
+    # Core inserts skip the model's Python-side defaults, so fill them in here
+    creates = []
+    for index, item in enumerate(batch.create):
+        try:
+            values = create_schema.parse_obj(item).dict()
+        except ValidationError as e:
+            errors.append({"operation": "create", "index": index, "error": _validation_message(e)})
+            continue
+        creates.append({
+            **defaults, **values,
+            "id": uuid4(), "owner_id": owner_id, "row_version": 1, "created_at": now, "updated_at": now
+        })
+    
+    # Fields left out of an update, or null, keep their value, as with the single-item routes
+    updates: List[Tuple[int, UUID, Dict[str, Any]]] = []
+    for index, item in enumerate(batch.update):
+        try:
+            values = update_schema.parse_obj(item).dict(exclude_none=True)
+        except ValidationError as e:
+            errors.append({"operation": "update", "index": index, "error": _validation_message(e)})
+            continue
+        updates.append((index, values.pop("id"), values))
+    
+    deletes: List[Tuple[int, UUID]] = []
+    for index, item in enumerate(batch.delete):
+        try:
+            deletes.append((index, UUID(str(item))))
+        except ValueError:
+            errors.append({"operation": "delete", "index": index, "error": f"Invalid ID: {item}"})
+    
+    # Each row may be touched once, and only by its owner
+    targets = [("update", index, row_id) for index, row_id, _ in updates]
+    targets += [("delete", index, row_id) for index, row_id in deletes]
+    owned = set()
+    if targets:
+        result = await db.execute(
+            select(model.id).filter(model.id.in_({row_id for _, _, row_id in targets}), model.owner_id == owner_id)
+        )
+        owned = set(result.scalars())
+    seen = set()
+    rejected = set()
+    for operation, index, row_id in targets:
+        if row_id not in owned:
+            error = f"{model.__name__} {row_id} not found"
+        elif row_id in seen:
+            error = f"{model.__name__} {row_id} appears earlier in the batch"
+        else:
+            seen.add(row_id)
+            continue
+        errors.append({"operation": operation, "index": index, "error": error})
+        rejected.add((operation, index))
+    updates = [update for update in updates if ("update", update[0]) not in rejected]
+    deletes = [delete for delete in deletes if ("delete", delete[0]) not in rejected]
+    
+    errors.sort(key=lambda error: (("create", "update", "delete").index(error["operation"]), error["index"]))
+    if batch.atomic and errors:
+        return {"created": [], "updated": [], "deleted": [], "errors": errors, "applied": False}
+    
+    table = model.__table__
+    if creates:
+        await db.execute(table.insert(), creates)
+    
+    # An executemany needs the same parameters for every row, so group updates by the columns they set
+    groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+    for _, row_id, values in updates:
+        columns = tuple(sorted(values))
+        params = {f"new_{name}": values[name] for name in columns}
+        groups.setdefault(columns, []).append({"target_id": row_id, **params})
+    for columns, params in groups.items():
+        assignments = {name: bindparam(f"new_{name}") for name in columns}
+        statement = table.update().where(table.c.id == bindparam("target_id")).values(
+            **assignments, updated_at=now, row_version=table.c.row_version + 1
+        )
+        await db.execute(statement, params)
+    
+    if deletes:
+        if on_delete is not None:
+            await on_delete(db, [row_id for _, row_id in deletes])
+        await db.execute(table.delete().where(table.c.id.in_([row_id for _, row_id in deletes])))
+    
+    # IDs as strings, so the result can be recorded as JSON for idempotent retries
+    return {
+        "created": [str(values["id"]) for values in creates],
+        "updated": [str(row_id) for _, row_id, _ in updates],
+        "deleted": [str(row_id) for _, row_id in deletes],
+        "errors": errors,
+        "applied": True
+    }
+
+async def run_batch(db: AsyncSession, model: Any, batch: BatchRequest, create_schema: Type[BaseModel],
+                    update_schema: Type[BaseModel], defaults: Dict[str, Any], owner_id: UUID, scope: str,
+                    idempotency_key: Optional[str],
+                    on_delete: Optional[DeleteHook] = None) -> Tuple[ORJSONResponse, List[str]]:
+    """Apply and commit a batch, replaying the recorded response if its idempotency key was seen before.
+    
+    Returns the response and the IDs of the rows this call updated or deleted, so callers can drop
+    them from their caches. A replayed or rejected batch changed nothing, so its list is empty.
+    """
+    fingerprint = request_fingerprint(batch.dict())
+    if idempotency_key is not None:
+        record = await find_response(db, owner_id, scope, idempotency_key, fingerprint)
+        if record is not None:
+            logger.info(f"Replaying {scope} response for idempotency key {idempotency_key}")
+            return replay(record), []
+    
+    result = await apply_batch(db, model, batch, create_schema, update_schema, defaults, owner_id, on_delete)
+    if not result["applied"]:
+        await db.rollback()
+        return ORJSONResponse(result, status_code=status.HTTP_422_UNPROCESSABLE_ENTITY), []
+    
+    if idempotency_key is not None:
+        record_response(db, owner_id, scope, idempotency_key, fingerprint, status.HTTP_200_OK, result)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        if idempotency_key is None:
+            raise
+        # A concurrent request with the same key committed first, so this one's writes were rolled back
+        record = await find_response(db, owner_id, scope, idempotency_key, fingerprint)
+        if record is None:
+            raise
+        return replay(record), []
+    
+    logger.info(
+        f"Batch {scope}: {len(result['created'])} created, {len(result['updated'])} updated, "
+        f"{len(result['deleted'])} deleted, {len(result['errors'])} failed"
+    )
+    return ORJSONResponse(result), result["updated"] + result["deleted"]
@@ -0,0 +1,174 @@
+# AI Agentic Platform - Bulk Prompt Import and Export
+"""
+Reading, validating and chunking bulk prompt imports, and encoding streamed exports, for both the
+prompt routes and the prompt store.
+
+Imports take NDJSON, one row per line, or a JSON array of ``{"body", "version", "tags"}`` rows. Rows
+are handed to the caller in numbered chunks, one transaction each; a row that is not valid JSON or
+not a valid prompt is reported by its position instead of failing the import.
+
+Exports are NDJSON, the import format, or one JSON array, encoded a batch of prompts per chunk so
+nothing holds the whole library.
+"""
+
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, Iterator, List, Tuple
+import json
+
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "json": "application/json"}
+
+# A chunk of import rows, each with its position in the import
+Chunk = List[Tuple[int, Any]]
+
+def new_result() -> Dict[str, Any]:
+    """Start the result of an import: counts, the new prompt IDs and the per-row errors."""
+    return {"imported": 0, "failed": 0, "ids": [], "errors": []}
+
+def parse_line(line: bytes) -> Any:
+    """Parse one NDJSON line, returning the error instead of raising so it is reported against its row."""
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        return ValueError(f"Invalid JSON: {e}")
+
+def parse_json_array(body: bytes) -> List[Any]:
+    """Parse a JSON array of rows, raising ValueError if the body is not one."""
+    try:
+        rows = json.loads(body)
+    except ValueError as e:
+        raise ValueError(f"Invalid JSON: {e}")
+    if not isinstance(rows, list):
+        raise ValueError("Expected a JSON array of prompts")
+    return rows
+
+def _split_lines(buffer: bytes, chunk: bytes) -> Tuple[List[Any], bytes]:
+    """Add a chunk of an NDJSON stream to the unfinished line in ``buffer``.
+    
+    Returns the rows of the lines the chunk completed and what is left of the unfinished line.
+    """
+    *lines, buffer = (buffer + chunk).split(b"\n")
+    return [parse_line(line) for line in lines if line.strip()], buffer
+
+def iter_ndjson(chunks: Iterable[bytes]) -> Iterator[Any]:
+    """Yield the rows of an NDJSON stream as its chunks, or a file's lines, are read."""
+    buffer = b""
+    for chunk in chunks:
+        rows, buffer = _split_lines(buffer, chunk)
+        yield from rows
+    if buffer.strip():
+        yield parse_line(buffer)
+
+async def aiter_ndjson(chunks: AsyncIterable[bytes]) -> AsyncIterator[Any]:
+    """Yield the rows of an NDJSON stream as its chunks arrive."""
+    buffer = b""
+    async for chunk in chunks:
+        rows, buffer = _split_lines(buffer, chunk)
+        for row in rows:
+            yield row
+    if buffer.strip():
+        yield parse_line(buffer)
+
+def chunked(rows: Iterable[Any], size: int) -> Iterator[Chunk]:
+    """Group import rows into chunks of ``size``, numbering them from 0."""
+    chunk = []
+    for index, row in enumerate(rows):
+        chunk.append((index, row))
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+async def achunked(rows: AsyncIterable[Any], size: int) -> AsyncIterator[Chunk]:
+    """Group import rows arriving asynchronously into chunks of ``size``, numbering them from 0."""
+    chunk = []
+    index = 0
+    async for row in rows:
+        chunk.append((index, row))
+        index += 1
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def row_fields(row: Any) -> Tuple[str, str, List[str]]:
+    """Validate an import row and return its body, version and tags."""
+    if isinstance(row, Exception):
+        # Rows that failed to parse are reported like any other bad row
+        raise row
+    if not isinstance(row, dict):
+        raise ValueError("Row must be an object")
+    body = row.get("body")
+    version = row.get("version", "1.0")
+    tags = row.get("tags") or []
+    if not isinstance(body, str) or not body:
+        raise ValueError("body must be a non-empty string")
+    if not isinstance(version, str):
+        raise ValueError("version must be a string")
+    if not isinstance(tags, list) or not all(isinstance(tag, str) for tag in tags):
+        raise ValueError("tags must be a list of strings")
+    return body, version, tags
+
+def validate_chunk(chunk: Chunk, result: Dict[str, Any]) -> List[Tuple[int, Tuple[str, str, List[str]]]]:
+    """Get the body, version and tags of a chunk's valid rows, reporting the others in ``result``."""
+    valid = []
+    for index, row in chunk:
+        try:
+            valid.append((index, row_fields(row)))
+        except ValueError as e:
+            add_error(result, index, e)
+    return valid
+
+def add_error(result: Dict[str, Any], index: int, error: Any) -> None:
+    """Report a row that could not be imported."""
+    result["errors"].append({"index": index, "error": str(error)})
+    result["failed"] = len(result["errors"])
+
+def add_imported(result: Dict[str, Any], ids: List[Any]) -> None:
+    """Count the prompts a chunk imported."""
+    result["ids"].extend(ids)
+    result["imported"] += len(ids)
+
+class ExportEncoder:
+    """Encodes prompts for an export, a batch at a time, as NDJSON lines or the items of one JSON array."""
+    
+    def __init__(self, export_format: str = "ndjson"):
+        """Start an export in ``export_format``, one of ``EXPORT_FORMATS``."""
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {export_format}")
+        self.export_format = export_format
+        self._first = True
+    
+    def start(self) -> bytes:
+        """Get what comes before the first batch."""
+        return b"[" if self.export_format == "json" else b""
+    
+    def batch(self, prompts: Iterable[Dict[str, Any]]) -> bytes:
+        """Encode a batch of prompt dicts."""
+        lines = [json.dumps(prompt) for prompt in prompts]
+        if not lines:
+            return b""
+        if self.export_format == "ndjson":
+            return ("\n".join(lines) + "\n").encode("utf-8")
+        text = ",".join(lines) if self._first else "," + ",".join(lines)
+        self._first = False
+        return text.encode("utf-8")
+    
+    def end(self) -> bytes:
+        """Get what comes after the last batch."""
+        return b"]" if self.export_format == "json" else b""
+
+def encode_export(prompts: Iterable[Dict[str, Any]], export_format: str = "ndjson",
+                  batch_size: int = 1000) -> Iterator[bytes]:
+    """Encode prompt dicts as an export, yielding one chunk per ``batch_size`` prompts."""
+    encoder = ExportEncoder(export_format)
+    yield encoder.start()
+    batch = []
+    for prompt in prompts:
+        batch.append(prompt)
+        if len(batch) >= batch_size:
+            yield encoder.batch(batch)
+            batch = []
+    if batch:
+        yield encoder.batch(batch)
+    yield encoder.end()
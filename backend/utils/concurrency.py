@@ -0,0 +1,63 @@
+# AI Agentic Platform - Concurrency Utilities
+"""
+Locking primitives shared by the in-memory caches.
+"""
+
+from contextlib import contextmanager
+import threading
+
+class ReadWriteLock:
+    """Lock that admits any number of readers at once, or a single writer.
+    
+    Waiting writers go first, so a steady stream of readers cannot starve them. The write side is
+    reentrant, and the thread holding it may also take the read side.
+    """
+    
+    def __init__(self):
+        """Initialize the lock."""
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._waiting_writers = 0
+        self._writer = None
+        self._depth = 0
+    
+    @contextmanager
+    def read(self):
+        """Hold the lock for reading."""
+        if self._writer == threading.get_ident():
+            yield
+            return
+        with self._cond:
+            while self._writer is not None or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+    
+    @contextmanager
+    def write(self):
+        """Hold the lock for writing."""
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer != me:
+                self._waiting_writers += 1
+                try:
+                    while self._writer is not None or self._readers:
+                        self._cond.wait()
+                finally:
+                    self._waiting_writers -= 1
+                self._writer = me
+            self._depth += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._depth -= 1
+                if not self._depth:
+                    self._writer = None
+                    self._cond.notify_all()
@@ -0,0 +1,90 @@
+# AI Agentic Platform - Conditional Requests
+"""
+ETags and conditional GETs, so clients polling for changes get a bodiless 304 while nothing changed.
+
+An entity's ETag hashes its ``id``, ``row_version`` and ``updated_at``, and a listing page's hashes
+those of every row on the page along with whether there is a next one. Both cover the fields asked
+for, since each fieldset is its own representation. Routes look the validators up with a narrow
+query first and only load, project and encode the full rows when the client's copy is stale.
+"""
+
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Iterable, Optional, Sequence
+import hashlib
+
+from fastapi import Request, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Columns an ETag is computed from
+VALIDATOR_FIELDS = ("id", "row_version", "updated_at")
+
+def _etag(parts: Iterable[Any]) -> str:
+    """Hash the parts of a representation's state into a strong ETag."""
+    digest = hashlib.blake2b(digest_size=12)
+    for part in parts:
+        digest.update(repr(part).encode("utf-8"))
+        digest.update(b"\0")
+    return f'"{digest.hexdigest()}"'
+
+def entity_etag(row: Any, fields: Sequence[str]) -> str:
+    """Get the ETag of one row served with ``fields``."""
+    return _etag((row.id, row.row_version, row.updated_at, *fields))
+
+def collection_etag(rows: Sequence[Any], next_cursor: Optional[str], fields: Sequence[str]) -> str:
+    """Get the ETag of a listing page of rows served with ``fields``."""
+    state = (part for row in rows for part in (row.id, row.row_version, row.updated_at))
+    return _etag((*fields, next_cursor is not None, *state))
+
+def http_date(value: datetime) -> str:
+    """Format a naive UTC datetime as an HTTP date."""
+    return format_datetime(value.replace(tzinfo=timezone.utc), usegmt=True)
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Check an ``If-None-Match`` header against an ETag, with the weak comparison it calls for."""
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+def is_conditional(request: Request) -> bool:
+    """Check whether a request carries validators worth looking the current ones up for."""
+    return "if-none-match" in request.headers or "if-modified-since" in request.headers
+
+async def load_validators(db: AsyncSession, model: Any, entity_id: Any) -> Optional[Any]:
+    """Get just the columns an entity's ETag is computed from, or None if it doesn't exist."""
+    columns = [getattr(model, name) for name in VALIDATOR_FIELDS]
+    result = await db.execute(select(*columns).filter(model.id == entity_id))
+    return result.first()
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """Check whether the client's cached copy is current.
+    
+    ``If-None-Match`` decides when present; ``If-Modified-Since`` is only consulted without it, and
+    only for representations with a ``last_modified`` time.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is not None:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    # HTTP dates have whole seconds
+    return last_modified.replace(microsecond=0) <= since
+
+def set_validators(response: Response, etag: str, last_modified: Optional[datetime] = None) -> Response:
+    """Add the ETag and Last-Modified headers to a response."""
+    response.headers["ETag"] = etag
+    if last_modified is not None:
+        response.headers["Last-Modified"] = http_date(last_modified)
+    return response
+
+def not_modified(etag: str, last_modified: Optional[datetime] = None) -> Response:
+    """Build a 304 response for a client whose cached copy is current."""
+    return set_validators(Response(status_code=status.HTTP_304_NOT_MODIFIED), etag, last_modified)
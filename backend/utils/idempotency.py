@@ -0,0 +1,67 @@
+# AI Agentic Platform - Idempotency Keys
+"""
+Idempotency keys, so a client can retry a write whose response it never got without applying it twice.
+
+The client sends an ``Idempotency-Key`` header with the request. The response is recorded in the
+same transaction as the writes it describes, so either both are committed or neither is, and a
+retry with the same key gets the recorded response back instead. Keys are scoped to their owner
+and endpoint and expire after ``idempotency_key_ttl_hours``. Reusing a key for a different request
+body is refused with a 422.
+"""
+
+from datetime import datetime, timedelta
+from typing import Any, Optional
+from uuid import UUID
+import hashlib
+import json
+
+from fastapi import HTTPException, status
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
+def request_fingerprint(payload: Any) -> str:
+    """Hash a request body, independent of key order, to tell a retry from a different request."""
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+async def find_response(db: AsyncSession, owner_id: UUID, scope: str, key: str,
+                        fingerprint: str) -> Optional[IdempotencyKey]:
+    """Get the response recorded for a key, or None if the key is new or has expired.
+    
+    Raises a 422 if the key was recorded for a different request.
+    """
+    record = await db.get(IdempotencyKey, {"owner_id": owner_id, "scope": scope, "key": key})
+    if record is None:
+        return None
+    if record.created_at < datetime.utcnow() - timedelta(hours=settings.idempotency_key_ttl_hours):
+        # Free the key for this request; the delete commits along with its new response
+        await db.delete(record)
+        await db.flush()
+        return None
+    if record.request_hash != fingerprint:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"{IDEMPOTENCY_HEADER} {key} was already used for a different request"
+        )
+    return record
+
+def record_response(db: AsyncSession, owner_id: UUID, scope: str, key: str, fingerprint: str,
+                    status_code: int, body: dict) -> None:
+    """Record a response for a key, to be committed with the writes it describes."""
+    db.add(IdempotencyKey(
+        owner_id=owner_id,
+        scope=scope,
+        key=key,
+        request_hash=fingerprint,
+        status_code=status_code,
+        response=body
+    ))
+
+def replay(record: IdempotencyKey) -> ORJSONResponse:
+    """Build the response to a retry from what was recorded for its key."""
+    return ORJSONResponse(record.response, status_code=record.status_code, headers={"Idempotent-Replayed": "true"})
@@ -0,0 +1,83 @@
+# AI Agentic Platform - Pagination
+"""
+Keyset (cursor) pagination for list endpoints.
+
+Listings are ordered by ``(created_at, id)`` and a page starts right after the last row of the
+previous one, so every page is an index range scan no matter how deep it is, and rows written
+between requests never shift later pages. Cursors are opaque URL-safe strings encoding that last
+``(created_at, id)``.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+from uuid import UUID
+import base64
+
+from fastapi import HTTPException, status
+from sqlalchemy import literal, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+def encode_cursor(created_at: datetime, row_id: UUID) -> str:
+    """Encode the position right after a row as an opaque cursor."""
+    raw = f"{created_at.isoformat()}|{row_id.hex}".encode("ascii")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    """Decode a cursor into the ``(created_at, id)`` it points after. Raises ValueError if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("ascii")
+        created_at, row_id = raw.split("|")
+        return datetime.fromisoformat(created_at), UUID(hex=row_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+@dataclass
+class PageRequest:
+    """Where a page starts and how many rows it holds."""
+    after: Optional[Tuple[datetime, UUID]]
+    limit: int
+
+def get_page_request(cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE) -> PageRequest:
+    """Dependency that reads and validates the ``cursor`` and ``limit`` query parameters."""
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"limit must be between 1 and {MAX_PAGE_SIZE}"
+        )
+    try:
+        return PageRequest(after=decode_cursor(cursor) if cursor else None, limit=limit)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+def page_statement(statement: Any, model: Any, page: PageRequest) -> Any:
+    """Narrow a query or select over ``model`` to one page, plus one row to tell if there is another."""
+    statement = statement.order_by(model.created_at, model.id)
+    if page.after is not None:
+        created_at, row_id = page.after
+        statement = statement.filter(
+            tuple_(model.created_at, model.id)
+            > tuple_(literal(created_at, model.created_at.type), literal(row_id, model.id.type))
+        )
+    return statement.limit(page.limit + 1)
+
+def split_page(rows: List[Any], page: PageRequest) -> Tuple[List[Any], Optional[str]]:
+    """Split the rows fetched for a page into the page and the cursor of the next one, if any."""
+    if len(rows) <= page.limit:
+        return rows, None
+    last = rows[page.limit - 1]
+    return rows[:page.limit], encode_cursor(last.created_at, last.id)
+
+async def paginate_async(db: AsyncSession, statement: Select, model: Any,
+                         page: PageRequest) -> Tuple[List[Any], Optional[str]]:
+    """Fetch one page of a select of ``model``'s columns on an async session, ordered by ``(created_at, id)``.
+    
+    Returns the page's rows and the cursor of the next page, or None if this is the last one. The
+    select must include the ``created_at`` and ``id`` columns, which the next cursor is built from.
+    """
+    result = await db.execute(page_statement(statement, model, page))
+    return split_page(result.all(), page)
@@ -119,6 +119,16 @@ export const teams = {
     return response.data;
   },
   
+  getTeamWithAgents: async (teamId: string) => {
+    const response = await api.get(`/teams/${teamId}/with-agents`);
+    return response.data;
+  },
+  
+  setTeamMembers: async (teamId: string, members: { agent_id: string; role?: string }[]) => {
+    const response = await api.put(`/teams/${teamId}/members`, members);
+    return response.data;
+  },
+  
   createTeam: async (teamData: any) => {
     const response = await api.post('/teams', teamData);
     return response.data;
@@ -137,8 +147,15 @@ export const teams = {
 
 // Prompts endpoints
 export const prompts = {
-  getPrompts: async () => {
-    const response = await api.get('/prompts');
+  getPrompts: async (tags: string[] = []) => {
+    const params = tags.length > 0 ? { tags: tags.join(',') } : {};
+    const response = await api.get('/prompts', { params });
+    return response.data;
+  },
+  
+  getTagCounts: async (tags: string[] = []) => {
+    const params = tags.length > 0 ? { tags: tags.join(',') } : {};
+    const response = await api.get('/prompts/tags', { params });
     return response.data;
   },
   
@@ -12,6 +12,7 @@ const PromptsPage = () => {
   const [error, setError] = useState('');
   const [searchTerm, setSearchTerm] = useState('');
   const [filterTags, setFilterTags] = useState<string[]>([]);
+  const [tagCounts, setTagCounts] = useState<{ tag: string; count: number }[]>([]);
   
   const router = useRouter();
 
@@ -19,8 +20,13 @@ const PromptsPage = () => {
     const fetchPrompts = async () => {
       try {
         setLoading(true);
-        const data = await prompts.getPrompts();
-        setPromptsList(data);
+        // Tags are filtered on the server, which also counts the tags of the prompts that match
+        const [page, counts] = await Promise.all([
+          prompts.getPrompts(filterTags),
+          prompts.getTagCounts(filterTags)
+        ]);
+        setPromptsList(page.items);
+        setTagCounts(counts);
       } catch (err: any) {
         setError(err.response?.data?.detail || 'Failed to fetch prompts');
       } finally {
@@ -29,22 +35,15 @@ const PromptsPage = () => {
     };
 
     fetchPrompts();
-  }, []);
+  }, [filterTags]);
 
-  // Get all unique tags from prompts for filtering
-  const allTags = Array.from(new Set(
-    promptsList.flatMap(prompt => prompt.tags || [])
-  )).sort();
+  // Tags to narrow the filter by, most used first
+  const allTags = tagCounts.filter(({ tag }) => !filterTags.includes(tag));
 
-  // Filter prompts based on search and tags
+  // Filter prompts based on search
   const filteredPrompts = promptsList.filter(prompt => {
-    const matchesSearch = prompt.body.toLowerCase().includes(searchTerm.toLowerCase()) || 
-                         prompt.version.includes(searchTerm);
-    
-    const matchesTags = filterTags.length === 0 || 
-                      filterTags.every(tag => prompt.tags?.includes(tag));
-    
-    return matchesSearch && matchesTags;
+    return prompt.body.toLowerCase().includes(searchTerm.toLowerCase()) || 
+           prompt.version.includes(searchTerm);
   });
 
   const handleAddTag = (tag: string) => {
@@ -87,13 +86,13 @@ const PromptsPage = () => {
             <div>
               <label className="block text-sm font-medium text-gray-700 mb-1">Filter by Tags</label>
               <div className="flex flex-wrap gap-2">
-                {allTags.slice(0, 10).map((tag) => (
+                {allTags.slice(0, 10).map(({ tag, count }) => (
                   <button
                     key={tag}
                     onClick={() => handleAddTag(tag)}
                     className="px-2 py-1 text-xs font-medium rounded-full bg-gray-100 text-gray-800 hover:bg-blue-100 hover:text-blue-800 transition-colors"
                   >
-                    {tag}
+                    {tag} ({count})
                   </button>
                 ))}
                 
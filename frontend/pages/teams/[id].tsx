@@ -25,7 +25,7 @@ const TeamDetailPage = () => {
     const fetchTeam = async () => {
       try {
         setLoading(true);
-        const data = await teams.getTeam(id as string);
+        const data = await teams.getTeamWithAgents(id as string);
         setTeam(data);
         setFormData({
           name: data.name,
@@ -49,7 +49,7 @@ const TeamDetailPage = () => {
       setIsEditing(false);
       
       // Refresh the team data
-      const updatedTeam = await teams.getTeam(id as string);
+      const updatedTeam = await teams.getTeamWithAgents(id as string);
       setTeam(updatedTeam);
     } catch (err: any) {
       setError(err.response?.data?.detail || 'Failed to update team');
@@ -148,12 +148,13 @@ const TeamDetailPage = () => {
                     Team Members (Agents)
                   </label>
                   <div className="bg-gray-50 px-3 py-2 rounded-md">
-                    {team.members && team.members.length > 0 ? (
+                    {team.agents && team.agents.length > 0 ? (
                       <ul className="space-y-1 text-sm">
-                        {team.members.map((member: string) => (
-                          <li key={member} className="flex items-center">
+                        {team.agents.map((agent: any) => (
+                          <li key={agent.id} className="flex items-center">
                             <span className="w-2 h-2 bg-blue-500 rounded-full mr-2"></span>
-                            {member}
+                            {agent.name}
+                            {agent.role && <span className="ml-2 text-gray-500">({agent.role})</span>}
                           </li>
                         ))}
                       </ul>